@@ -4,13 +4,18 @@ import hmac
 import hashlib
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, Header, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.database import get_async_db
 from app.models import GenerationToken, PaymentTransaction
 from app.schemas import CreateCheckoutRequest, CheckoutResponse
 from app.config import get_settings
 from app.metrics import record_payment
+from app.services.http_clients import creem_client
+from app.services.db_writer import db_writer
+from app.services.token_ledger import grant_tokens
 import httpx
 
 router = APIRouter(prefix="/api/v1/payment", tags=["payment"])
@@ -35,7 +40,7 @@ def get_product_ids() -> dict:
 @router.post("/checkout", response_model=CheckoutResponse)
 async def create_checkout(
     request: CreateCheckoutRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a Creem checkout session."""
     if request.product_sku not in PRODUCTS:
@@ -51,7 +56,7 @@ async def create_checkout(
         raise HTTPException(status_code=500, detail="Payment not configured")
     
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
+        async with creem_client() as client:
             response = await client.post(
                 "https://api.creem.io/v1/checkouts",
                 headers={
@@ -81,8 +86,7 @@ async def create_checkout(
                 status="pending",
                 tokens_granted=PRODUCTS[request.product_sku]["tokens"]
             )
-            db.add(transaction)
-            db.commit()
+            await db_writer.run(db, add_transaction, transaction)
             
             return CheckoutResponse(
                 checkout_url=data["checkout_url"],
@@ -109,11 +113,56 @@ def verify_webhook_signature(payload: bytes, signature: str) -> bool:
     return hmac.compare_digest(expected, signature)
 
 
+def add_transaction(db: Session, transaction: PaymentTransaction) -> None:
+    """Store a new payment transaction."""
+    db.add(transaction)
+    db.commit()
+
+
+def complete_payment(db: Session, checkout_id: str, payload: dict) -> PaymentTransaction:
+    """Mark a checkout completed and grant its tokens, as one write."""
+    # Find transaction
+    transaction = db.query(PaymentTransaction).filter(
+        PaymentTransaction.checkout_id == checkout_id
+    ).first()
+    
+    if not transaction:
+        # Create transaction if not found (metadata should contain device_id)
+        metadata = payload.get("metadata", payload.get("data", {}).get("metadata", {}))
+        device_id = metadata.get("device_id")
+        product_sku = metadata.get("product_sku", "quiz_5")
+        
+        if not device_id:
+            raise HTTPException(status_code=400, detail="Missing device_id in metadata")
+        
+        transaction = PaymentTransaction(
+            checkout_id=checkout_id,
+            device_id=device_id,
+            product_id=payload.get("product_id", ""),
+            amount_cents=payload.get("amount", 0),
+            currency=payload.get("currency", "usd"),
+            status="completed",
+            tokens_granted=PRODUCTS.get(product_sku, {}).get("tokens", 5),
+            completed_at=datetime.utcnow()
+        )
+        db.add(transaction)
+    else:
+        transaction.status = "completed"
+        transaction.amount_cents = payload.get("amount", transaction.amount_cents)
+        transaction.completed_at = datetime.utcnow()
+    
+    # Add tokens to user
+    grant_tokens(db, transaction.device_id, transaction.tokens_granted)
+    
+    db.commit()
+    return transaction
+
+
 @router.post("/webhook")
 async def handle_webhook(
     request: Request,
     x_creem_signature: str = Header(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Handle Creem payment webhooks."""
     body = await request.body()
@@ -131,54 +180,7 @@ async def handle_webhook(
     checkout_id = payload.get("checkout_id", payload.get("data", {}).get("checkout_id"))
     
     if event_type in ["checkout.completed", "payment.completed"]:
-        # Find transaction
-        transaction = db.query(PaymentTransaction).filter(
-            PaymentTransaction.checkout_id == checkout_id
-        ).first()
-        
-        if not transaction:
-            # Create transaction if not found (metadata should contain device_id)
-            metadata = payload.get("metadata", payload.get("data", {}).get("metadata", {}))
-            device_id = metadata.get("device_id")
-            product_sku = metadata.get("product_sku", "quiz_5")
-            
-            if not device_id:
-                raise HTTPException(status_code=400, detail="Missing device_id in metadata")
-            
-            transaction = PaymentTransaction(
-                checkout_id=checkout_id,
-                device_id=device_id,
-                product_id=payload.get("product_id", ""),
-                amount_cents=payload.get("amount", 0),
-                currency=payload.get("currency", "usd"),
-                status="completed",
-                tokens_granted=PRODUCTS.get(product_sku, {}).get("tokens", 5),
-                completed_at=datetime.utcnow()
-            )
-            db.add(transaction)
-        else:
-            transaction.status = "completed"
-            transaction.amount_cents = payload.get("amount", transaction.amount_cents)
-            transaction.completed_at = datetime.utcnow()
-        
-        # Add tokens to user
-        token_record = db.query(GenerationToken).filter(
-            GenerationToken.device_id == transaction.device_id
-        ).first()
-        
-        if token_record:
-            token_record.tokens_remaining += transaction.tokens_granted
-            token_record.tokens_total += transaction.tokens_granted
-            token_record.updated_at = datetime.utcnow()
-        else:
-            token_record = GenerationToken(
-                device_id=transaction.device_id,
-                tokens_remaining=transaction.tokens_granted,
-                tokens_total=transaction.tokens_granted
-            )
-            db.add(token_record)
-        
-        db.commit()
+        transaction = await db_writer.run(db, complete_payment, checkout_id, payload)
         
         # Record metrics
         product_sku = payload.get("metadata", {}).get("product_sku", "unknown")
@@ -191,12 +193,12 @@ async def handle_webhook(
 async def payment_success(
     checkout_id: str,
     device_id: str = Header(None, alias="X-Device-Id"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Verify payment success and return token count."""
-    transaction = db.query(PaymentTransaction).filter(
-        PaymentTransaction.checkout_id == checkout_id
-    ).first()
+    transaction = (await db.execute(
+        select(PaymentTransaction).where(PaymentTransaction.checkout_id == checkout_id)
+    )).scalar_one_or_none()
     
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
@@ -208,9 +210,9 @@ async def payment_success(
         }
     
     # Get token balance
-    token_record = db.query(GenerationToken).filter(
-        GenerationToken.device_id == transaction.device_id
-    ).first()
+    token_record = (await db.execute(
+        select(GenerationToken).where(GenerationToken.device_id == transaction.device_id)
+    )).scalar_one_or_none()
     
     return {
         "status": "completed",
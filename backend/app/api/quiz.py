@@ -1,25 +1,54 @@
 """Quiz API routes."""
-from fastapi import APIRouter, Depends, HTTPException, Header
-from sqlalchemy.orm import Session
-from typing import Optional
-from datetime import datetime
+import json
+import logging
+import time
+from contextlib import aclosing
+from fastapi import APIRouter, Depends, HTTPException, Header, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from typing import AsyncIterator, Collection, List, Optional
 
-from app.database import get_db
-from app.models import UserProgress, StudySession, GenerationToken, FreeTrialUsage
+from app.database import get_async_db
+from app.models import UserProgress, GenerationToken, FreeTrialUsage
 from app.schemas import (
     QuizRequest, QuizResponse, QuizSubmitRequest, QuizSubmitResponse,
-    UserProgressResponse, TokenStatusResponse, QuizResult
+    UserProgressResponse, TokenStatusResponse, QuizResult, QuizQuestion
 )
-from app.services.quiz_service import (
-    generate_quiz, calculate_xp, calculate_level, xp_to_next_level,
-    check_achievements
+from app.services.quiz_service import generate_quiz, stream_quiz, translate_questions, xp_to_next_level
+from app.services.circuit_breaker import CircuitOpenError, llm_breaker
+from app.services.degraded_quiz import assemble_degraded_quiz
+from app.services.llm_limiter import (
+    LLMDeadlineExceeded, LLMOverloadedError, PAID, FREE_TRIAL, llm_caller
 )
+from app.services.quiz_cache import quiz_cache, quiz_cache_key
+from app.services.quiz_translation import (
+    TranslationLookup, look_up_translation, quiz_translations, translation_source_key
+)
+from app.services.question_index import recent_groups, remember_served
+from app.services.quiz_store import quiz_store
+from app.services.topic_index import topic_category
+from app.services.progress_engine import progress_engine
+from app.services.single_flight import quiz_flights
+from app.services.question_bank import assemble_quiz_from_bank
+from app.services.warm_pool import warm_pool
+from app.services.db_writer import WriteTimeoutError, db_writer
+from app.services.token_ledger import (
+    Reservation, NoTokensError, reserve_generation, refund_generation
+)
+from app.config import get_settings
 from app.metrics import (
     record_quiz_generation, record_quiz_submission,
-    record_token_consumption, record_free_trial
+    record_time_to_first_question, record_degraded_quiz,
+    record_quiz_generated, record_quiz_translation
 )
 
 router = APIRouter(prefix="/api/v1", tags=["quiz"])
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Retry-After for a generation whose reservation the database writer didn't get to in time
+WRITE_RETRY_AFTER_SECONDS = 1
 
 
 def get_device_id(x_device_id: Optional[str] = Header(None)) -> str:
@@ -29,125 +58,438 @@ def get_device_id(x_device_id: Optional[str] = Header(None)) -> str:
     return x_device_id
 
 
-def check_token_or_free_trial(device_id: str, db: Session) -> tuple[bool, int]:
-    """Check if user has tokens or free trial available.
-    
-    Returns: (is_free_trial, tokens_remaining)
+async def reserve_generation_or_402(device_id: str, db: AsyncSession) -> Reservation:
+    """Reserve a generation, or raise 402 if the device has nothing left.
+
+    A reservation the database writer doesn't get to in time is a
+    retryable 503; if it is applied after all, it is refunded.
     """
-    # Check for paid tokens first
-    token_record = db.query(GenerationToken).filter(
-        GenerationToken.device_id == device_id
-    ).first()
-    
-    if token_record and token_record.tokens_remaining > 0:
-        return False, token_record.tokens_remaining
-    
-    # Check free trial
-    free_trial = db.query(FreeTrialUsage).filter(
-        FreeTrialUsage.device_id == device_id
-    ).first()
-    
-    if not free_trial:
-        return True, 0  # Free trial available
-    
-    # No tokens and free trial used
-    raise HTTPException(
-        status_code=402,
+    try:
+        return await db_writer.run(db, reserve_generation, device_id)
+    except NoTokensError:
+        raise HTTPException(
+            status_code=402,
+            detail={
+                "error": "No tokens remaining. Please purchase more quiz generations.",
+                "code": "payment_required"
+            }
+        )
+    except WriteTimeoutError as e:
+        e.pending.add_done_callback(refund_late_reservation)
+        raise HTTPException(
+            status_code=503,
+            detail={
+                "error": "Quiz generation is busy. Please try again shortly.",
+                "code": "db_busy"
+            },
+            headers={"Retry-After": str(WRITE_RETRY_AFTER_SECONDS)}
+        )
+
+
+def refund_late_reservation(pending) -> None:
+    """Refund a reservation applied after its request already answered 503."""
+    if pending.cancelled() or pending.exception() is not None:
+        return
+    if not db_writer.running:
+        logger.warning("Late reservation for %s not refunded: writer stopped", pending.result().device_id)
+        return
+    db_writer.enqueue(refund_generation, pending.result())
+
+
+def llm_caller_for(reservation: Reservation):
+    """Schedule the LLM calls of a generation by what the caller pays with, under one deadline."""
+    return llm_caller(
+        FREE_TRIAL if reservation.is_free_trial else PAID,
+        reservation.device_id,
+        deadline=time.monotonic() + settings.llm_request_deadline_seconds
+    )
+
+
+def overloaded_503(e: LLMOverloadedError) -> HTTPException:
+    """503 for a generation shed by the LLM limiter, with a Retry-After hint."""
+    return HTTPException(
+        status_code=503,
         detail={
-            "error": "No tokens remaining. Please purchase more quiz generations.",
-            "code": "payment_required"
-        }
+            "error": "Quiz generation is busy. Please try again shortly.",
+            "code": "llm_overloaded"
+        },
+        headers={"Retry-After": str(e.retry_after)}
     )
 
 
-def consume_token_or_free_trial(device_id: str, db: Session) -> bool:
-    """Consume a token or mark free trial as used.
-    
-    Returns: True if this was a free trial
+def unavailable_503(e: CircuitOpenError) -> HTTPException:
+    """503 for a generation while the LLM is down and no earlier questions are on hand."""
+    return HTTPException(
+        status_code=503,
+        detail={
+            "error": "Quiz generation is temporarily unavailable. Please try again later.",
+            "code": "llm_unavailable"
+        },
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+
+async def find_degraded_quiz(request: QuizRequest, db: AsyncSession) -> Optional[List[QuizQuestion]]:
+    """Earlier questions for a request, for degraded mode."""
+    questions = await db.run_sync(lambda session: assemble_degraded_quiz(
+        session, request.topic, request.difficulty, request.language, request.num_questions
+    ))
+    record_degraded_quiz(served=questions is not None)
+    return questions
+
+
+def balance_after(reservation: Reservation, charged: bool) -> dict:
+    """`is_free_trial` and `tokens_remaining` for a response, once the reservation is kept or refunded."""
+    if reservation.is_free_trial:
+        # A refunded free trial is still available, and the paid balance is untouched
+        return {"is_free_trial": charged, "tokens_remaining": None if charged else reservation.tokens_remaining}
+    return {
+        "is_free_trial": False,
+        "tokens_remaining": reservation.tokens_remaining if charged else reservation.tokens_remaining + 1
+    }
+
+
+async def get_or_generate_quiz(
+    request: QuizRequest,
+    db: AsyncSession,
+    avoid: Collection[str] = ()
+) -> List[QuizQuestion]:
+    """Serve a quiz from the warm pool, cache or question bank, generating one on a miss.
+    
+    Identical concurrent misses share one LLM call; each caller is still
+    charged separately by the endpoint. Bank quizzes leave out the
+    question groups in `avoid` when they can.
     """
-    # Check for paid tokens first
-    token_record = db.query(GenerationToken).filter(
-        GenerationToken.device_id == device_id
-    ).first()
+    warm_pool.observe(request.topic, request.difficulty, request.language, request.num_questions)
+    questions = warm_pool.take(request.topic, request.difficulty, request.language, request.num_questions)
+    if questions is not None:
+        return questions
     
-    if token_record and token_record.tokens_remaining > 0:
-        token_record.tokens_remaining -= 1
-        token_record.updated_at = datetime.utcnow()
-        db.commit()
-        record_token_consumption()
-        return False
+    key = quiz_cache_key(request.topic, request.difficulty, request.language, request.num_questions)
     
-    # Use free trial
-    free_trial = db.query(FreeTrialUsage).filter(
-        FreeTrialUsage.device_id == device_id
-    ).first()
+    questions = await db.run_sync(lambda session: quiz_cache.get(key, session))
+    if questions is not None:
+        return questions
     
-    if not free_trial:
-        free_trial = FreeTrialUsage(device_id=device_id)
-        db.add(free_trial)
-        db.commit()
-        record_free_trial()
-        return True
+    questions = await db_writer.run(
+        db, assemble_quiz_from_bank,
+        request.topic, request.difficulty, request.language, request.num_questions, avoid
+    )
+    if questions is not None:
+        return questions
     
-    # Should not reach here - check_token_or_free_trial should have raised
-    raise HTTPException(
-        status_code=402,
-        detail={
-            "error": "No tokens remaining. Please purchase more quiz generations.",
-            "code": "payment_required"
-        }
+    questions = await find_translated_quiz(request, db)
+    if questions is not None:
+        return questions
+    
+    # End the read transaction so the connection goes back to the pool
+    # for the duration of the LLM call
+    await db.commit()
+    
+    questions, _ = await quiz_flights.do(key, lambda: generate_and_cache(request, key, db.bind))
+    return questions
+
+
+async def generate_and_cache(request: QuizRequest, key: str, bind: AsyncEngine) -> List[QuizQuestion]:
+    """Generate a quiz and store it as a cache variant.
+    
+    Runs as the coalesced call itself, so the quiz is cached once, even if
+    the request that started it has disconnected. Uses its own session for
+    the same reason.
+    """
+    started = time.perf_counter()
+    questions = await generate_quiz(
+        topic=request.topic,
+        num_questions=request.num_questions,
+        difficulty=request.difficulty,
+        language=request.language
     )
+    record_quiz_generated(request.language, time.perf_counter() - started)
+    
+    async with AsyncSession(bind, expire_on_commit=False) as session:
+        await db_writer.run(session, lambda sync_session: quiz_cache.put(
+            key, questions, sync_session,
+            topic=request.topic,
+            difficulty=request.difficulty,
+            language=request.language
+        ))
+    return questions
+
+
+async def find_translated_quiz(
+    request: QuizRequest,
+    db: AsyncSession,
+    translate: bool = True
+) -> Optional[List[QuizQuestion]]:
+    """A request's quiz translated from a cached source-language quiz, if there is one.
+    
+    Stored translations are served as they are; the missing ones are
+    translated with one LLM call when `translate` is set. Returns None
+    (generate the quiz instead) without a source quiz or when the
+    translation fails.
+    """
+    if translation_source_key(request.topic, request.difficulty, request.language, request.num_questions) is None:
+        return None
+    started = time.perf_counter()
+    lookup = await db.run_sync(lambda session: look_up_translation(
+        session, request.topic, request.difficulty, request.language, request.num_questions
+    ))
+    if lookup is None:
+        record_quiz_translation(request.language, "no_source")
+        return None
+    
+    missing = lookup.missing
+    if missing and not translate:
+        record_quiz_translation(request.language, "missed")
+        return None
+    if missing:
+        # Release the connection for the duration of the LLM call
+        await db.commit()
+        flight = f"translate:{lookup.source_key}:{request.language}:{','.join(q.id for q in missing)}"
+        try:
+            translated, _ = await quiz_flights.do(
+                flight, lambda: translate_and_store(lookup, missing, request.language, db.bind)
+            )
+        except (CircuitOpenError, LLMOverloadedError, LLMDeadlineExceeded):
+            raise
+        except Exception:
+            translated = []
+        lookup.translated.update((question.id, question) for question in translated)
+        if lookup.missing:
+            record_quiz_translation(request.language, "failed")
+            return None
+    
+    record_quiz_translation(request.language, "translated" if missing else "cached", time.perf_counter() - started)
+    return lookup.quiz()
+
+
+async def translate_and_store(
+    lookup: TranslationLookup,
+    questions: List[QuizQuestion],
+    language: str,
+    bind: AsyncEngine
+) -> List[QuizQuestion]:
+    """Translate source questions and store the translations (as a coalesced call, with its own session)."""
+    translated = await translate_questions(questions, language)
+    async with AsyncSession(bind, expire_on_commit=False) as session:
+        await db_writer.run(session, lambda sync_session: quiz_translations.store(
+            lookup.source_key, translated, language, sync_session
+        ))
+    return translated
 
 
 @router.post("/quiz/generate", response_model=QuizResponse)
 async def generate_quiz_endpoint(
     request: QuizRequest,
     device_id: str = Depends(get_device_id),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Generate quiz questions on a topic."""
-    # Check tokens/free trial
-    is_free_trial, tokens_remaining = check_token_or_free_trial(device_id, db)
+    # Reserve a token/free trial up front; refunded if generation fails
+    reservation = await reserve_generation_or_402(device_id, db)
+    degraded = False
+    refunded = False
+    
+    async def refund() -> None:
+        # At most once: a failing refund must not be retried by the handlers below
+        nonlocal refunded
+        if not refunded:
+            refunded = True
+            await db_writer.run(db, refund_generation, reservation)
     
     try:
-        # Generate quiz
-        questions = await generate_quiz(
-            topic=request.topic,
-            num_questions=request.num_questions,
-            difficulty=request.difficulty,
-            language=request.language
-        )
-        
-        # Consume token after successful generation
-        is_free_trial = consume_token_or_free_trial(device_id, db)
+        try:
+            # Generate quiz (or serve a cached variant)
+            with llm_caller_for(reservation):
+                questions = await get_or_generate_quiz(request, db, recent_groups(device_id))
+        except CircuitOpenError:
+            # The LLM is down: serve earlier questions instead, free of charge
+            questions = await find_degraded_quiz(request, db)
+            if questions is None:
+                raise
+            degraded = True
         
-        # Get updated token count
-        token_record = db.query(GenerationToken).filter(
-            GenerationToken.device_id == device_id
-        ).first()
-        tokens_remaining = token_record.tokens_remaining if token_record else 0
+        # Keep the answer key server-side for grading on submit
+        quiz_id = await db_writer.run(
+            db, quiz_store.save, device_id, request.topic, request.difficulty, questions
+        )
+        remember_served(device_id, questions)
         
         # Record metrics
-        record_quiz_generation(request.topic, request.difficulty)
+        record_quiz_generation(request.topic, request.difficulty, topic_category(request.topic))
+        
+        if degraded:
+            await refund()
         
         return QuizResponse(
+            quiz_id=quiz_id,
             topic=request.topic,
             questions=questions,
-            is_free_trial=is_free_trial,
-            tokens_remaining=tokens_remaining if not is_free_trial else None
+            degraded=degraded,
+            **balance_after(reservation, charged=not degraded)
         )
         
+    except CircuitOpenError as e:
+        await refund()
+        raise unavailable_503(e)
+    except LLMOverloadedError as e:
+        await refund()
+        raise overloaded_503(e)
+    except LLMDeadlineExceeded as e:
+        await refund()
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
+        await refund()
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def format_stream_event(event: str, data: dict, sse: bool) -> str:
+    """Frame one stream event as an NDJSON line or an SSE message."""
+    if sse:
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    return json.dumps({"event": event, **data}) + "\n"
+
+
+async def stream_quiz_events(
+    request: QuizRequest,
+    reservation: Reservation,
+    db: AsyncSession,
+    sse: bool
+) -> AsyncIterator[str]:
+    """Yield question events as they are generated, then a final `done` event.
+    
+    The generation is reserved before the stream starts and is only kept
+    once the first valid question is sent; a stream that fails or is
+    abandoned before that is refunded. While the LLM circuit is open,
+    earlier questions are streamed instead, free of charge.
+    """
+    started = time.perf_counter()
+    key = quiz_cache_key(request.topic, request.difficulty, request.language, request.num_questions)
+    delivered: List[QuizQuestion] = []
+    degraded = None
+    
+    try:
+        cached = await db.run_sync(lambda session: quiz_cache.get(key, session))
+        if cached is None:
+            # Only translations already stored: a translation call would hold up the first question
+            cached = await find_translated_quiz(request, db, translate=False)
+        if cached is None and llm_breaker.is_open:
+            degraded = await find_degraded_quiz(request, db)
+        await db.commit()
+        if cached is not None:
+            source = iter_questions(cached)
+        elif degraded is not None:
+            source = iter_questions(degraded)
+        else:
+            source = stream_quiz(
+                topic=request.topic,
+                num_questions=request.num_questions,
+                difficulty=request.difficulty,
+                language=request.language
+            )
+        
+        # Close the source on early exit, releasing the upstream LLM connection
+        with llm_caller_for(reservation):
+            async with aclosing(source):
+                async for question in source:
+                    if not delivered:
+                        record_time_to_first_question(time.perf_counter() - started)
+                    
+                    delivered.append(question)
+                    yield format_stream_event("question", {"question": question.model_dump()}, sse)
+                    
+                    if len(delivered) >= request.num_questions:
+                        break
+        
+        if not delivered:
+            raise Exception("Quiz generation failed: no valid questions generated")
+        
+        # A short quiz is still delivered, but isn't cached under the full-size key
+        if cached is None and degraded is None and len(delivered) == request.num_questions:
+            await db_writer.run(db, lambda session: quiz_cache.put(
+                key, delivered, session,
+                topic=request.topic,
+                difficulty=request.difficulty,
+                language=request.language
+            ))
+        
+        quiz_id = await db_writer.run(
+            db, quiz_store.save, reservation.device_id, request.topic, request.difficulty, delivered
+        )
+        remember_served(reservation.device_id, delivered)
+        
+        record_quiz_generation(request.topic, request.difficulty, topic_category(request.topic))
+        
+        if degraded is not None:
+            await db_writer.run(db, refund_generation, reservation)
+        
+        yield format_stream_event("done", {
+            "quiz_id": quiz_id,
+            "topic": request.topic,
+            "total": len(delivered),
+            "degraded": degraded is not None,
+            **balance_after(reservation, charged=degraded is None)
+        }, sse)
+        
+    except CircuitOpenError as e:
+        yield format_stream_event("error", {
+            "status_code": 503, "detail": str(e), "retry_after": e.retry_after
+        }, sse)
+    except LLMOverloadedError as e:
+        yield format_stream_event("error", {
+            "status_code": 503, "detail": str(e), "retry_after": e.retry_after
+        }, sse)
+    except LLMDeadlineExceeded as e:
+        yield format_stream_event("error", {"status_code": 504, "detail": str(e)}, sse)
+    except Exception as e:
+        yield format_stream_event("error", {"status_code": 500, "detail": str(e)}, sse)
+    finally:
+        if not delivered:
+            await db_writer.run(db, refund_generation, reservation)
+        # FastAPI closes yield-dependencies before a streaming body runs, so
+        # this session was reopened on first use; release it here.
+        await db.close()
+
+
+async def iter_questions(questions: List[QuizQuestion]) -> AsyncIterator[QuizQuestion]:
+    """Async iterator over already-available questions."""
+    for question in questions:
+        yield question
+
+
+@router.post("/quiz/generate/stream")
+async def generate_quiz_stream_endpoint(
+    request: QuizRequest,
+    http_request: Request,
+    device_id: str = Depends(get_device_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Stream quiz questions as they are generated.
+    
+    Responds with NDJSON by default, or SSE when the client sends
+    `Accept: text/event-stream`.
+    """
+    # Reserve before streaming so an exhausted device gets a regular 402
+    reservation = await reserve_generation_or_402(device_id, db)
+    
+    sse = "text/event-stream" in http_request.headers.get("accept", "")
+    return StreamingResponse(
+        stream_quiz_events(request, reservation, db, sse),
+        media_type="text/event-stream" if sse else "application/x-ndjson"
+    )
+
+
 @router.post("/quiz/submit", response_model=QuizSubmitResponse)
 async def submit_quiz(
     request: QuizSubmitRequest,
     device_id: str = Depends(get_device_id),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Submit quiz answers and get results."""
+    """Submit quiz answers and get results, graded against the stored quiz."""
+    quiz = await db_writer.run(db, quiz_store.take, request.quiz_id, device_id)
+    if quiz is None:
+        raise HTTPException(status_code=404, detail="Quiz not found, expired or already submitted")
+    
     # Calculate results
     results = []
     correct_count = 0
@@ -155,96 +497,30 @@ async def submit_quiz(
     # Create answer lookup
     answer_map = {a.question_id: a.answer for a in request.answers}
     
-    for question in request.questions:
-        user_answer = answer_map.get(question.id, "")
-        is_correct = user_answer.upper() == question.correct_answer.upper()
+    for question_id, correct_answer, explanation in quiz.answer_key:
+        user_answer = answer_map.get(question_id, "")
+        is_correct = user_answer.upper() == correct_answer.upper()
         
         if is_correct:
             correct_count += 1
         
         results.append(QuizResult(
-            question_id=question.id,
+            question_id=question_id,
             correct=is_correct,
-            correct_answer=question.correct_answer,
-            explanation=question.explanation
+            correct_answer=correct_answer,
+            explanation=explanation
         ))
     
-    # Get or create user progress
-    progress = db.query(UserProgress).filter(
-        UserProgress.device_id == device_id
-    ).first()
-    
-    if not progress:
-        progress = UserProgress(
-            device_id=device_id,
-            xp=0,
-            level=1,
-            total_questions=0,
-            correct_answers=0,
-            current_streak=0,
-            best_streak=0,
-            achievements=[]
-        )
-        db.add(progress)
-    
-    # Update streak
-    if correct_count == len(request.questions):
-        progress.current_streak += correct_count
-    else:
-        progress.current_streak = correct_count
-    
-    if progress.current_streak > progress.best_streak:
-        progress.best_streak = progress.current_streak
-    
-    # Calculate XP (assuming medium difficulty)
-    xp_earned = calculate_xp(
-        correct=correct_count,
-        total=len(request.questions),
-        streak=progress.current_streak,
-        difficulty="medium"
+    progress, xp_earned, new_achievements = await progress_engine.submit(
+        db, device_id, quiz, correct_count, request.duration_seconds
     )
     
-    # Update progress
-    progress.xp += xp_earned
-    progress.total_questions += len(request.questions)
-    progress.correct_answers += correct_count
-    progress.level = calculate_level(progress.xp)
-    
-    # Check achievements
-    existing_achievements = progress.achievements or []
-    new_achievements = check_achievements(
-        total_questions=progress.total_questions,
-        total_xp=progress.xp,
-        level=progress.level,
-        best_streak=progress.best_streak,
-        perfect_this_quiz=(correct_count == len(request.questions)),
-        existing_achievements=existing_achievements
-    )
-    
-    if new_achievements:
-        progress.achievements = existing_achievements + new_achievements
-    
-    progress.updated_at = datetime.utcnow()
-    
-    # Save study session
-    session = StudySession(
-        device_id=device_id,
-        topic=request.topic,
-        questions_count=len(request.questions),
-        correct_count=correct_count,
-        xp_earned=xp_earned,
-        duration_seconds=request.duration_seconds
-    )
-    db.add(session)
-    
-    db.commit()
-    
     # Record metrics
-    record_quiz_submission(correct_count, len(request.questions), xp_earned)
+    record_quiz_submission(correct_count, len(quiz.answer_key), xp_earned)
     
     return QuizSubmitResponse(
         correct_count=correct_count,
-        total_count=len(request.questions),
+        total_count=len(quiz.answer_key),
         xp_earned=xp_earned,
         new_total_xp=progress.xp,
         new_level=progress.level,
@@ -257,12 +533,13 @@ async def submit_quiz(
 @router.get("/progress", response_model=UserProgressResponse)
 async def get_progress(
     device_id: str = Depends(get_device_id),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get user's learning progress."""
-    progress = db.query(UserProgress).filter(
-        UserProgress.device_id == device_id
-    ).first()
+    # Unflushed submits are only in the write-behind cache
+    progress = progress_engine.get(device_id) or (await db.execute(
+        select(UserProgress).where(UserProgress.device_id == device_id)
+    )).scalar_one_or_none()
     
     if not progress:
         return UserProgressResponse(
@@ -298,20 +575,18 @@ async def get_progress(
 @router.get("/tokens", response_model=TokenStatusResponse)
 async def get_token_status(
     device_id: str = Depends(get_device_id),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get token balance and free trial status."""
     # Check tokens
-    token_record = db.query(GenerationToken).filter(
-        GenerationToken.device_id == device_id
-    ).first()
-    
-    tokens_remaining = token_record.tokens_remaining if token_record else 0
+    tokens_remaining = (await db.execute(
+        select(GenerationToken.tokens_remaining).where(GenerationToken.device_id == device_id)
+    )).scalar_one_or_none() or 0
     
     # Check free trial
-    free_trial = db.query(FreeTrialUsage).filter(
-        FreeTrialUsage.device_id == device_id
-    ).first()
+    free_trial = (await db.execute(
+        select(FreeTrialUsage.id).where(FreeTrialUsage.device_id == device_id)
+    )).scalar_one_or_none()
     
     return TokenStatusResponse(
         tokens_remaining=tokens_remaining,
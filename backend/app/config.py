@@ -15,13 +15,131 @@ class Settings(BaseSettings):
     llm_proxy_url: str = "https://llm-proxy.densematrix.ai"
     llm_proxy_key: str = ""
     
+    # LLM HTTP client (app-lifetime connection pool)
+    llm_max_connections: int = 100
+    llm_max_keepalive_connections: int = 20
+    llm_keepalive_expiry: float = 30.0  # seconds an idle connection is kept
+    llm_http2: bool = False  # requires the optional `h2` package
+    llm_connect_timeout: float = 5.0
+    llm_read_timeout: float = 60.0
+    llm_pool_timeout: float = 10.0  # max wait for a free pooled connection
+    
+    # LLM model routing: JSON list of rules, first match wins, e.g.
+    # [{"model": "...", "max_questions": 5, "difficulties": ["easy"], "languages": ["ja"], "tokens_per_question": 400}]
+    llm_default_model: str = "claude-sonnet-4-20250514"
+    llm_model_routes: str = '[{"model": "claude-3-5-haiku-20241022", "max_questions": 5, "difficulties": ["easy"]}]'
+    llm_tokens_per_question: int = 300  # output budget per question
+    llm_tokens_overhead: int = 200  # output budget per call on top of the questions
+    llm_shadow_model: str = ""  # model to shadow-test on sampled single-quiz calls
+    llm_shadow_sample_rate: float = 0.0
+    llm_prompt_versions: str = "{}"  # JSON {"quiz": "v1"} to pin a template version; latest otherwise
+    llm_output_budget_enabled: bool = True  # size max_tokens from observed completion tokens per question
+    
+    # LLM call resilience (retries, hedged duplicates, one deadline per request)
+    llm_request_deadline_seconds: float = 60.0  # whole generation, queueing and retries included
+    llm_max_attempts: int = 3
+    llm_retry_backoff_base_ms: int = 200
+    llm_retry_backoff_max_ms: int = 5000
+    llm_hedge_enabled: bool = True
+    llm_hedge_min_samples: int = 20  # successful calls seen before hedging at their p95
+    llm_hedge_min_delay_ms: int = 500
+    
+    # LLM circuit breaker (fail fast while the proxy is down, serve degraded quizzes)
+    llm_breaker_enabled: bool = True
+    llm_breaker_failure_threshold: int = 5  # consecutive outage failures that open the circuit
+    llm_breaker_open_seconds: float = 30.0  # before a half-open probe is let through
+    llm_breaker_half_open_probes: int = 1  # concurrent probe calls while half-open
+    degraded_mode_enabled: bool = True  # serve earlier questions, free of charge, while open
+    
+    # LLM admission control (adaptive concurrency limit, 503 when saturated)
+    llm_limiter_enabled: bool = True
+    llm_concurrency_initial: int = 20
+    llm_concurrency_min: int = 2
+    llm_concurrency_max: int = 100  # keep <= llm_max_connections
+    llm_latency_tolerance: float = 2.0  # calls slower than this x the average shrink the limit
+    llm_limit_backoff: float = 0.5  # limit multiplier on an overload signal
+    llm_free_trial_min_share: float = 0.2  # slots kept for waiting free trials when paid calls queue
+    llm_queue_max: int = 200  # calls waiting for a slot before new ones are rejected
+    llm_queue_timeout_ms: int = 10000  # max wait for a slot
+    
+    # LLM request batching (several quizzes per call while the LLM is busy)
+    quiz_batch_enabled: bool = True
+    quiz_batch_min_in_flight: int = 8  # LLM calls running before requests are held for batching
+    quiz_batch_max_wait_ms: int = 50  # max time a request is held to fill a batch
+    quiz_batch_tokens_per_question: int = 180  # expected output tokens per question
+    
+    # Quiz cache (content-addressed, in front of LLM generation)
+    quiz_cache_enabled: bool = True
+    quiz_cache_max_entries: int = 1000
+    quiz_cache_ttl_seconds: int = 86400
+    quiz_cache_variants: int = 3  # distinct quizzes kept per key before serving hits
+    quiz_cache_persistent: bool = True  # also store quizzes in the database
+    
+    # Topic canonicalization (free-text topics mapped onto known ones for cache keys)
+    topic_canonicalization_enabled: bool = True
+    topic_similarity_threshold: float = 0.7  # character-trigram Jaccard to map onto a known topic
+    topic_index_max_topics: int = 50000  # topics indexed per process, catalog included
+    
+    # Near-duplicate questions (MinHash index over question text)
+    question_dedup_enabled: bool = True
+    question_dedup_threshold: float = 0.7  # word and word-pair Jaccard of near-duplicate questions
+    question_index_max_entries: int = 200000  # question texts indexed per process
+    question_recent_ttl_seconds: int = 7 * 86400  # bank quizzes avoid questions a device saw this recently
+    question_recent_per_device: int = 200
+    
+    # Quiz translation (other languages served from a cached source-language quiz)
+    translation_enabled: bool = True
+    translation_source_language: str = "en"
+    translation_model: str = "claude-3-5-haiku-20241022"
+    translation_cache_max_entries: int = 20000  # translated questions kept in memory
+    
+    # Quiz store (answer keys of served quizzes, graded on submit)
+    quiz_store_max_entries: int = 10000
+    quiz_store_ttl_seconds: int = 6 * 3600  # time allowed to submit a quiz
+    quiz_store_persistent: bool = True  # also store quizzes in the database
+    
+    # Progress write-behind (submits applied in memory, flushed in batches)
+    progress_write_behind_enabled: bool = False  # single worker only: rows are cached per process
+    progress_flush_interval_ms: int = 500
+    progress_flush_max_items: int = 256  # pending submits that trigger an early flush
+    progress_cache_max_rows: int = 10000  # hot rows kept in memory
+    progress_journal_dir: str = "./progress-journal"
+    progress_journal_fsync: bool = True  # fsync each journal entry before responding
+    
+    # Question bank (pre-generated questions for SEO catalog topics)
+    question_bank_enabled: bool = True
+    question_bank_target_per_key: int = 20  # questions kept per (topic, difficulty, language)
+    question_bank_warm_concurrency: int = 4  # concurrent LLM calls while warming
+    question_bank_background_warm: bool = False  # warm from the lifespan on startup
+    seo_catalog_path: str = ""  # defaults to scripts/generate-seo-pages.js
+    
+    # Warm pool (ready quizzes for the hottest request keys)
+    warm_pool_enabled: bool = False  # spends LLM calls in the background
+    warm_pool_depth: int = 3  # unused quizzes kept ready per hot key
+    warm_pool_hot_keys: int = 20
+    warm_pool_llm_concurrency: int = 2  # refill workers (concurrent LLM calls)
+    warm_pool_max_age_seconds: int = 3600
+    
     # Database
     database_url: str = "sqlite:///./gamified_study.db"
     
+    # SQLite performance profile (ignored for other databases)
+    sqlite_tuning_enabled: bool = False  # WAL + pragmas below, pooled reads, single writer
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_size: int = 256 * 1024 * 1024  # bytes
+    sqlite_cache_size_kib: int = 64 * 1024  # page cache per connection
+    sqlite_read_pool_size: int = 10  # pooled aiosqlite connections (profile on or off)
+    sqlite_writer_batch_size: int = 64  # max writes committed together
+    sqlite_writer_timeout_seconds: float = 30.0  # max wait for a queued write
+    
     # Creem Payment
     creem_api_key: str = ""
     creem_webhook_secret: str = ""
     creem_product_ids: str = "{}"  # JSON string
+    creem_max_connections: int = 10
+    creem_keepalive_expiry: float = 30.0  # seconds an idle connection is kept
+    creem_connect_timeout: float = 5.0
+    creem_timeout: float = 30.0
     
     # Tool name for metrics
     tool_name: str = "gamified-study"
@@ -1,10 +1,60 @@
 """Database configuration."""
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from typing import Union
 from app.config import get_settings
 
 settings = get_settings()
 
+# Async drivers for the sync URLs accepted in DATABASE_URL
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def async_database_url(url: str) -> str:
+    """Map a sync database URL to its async-driver equivalent."""
+    scheme, sep, rest = url.partition("://")
+    dialect = scheme.split("+", 1)[0]
+    if dialect in ASYNC_DRIVERS and "+" not in scheme:
+        return f"{ASYNC_DRIVERS[dialect]}{sep}{rest}"
+    return url
+
+
+def sqlite_tuned(url: str) -> bool:
+    """Whether the SQLite performance profile applies to a database URL."""
+    return settings.sqlite_tuning_enabled and url.startswith("sqlite") and ":memory:" not in url
+
+
+def sqlite_pragmas() -> dict:
+    """Pragmas applied to every connection under the SQLite profile."""
+    return {
+        "journal_mode": "WAL",  # readers never block the writer
+        "synchronous": "NORMAL",  # fsync on checkpoint only; safe with WAL
+        "busy_timeout": settings.sqlite_busy_timeout_ms,
+        "mmap_size": settings.sqlite_mmap_size,
+        "cache_size": -settings.sqlite_cache_size_kib,  # negative = KiB, not pages
+        "temp_store": "MEMORY",
+    }
+
+
+def configure_sqlite(engine: Union[Engine, AsyncEngine]) -> None:
+    """Apply the SQLite performance profile to every new connection of an engine."""
+    pragmas = sqlite_pragmas()
+
+    @event.listens_for(getattr(engine, "sync_engine", engine), "connect")
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+# Sync engine: table creation, CLI workers and scripts
 engine = create_engine(
     settings.database_url,
     connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {}
@@ -12,6 +62,29 @@ engine = create_engine(
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def async_engine_options(url: str) -> dict:
+    """Pool options for the async engine."""
+    if url.startswith("sqlite") and ":memory:" not in url:
+        # aiosqlite defaults to NullPool: a new connection and thread per session
+        return {"poolclass": AsyncAdaptedQueuePool, "pool_size": settings.sqlite_read_pool_size}
+    return {}
+
+
+# Async engine: request handlers, so queries never block the event loop
+async_engine = create_async_engine(
+    async_database_url(settings.database_url),
+    **async_engine_options(settings.database_url)
+)
+
+if sqlite_tuned(settings.database_url):
+    # Writes go through the single-writer queue in app.services.db_writer
+    configure_sqlite(engine)
+    configure_sqlite(async_engine)
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
+
 Base = declarative_base()
 
 
@@ -22,3 +95,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """Get async database session."""
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,26 +1,51 @@
 """Main FastAPI application."""
-import time
-from fastapi import FastAPI, Request
+import asyncio
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
-from app.database import engine, Base
+from app.database import engine, async_engine, Base
 from app.api import quiz, payment
-from app.metrics import metrics_router, http_requests_total, http_request_duration_seconds
+from app.metrics import metrics_router
+from app.middleware import MetricsMiddleware
 from app.config import get_settings
+from app.services.http_clients import start_http_clients, close_http_clients
+from app.services.question_bank import warm_question_bank
+from app.services.warm_pool import warm_pool
+from app.services.db_writer import db_writer
+from app.services.progress_engine import progress_engine
+from app.services.circuit_breaker import llm_breaker
 
 settings = get_settings()
 
-# Bot patterns for crawler detection
-BOT_PATTERNS = ["Googlebot", "bingbot", "Baiduspider", "YandexBot", "DuckDuckBot", "Slurp", "facebookexternalhit"]
-
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan handler."""
     # Create database tables
     Base.metadata.create_all(bind=engine)
-    yield
+    
+    # Open pooled outbound HTTP clients (LLM proxy, Creem)
+    await start_http_clients()
+    await db_writer.start()
+    await progress_engine.start()  # replays the journal of an unclean shutdown
+    await warm_pool.start()
+    
+    # Optionally fill the question bank in the background
+    warm_task = None
+    if settings.question_bank_background_warm:
+        warm_task = asyncio.create_task(warm_question_bank())
+    
+    try:
+        yield
+    finally:
+        if warm_task is not None:
+            warm_task.cancel()
+        await warm_pool.stop()
+        await close_http_clients()
+        # Flush buffered progress while the writer still runs
+        await progress_engine.stop()
+        await db_writer.stop()
+        await async_engine.dispose()
 
 
 app = FastAPI(
@@ -39,42 +64,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-
-@app.middleware("http")
-async def metrics_middleware(request: Request, call_next):
-    """Track request metrics and crawler visits."""
-    start_time = time.time()
-    
-    # Check for crawlers
-    ua = request.headers.get("user-agent", "")
-    for bot in BOT_PATTERNS:
-        if bot.lower() in ua.lower():
-            from app.metrics import crawler_visits_total
-            crawler_visits_total.labels(tool=settings.tool_name, bot=bot).inc()
-            break
-    
-    response = await call_next(request)
-    
-    # Record metrics
-    duration = time.time() - start_time
-    endpoint = request.url.path
-    method = request.method
-    status = str(response.status_code)
-    
-    http_requests_total.labels(
-        tool=settings.tool_name,
-        endpoint=endpoint,
-        method=method,
-        status=status
-    ).inc()
-    
-    http_request_duration_seconds.labels(
-        tool=settings.tool_name,
-        endpoint=endpoint,
-        method=method
-    ).observe(duration)
-    
-    return response
+# Request metrics (outermost, so it times CORS handling too)
+app.add_middleware(MetricsMiddleware)
 
 
 # Include routers
@@ -85,8 +76,12 @@ app.include_router(metrics_router)
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint."""
-    return {"status": "healthy", "version": "1.0.0"}
+    """Health check endpoint.
+    
+    Stays healthy while the LLM circuit is open: quizzes are still served
+    in degraded mode, so the instance shouldn't be taken out of rotation.
+    """
+    return {"status": "healthy", "version": "1.0.0", "llm_circuit": llm_breaker.state}
 
 
 @app.get("/")
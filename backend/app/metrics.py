@@ -1,5 +1,6 @@
 """Prometheus metrics."""
 import os
+from typing import List, Optional
 from prometheus_client import Counter, Histogram, Gauge, generate_latest, CONTENT_TYPE_LATEST
 from fastapi import APIRouter, Response
 
@@ -43,6 +44,274 @@ xp_earned_total = Counter(
     ["tool"]
 )
 
+quiz_time_to_first_question_seconds = Histogram(
+    "quiz_time_to_first_question_seconds",
+    "Time from a streaming generate request to its first question",
+    ["tool"],
+    buckets=(0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 7.5, 10.0, 15.0, 20.0, 30.0, 60.0)
+)
+
+# Quiz cache metrics
+quiz_cache_hits_total = Counter(
+    "quiz_cache_hits_total",
+    "Quiz cache hits",
+    ["tool", "tier"]
+)
+
+quiz_cache_misses_total = Counter(
+    "quiz_cache_misses_total",
+    "Quiz cache misses",
+    ["tool"]
+)
+
+quiz_cache_evictions_total = Counter(
+    "quiz_cache_evictions_total",
+    "Quiz cache evictions",
+    ["tool", "reason"]
+)
+
+quiz_cache_entries = Gauge(
+    "quiz_cache_entries",
+    "Keys held in the in-memory quiz cache",
+    ["tool"]
+)
+
+topic_canonicalizations_total = Counter(
+    "topic_canonicalizations_total",
+    "Distinct request topics by how their canonical topic was found (catalog, known, similar, new)",
+    ["tool", "match"]
+)
+
+question_near_duplicates_total = Counter(
+    "question_near_duplicates_total",
+    "Near-duplicate questions left out, by where (quiz, bank_add, bank, recent)",
+    ["tool", "source"]
+)
+
+quiz_translations_total = Counter(
+    "quiz_translations_total",
+    "Requests in another language than the source quiz's, by result "
+    "(cached, translated, missed, no_source, failed)",
+    ["tool", "language", "result"]
+)
+
+quiz_language_serve_seconds = Histogram(
+    "quiz_language_serve_seconds",
+    "Time to get a quiz that missed the cache, by language and path (generated, translated, translation_cached)",
+    ["tool", "language", "path"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+)
+
+question_bank_lookups_total = Counter(
+    "question_bank_lookups_total",
+    "Question bank lookups by result (hit or short)",
+    ["tool", "result"]
+)
+
+question_bank_questions_added_total = Counter(
+    "question_bank_questions_added_total",
+    "Questions added to the question bank by the warmer",
+    ["tool"]
+)
+
+warm_pool_takes_total = Counter(
+    "warm_pool_takes_total",
+    "Warm pool takes for hot keys by result (hit or empty)",
+    ["tool", "result"]
+)
+
+warm_pool_keys = Gauge(
+    "warm_pool_keys",
+    "Hot keys with a warm pool",
+    ["tool"]
+)
+
+warm_pool_depth = Gauge(
+    "warm_pool_depth",
+    "Ready quizzes across all warm pools",
+    ["tool"]
+)
+
+warm_pool_refill_lag_seconds = Gauge(
+    "warm_pool_refill_lag_seconds",
+    "Age of the oldest outstanding warm pool refill",
+    ["tool"]
+)
+
+warm_pool_staleness_seconds = Gauge(
+    "warm_pool_staleness_seconds",
+    "Age of the oldest ready quiz in the warm pools",
+    ["tool"]
+)
+
+llm_calls_coalesced_total = Counter(
+    "llm_calls_coalesced_total",
+    "LLM calls saved by joining an identical in-flight generation",
+    ["tool"]
+)
+
+quiz_batch_size = Histogram(
+    "quiz_batch_size",
+    "Quizzes packed into one batched LLM call",
+    ["tool"],
+    buckets=[1, 2, 3, 4, 6, 8, 12, 16]
+)
+
+quiz_batch_wait_seconds = Histogram(
+    "quiz_batch_wait_seconds",
+    "Time a quiz request waited to be batched",
+    ["tool"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5)
+)
+
+llm_calls_per_quiz = Histogram(
+    "llm_calls_per_quiz",
+    "LLM calls spent on one quiz (a share of a batch call, plus any fallback)",
+    ["tool"],
+    buckets=(0.1, 0.2, 0.25, 0.34, 0.5, 1.0, 1.5, 2.0)
+)
+
+llm_concurrency_limit = Gauge(
+    "llm_concurrency_limit",
+    "Current adaptive limit on concurrent LLM calls",
+    ["tool"]
+)
+
+llm_in_flight = Gauge(
+    "llm_in_flight",
+    "LLM calls running under the concurrency limiter",
+    ["tool"]
+)
+
+llm_queue_depth = Gauge(
+    "llm_queue_depth",
+    "LLM calls waiting for a slot under the concurrency limit",
+    ["tool"]
+)
+
+llm_rejections_total = Counter(
+    "llm_rejections_total",
+    "LLM calls shed by the limiter (queue_full, queue_timeout or preempted)",
+    ["tool", "reason"]
+)
+
+llm_queue_wait_seconds = Histogram(
+    "llm_queue_wait_seconds",
+    "Time an LLM call waited for a slot, by priority class",
+    ["tool", "priority"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+
+llm_attempts_per_call = Histogram(
+    "llm_attempts_per_call",
+    "LLM requests sent for one call, retries and hedges included",
+    ["tool"],
+    buckets=[1, 2, 3, 4, 5, 6]
+)
+
+llm_retries_total = Counter(
+    "llm_retries_total",
+    "LLM call retries by reason (timeout, rate_limited, server_error, transport, malformed)",
+    ["tool", "reason"]
+)
+
+llm_hedges_total = Counter(
+    "llm_hedges_total",
+    "Hedged LLM calls by outcome (primary_won, hedge_won, both_failed)",
+    ["tool", "outcome"]
+)
+
+llm_model_latency_seconds = Histogram(
+    "llm_model_latency_seconds",
+    "LLM request latency by model, for live and shadow calls",
+    ["tool", "model", "mode"],
+    buckets=(0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+)
+
+llm_model_tokens_total = Counter(
+    "llm_model_tokens_total",
+    "LLM tokens used by model and kind (prompt, completion)",
+    ["tool", "model", "mode", "kind"]
+)
+
+llm_prompt_tokens = Histogram(
+    "llm_prompt_tokens",
+    "LLM tokens per live call by prompt template version, model and kind (prompt, completion)",
+    ["tool", "template", "model", "kind"],
+    buckets=(100, 250, 500, 1000, 2000, 4000, 8000)
+)
+
+llm_prompt_latency_seconds = Histogram(
+    "llm_prompt_latency_seconds",
+    "LLM live call latency by prompt template version and model",
+    ["tool", "template", "model"],
+    buckets=(0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+)
+
+llm_model_answers_total = Counter(
+    "llm_model_answers_total",
+    "LLM quiz answers by model and result (parsed, partial, malformed, error)",
+    ["tool", "model", "mode", "result"]
+)
+
+llm_circuit_state = Gauge(
+    "llm_circuit_state",
+    "LLM circuit breaker state (0 closed, 1 half-open, 2 open)",
+    ["tool"]
+)
+
+llm_circuit_transitions_total = Counter(
+    "llm_circuit_transitions_total",
+    "LLM circuit breaker transitions by the state entered",
+    ["tool", "state"]
+)
+
+degraded_quizzes_total = Counter(
+    "degraded_quizzes_total",
+    "Generations while the LLM circuit was open, by result (served or unavailable)",
+    ["tool", "result"]
+)
+
+llm_answer_repairs_total = Counter(
+    "llm_answer_repairs_total",
+    "LLM quiz answers repaired before parsing, by repair (code_fence, trailing_comma, truncated, salvaged)",
+    ["tool", "repair"]
+)
+
+llm_questions_rejected_total = Counter(
+    "llm_questions_rejected_total",
+    "LLM-generated questions dropped for failing validation",
+    ["tool"]
+)
+
+# Database metrics
+db_write_batch_size = Histogram(
+    "db_write_batch_size",
+    "Writes committed together by the single-writer queue",
+    ["tool"],
+    buckets=[1, 2, 4, 8, 16, 32, 64, 128]
+)
+
+db_write_queue_depth = Gauge(
+    "db_write_queue_depth",
+    "Writes waiting for the single-writer queue",
+    ["tool"]
+)
+
+progress_flush_rows = Histogram(
+    "progress_flush_rows",
+    "Progress rows written by one write-behind flush",
+    ["tool"],
+    buckets=[1, 4, 16, 64, 256, 1024, 4096]
+)
+
+progress_flush_sessions = Histogram(
+    "progress_flush_sessions",
+    "Study sessions inserted by one write-behind flush",
+    ["tool"],
+    buckets=[1, 4, 16, 64, 256, 1024, 4096]
+)
+
 # Payment metrics
 payment_success_total = Counter(
     "payment_success_total",
@@ -62,6 +331,12 @@ tokens_consumed_total = Counter(
     ["tool"]
 )
 
+tokens_refunded_total = Counter(
+    "tokens_refunded_total",
+    "Reserved generations refunded after a failed generation",
+    ["tool"]
+)
+
 free_trial_used_total = Counter(
     "free_trial_used_total",
     "Free trial uses",
@@ -97,23 +372,45 @@ async def metrics():
     return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 
-def record_quiz_generation(topic: str, difficulty: str):
-    """Record a quiz generation."""
-    # Categorize topic for metrics (simplified)
-    category = "general"
-    topic_lower = topic.lower()
-    if any(kw in topic_lower for kw in ["python", "javascript", "code", "programming"]):
-        category = "programming"
-    elif any(kw in topic_lower for kw in ["math", "algebra", "calculus"]):
-        category = "math"
-    elif any(kw in topic_lower for kw in ["history", "geography", "science"]):
-        category = "academic"
-    elif any(kw in topic_lower for kw in ["french", "spanish", "japanese", "language"]):
-        category = "language"
+# SEO catalog categories -> `topic_category` labels, kept to the keyword labels below
+CATALOG_CATEGORY_LABELS = {
+    "programming": "programming",
+    "technology": "programming",
+    "math": "math",
+    "science": "academic",
+    "history": "academic",
+    "geography": "academic",
+    "law": "academic",
+    "education": "academic",
+    "languages": "language",
+}
+
+
+def record_quiz_generation(topic: str, difficulty: str, category: Optional[str] = None):
+    """Record a quiz generation, labelled from the topic's catalog category when it has one."""
+    if category is not None:
+        category = CATALOG_CATEGORY_LABELS.get(category, "general")
+    else:
+        # Not a catalog topic: categorize by keywords (simplified)
+        category = "general"
+        topic_lower = topic.lower()
+        if any(kw in topic_lower for kw in ["python", "javascript", "code", "programming"]):
+            category = "programming"
+        elif any(kw in topic_lower for kw in ["math", "algebra", "calculus"]):
+            category = "math"
+        elif any(kw in topic_lower for kw in ["history", "geography", "science"]):
+            category = "academic"
+        elif any(kw in topic_lower for kw in ["french", "spanish", "japanese", "language"]):
+            category = "language"
     
     quiz_generations_total.labels(tool=TOOL_NAME, topic_category=category, difficulty=difficulty).inc()
 
 
+def record_time_to_first_question(seconds: float):
+    """Record time-to-first-question for a streamed quiz."""
+    quiz_time_to_first_question_seconds.labels(tool=TOOL_NAME).observe(seconds)
+
+
 def record_quiz_submission(correct: int, total: int, xp: int):
     """Record quiz submission metrics."""
     quiz_submissions_total.labels(tool=TOOL_NAME).inc()
@@ -121,6 +418,179 @@ def record_quiz_submission(correct: int, total: int, xp: int):
     xp_earned_total.labels(tool=TOOL_NAME).inc(xp)
 
 
+def record_quiz_cache_hit(tier: str):
+    """Record a quiz cache hit on the given tier (memory or db)."""
+    quiz_cache_hits_total.labels(tool=TOOL_NAME, tier=tier).inc()
+
+
+def record_quiz_cache_miss():
+    """Record a quiz cache miss."""
+    quiz_cache_misses_total.labels(tool=TOOL_NAME).inc()
+
+
+def record_quiz_cache_eviction(reason: str):
+    """Record a quiz cache eviction (capacity or expired)."""
+    quiz_cache_evictions_total.labels(tool=TOOL_NAME, reason=reason).inc()
+
+
+def record_quiz_cache_size(entries: int):
+    """Record the number of keys held in memory."""
+    quiz_cache_entries.labels(tool=TOOL_NAME).set(entries)
+
+
+def record_topic_canonicalization(match: str):
+    """Record how a new request topic was mapped to its canonical topic."""
+    topic_canonicalizations_total.labels(tool=TOOL_NAME, match=match).inc()
+
+
+def record_near_duplicates(source: str, count: int):
+    """Record near-duplicate questions left out of a quiz or the bank."""
+    if count:
+        question_near_duplicates_total.labels(tool=TOOL_NAME, source=source).inc(count)
+
+
+def record_quiz_translation(language: str, result: str, seconds: Optional[float] = None):
+    """Record how a request was served from a source-language quiz, and how long it took."""
+    quiz_translations_total.labels(tool=TOOL_NAME, language=language, result=result).inc()
+    if seconds is not None:
+        path = "translation_cached" if result == "cached" else "translated"
+        quiz_language_serve_seconds.labels(tool=TOOL_NAME, language=language, path=path).observe(seconds)
+
+
+def record_quiz_generated(language: str, seconds: float):
+    """Record the time to generate a quiz with the LLM, by language."""
+    quiz_language_serve_seconds.labels(tool=TOOL_NAME, language=language, path="generated").observe(seconds)
+
+
+def record_question_bank_lookup(hit: bool):
+    """Record whether the question bank could serve a quiz."""
+    question_bank_lookups_total.labels(tool=TOOL_NAME, result="hit" if hit else "short").inc()
+
+
+def record_question_bank_added(count: int):
+    """Record questions added to the bank."""
+    question_bank_questions_added_total.labels(tool=TOOL_NAME).inc(count)
+
+
+def record_warm_pool_take(hit: bool):
+    """Record a warm pool take for a hot key."""
+    warm_pool_takes_total.labels(tool=TOOL_NAME, result="hit" if hit else "empty").inc()
+
+
+def record_warm_pool_state(keys: int, depth: int, refill_lag: float, staleness: float):
+    """Record warm pool gauges."""
+    warm_pool_keys.labels(tool=TOOL_NAME).set(keys)
+    warm_pool_depth.labels(tool=TOOL_NAME).set(depth)
+    warm_pool_refill_lag_seconds.labels(tool=TOOL_NAME).set(refill_lag)
+    warm_pool_staleness_seconds.labels(tool=TOOL_NAME).set(staleness)
+
+
+def record_llm_call_coalesced():
+    """Record a request that joined an in-flight LLM call instead of making one."""
+    llm_calls_coalesced_total.labels(tool=TOOL_NAME).inc()
+
+
+def record_quiz_batch(size: int, waits: List[float]):
+    """Record a batched LLM call and how long each of its quizzes waited."""
+    quiz_batch_size.labels(tool=TOOL_NAME).observe(size)
+    for wait in waits:
+        quiz_batch_wait_seconds.labels(tool=TOOL_NAME).observe(wait)
+
+
+def record_llm_calls_per_quiz(calls: float):
+    """Record the LLM calls one quiz cost."""
+    llm_calls_per_quiz.labels(tool=TOOL_NAME).observe(calls)
+
+
+def record_llm_limiter(limit: float, in_flight: int, queue_depth: int):
+    """Record the LLM limiter's limit, running calls and queue depth."""
+    llm_concurrency_limit.labels(tool=TOOL_NAME).set(limit)
+    llm_in_flight.labels(tool=TOOL_NAME).set(in_flight)
+    llm_queue_depth.labels(tool=TOOL_NAME).set(queue_depth)
+
+
+def record_llm_queue_wait(priority: str, seconds: float):
+    """Record how long an admitted LLM call waited for its slot."""
+    llm_queue_wait_seconds.labels(tool=TOOL_NAME, priority=priority).observe(seconds)
+
+
+def record_llm_rejection(reason: str):
+    """Record an LLM call shed by the limiter."""
+    llm_rejections_total.labels(tool=TOOL_NAME, reason=reason).inc()
+
+
+def record_llm_attempts(attempts: int):
+    """Record the LLM requests one call took."""
+    llm_attempts_per_call.labels(tool=TOOL_NAME).observe(attempts)
+
+
+def record_llm_retry(reason: str):
+    """Record a retried LLM call."""
+    llm_retries_total.labels(tool=TOOL_NAME, reason=reason).inc()
+
+
+def record_llm_hedge(outcome: str):
+    """Record how a hedged LLM call ended."""
+    llm_hedges_total.labels(tool=TOOL_NAME, outcome=outcome).inc()
+
+
+def record_llm_model_call(model: str, mode: str, seconds: float, usage: Optional[dict]):
+    """Record one LLM request's latency and token usage for its model."""
+    llm_model_latency_seconds.labels(tool=TOOL_NAME, model=model, mode=mode).observe(seconds)
+    for kind in ("prompt", "completion"):
+        tokens = (usage or {}).get(f"{kind}_tokens")
+        if tokens:
+            llm_model_tokens_total.labels(tool=TOOL_NAME, model=model, mode=mode, kind=kind).inc(tokens)
+
+
+def record_llm_prompt_call(template: str, model: str, seconds: float, usage: dict):
+    """Record one live call's latency and token usage for its prompt template version."""
+    llm_prompt_latency_seconds.labels(tool=TOOL_NAME, template=template, model=model).observe(seconds)
+    for kind in ("prompt", "completion"):
+        tokens = usage.get(f"{kind}_tokens")
+        if tokens:
+            llm_prompt_tokens.labels(tool=TOOL_NAME, template=template, model=model, kind=kind).observe(tokens)
+
+
+def record_llm_model_answer(model: str, mode: str, result: str):
+    """Record whether a model's quiz answer parsed."""
+    llm_model_answers_total.labels(tool=TOOL_NAME, model=model, mode=mode, result=result).inc()
+
+
+def record_llm_circuit(state: str, transition: bool = True):
+    """Record the LLM circuit breaker's state (and a transition into it)."""
+    llm_circuit_state.labels(tool=TOOL_NAME).set(("closed", "half_open", "open").index(state))
+    if transition:
+        llm_circuit_transitions_total.labels(tool=TOOL_NAME, state=state).inc()
+
+
+def record_degraded_quiz(served: bool):
+    """Record a generation answered in degraded mode."""
+    degraded_quizzes_total.labels(tool=TOOL_NAME, result="served" if served else "unavailable").inc()
+
+
+def record_llm_answer_repair(repair: str):
+    """Record a repair applied to an LLM answer before parsing."""
+    llm_answer_repairs_total.labels(tool=TOOL_NAME, repair=repair).inc()
+
+
+def record_llm_questions_rejected(count: int):
+    """Record generated questions dropped for failing validation."""
+    llm_questions_rejected_total.labels(tool=TOOL_NAME).inc(count)
+
+
+def record_db_write_batch(size: int, queued: int):
+    """Record a batch committed by the writer queue and the writes still waiting."""
+    db_write_batch_size.labels(tool=TOOL_NAME).observe(size)
+    db_write_queue_depth.labels(tool=TOOL_NAME).set(queued)
+
+
+def record_progress_flush(rows: int, sessions: int):
+    """Record the size of a write-behind progress flush."""
+    progress_flush_rows.labels(tool=TOOL_NAME).observe(rows)
+    progress_flush_sessions.labels(tool=TOOL_NAME).observe(sessions)
+
+
 def record_payment(product_sku: str, amount_cents: int):
     """Record successful payment."""
     payment_success_total.labels(tool=TOOL_NAME, product_sku=product_sku).inc()
@@ -132,6 +602,11 @@ def record_token_consumption():
     tokens_consumed_total.labels(tool=TOOL_NAME).inc()
 
 
+def record_token_refund():
+    """Record a refunded generation reservation."""
+    tokens_refunded_total.labels(tool=TOOL_NAME).inc()
+
+
 def record_free_trial():
     """Record free trial usage."""
     free_trial_used_total.labels(tool=TOOL_NAME).inc()
@@ -0,0 +1,83 @@
+"""ASGI middleware."""
+import re
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import get_settings
+from app.metrics import http_requests_total, http_request_duration_seconds, crawler_visits_total
+
+settings = get_settings()
+
+# Bot patterns for crawler detection
+BOT_PATTERNS = ["Googlebot", "bingbot", "Baiduspider", "YandexBot", "DuckDuckBot", "Slurp", "facebookexternalhit"]
+
+_BOT_RE = re.compile("|".join(re.escape(bot) for bot in BOT_PATTERNS), re.IGNORECASE)
+_BOT_NAMES = {bot.lower(): bot for bot in BOT_PATTERNS}
+
+# Endpoint label for requests that matched no route (scanners, typos),
+# so arbitrary paths can't create new series
+UNMATCHED_ENDPOINT = "unmatched"
+
+
+def detect_bot(user_agent: str):
+    """Return the crawler name in a user agent, or None."""
+    match = _BOT_RE.search(user_agent)
+    return _BOT_NAMES[match.group(0).lower()] if match else None
+
+
+def endpoint_label(scope: Scope) -> str:
+    """Route template of the matched route (set by the router on the scope)."""
+    route = scope.get("route")
+    return getattr(route, "path_format", None) or getattr(route, "path", None) or UNMATCHED_ENDPOINT
+
+
+class MetricsMiddleware:
+    """Record request count, latency and crawler visits.
+
+    Plain ASGI rather than `@app.middleware("http")`, which wraps every
+    request and response in BaseHTTPMiddleware's task and stream machinery.
+    Series are labelled by route template, not raw path, so cardinality is
+    bounded by the number of routes.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        for name, value in scope["headers"]:
+            if name == b"user-agent":
+                bot = detect_bot(value.decode("latin-1"))
+                if bot:
+                    crawler_visits_total.labels(tool=settings.tool_name, bot=bot).inc()
+                break
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            endpoint = endpoint_label(scope)
+            method = scope["method"]
+            http_requests_total.labels(
+                tool=settings.tool_name,
+                endpoint=endpoint,
+                method=method,
+                status=str(status)
+            ).inc()
+            http_request_duration_seconds.labels(
+                tool=settings.tool_name,
+                endpoint=endpoint,
+                method=method
+            ).observe(time.perf_counter() - start)
@@ -1,5 +1,5 @@
 """Database models."""
-from sqlalchemy import Column, String, Integer, Float, DateTime, Boolean, Text, JSON
+from sqlalchemy import Column, String, Integer, Float, DateTime, Boolean, Text, JSON, Index, UniqueConstraint
 from sqlalchemy.sql import func
 from app.database import Base
 
@@ -70,3 +70,67 @@ class FreeTrialUsage(Base):
     id = Column(Integer, primary_key=True, index=True)
     device_id = Column(String(255), unique=True, index=True)
     used_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class CachedQuiz(Base):
+    """Persistent tier of the quiz cache (one row per cached variant)."""
+    __tablename__ = "cached_quizzes"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String(64), index=True)
+    topic = Column(String(500))
+    difficulty = Column(String(20))
+    language = Column(String(10))
+    questions = Column(JSON)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+
+class QuizTranslation(Base):
+    """A cached question translated from a source-language quiz."""
+    __tablename__ = "quiz_translations"
+    __table_args__ = (
+        UniqueConstraint("source_key", "language", "question_id", name="uq_quiz_translations_key"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    source_key = Column(String(64))  # cache_key of the source quiz
+    question_id = Column(String(32))
+    language = Column(String(10))
+    question = Column(JSON)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+
+class QuizSession(Base):
+    """A served quiz awaiting submission (answer key only)."""
+    __tablename__ = "quiz_sessions"
+    
+    quiz_id = Column(String(32), primary_key=True)
+    device_id = Column(String(255))
+    topic = Column(String(500))
+    difficulty = Column(String(20))
+    answer_key = Column(JSON)  # [[question_id, correct_answer, explanation], ...]
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+
+class JournalCheckpoint(Base):
+    """Last write-behind journal entry committed to the database."""
+    __tablename__ = "journal_checkpoints"
+    
+    name = Column(String(64), primary_key=True)
+    seq = Column(Integer, default=0)
+
+
+class BankQuestion(Base):
+    """Pre-generated question in the question bank."""
+    __tablename__ = "bank_questions"
+    __table_args__ = (
+        Index("ix_bank_questions_key", "topic_slug", "difficulty", "language"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    topic_slug = Column(String(255))
+    difficulty = Column(String(20))
+    language = Column(String(10))
+    question = Column(JSON)  # QuizQuestion fields without the per-quiz id
+    served_count = Column(Integer, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
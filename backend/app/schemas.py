@@ -3,12 +3,15 @@ from pydantic import BaseModel, Field
 from typing import List, Optional
 from datetime import datetime
 
+MAX_QUIZ_QUESTIONS = 10
+QUIZ_DIFFICULTIES = ("easy", "medium", "hard")
+
 
 # Quiz schemas
 class QuizRequest(BaseModel):
     """Request to generate quiz questions."""
     topic: str = Field(..., min_length=1, max_length=500, description="Topic to study")
-    num_questions: int = Field(default=5, ge=1, le=10, description="Number of questions")
+    num_questions: int = Field(default=5, ge=1, le=MAX_QUIZ_QUESTIONS, description="Number of questions")
     difficulty: str = Field(default="medium", pattern="^(easy|medium|hard)$")
     language: str = Field(default="en", pattern="^(en|zh|ja|de|fr|ko|es)$")
 
@@ -31,10 +34,12 @@ class QuizQuestion(BaseModel):
 
 class QuizResponse(BaseModel):
     """Generated quiz response."""
+    quiz_id: str
     topic: str
     questions: List[QuizQuestion]
     is_free_trial: bool
     tokens_remaining: Optional[int] = None
+    degraded: bool = False  # earlier questions served free of charge while the LLM is down
 
 
 class AnswerSubmission(BaseModel):
@@ -44,10 +49,9 @@ class AnswerSubmission(BaseModel):
 
 
 class QuizSubmitRequest(BaseModel):
-    """Submit quiz answers."""
-    topic: str
+    """Submit quiz answers (graded against the stored quiz)."""
+    quiz_id: str = Field(..., min_length=1, max_length=32)
     answers: List[AnswerSubmission]
-    questions: List[QuizQuestion]
     duration_seconds: Optional[int] = None
 
 
@@ -0,0 +1,157 @@
+"""Circuit breaker in front of the LLM proxy."""
+import asyncio
+import logging
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable
+
+import httpx
+
+from app.config import get_settings
+from app.metrics import record_llm_circuit
+from app.services.llm_limiter import LLMDeadlineExceeded, LLMOverloadedError
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+
+
+class CircuitOpenError(Exception):
+    """The LLM circuit is open; no call is made until `retry_after` seconds pass."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"LLM unavailable (circuit open), retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+def is_outage_signal(error: BaseException) -> bool:
+    """Whether a failed LLM call says the upstream is down (not merely busy or picky)."""
+    if isinstance(error, (httpx.TimeoutException, httpx.TransportError)):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return False
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker around calls to one upstream.
+
+    - Closed: calls go through; `failure_threshold` consecutive outage
+      failures (timeout, transport error, 5xx) open the circuit.
+    - Open: calls fail at once with CircuitOpenError for `open_seconds`.
+    - Half-open: up to `half_open_probes` calls at a time go through as
+      probes; the first that gets an answer closes the circuit, a failed
+      one opens it again. Other calls still fail fast.
+
+    429s and client errors don't count: the upstream is up, and the
+    concurrency limiter deals with rate limits. Calls the limiter sheds
+    or that run out of time locally give no verdict at all, as nothing
+    came back from the upstream.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int,
+        open_seconds: float,
+        half_open_probes: int = 1,
+        enabled: bool = True,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.enabled = enabled
+        self._clock = clock
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        record_llm_circuit(CLOSED, transition=False)
+
+    @property
+    def state(self) -> str:
+        """Current state; an open circuit turns half-open once `open_seconds` have passed."""
+        if self._state == OPEN and self._clock() - self._opened_at >= self.open_seconds:
+            self._enter(HALF_OPEN)
+        return self._state
+
+    @property
+    def is_open(self) -> bool:
+        """Whether calls are failing fast right now."""
+        return self.state == OPEN
+
+    def reset(self) -> None:
+        """Close the circuit and forget past failures."""
+        self._failures = 0
+        self._probes = 0
+        if self._state != CLOSED:
+            self._enter(CLOSED)
+
+    def retry_after(self) -> int:
+        """Seconds until the next probe is let through."""
+        left = self.open_seconds - (self._clock() - self._opened_at)
+        return max(1, math.ceil(left))
+
+    @asynccontextmanager
+    async def call(self) -> AsyncIterator[None]:
+        """Guard one upstream call.
+
+        Raises: CircuitOpenError if the call isn't let through.
+        """
+        if not self.enabled:
+            yield
+            return
+
+        state = self.state
+        if state == OPEN or (state == HALF_OPEN and self._probes >= self.half_open_probes):
+            raise CircuitOpenError(self.retry_after())
+        probe = state == HALF_OPEN
+        if probe:
+            self._probes += 1
+
+        try:
+            yield
+        except (asyncio.CancelledError, GeneratorExit, LLMOverloadedError, LLMDeadlineExceeded):
+            # Abandoned by the caller (hedge lost, client gone) or stopped
+            # locally before the upstream answered: no verdict
+            raise
+        except BaseException as e:
+            if is_outage_signal(e):
+                self._on_failure(probe)
+            else:
+                self._on_success()
+            raise
+        else:
+            self._on_success()
+        finally:
+            if probe:
+                self._probes -= 1
+
+    def _on_success(self) -> None:
+        self._failures = 0
+        if self._state != CLOSED:
+            logger.info("LLM circuit closed")
+            self._enter(CLOSED)
+
+    def _on_failure(self, probe: bool) -> None:
+        self._failures += 1
+        if probe or (self._state == CLOSED and self._failures >= self.failure_threshold):
+            logger.warning("LLM circuit opened after %d consecutive failures", self._failures)
+            self._opened_at = self._clock()
+            self._enter(OPEN)
+
+    def _enter(self, state: str) -> None:
+        self._state = state
+        record_llm_circuit(state)
+
+
+llm_breaker = CircuitBreaker(
+    failure_threshold=settings.llm_breaker_failure_threshold,
+    open_seconds=settings.llm_breaker_open_seconds,
+    half_open_probes=settings.llm_breaker_half_open_probes,
+    enabled=settings.llm_breaker_enabled
+)
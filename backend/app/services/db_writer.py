@@ -0,0 +1,167 @@
+"""Single-writer queue: serialize database writes and commit them in batches."""
+import asyncio
+import logging
+from typing import Any, Callable, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app.config import get_settings
+from app.database import async_engine, sqlite_tuned
+from app.metrics import record_db_write_batch
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+WriteFn = Callable[..., Any]  # fn(session, *args), may commit
+_Write = Tuple[WriteFn, tuple, "asyncio.Future[Any]"]
+
+
+class WriteTimeoutError(asyncio.TimeoutError):
+    """The writer didn't get to a write in time; the write may still be applied.
+
+    `pending` resolves with the write's result (or error) once the writer
+    gets to it, so callers can reconcile a write that lands late.
+    """
+
+    def __init__(self, pending: "asyncio.Future[Any]"):
+        super().__init__("Database writer timed out; the write may still be applied")
+        self.pending = pending
+
+
+class DatabaseWriter:
+    """Run every write on one background task, committing queued writes together.
+
+    SQLite allows a single writer at a time; funnelling writes through one
+    task removes "database is locked" contention between request handlers,
+    and committing a batch in one transaction pays the WAL fsync once.
+    Each write runs in its own SAVEPOINT, so a failing write is rolled
+    back on its own and its exception is raised to its caller only.
+
+    Write functions take a sync `Session` (the same functions routes call
+    through `AsyncSession.run_sync`); a `session.commit()` inside them only
+    releases their savepoint.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        batch_size: int,
+        timeout_seconds: float = 30.0,
+        enabled: bool = True
+    ):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.timeout_seconds = timeout_seconds
+        self.enabled = enabled
+        self._queue: Optional["asyncio.Queue[_Write]"] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self) -> None:
+        """Start the writer task."""
+        if not self.enabled or self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._worker())
+
+    async def stop(self) -> None:
+        """Commit queued writes, then stop the writer task."""
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        self._queue = None
+        self._loop = None
+
+    async def run(self, db: AsyncSession, fn: WriteFn, *args: Any) -> Any:
+        """Run the write `fn(session, *args)` and return its result.
+
+        Queued for the writer task when it is running on the caller's
+        event loop; otherwise run directly on the request's session.
+
+        Raises: WriteTimeoutError if the writer doesn't get to the write
+        within `timeout_seconds` (the write may still be applied later).
+        """
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or loop is not self._loop:
+            return await db.run_sync(fn, *args)
+
+        future = self.enqueue(fn, *args)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.timeout_seconds)
+        except asyncio.TimeoutError:
+            raise WriteTimeoutError(future) from None
+
+    def enqueue(self, fn: WriteFn, *args: Any) -> "asyncio.Future[Any]":
+        """Queue the write `fn(session, *args)` without waiting for it (writer must be running)."""
+        future = self._loop.create_future()
+        self._queue.put_nowait((fn, args, future))
+        return future
+
+    async def _worker(self) -> None:
+        """Take whatever is queued (up to a batch) and commit it together."""
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._commit_batch(batch)
+            except Exception as e:
+                logger.warning("Write batch of %d failed: %s", len(batch), e)
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            finally:
+                record_db_write_batch(len(batch), self._queue.qsize())
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _commit_batch(self, batch: List[_Write]) -> None:
+        """Run each write in a savepoint of one transaction, then commit once."""
+        outcomes = []
+        async with self.engine.connect() as conn:
+            await conn.begin()
+            if conn.dialect.name == "sqlite":
+                # Take the write lock up front: the driver otherwise defers
+                # BEGIN to the first DML, after the savepoint has been opened
+                await conn.exec_driver_sql("BEGIN IMMEDIATE")
+            session = AsyncSession(
+                bind=conn,
+                join_transaction_mode="create_savepoint",
+                autoflush=False,
+                expire_on_commit=False
+            )
+            for fn, args, future in batch:
+                try:
+                    result = await session.run_sync(fn, *args)
+                    await session.commit()
+                    outcomes.append((future, result, None))
+                except Exception as e:
+                    await session.rollback()
+                    outcomes.append((future, None, e))
+            await session.close()
+            await conn.commit()
+
+        # Only report results once they are durable
+        for future, result, error in outcomes:
+            if future.done():  # caller went away
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+db_writer = DatabaseWriter(
+    async_engine,
+    batch_size=settings.sqlite_writer_batch_size,
+    timeout_seconds=settings.sqlite_writer_timeout_seconds,
+    enabled=sqlite_tuned(settings.database_url)
+)
@@ -0,0 +1,90 @@
+"""Degraded-mode quizzes: earlier questions, served while the LLM is down."""
+import random
+import uuid
+from typing import Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models import BankQuestion, CachedQuiz
+from app.schemas import QuizQuestion
+from app.services.question_index import question_group
+from app.services.quiz_cache import topic_cache_keys
+from app.services.topic_catalog import load_seo_catalog, topic_slug
+from app.services.topic_index import canonical_topic
+
+settings = get_settings()
+
+# Cached quizzes looked at per topic (newest first)
+MAX_CACHED_QUIZZES = 20
+
+
+def _cached_questions(db: Session, topic: str, language: str) -> List[dict]:
+    """Questions from cached quizzes on the topic (any spelling of it), expired ones included."""
+    rows = db.query(CachedQuiz.questions).filter(
+        CachedQuiz.cache_key.in_(topic_cache_keys(topic, language))
+    ).order_by(CachedQuiz.created_at.desc()).limit(MAX_CACHED_QUIZZES).all()
+    return [question for (questions,) in rows for question in questions or ()]
+
+
+def _bank_questions(db: Session, slugs: List[str], language: str, difficulty: str, limit: int) -> List[dict]:
+    """Banked questions for any of `slugs`, the requested difficulty first."""
+    rows = db.query(BankQuestion.question).filter(
+        BankQuestion.topic_slug.in_(slugs),
+        BankQuestion.language == language
+    ).order_by(
+        (BankQuestion.difficulty != difficulty), BankQuestion.served_count, func.random()
+    ).limit(limit).all()
+    return [row.question for row in rows]
+
+
+def assemble_degraded_quiz(
+    db: Session,
+    topic: str,
+    difficulty: str,
+    language: str,
+    num_questions: int
+) -> Optional[List[QuizQuestion]]:
+    """Up to `num_questions` earlier questions on the topic, or on its catalog category.
+
+    Looks at cached quizzes on the topic, then the question bank for the
+    topic (any difficulty), then the bank for the other topics of its SEO
+    category. Returns None if nothing was found; a short quiz is better
+    than none while the LLM is down.
+    """
+    if not settings.degraded_mode_enabled:
+        return None
+
+    found: Dict[str, dict] = {}
+
+    def take(questions: List[dict]) -> None:
+        for question in questions:
+            if len(found) >= num_questions:
+                return
+            found.setdefault(question_group(question), question)
+
+    cached = _cached_questions(db, topic, language)
+    random.shuffle(cached)
+    take(cached)
+
+    slug = topic_slug(canonical_topic(topic))
+    if slug and len(found) < num_questions:
+        take(_bank_questions(db, [slug], language, difficulty, num_questions))
+
+    catalog = load_seo_catalog()
+    category = catalog.category_of(slug) if slug else ""
+    if category and len(found) < num_questions:
+        siblings = [other for other in catalog.categories[category] if other != slug]
+        take(_bank_questions(db, siblings, language, difficulty, num_questions))
+
+    if not found:
+        return None
+    fields = {"type", "question", "options", "correct_answer", "explanation"}
+    return [
+        QuizQuestion(
+            id=str(uuid.uuid4())[:8],
+            **{key: value for key, value in question.items() if key in fields}
+        )
+        for question in found.values()
+    ]
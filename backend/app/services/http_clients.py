@@ -0,0 +1,114 @@
+"""Shared, pooled HTTP clients for outbound calls (LLM proxy, Creem)."""
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import httpx
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# App-lifetime clients, owned by the FastAPI lifespan in app.main
+_llm_client: Optional[httpx.AsyncClient] = None
+_creem_client: Optional[httpx.AsyncClient] = None
+
+
+def _http2_supported() -> bool:
+    """Check whether the optional `h2` package is installed."""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def llm_timeout(limit: Optional[float] = None) -> httpx.Timeout:
+    """Timeout for LLM calls: short connect, long read (generations are slow).
+    
+    `limit` caps every phase, e.g. to the time left before a deadline.
+    """
+    cap = (lambda seconds: min(seconds, limit)) if limit is not None else (lambda seconds: seconds)
+    return httpx.Timeout(
+        connect=cap(settings.llm_connect_timeout),
+        read=cap(settings.llm_read_timeout),
+        write=cap(settings.llm_connect_timeout),
+        pool=cap(settings.llm_pool_timeout)
+    )
+
+
+def build_llm_client() -> httpx.AsyncClient:
+    """Create a pooled, keep-alive client for the LLM proxy."""
+    http2 = settings.llm_http2
+    if http2 and not _http2_supported():
+        logger.warning("LLM_HTTP2 is enabled but 'h2' is not installed; using HTTP/1.1")
+        http2 = False
+
+    return httpx.AsyncClient(
+        timeout=llm_timeout(),
+        limits=httpx.Limits(
+            max_connections=settings.llm_max_connections,
+            max_keepalive_connections=settings.llm_max_keepalive_connections,
+            keepalive_expiry=settings.llm_keepalive_expiry
+        ),
+        http2=http2
+    )
+
+
+def build_creem_client() -> httpx.AsyncClient:
+    """Create a pooled, keep-alive client for the Creem payment API."""
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(settings.creem_timeout, connect=settings.creem_connect_timeout),
+        limits=httpx.Limits(
+            max_connections=settings.creem_max_connections,
+            max_keepalive_connections=settings.creem_max_connections,
+            keepalive_expiry=settings.creem_keepalive_expiry
+        )
+    )
+
+
+async def start_http_clients() -> None:
+    """Open the app-lifetime clients (called from the lifespan handler)."""
+    global _llm_client, _creem_client
+    if _llm_client is None:
+        _llm_client = build_llm_client()
+    if _creem_client is None:
+        _creem_client = build_creem_client()
+
+
+async def close_http_clients() -> None:
+    """Close the app-lifetime clients and release pooled connections."""
+    global _llm_client, _creem_client
+    if _llm_client is not None:
+        await _llm_client.aclose()
+        _llm_client = None
+    if _creem_client is not None:
+        await _creem_client.aclose()
+        _creem_client = None
+
+
+@asynccontextmanager
+async def llm_client() -> AsyncIterator[httpx.AsyncClient]:
+    """Yield the shared LLM client.
+
+    Outside the app lifespan (CLI scripts, unit tests) there is no shared
+    client, so a short-lived one is opened and closed around the call.
+    """
+    if _llm_client is not None:
+        yield _llm_client
+        return
+
+    async with httpx.AsyncClient(timeout=llm_timeout()) as client:
+        yield client
+
+
+@asynccontextmanager
+async def creem_client() -> AsyncIterator[httpx.AsyncClient]:
+    """Yield the shared Creem client (short-lived outside the lifespan)."""
+    if _creem_client is not None:
+        yield _creem_client
+        return
+
+    async with httpx.AsyncClient(timeout=settings.creem_timeout) as client:
+        yield client
@@ -0,0 +1,81 @@
+"""Incremental parser for JSON arrays arriving in chunks."""
+import json
+from typing import List
+
+
+class JsonArrayStreamParser:
+    """Extract top-level objects from a JSON array as text streams in.
+
+    Text before the opening `[` (e.g. a code fence or a stray sentence) is
+    skipped. Each element object is decoded as soon as its closing brace
+    arrives, so callers can act on it before the rest of the array exists.
+    Elements that fail to decode are counted in `malformed` and dropped.
+    """
+
+    def __init__(self):
+        self.started = False
+        self.finished = False
+        self.malformed = 0
+        self._buffer: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> List[dict]:
+        """Consume a chunk of text and return any objects it completed."""
+        objects = []
+
+        for ch in chunk:
+            if self.finished:
+                break
+
+            if not self.started:
+                if ch == "[":
+                    self.started = True
+                continue
+
+            # Between elements: only an object start or the closing bracket matter
+            if self._depth == 0:
+                if ch == "{":
+                    self._depth = 1
+                    self._buffer = [ch]
+                elif ch == "]":
+                    self.finished = True
+                continue
+
+            self._buffer.append(ch)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    obj = self._decode("".join(self._buffer))
+                    self._buffer = []
+                    if obj is not None:
+                        objects.append(obj)
+
+        return objects
+
+    def _decode(self, text: str):
+        """Decode one element, counting failures instead of raising."""
+        try:
+            obj = json.loads(text)
+        except json.JSONDecodeError:
+            self.malformed += 1
+            return None
+        if not isinstance(obj, dict):
+            self.malformed += 1
+            return None
+        return obj
@@ -0,0 +1,338 @@
+"""Adaptive concurrency limit, priority scheduling and load shedding in front of the LLM."""
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Deque, Dict, Iterator, Optional, Tuple
+
+import httpx
+
+from app.config import get_settings
+from app.metrics import record_llm_limiter, record_llm_queue_wait, record_llm_rejection
+
+settings = get_settings()
+
+# Priority classes, in dispatch order
+PAID = "paid"
+FREE_TRIAL = "free_trial"
+BACKGROUND = "background"  # warm pool, question bank and other work nobody waits on
+PRIORITIES = (PAID, FREE_TRIAL, BACKGROUND)
+
+
+@dataclass(frozen=True)
+class LLMCaller:
+    """Who an LLM call is made for, and by when it must be done."""
+    priority: str = BACKGROUND
+    device_id: str = ""
+    deadline: Optional[float] = None  # time.monotonic() value
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline (None: no deadline)."""
+        return None if self.deadline is None else self.deadline - time.monotonic()
+
+
+_caller: ContextVar[LLMCaller] = ContextVar("llm_caller", default=LLMCaller())
+
+
+def current_caller() -> LLMCaller:
+    """The caller LLM calls are currently made for."""
+    return _caller.get()
+
+
+@contextmanager
+def llm_caller(priority: str, device_id: str, deadline: Optional[float] = None) -> Iterator[None]:
+    """Schedule LLM calls made in this block (and tasks started from it) for a caller."""
+    token = _caller.set(LLMCaller(priority, device_id, deadline))
+    try:
+        yield
+    finally:
+        _caller.reset(token)
+
+
+class LLMDeadlineExceeded(Exception):
+    """The caller's deadline passed before the LLM call could finish."""
+
+    def __init__(self):
+        super().__init__("LLM request deadline exceeded")
+
+
+class LLMOverloadedError(Exception):
+    """The LLM call was shed by the limiter; retry after `retry_after` seconds."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"LLM overloaded ({reason}), retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def is_overload_signal(error: BaseException) -> bool:
+    """Whether a failed LLM call says the upstream is overloaded."""
+    if isinstance(error, httpx.TimeoutException):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return False
+
+
+_Waiter = Tuple["asyncio.Future[None]", float]  # (granted future, enqueued at)
+
+
+class AdaptiveLimiter:
+    """AIMD limit on concurrent LLM calls, with a bounded priority wait queue.
+
+    The limit grows by about one per limit's worth of completed calls
+    while it is in use (additive increase), and shrinks by `backoff` when
+    a call fails with an overload signal (timeout, 429, 5xx) or the
+    recent latency of its kind of call (e.g. its model) rises over
+    `tolerance` times the long-run average, at most once per average
+    call duration (multiplicative decrease). Recent latency is a short
+    moving average, so one slow call in a long-tailed distribution
+    doesn't shrink the limit.
+
+    Calls over the limit wait for at most `queue_timeout` seconds each,
+    or until their caller's deadline (LLMDeadlineExceeded).
+    A freed slot goes to the highest priority class with waiters (see
+    PRIORITIES; the class comes from `llm_caller`), except that free
+    trials get at least `free_trial_min_share` of the slots while they
+    wait. Within a class, devices take turns, FIFO per device, so one
+    device can't monopolize the slots.
+
+    When `max_queue` calls are already waiting, a call pushes out the
+    newest waiter of a lower class, or is rejected at once if there is
+    none. Shed calls raise LLMOverloadedError with a Retry-After
+    estimate, so the API can answer 503 instead of piling up upstream
+    timeouts.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int,
+        min_limit: int,
+        max_limit: int,
+        max_queue: int,
+        queue_timeout: float,
+        tolerance: float = 2.0,
+        backoff: float = 0.5,
+        free_trial_min_share: float = 0.2,
+        enabled: bool = True,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.free_trial_min_share = free_trial_min_share
+        self.enabled = enabled
+        self._clock = clock
+        self._limit = float(max(min_limit, min(initial_limit, max_limit)))
+        self._in_flight = 0
+        # class -> device -> waiters; devices rotate to the back once served
+        self._queues: Dict[str, "OrderedDict[str, Deque[_Waiter]]"] = {
+            priority: OrderedDict() for priority in PRIORITIES
+        }
+        self._queued = 0
+        self._since_free_trial = 0  # slots granted to others while free trials waited
+        self._latency_avg: Optional[float] = None
+        self._kind_latency: Dict[str, Tuple[float, float]] = {}  # kind -> (long-run, recent) average
+        self._last_decrease = float("-inf")
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queued
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free: the queue ahead, drained at the limit."""
+        latency = self._latency_avg or 1.0
+        return max(1, min(60, math.ceil(latency * (self._queued / self.limit + 1))))
+
+    @asynccontextmanager
+    async def slot(self, kind: str = "") -> AsyncIterator[None]:
+        """Hold a slot for the duration of one LLM call.
+
+        `kind` groups calls of similar latency (e.g. by model), so a mix
+        of fast and slow models isn't taken for a slowdown.
+        Raises: LLMOverloadedError if the call is shed.
+        """
+        if not self.enabled:
+            yield
+            return
+
+        await self._acquire()
+        started = self._clock()
+        try:
+            yield
+        except (asyncio.CancelledError, GeneratorExit):
+            # Abandoned by the caller: says nothing about the upstream
+            self._release(None, overloaded=False)
+            raise
+        except BaseException as e:
+            self._release(None, overloaded=is_overload_signal(e))
+            raise
+        else:
+            self._release(self._clock() - started, overloaded=False, kind=kind)
+
+    async def _acquire(self) -> None:
+        caller = _caller.get()
+        if self._in_flight < self.limit and not self._queued:
+            self._in_flight += 1
+            record_llm_queue_wait(caller.priority, 0.0)
+            self._record()
+            return
+        timeout = self.queue_timeout
+        remaining = caller.remaining()
+        if remaining is not None:
+            if remaining <= 0:
+                raise LLMDeadlineExceeded()
+            timeout = min(timeout, remaining)
+        if self._queued >= self.max_queue and not self._preempt(caller.priority):
+            record_llm_rejection("queue_full")
+            raise LLMOverloadedError("queue_full", self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues[caller.priority].setdefault(caller.device_id, deque()).append(
+            (waiter, self._clock())
+        )
+        self._queued += 1
+        self._record()
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            self._forget(caller, waiter)
+            if timeout < self.queue_timeout:
+                raise LLMDeadlineExceeded()
+            record_llm_rejection("queue_timeout")
+            raise LLMOverloadedError("queue_timeout", self.retry_after())
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release(None, overloaded=False)  # granted just before the cancel
+            else:
+                self._forget(caller, waiter)
+            raise
+
+    def _forget(self, caller: LLMCaller, waiter: "asyncio.Future[None]") -> None:
+        """Drop a waiter that stopped waiting (timeout or cancel)."""
+        devices = self._queues[caller.priority]
+        waiters = devices.get(caller.device_id)
+        for item in waiters or ():
+            if item[0] is waiter:
+                waiters.remove(item)
+                self._queued -= 1
+                if not waiters:
+                    del devices[caller.device_id]
+                break
+        self._record()
+
+    def _preempt(self, priority: str) -> bool:
+        """Make room by shedding the newest waiter of the lowest class below `priority`."""
+        for lower in reversed(PRIORITIES[PRIORITIES.index(priority) + 1:]):
+            devices = self._queues[lower]
+            while devices:
+                device_id = next(reversed(devices))
+                waiters = devices[device_id]
+                waiter, _ = waiters.pop()
+                if not waiters:
+                    del devices[device_id]
+                self._queued -= 1
+                if waiter.done():  # timed out or cancelled, not yet forgotten
+                    continue
+                record_llm_rejection("preempted")
+                waiter.set_exception(LLMOverloadedError("preempted", self.retry_after()))
+                return True
+        return False
+
+    def _next_class(self) -> Optional[str]:
+        """The class the next free slot goes to."""
+        waiting = [priority for priority in PRIORITIES if self._queues[priority]]
+        if not waiting:
+            return None
+        top = waiting[0]
+        if top != FREE_TRIAL and FREE_TRIAL in waiting and self.free_trial_min_share > 0:
+            if self._since_free_trial + 1 < 1 / self.free_trial_min_share:
+                self._since_free_trial += 1
+                return top
+            top = FREE_TRIAL
+        if top == FREE_TRIAL:
+            self._since_free_trial = 0
+        return top
+
+    def _grant(self) -> None:
+        """Hand free slots to waiters: by class, then device turns, then FIFO."""
+        while self._in_flight < self.limit:
+            priority = self._next_class()
+            if priority is None:
+                return
+            devices = self._queues[priority]
+            device_id, waiters = next(iter(devices.items()))
+            waiter, enqueued = waiters.popleft()
+            if waiters:
+                devices.move_to_end(device_id)
+            else:
+                del devices[device_id]
+            self._queued -= 1
+            if waiter.done():  # timed out or cancelled, not yet forgotten
+                continue
+            self._in_flight += 1
+            record_llm_queue_wait(priority, self._clock() - enqueued)
+            waiter.set_result(None)
+
+    def _release(self, latency: Optional[float], overloaded: bool, kind: str = "") -> None:
+        """Free a slot, adapt the limit to the call's outcome and admit waiters."""
+        saturated = self._in_flight >= self._limit / 2
+        self._in_flight -= 1
+        now = self._clock()
+
+        slow = latency is not None and self._observe(kind, latency)
+        if overloaded or slow:
+            if now - self._last_decrease >= (self._latency_avg or 1.0):
+                self._limit = max(self.min_limit, self._limit * self.backoff)
+                self._last_decrease = now
+        elif latency is not None and saturated:
+            self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+
+        if latency is not None:
+            self._latency_avg = latency if self._latency_avg is None else (
+                0.9 * self._latency_avg + 0.1 * latency
+            )
+
+        self._grant()
+        self._record()
+
+    def _observe(self, kind: str, latency: float) -> bool:
+        """Fold a call's latency into its kind's averages; whether calls of that kind got slow."""
+        if kind not in self._kind_latency:
+            self._kind_latency[kind] = (latency, latency)
+            return False
+        long_run, recent = self._kind_latency[kind]
+        recent = 0.5 * recent + 0.5 * latency
+        self._kind_latency[kind] = (0.9 * long_run + 0.1 * latency, recent)
+        return recent > self.tolerance * long_run
+
+    def _record(self) -> None:
+        record_llm_limiter(self._limit, self._in_flight, self._queued)
+
+
+llm_limiter = AdaptiveLimiter(
+    initial_limit=settings.llm_concurrency_initial,
+    min_limit=settings.llm_concurrency_min,
+    max_limit=settings.llm_concurrency_max,
+    max_queue=settings.llm_queue_max,
+    queue_timeout=settings.llm_queue_timeout_ms / 1000,
+    tolerance=settings.llm_latency_tolerance,
+    backoff=settings.llm_limit_backoff,
+    free_trial_min_share=settings.llm_free_trial_min_share,
+    enabled=settings.llm_limiter_enabled
+)
@@ -0,0 +1,200 @@
+"""Retries, hedging and deadlines for LLM calls."""
+import asyncio
+import logging
+import random
+import time
+from collections import defaultdict, deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+import httpx
+
+from app.config import get_settings
+from app.metrics import record_llm_attempts, record_llm_hedge, record_llm_retry
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.llm_limiter import LLMDeadlineExceeded, LLMOverloadedError, current_caller, llm_limiter
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+T = TypeVar("T")
+# One attempt, given the seconds it may take: request, then parse the answer
+Attempt = Callable[[float], Awaitable[T]]
+
+
+def retry_reason(error: BaseException) -> Optional[str]:
+    """Why a failed attempt is worth retrying, or None if it isn't."""
+    if isinstance(error, (LLMOverloadedError, LLMDeadlineExceeded, CircuitOpenError)):
+        return None  # shed locally, out of time or upstream down: another attempt can't help
+    if isinstance(error, (httpx.TimeoutException, asyncio.TimeoutError)):
+        return "timeout"
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        if status == 429:
+            return "rate_limited"
+        return "server_error" if status >= 500 else None
+    if isinstance(error, httpx.TransportError):
+        return "transport"
+    if isinstance(error, (ValueError, KeyError, TypeError)):  # includes JSONDecodeError
+        return "malformed"
+    return None
+
+
+def retry_after_seconds(error: BaseException) -> float:
+    """The upstream's Retry-After on a 429/503, in seconds (0 if absent)."""
+    if isinstance(error, httpx.HTTPStatusError):
+        try:
+            return float(error.response.headers.get("retry-after", 0))
+        except ValueError:
+            return 0.0
+    return 0.0
+
+
+class ResilientCaller:
+    """Run an LLM call as retried, hedged attempts within one deadline.
+
+    - Retries: a retryable failure (timeout, 429, 5xx, transport error,
+      malformed answer) is retried up to `max_attempts` in total, after a
+      full-jitter exponential backoff (at least the upstream's Retry-After).
+    - Hedging: once `hedge_min_samples` successful attempts of the same
+      kind are known, an attempt still running after their p95 latency
+      gets a duplicate; the first valid answer wins and the other attempt
+      is cancelled. `can_hedge` can veto a hedge (e.g. no spare capacity).
+    - Deadline: the caller's deadline (see `llm_caller`), or `deadline`
+      seconds from the start; each attempt may only use the time left,
+      and no retry starts that couldn't finish in time.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int,
+        backoff_base: float,
+        backoff_max: float,
+        deadline: float,
+        attempt_timeout: float,
+        hedge_enabled: bool = True,
+        hedge_min_samples: int = 20,
+        hedge_min_delay: float = 0.5,
+        can_hedge: Callable[[], bool] = lambda: True,
+        clock: Callable[[], float] = time.monotonic,
+        rng: Optional[random.Random] = None
+    ):
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.deadline = deadline
+        self.attempt_timeout = attempt_timeout
+        self.hedge_enabled = hedge_enabled
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_min_delay = hedge_min_delay
+        self.can_hedge = can_hedge
+        self._clock = clock
+        self._rng = rng or random.Random()
+        self._latencies: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=200))
+
+    def hedge_delay(self, kind: str) -> Optional[float]:
+        """p95 latency of recent successful attempts of this kind (None: too few yet)."""
+        samples = self._latencies[kind]
+        if not self.hedge_enabled or len(samples) < self.hedge_min_samples:
+            return None
+        ordered = sorted(samples)
+        return max(self.hedge_min_delay, ordered[int(len(ordered) * 0.95) - 1])
+
+    def backoff(self, retry: int) -> float:
+        """Full-jitter exponential backoff before retry number `retry` (1-based)."""
+        return self._rng.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (retry - 1)))
+
+    async def call(self, kind: str, attempt: Attempt, max_attempts: Optional[int] = None, hedge: bool = True) -> T:
+        """Run `attempt` until one succeeds, retrying and hedging as configured.
+
+        `kind` groups calls of similar latency for the hedge delay.
+        """
+        max_attempts = max_attempts or self.max_attempts
+        remaining = current_caller().remaining()
+        deadline = self._clock() + (self.deadline if remaining is None else min(self.deadline, remaining))
+        launched = 0
+
+        async def counted(timeout: float) -> T:
+            nonlocal launched
+            launched += 1
+            return await attempt(timeout)
+
+        retries = 0
+        try:
+            while True:
+                try:
+                    return await self._hedged(kind, counted, deadline, hedge)
+                except Exception as e:
+                    reason = retry_reason(e)
+                    if reason is None or retries + 1 >= max_attempts:
+                        raise
+                    retries += 1
+                    pause = max(self.backoff(retries), retry_after_seconds(e))
+                    if self._clock() + pause >= deadline:
+                        raise
+                    record_llm_retry(reason)
+                    logger.info("Retrying %s LLM call in %.2fs after %s: %s", kind, pause, reason, e)
+                    await asyncio.sleep(pause)
+        finally:
+            record_llm_attempts(launched)
+
+    async def _hedged(self, kind: str, attempt: Attempt, deadline: float, hedge: bool) -> T:
+        """One attempt, plus a hedge if it is still running after the p95 latency."""
+        primary = asyncio.ensure_future(self._timed(kind, attempt, deadline))
+        tasks = {primary}
+        hedged = False
+        try:
+            delay = self.hedge_delay(kind) if hedge else None
+            if delay is not None and self._clock() + delay < deadline:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done and self.can_hedge():
+                    tasks.add(asyncio.ensure_future(self._timed(kind, attempt, deadline)))
+                    hedged = True
+
+            error: Optional[BaseException] = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if hedged:
+                            record_llm_hedge("primary_won" if task is primary else "hedge_won")
+                        return task.result()
+                    error = task.exception()
+            if hedged:
+                record_llm_hedge("both_failed")
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _timed(self, kind: str, attempt: Attempt, deadline: float):
+        """Run one attempt within the time left, recording its latency on success."""
+        remaining = min(self.attempt_timeout, deadline - self._clock())
+        if remaining <= 0:
+            raise LLMDeadlineExceeded()
+        started = self._clock()
+        try:
+            result = await asyncio.wait_for(attempt(remaining), remaining)
+        except asyncio.TimeoutError:
+            if self._clock() >= deadline:
+                raise LLMDeadlineExceeded()
+            raise
+        self._latencies[kind].append(self._clock() - started)
+        return result
+
+
+def _llm_has_spare_capacity() -> bool:
+    """Hedge only with free LLM slots: under load a duplicate would queue or be shed."""
+    return llm_limiter.queue_depth == 0 and llm_limiter.in_flight < llm_limiter.limit
+
+
+llm_calls = ResilientCaller(
+    max_attempts=settings.llm_max_attempts,
+    backoff_base=settings.llm_retry_backoff_base_ms / 1000,
+    backoff_max=settings.llm_retry_backoff_max_ms / 1000,
+    deadline=settings.llm_request_deadline_seconds,
+    attempt_timeout=settings.llm_read_timeout,
+    hedge_enabled=settings.llm_hedge_enabled,
+    hedge_min_samples=settings.llm_hedge_min_samples,
+    hedge_min_delay=settings.llm_hedge_min_delay_ms / 1000,
+    can_hedge=_llm_has_spare_capacity
+)
@@ -0,0 +1,124 @@
+"""Model routing: which LLM model, and how many output tokens, a generation gets."""
+import json
+import random
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence, Tuple
+
+DIFFICULTIES = ("easy", "medium", "hard")  # least to most demanding
+
+
+@dataclass(frozen=True)
+class ModelRoute:
+    """The model and output budget for one LLM call."""
+    model: str
+    max_tokens: int
+
+
+@dataclass(frozen=True)
+class RouteRule:
+    """One row of the routing table; unset conditions match anything."""
+    model: str
+    max_questions: Optional[int] = None
+    difficulties: Optional[Tuple[str, ...]] = None
+    languages: Optional[Tuple[str, ...]] = None
+    tokens_per_question: Optional[int] = None  # e.g. more for languages that tokenize long
+
+    def matches(self, num_questions: int, difficulty: str, language: Optional[str]) -> bool:
+        return (
+            (self.max_questions is None or num_questions <= self.max_questions)
+            and (self.difficulties is None or difficulty in self.difficulties)
+            and (self.languages is None or language in self.languages)
+        )
+
+
+def parse_routes(raw: str) -> List[RouteRule]:
+    """Parse the routing table, a JSON list of rule objects (see RouteRule)."""
+    rules = []
+    for row in json.loads(raw or "[]"):
+        rules.append(RouteRule(
+            model=row["model"],
+            max_questions=row.get("max_questions"),
+            difficulties=tuple(row["difficulties"]) if row.get("difficulties") else None,
+            languages=tuple(row["languages"]) if row.get("languages") else None,
+            tokens_per_question=row.get("tokens_per_question")
+        ))
+    return rules
+
+
+class ModelRouter:
+    """Pick a model and `max_tokens` per call from its size, difficulty and language.
+
+    The first matching rule picks the model; with none, `default_model`
+    is used. The output budget grows with the number of questions:
+    `overhead_tokens` plus `tokens_per_question` (or the rule's own) per
+    question, up to `max_tokens`. Without a rule of its own, the per
+    question budget comes from `learned_tokens_per_question(language)`
+    when that knows one (see prompts.OutputBudget).
+
+    With a `shadow_model`, `shadow_sample_rate` of single-quiz calls are
+    also sent to it in the background, to compare its parse success and
+    latency with the live model's before routing traffic to it.
+    """
+
+    def __init__(
+        self,
+        rules: Sequence[RouteRule],
+        default_model: str,
+        tokens_per_question: int,
+        overhead_tokens: int,
+        max_tokens: int,
+        shadow_model: str = "",
+        shadow_sample_rate: float = 0.0,
+        rng: Optional[random.Random] = None,
+        learned_tokens_per_question: Optional[Callable[[Optional[str]], Optional[int]]] = None
+    ):
+        self.rules = list(rules)
+        self.default_model = default_model
+        self.tokens_per_question = tokens_per_question
+        self.overhead_tokens = overhead_tokens
+        self.max_tokens = max_tokens
+        self.shadow_model = shadow_model
+        self.shadow_sample_rate = shadow_sample_rate
+        self._rng = rng or random.Random()
+        self.learned_tokens_per_question = learned_tokens_per_question
+
+    def route(self, num_questions: int, difficulty: str, language: Optional[str]) -> ModelRoute:
+        """Model and output budget for a call generating one quiz of `num_questions` questions."""
+        return self._route(num_questions, num_questions, difficulty, language)
+
+    def route_batch(self, specs: Sequence) -> ModelRoute:
+        """Route a batched call by its largest quiz at its hardest difficulty.
+
+        The budget covers all of its questions. Batches mixing languages
+        only match rules without a language condition.
+        """
+        languages = {spec.language for spec in specs}
+        return self._route(
+            max(spec.num_questions for spec in specs),
+            sum(spec.num_questions for spec in specs),
+            max((spec.difficulty for spec in specs), key=_difficulty_rank),
+            languages.pop() if len(languages) == 1 else None
+        )
+
+    def _route(self, quiz_size: int, total_questions: int, difficulty: str, language: Optional[str]) -> ModelRoute:
+        rule = next((rule for rule in self.rules if rule.matches(quiz_size, difficulty, language)), None)
+        per_question = (
+            (rule and rule.tokens_per_question)
+            or (self.learned_tokens_per_question and self.learned_tokens_per_question(language))
+            or self.tokens_per_question
+        )
+        budget = min(self.max_tokens, self.overhead_tokens + per_question * total_questions)
+        return ModelRoute(rule.model if rule else self.default_model, budget)
+
+    def shadow_for(self, route: ModelRoute) -> Optional[str]:
+        """The shadow model to also try this call on, if it is sampled."""
+        if not self.shadow_model or self.shadow_model == route.model:
+            return None
+        if self._rng.random() >= self.shadow_sample_rate:
+            return None
+        return self.shadow_model
+
+
+def _difficulty_rank(difficulty: str) -> int:
+    return DIFFICULTIES.index(difficulty) if difficulty in DIFFICULTIES else len(DIFFICULTIES)
+
@@ -0,0 +1,456 @@
+"""Write-behind progress engine: apply quiz results in memory, flush in batches."""
+import asyncio
+import json
+import logging
+import os
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.database import async_engine
+from app.metrics import record_progress_flush
+from app.models import JournalCheckpoint, StudySession, UserProgress
+from app.services.db_writer import db_writer
+from app.services.quiz_service import calculate_xp, calculate_level, check_achievements
+from app.services.quiz_store import StoredQuiz
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+JOURNAL_NAME = "progress"
+PROGRESS_FIELDS = (
+    "xp", "level", "total_questions", "correct_answers",
+    "current_streak", "best_streak", "achievements"
+)
+_IN_CHUNK = 500  # device ids per IN (...) lookup
+
+
+class ProgressState:
+    """In-memory copy of a `UserProgress` row."""
+    __slots__ = PROGRESS_FIELDS
+
+    def __init__(
+        self,
+        xp: int = 0,
+        level: int = 1,
+        total_questions: int = 0,
+        correct_answers: int = 0,
+        current_streak: int = 0,
+        best_streak: int = 0,
+        achievements: Optional[List[str]] = None
+    ):
+        self.xp = xp
+        self.level = level
+        self.total_questions = total_questions
+        self.correct_answers = correct_answers
+        self.current_streak = current_streak
+        self.best_streak = best_streak
+        self.achievements = list(achievements or [])
+
+    @classmethod
+    def from_row(cls, row: Optional[UserProgress]) -> "ProgressState":
+        if row is None:
+            return cls()
+        return cls(**{field: getattr(row, field) for field in PROGRESS_FIELDS})
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in PROGRESS_FIELDS}
+
+
+def score_quiz(progress, quiz: StoredQuiz, correct_count: int) -> Tuple[int, List[str]]:
+    """Apply a graded quiz to a progress row or `ProgressState`.
+
+    Returns (xp earned, new achievements).
+    """
+    total = len(quiz.answer_key)
+
+    # Update streak
+    if correct_count == total:
+        progress.current_streak += correct_count
+    else:
+        progress.current_streak = correct_count
+
+    if progress.current_streak > progress.best_streak:
+        progress.best_streak = progress.current_streak
+
+    # Calculate XP at the difficulty the quiz was generated with
+    xp_earned = calculate_xp(
+        correct=correct_count,
+        total=total,
+        streak=progress.current_streak,
+        difficulty=quiz.difficulty
+    )
+
+    # Update progress
+    progress.xp += xp_earned
+    progress.total_questions += total
+    progress.correct_answers += correct_count
+    progress.level = calculate_level(progress.xp)
+
+    # Check achievements
+    existing_achievements = progress.achievements or []
+    new_achievements = check_achievements(
+        total_questions=progress.total_questions,
+        total_xp=progress.xp,
+        level=progress.level,
+        best_streak=progress.best_streak,
+        perfect_this_quiz=(correct_count == total),
+        existing_achievements=existing_achievements
+    )
+
+    if new_achievements:
+        progress.achievements = existing_achievements + new_achievements
+
+    return xp_earned, new_achievements
+
+
+def apply_quiz_result(
+    db: Session,
+    device_id: str,
+    quiz: StoredQuiz,
+    correct_count: int,
+    duration_seconds: Optional[int]
+) -> Tuple[UserProgress, int, List[str]]:
+    """Update progress and record the study session for a graded quiz.
+
+    The write-through path, used when the engine isn't running. Runs as a
+    single write; returns (progress, xp earned, new achievements).
+    """
+    progress = db.query(UserProgress).filter(UserProgress.device_id == device_id).first()
+
+    if not progress:
+        progress = UserProgress(device_id=device_id, **ProgressState().snapshot())
+        db.add(progress)
+
+    xp_earned, new_achievements = score_quiz(progress, quiz, correct_count)
+    progress.updated_at = datetime.utcnow()
+
+    db.add(StudySession(
+        device_id=device_id,
+        topic=quiz.topic,
+        questions_count=len(quiz.answer_key),
+        correct_count=correct_count,
+        xp_earned=xp_earned,
+        duration_seconds=duration_seconds
+    ))
+
+    db.commit()
+    return progress, xp_earned, new_achievements
+
+
+def write_progress_batch(
+    db: Session,
+    rows: Dict[str, Dict[str, Any]],
+    sessions: List[Dict[str, Any]],
+    seq: int
+) -> None:
+    """Upsert progress snapshots, insert study sessions and advance the journal checkpoint.
+
+    All in one transaction, so the checkpoint only moves past journal
+    entries whose effects are committed.
+    """
+    now = datetime.utcnow()
+    device_ids = list(rows)
+    for start in range(0, len(device_ids), _IN_CHUNK):
+        chunk = device_ids[start:start + _IN_CHUNK]
+        existing = {
+            progress.device_id: progress
+            for progress in db.query(UserProgress).filter(UserProgress.device_id.in_(chunk))
+        }
+        for device_id in chunk:
+            progress = existing.get(device_id)
+            if progress is None:
+                progress = UserProgress(device_id=device_id)
+                db.add(progress)
+            for field, value in rows[device_id].items():
+                setattr(progress, field, value)
+            progress.updated_at = now
+
+    if sessions:
+        db.execute(insert(StudySession), [
+            {**session, "created_at": datetime.fromisoformat(session["created_at"])}
+            for session in sessions
+        ])
+
+    db.merge(JournalCheckpoint(name=JOURNAL_NAME, seq=seq))
+    db.commit()
+
+
+def read_checkpoint(db: Session) -> int:
+    """Sequence number of the last journal entry committed to the database."""
+    checkpoint = db.get(JournalCheckpoint, JOURNAL_NAME)
+    return checkpoint.seq if checkpoint else 0
+
+
+class ProgressEngine:
+    """Hold hot progress rows in memory and write them behind the response.
+
+    A submit is applied to the cached row, appended (and fsynced) to an
+    append-only journal, and answered. The fsync runs off the event
+    loop, and submits waiting on it share the next one (group commit).
+    Dirty rows and pending study
+    sessions are flushed in one transaction every `flush_interval_ms` or
+    once `flush_max_items` submits are pending.
+
+    The journal is split into segments: a flush closes the current
+    segment and deletes the closed ones once its transaction, which also
+    records the last journal sequence number it covers, has committed.
+    On start, entries past that checkpoint are replayed, so a crash loses
+    nothing and nothing is applied twice.
+
+    Cached rows are authoritative for this process only; run a single
+    worker with the engine enabled.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        journal_dir: str,
+        flush_interval_ms: int,
+        flush_max_items: int,
+        max_rows: int,
+        fsync: bool = True,
+        enabled: bool = True
+    ):
+        self.engine = engine
+        self.journal_dir = journal_dir
+        self.flush_interval_ms = flush_interval_ms
+        self.flush_max_items = flush_max_items
+        self.max_rows = max_rows
+        self.fsync = fsync
+        self.enabled = enabled
+        self._rows: "OrderedDict[str, ProgressState]" = OrderedDict()
+        self._dirty: Set[str] = set()
+        self._sessions: List[Dict[str, Any]] = []
+        self._seq = 0
+        self._journal = None
+        self._synced_seq = 0
+        self._sync_lock = asyncio.Lock()
+        self._closed_segments: List[Path] = []
+        self._flush_lock = asyncio.Lock()
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and asyncio.get_running_loop() is self._loop
+
+    @property
+    def pending(self) -> int:
+        """Submits applied in memory but not yet committed."""
+        return len(self._sessions)
+
+    async def start(self) -> None:
+        """Replay the journal, then start the periodic flush task."""
+        if not self.enabled or self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._flush_lock = asyncio.Lock()
+        self._sync_lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        Path(self.journal_dir).mkdir(parents=True, exist_ok=True)
+        await self._replay()
+        self._synced_seq = self._seq
+        await self.flush()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flush task and flush everything still pending."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        await self.flush()
+        await self._close_segment()
+        # Whatever failed to flush is in the journal and replays on start
+        self._rows.clear()
+        self._dirty.clear()
+        self._sessions.clear()
+        self._closed_segments.clear()
+        self._loop = None
+
+    def get(self, device_id: str) -> Optional[ProgressState]:
+        """Cached progress for a device, including unflushed submits."""
+        if self._task is None:
+            return None
+        return self._rows.get(device_id)
+
+    async def submit(
+        self,
+        db: AsyncSession,
+        device_id: str,
+        quiz: StoredQuiz,
+        correct_count: int,
+        duration_seconds: Optional[int]
+    ):
+        """Apply a graded quiz; returns (progress, xp earned, new achievements).
+
+        Written behind when the engine runs on the caller's event loop,
+        otherwise written through on the request's session.
+        """
+        if not self.running:
+            return await db_writer.run(
+                db, apply_quiz_result, device_id, quiz, correct_count, duration_seconds
+            )
+
+        progress = await self._load(db, device_id)
+        xp_earned, new_achievements = score_quiz(progress, quiz, correct_count)
+        session = {
+            "device_id": device_id,
+            "topic": quiz.topic,
+            "questions_count": len(quiz.answer_key),
+            "correct_count": correct_count,
+            "xp_earned": xp_earned,
+            "duration_seconds": duration_seconds,
+            "created_at": datetime.utcnow().isoformat()
+        }
+
+        self._seq += 1
+        seq = self._seq
+        self._append({"seq": seq, "device_id": device_id,
+                      "progress": progress.snapshot(), "session": session})
+        self._dirty.add(device_id)
+        self._sessions.append(session)
+        if len(self._sessions) >= self.flush_max_items:
+            self._wake.set()
+        await self._sync(seq)
+        return progress, xp_earned, new_achievements
+
+    async def flush(self) -> None:
+        """Commit dirty rows and pending sessions in one transaction."""
+        async with self._flush_lock:
+            if not self._dirty and not self._sessions and not self._closed_segments:
+                return
+            rows = {device_id: self._rows[device_id].snapshot() for device_id in self._dirty}
+            sessions = self._sessions
+            seq = self._seq
+            self._dirty = set()
+            self._sessions = []
+            await self._close_segment()
+            segments = list(self._closed_segments)
+
+            try:
+                async with AsyncSession(self.engine, expire_on_commit=False) as db:
+                    await db_writer.run(db, write_progress_batch, rows, sessions, seq)
+            except Exception as e:
+                logger.warning("Progress flush of %d rows failed: %s", len(rows), e)
+                self._dirty |= rows.keys()
+                self._sessions = sessions + self._sessions
+                return
+
+            for path in segments:
+                path.unlink(missing_ok=True)
+                self._closed_segments.remove(path)
+            self._evict_clean()
+            record_progress_flush(len(rows), len(sessions))
+
+    async def _run(self) -> None:
+        """Flush every interval, or early once enough submits are pending."""
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval_ms / 1000)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def _load(self, db: AsyncSession, device_id: str) -> ProgressState:
+        """Cached row for a device, read from the database on a miss."""
+        progress = self._rows.get(device_id)
+        if progress is None:
+            row = await db.run_sync(
+                lambda session: session.query(UserProgress).filter(
+                    UserProgress.device_id == device_id
+                ).first()
+            )
+            await db.commit()
+            # Another submit for this device may have loaded it meanwhile
+            progress = self._rows.setdefault(device_id, ProgressState.from_row(row))
+        self._rows.move_to_end(device_id)
+        return progress
+
+    async def _replay(self) -> None:
+        """Re-apply journal entries the database hasn't seen yet."""
+        async with AsyncSession(self.engine) as db:
+            checkpoint = await db.run_sync(read_checkpoint)
+        self._seq = checkpoint
+
+        for path in sorted(Path(self.journal_dir).glob(f"{JOURNAL_NAME}-*.jsonl")):
+            self._closed_segments.append(path)
+            with open(path, encoding="utf-8") as journal:
+                for line in journal:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # torn write at the tail of a crashed segment
+                    if entry["seq"] <= checkpoint:
+                        continue
+                    self._seq = max(self._seq, entry["seq"])
+                    self._rows[entry["device_id"]] = ProgressState(**entry["progress"])
+                    self._dirty.add(entry["device_id"])
+                    self._sessions.append(entry["session"])
+
+        if self._sessions:
+            logger.info("Replayed %d progress journal entries", len(self._sessions))
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        """Append one entry to the current journal segment (durable after `_sync`)."""
+        if self._journal is None:
+            path = Path(self.journal_dir) / f"{JOURNAL_NAME}-{entry['seq']:012d}.jsonl"
+            self._journal = open(path, "a", encoding="utf-8")
+        self._journal.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self._journal.flush()
+
+    async def _sync(self, seq: int) -> None:
+        """Wait until journal entries up to `seq` are on disk.
+
+        One fsync at a time, on a worker thread; entries appended while it
+        runs are covered by the next one.
+        """
+        if not self.fsync:
+            return
+        async with self._sync_lock:
+            if self._synced_seq >= seq or self._journal is None:
+                return
+            covered = self._seq
+            await asyncio.to_thread(os.fsync, self._journal.fileno())
+            self._synced_seq = max(self._synced_seq, covered)
+
+    async def _close_segment(self) -> None:
+        """Sync and close the current segment; it is deleted after the next successful flush."""
+        async with self._sync_lock:
+            if self._journal is None:
+                return
+            if self.fsync and self._synced_seq < self._seq:
+                await asyncio.to_thread(os.fsync, self._journal.fileno())
+            self._synced_seq = self._seq
+            self._journal.close()
+            self._closed_segments.append(Path(self._journal.name))
+            self._journal = None
+
+    def _evict_clean(self) -> None:
+        """Drop least-recently-used clean rows beyond capacity."""
+        for device_id in list(self._rows):
+            if len(self._rows) <= self.max_rows:
+                break
+            if device_id not in self._dirty:
+                del self._rows[device_id]
+
+
+progress_engine = ProgressEngine(
+    async_engine,
+    journal_dir=settings.progress_journal_dir,
+    flush_interval_ms=settings.progress_flush_interval_ms,
+    flush_max_items=settings.progress_flush_max_items,
+    max_rows=settings.progress_cache_max_rows,
+    fsync=settings.progress_journal_fsync,
+    enabled=settings.progress_write_behind_enabled
+)
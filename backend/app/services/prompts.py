@@ -0,0 +1,335 @@
+"""Prompt registry: versioned generation prompts, token estimates and output budgets.
+
+Each template is rendered once per language, difficulty and example
+count; a call only fills in its topic and question count. The active
+version of each template is configurable (`llm_prompt_versions`), and
+every prompt carries its template id so cost and latency can be
+tracked per version.
+"""
+import json
+import math
+import re
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Tuple
+
+from app.config import get_settings
+
+settings = get_settings()
+
+# Language names for prompts
+LANGUAGE_NAMES = {
+    "en": "English",
+    "zh": "Chinese (Simplified)",
+    "ja": "Japanese",
+    "de": "German",
+    "fr": "French",
+    "ko": "Korean",
+    "es": "Spanish"
+}
+
+# Shape of each question in a generation answer
+QUESTION_EXAMPLES = """  {
+    "type": "multiple_choice",
+    "question": "Question text here?",
+    "options": ["Option A", "Option B", "Option C", "Option D"],
+    "correct_answer": "A",
+    "explanation": "Explanation of why this is correct"
+  },
+  {
+    "type": "true_false",
+    "question": "Statement to evaluate?",
+    "options": ["True", "False"],
+    "correct_answer": "True",
+    "explanation": "Explanation"
+  },
+  {
+    "type": "fill_blank",
+    "question": "Complete the sentence: The ___ is...",
+    "options": null,
+    "correct_answer": "answer",
+    "explanation": "Explanation"
+  }"""
+
+# The same shapes, one compact line each; a prompt shows only as many as it asks for
+COMPACT_EXAMPLES = [
+    json.dumps(example) for example in (
+        {"type": "multiple_choice", "question": "Question?", "options": ["A text", "B text", "C text", "D text"],
+         "correct_answer": "A", "explanation": "Why A is correct"},
+        {"type": "true_false", "question": "Statement?", "options": ["True", "False"],
+         "correct_answer": "True", "explanation": "Why"},
+        {"type": "fill_blank", "question": "The ___ is...", "options": None,
+         "correct_answer": "answer", "explanation": "Why"},
+    )
+]
+
+# Templates by name and version. Fields filled in when a template is compiled:
+# {language}, {difficulty}, {examples}, {language_line}, {language_rule};
+# per call: {topic}, {count}, {quizzes}, {asked}, {questions}
+QUIZ_V1 = """Generate exactly {count} quiz questions about "{topic}" at {difficulty} difficulty level.
+    
+Output language: {language}
+
+Requirements:
+- Mix question types: multiple choice (4 options), true/false, and fill-in-the-blank
+- Questions should test understanding, not just recall
+- Provide clear explanations for each answer
+- Make sure all content is in {language}
+
+Return a JSON array with this exact structure:
+[
+{examples}
+]
+
+Return ONLY the JSON array, no other text."""
+
+QUIZ_V2 = """Generate exactly {count} quiz questions about "{topic}" at {difficulty} difficulty level.
+{language_line}
+Requirements:
+- Mix question types: multiple choice (4 options), true/false, and fill-in-the-blank
+- Test understanding, not just recall, and explain each answer{language_rule}
+
+Return ONLY a JSON array of question objects like:
+[
+{examples}
+]"""
+
+TOP_UP_SUFFIX = """
+
+Do not repeat any of these existing questions:
+{asked}"""
+
+BATCH_V1 = """Generate the following {count} quizzes.
+
+{quizzes}
+
+Requirements:
+- Mix question types: multiple choice (4 options), true/false, and fill-in-the-blank
+- Questions should test understanding, not just recall
+- Provide clear explanations for each answer
+- Write each quiz entirely in its own language
+
+Return a JSON object mapping each quiz number to its array of questions, with this exact structure:
+{
+  "1": [
+{examples}
+  ],
+  "2": [...]
+}
+
+Return ONLY the JSON object, no other text."""
+
+BATCH_V2 = """Generate the following {count} quizzes.
+
+{quizzes}
+
+Requirements:
+- Mix question types: multiple choice (4 options), true/false, and fill-in-the-blank
+- Test understanding, not just recall, and explain each answer
+- Write each quiz entirely in its own language
+
+Return ONLY a JSON object mapping each quiz number to its array of question objects like:
+{"1": [
+{examples}
+], "2": [...]}"""
+
+TRANSLATE_V1 = """Translate these quiz questions into {language}.
+Keep each "id" as is and the options in their order; translate all other text.
+
+{questions}
+
+Return ONLY a JSON array of the translated objects, in the same shape."""
+
+BATCH_ITEM = '{number}. "{topic}": exactly {count} questions at {difficulty} difficulty level, written in {language}'
+
+TEMPLATES: Dict[str, Dict[str, str]] = {
+    "quiz": {"v1": QUIZ_V1, "v2": QUIZ_V2},
+    "top_up": {"v1": QUIZ_V1 + TOP_UP_SUFFIX, "v2": QUIZ_V2 + TOP_UP_SUFFIX},
+    "batch": {"v1": BATCH_V1, "v2": BATCH_V2},
+    "translate": {"v1": TRANSLATE_V1},
+}
+# Templates whose answers are newly generated questions
+GENERATION_TEMPLATES = ("quiz", "top_up", "batch")
+
+_FIELD = re.compile(r"\{(\w+)\}")
+_CALL_FIELDS = ("topic", "count", "quizzes", "asked", "questions")
+_WIDE_CHAR = re.compile(r"[⺀-鿿가-힯豈-﫿＀-￯]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count: about 4 characters per token, one per CJK character."""
+    wide = len(_WIDE_CHAR.findall(text))
+    return math.ceil((len(text) - wide) / 4) + wide
+
+
+@dataclass(frozen=True)
+class Prompt:
+    """A rendered prompt, with what its answer is expected to hold."""
+    text: str
+    template: str  # name/version, e.g. "quiz/v2"
+    num_questions: int
+    language: Optional[str]  # None for batches mixing languages
+
+    @property
+    def estimated_tokens(self) -> int:
+        return estimate_tokens(self.text)
+
+
+class CompiledTemplate:
+    """A template with its fixed fields filled in, split around its per-call fields."""
+
+    def __init__(self, template_id: str, text: str, fixed: Dict[str, str]):
+        self.template_id = template_id
+        parts = _FIELD.split(text)  # odd parts are field names
+        for i in range(1, len(parts), 2):
+            if parts[i] not in _CALL_FIELDS:
+                parts[i - 1] += fixed[parts[i]]
+                parts[i] = ""
+        # Merge the filled-in fields into the text around them
+        self._parts = [parts[0]]
+        for name, text in zip(parts[1::2], parts[2::2]):
+            if name:
+                self._parts += [name, text]
+            else:
+                self._parts[-1] += text
+
+    def render(self, **values) -> str:
+        parts = self._parts[:]
+        parts[1::2] = [str(values[name]) for name in parts[1::2]]
+        return "".join(parts)
+
+
+def parse_versions(raw: str) -> Dict[str, str]:
+    """Parse the active template versions, a JSON object of name to version."""
+    return json.loads(raw or "{}")
+
+
+class PromptRegistry:
+    """Build generation prompts from compiled, versioned templates.
+
+    Templates without a configured version use their latest one.
+    Compiled templates are cached per version, language, difficulty and
+    example count, so a prompt costs one join per call.
+    """
+
+    def __init__(self, templates: Dict[str, Dict[str, str]] = TEMPLATES, versions: Optional[Dict[str, str]] = None):
+        self.templates = templates
+        self.versions = {
+            name: (versions or {}).get(name) or max(by_version, key=lambda v: int(v.lstrip("v")))
+            for name, by_version in templates.items()
+        }
+        for name, version in self.versions.items():
+            if version not in templates[name]:
+                raise ValueError(f"Unknown prompt version {name}/{version}")
+        self._compiled: Dict[Tuple, CompiledTemplate] = {}
+
+    def compiled(self, name: str, language: Optional[str], difficulty: str, examples: int) -> CompiledTemplate:
+        key = (name, language, difficulty, examples)
+        template = self._compiled.get(key)
+        if template is None:
+            version = self.versions[name]
+            template = self._compiled[key] = CompiledTemplate(
+                f"{name}/{version}", self.templates[name][version], self._fixed_fields(version, language, difficulty, examples)
+            )
+        return template
+
+    @staticmethod
+    def _fixed_fields(version: str, language: Optional[str], difficulty: str, examples: int) -> Dict[str, str]:
+        lang_name = LANGUAGE_NAMES.get(language, "English")
+        english = lang_name == "English"
+        return {
+            "language": lang_name,
+            "difficulty": difficulty,
+            # v1 always shows every example; later versions only as many as the quiz asks for
+            "examples": QUESTION_EXAMPLES if version == "v1" else ",\n".join(COMPACT_EXAMPLES[:examples]),
+            "language_line": "" if english else f"\nOutput language: {lang_name}\n",
+            "language_rule": "" if english else f"\n- Write all content in {lang_name}",
+        }
+
+    def quiz(self, topic: str, num_questions: int, difficulty: str, language: str) -> Prompt:
+        """The prompt for one quiz."""
+        template = self.compiled("quiz", language, difficulty, _example_count(num_questions))
+        return Prompt(template.render(topic=topic, count=num_questions), template.template_id, num_questions, language)
+
+    def top_up(self, topic: str, missing: int, difficulty: str, language: str, asked: Sequence[str]) -> Prompt:
+        """The prompt for `missing` more questions, avoiding those already `asked`."""
+        template = self.compiled("top_up", language, difficulty, _example_count(missing))
+        text = template.render(topic=topic, count=missing, asked="\n".join(f"- {q}" for q in asked))
+        return Prompt(text, template.template_id, missing, language)
+
+    def batch(self, specs: Sequence) -> Prompt:
+        """The prompt for several quizzes, answered as a JSON object keyed by quiz number."""
+        quizzes = "\n".join(
+            BATCH_ITEM.format(
+                number=i, topic=spec.topic, count=spec.num_questions, difficulty=spec.difficulty,
+                language=LANGUAGE_NAMES.get(spec.language, "English")
+            )
+            for i, spec in enumerate(specs, start=1)
+        )
+        template = self.compiled("batch", None, "", _example_count(max(spec.num_questions for spec in specs)))
+        languages = {spec.language for spec in specs}
+        return Prompt(
+            template.render(count=len(specs), quizzes=quizzes), template.template_id,
+            sum(spec.num_questions for spec in specs), languages.pop() if len(languages) == 1 else None
+        )
+
+    def translate(self, items: Sequence[dict], language: str) -> Prompt:
+        """The prompt translating quiz questions (see quiz_translation.translation_items)."""
+        template = self.compiled("translate", language, "", 0)
+        text = template.render(questions=json.dumps(list(items), ensure_ascii=False))
+        return Prompt(text, template.template_id, len(items), language)
+
+
+def _example_count(num_questions: int) -> int:
+    return max(1, min(num_questions, len(COMPACT_EXAMPLES)))
+
+
+class OutputBudget:
+    """Learn completion tokens per question from LLM usage, to size `max_tokens`.
+
+    Keeps a moving average per language (languages tokenize differently)
+    and budgets `headroom` times it, once `min_samples` answers were seen.
+    """
+
+    def __init__(self, headroom: float = 1.5, min_samples: int = 5, alpha: float = 0.1, enabled: bool = True):
+        self.headroom = headroom
+        self.min_samples = min_samples
+        self.alpha = alpha
+        self.enabled = enabled
+        self._per_question: Dict[str, Tuple[float, int]] = {}  # language -> (average, samples)
+
+    def observe(self, prompt: Prompt, completion_tokens: int) -> None:
+        """Record the completion tokens of an answer that was not cut off."""
+        if not self.enabled or prompt.language is None or not prompt.num_questions:
+            return
+        if prompt.template.split("/")[0] not in GENERATION_TEMPLATES:
+            return  # e.g. translations: not a new question's length
+        tokens = completion_tokens / prompt.num_questions
+        average, samples = self._per_question.get(prompt.language, (tokens, 0))
+        if samples:
+            average += self.alpha * (tokens - average)
+        self._per_question[prompt.language] = (average, samples + 1)
+
+    def tokens_per_question(self, language: Optional[str]) -> Optional[int]:
+        """The learned output budget per question, or None while unknown."""
+        average, samples = self._per_question.get(language, (0.0, 0))
+        if not self.enabled or samples < self.min_samples:
+            return None
+        return math.ceil(average * self.headroom)
+
+    def reset(self) -> None:
+        self._per_question.clear()
+
+
+def estimate_usage(prompt: str, completion: str) -> Dict[str, int]:
+    """Estimated `usage` for an answer that came without one (e.g. streamed)."""
+    prompt_tokens, completion_tokens = estimate_tokens(prompt), estimate_tokens(completion)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "estimated": True,
+    }
+
+
+prompt_registry = PromptRegistry(versions=parse_versions(settings.llm_prompt_versions))
+
@@ -0,0 +1,242 @@
+"""Question bank: pre-generated questions for SEO catalog topics.
+
+Quizzes for catalog topics are assembled from the bank in milliseconds;
+live LLM generation is only needed when the bank runs short.
+
+Warm the bank from the command line (from backend/):
+    python -m app.services.question_bank --concurrency 4 --languages en,zh
+"""
+import argparse
+import asyncio
+import logging
+import uuid
+from typing import Collection, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.database import AsyncSessionLocal, engine, Base
+from app.metrics import record_question_bank_lookup, record_question_bank_added, record_near_duplicates
+from app.models import BankQuestion
+from app.schemas import QuizQuestion
+from app.services.db_writer import db_writer
+from app.services.http_clients import start_http_clients, close_http_clients
+from app.services.question_index import question_group
+from app.services.quiz_service import generate_quiz
+from app.services.topic_catalog import load_seo_catalog, topic_slug, slug_to_topic
+from app.services.topic_index import canonical_topic
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Questions requested per LLM call while warming (the QuizRequest maximum)
+WARM_BATCH_SIZE = 10
+
+# Bank rows looked at per question wanted, to leave room for skipping near-duplicates
+CANDIDATES_PER_QUESTION = 3
+
+BankKey = Tuple[str, str, str]  # (topic slug, difficulty, language)
+
+
+def assemble_quiz_from_bank(
+    db: Session,
+    topic: str,
+    difficulty: str,
+    language: str,
+    num_questions: int,
+    avoid: Collection[str] = ()
+) -> Optional[List[QuizQuestion]]:
+    """Assemble a quiz from banked questions, or None if the bank runs short.
+
+    Least-served questions are picked first (ties broken randomly) so
+    repeat visitors rotate through the bank. A quiz holds no two
+    near-duplicates, and takes questions in the `avoid` groups (e.g.
+    served to the device recently) only if it would be short otherwise.
+    """
+    if not settings.question_bank_enabled:
+        return None
+
+    slug = topic_slug(canonical_topic(topic))  # "Learn Python!" is banked as "python"
+    if not slug:
+        return None
+
+    rows = db.query(BankQuestion).filter(
+        BankQuestion.topic_slug == slug,
+        BankQuestion.difficulty == difficulty,
+        BankQuestion.language == language
+    ).order_by(BankQuestion.served_count, func.random()).limit(num_questions * CANDIDATES_PER_QUESTION).all()
+
+    fresh, repeated = [], []
+    groups = set()
+    for row in rows:
+        group = question_group(row.question)
+        if group in groups:
+            continue
+        groups.add(group)
+        (repeated if group in avoid else fresh).append(row)
+    record_near_duplicates("bank", len(rows) - len(groups))
+    rows = (fresh + repeated)[:num_questions]
+
+    if len(rows) < num_questions:
+        record_question_bank_lookup(hit=False)
+        return None
+    # Recently served questions left out for fresh ones
+    record_near_duplicates("recent", len(repeated) - max(0, num_questions - len(fresh)))
+
+    for row in rows:
+        row.served_count += 1
+    db.commit()
+
+    record_question_bank_lookup(hit=True)
+    return [
+        QuizQuestion(id=str(uuid.uuid4())[:8], **row.question)
+        for row in rows
+    ]
+
+
+def bank_count(db: Session, key: BankKey) -> int:
+    """Number of banked questions for a key."""
+    slug, difficulty, language = key
+    return db.query(BankQuestion).filter(
+        BankQuestion.topic_slug == slug,
+        BankQuestion.difficulty == difficulty,
+        BankQuestion.language == language
+    ).count()
+
+
+def add_to_bank(db: Session, key: BankKey, questions: Iterable[QuizQuestion]) -> int:
+    """Store questions under a key, skipping near-duplicates of its questions. Returns count added."""
+    slug, difficulty, language = key
+    existing = {
+        question_group(row.question)
+        for row in db.query(BankQuestion).filter(
+            BankQuestion.topic_slug == slug,
+            BankQuestion.difficulty == difficulty,
+            BankQuestion.language == language
+        )
+    }
+
+    added = 0
+    questions = list(questions)
+    for question in questions:
+        group = question_group(question)
+        if group in existing:
+            continue
+        existing.add(group)
+        db.add(BankQuestion(
+            topic_slug=slug, difficulty=difficulty, language=language, question=question.model_dump(exclude={"id"})
+        ))
+        added += 1
+
+    db.commit()
+    record_question_bank_added(added)
+    record_near_duplicates("bank_add", len(questions) - added)
+    return added
+
+
+def catalog_keys(
+    languages: Optional[List[str]] = None,
+    difficulties: Optional[List[str]] = None
+) -> List[BankKey]:
+    """Every (slug, difficulty, language) the SEO pages link to."""
+    catalog = load_seo_catalog()
+    return [
+        (slug, difficulty, language)
+        for slug in catalog.slugs
+        for difficulty in (difficulties or catalog.difficulties)
+        for language in (languages or catalog.languages)
+    ]
+
+
+async def warm_key(key: BankKey, target: int) -> int:
+    """Top up one key to `target` questions. Returns questions added."""
+    slug, difficulty, language = key
+    async with AsyncSessionLocal() as db:
+        added = 0
+        # Bounded attempts so a topic the LLM keeps duplicating can't spin forever
+        for _ in range(max(1, target // WARM_BATCH_SIZE) + 2):
+            missing = target - await db.run_sync(bank_count, key)
+            await db.commit()  # don't hold a connection across the LLM call
+            if missing <= 0:
+                break
+            questions = await generate_quiz(
+                topic=slug_to_topic(slug),
+                num_questions=min(WARM_BATCH_SIZE, missing),
+                difficulty=difficulty,
+                language=language
+            )
+            added += await db_writer.run(db, add_to_bank, key, questions)
+        return added
+
+
+async def warm_question_bank(
+    keys: Optional[List[BankKey]] = None,
+    target: Optional[int] = None,
+    concurrency: Optional[int] = None
+) -> int:
+    """Fill the bank for the given keys (default: whole catalog).
+
+    A fixed number of workers drain a queue of keys, which bounds both
+    concurrent LLM calls and open database sessions.
+    """
+    keys = keys if keys is not None else catalog_keys()
+    target = target or settings.question_bank_target_per_key
+    workers = concurrency or settings.question_bank_warm_concurrency
+
+    queue: "asyncio.Queue[BankKey]" = asyncio.Queue()
+    for key in keys:
+        queue.put_nowait(key)
+
+    added = 0
+
+    async def worker() -> None:
+        nonlocal added
+        while not queue.empty():
+            key = queue.get_nowait()
+            try:
+                count = await warm_key(key, target)
+                added += count
+            except Exception as e:
+                logger.warning("Warming %s failed: %s", "/".join(key), e)
+
+    await asyncio.gather(*(worker() for _ in range(max(1, workers))))
+    return added
+
+
+async def warm_from_cli(keys: List[BankKey], target: Optional[int], concurrency: Optional[int]) -> int:
+    """Warm the bank outside the app, with the shared LLM client and writer."""
+    await start_http_clients()
+    await db_writer.start()
+    try:
+        return await warm_question_bank(keys, target, concurrency)
+    finally:
+        await db_writer.stop()
+        await close_http_clients()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """CLI entry point."""
+    parser = argparse.ArgumentParser(description="Warm the question bank from the SEO topic catalog")
+    parser.add_argument("--languages", help="comma-separated language codes (default: all)")
+    parser.add_argument("--difficulties", help="comma-separated difficulties (default: all)")
+    parser.add_argument("--topics", help="comma-separated topic slugs (default: whole catalog)")
+    parser.add_argument("--target", type=int, help="questions per key")
+    parser.add_argument("--concurrency", type=int, help="concurrent LLM calls")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    Base.metadata.create_all(bind=engine)
+
+    split = lambda value: value.split(",") if value else None  # noqa: E731
+    keys = catalog_keys(split(args.languages), split(args.difficulties))
+    if args.topics:
+        wanted = set(split(args.topics))
+        keys = [key for key in keys if key[0] in wanted]
+
+    added = asyncio.run(warm_from_cli(keys, args.target, args.concurrency))
+    logger.info("Added %d questions across %d keys", added, len(keys))
+
+
+if __name__ == "__main__":
+    main()
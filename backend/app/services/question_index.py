@@ -0,0 +1,325 @@
+"""Near-duplicate questions: a MinHash index over questions and their answers.
+
+Generated questions come back with small wording changes ("What is the
+capital of France?", "What is the capital city of France?"). Each
+question is indexed by the words and word pairs of its text, its
+options and its answer; a question at least `question_dedup_threshold`
+similar to an indexed one joins that one's group, provided both have
+the same answer, numbers and negations ("Which is a prime number?" and
+"Which is NOT a prime number?" stay apart). Quizzes are kept to one
+question per group, and bank quizzes avoid the groups a device was
+served recently.
+
+The index fills as questions are banked and served. Re-index the stored
+corpus (bank and cached quizzes) from the command line (from backend/):
+    python -m app.services.question_index                   # report near-duplicates
+    python -m app.services.question_index --prune           # and list the bank rows pruning would delete
+    python -m app.services.question_index --prune --apply   # and delete them
+"""
+import argparse
+import logging
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Collection, Dict, FrozenSet, Iterable, List, Mapping, Optional, Set, Tuple, Union
+
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.database import SessionLocal, engine, Base
+from app.metrics import record_near_duplicates
+from app.models import BankQuestion, CachedQuiz
+from app.schemas import QuizQuestion
+from app.services.minhash import MinHashIndex, char_shingles
+from app.services.topic_index import normalize_topic
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Bank rows deleted per statement when pruning
+PRUNE_CHUNK = 500
+# Duplicate bank rows listed by a dry-run prune
+PRUNE_SAMPLE = 20
+
+# Words that turn a question into its opposite
+NEGATIONS = frozenset({"not", "no", "never", "none", "except", "false", "incorrect", "untrue", "cannot"})
+
+_NUMBER = re.compile(r"\d+")
+_CONTRACTED_NOT = re.compile(r"n['’]t\b", re.IGNORECASE)  # "isn't" -> "is not"
+_WIDE_CHAR = re.compile(r"[⺀-鿿가-힯豈-﫿＀-￯]")
+
+Question = Union[QuizQuestion, Mapping[str, Any]]  # a model or a stored payload
+
+
+@dataclass(frozen=True)
+class FoldedQuestion:
+    """A question folded for comparison: its text, option texts and the answer's text."""
+    text: str
+    options: Tuple[str, ...]
+    answer: str
+
+    @property
+    def key(self) -> str:
+        """Exact identity of the folded question."""
+        if self.options:
+            return f"{self.text} [{' / '.join(self.options)}] = {self.answer}"
+        return f"{self.text} = {self.answer}"
+
+    @property
+    def guard(self) -> Tuple[Tuple[str, ...], FrozenSet[str], str]:
+        """What near-duplicates must share: numbers, negations and answer."""
+        return tuple(_NUMBER.findall(self.text)), frozenset(self.text.split(" ")) & NEGATIONS, self.answer
+
+
+def fold_question(question: Question) -> FoldedQuestion:
+    """Fold a question, given as a model or a stored payload."""
+    if isinstance(question, QuizQuestion):
+        text, answer = question.question, question.correct_answer
+        options = [(option.id, option.text) for option in question.options or ()]
+    else:
+        text, answer = question.get("question") or "", question.get("correct_answer") or ""
+        options = [(option.get("id"), option.get("text") or "") for option in question.get("options") or ()]
+    option_texts = {str(option_id): normalize_topic(str(option_text)) for option_id, option_text in options}
+    # A multiple-choice answer is an option id; compare the option's text
+    answer = option_texts.get(str(answer)) or normalize_topic(str(answer))
+    text = normalize_topic(_CONTRACTED_NOT.sub(" not", str(text)))
+    return FoldedQuestion(text, tuple(sorted(option_texts.values())), answer)
+
+
+def question_features(folded: FoldedQuestion) -> FrozenSet[str]:
+    """Words and word pairs of a question's text (character pairs for CJK text), its options and answer."""
+    if _WIDE_CHAR.search(folded.text):
+        features = set(char_shingles(folded.text, 2))
+    else:
+        words = folded.text.split(" ")
+        features = set(words + [f"{a} {b}" for a, b in zip(words, words[1:])])
+    features.update(f"option:{option}" for option in folded.options)
+    features.add(f"answer:{folded.answer}")
+    return frozenset(features)
+
+
+class QuestionIndex:
+    """Group questions with their near-duplicates.
+
+    A group is named after the key of the first question indexed in it.
+    Questions are indexed until `max_entries` are known; after that, new
+    questions only match exact repeats.
+    """
+
+    def __init__(self, threshold: float = 0.7, max_entries: int = 200000):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._index: MinHashIndex[str] = MinHashIndex()
+        self._groups: Dict[str, str] = {}  # folded question key -> group
+        self._guards: Dict[str, Tuple] = {}  # folded question key -> FoldedQuestion.guard
+
+    def __len__(self) -> int:
+        return len(self._groups)
+
+    @property
+    def group_count(self) -> int:
+        return len(set(self._groups.values()))
+
+    def clear(self) -> None:
+        self._index.clear()
+        self._groups.clear()
+        self._guards.clear()
+
+    def group_of(self, question: Question) -> str:
+        """The group of a question, indexing the question if it is new."""
+        folded = fold_question(question)
+        key = folded.key
+        group = self._groups.get(key)
+        if group is not None:
+            return group
+
+        features = question_features(folded)
+        # Questions with different numbers, negations or answers are different questions
+        guard = folded.guard
+        group = key
+        for known, _ in self._index.query(features, self.threshold):
+            if self._guards[known] == guard:
+                group = self._groups[known]
+                break
+        if len(self._groups) < self.max_entries:
+            self._index.add(key, features)
+            self._groups[key] = group
+            self._guards[key] = guard
+        return group
+
+    def distinct(self, questions: Iterable[QuizQuestion]) -> List[QuizQuestion]:
+        """The questions without near-duplicates of earlier ones."""
+        seen: Set[str] = set()
+        kept = []
+        for question in questions:
+            group = self.group_of(question)
+            if group not in seen:
+                seen.add(group)
+                kept.append(question)
+        return kept
+
+
+class RecentQuestions:
+    """Question groups served to each device recently (bounded LRU of devices, with TTL)."""
+
+    def __init__(
+        self,
+        ttl_seconds: int,
+        per_device: int = 200,
+        max_devices: int = 10000,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.per_device = per_device
+        self.max_devices = max_devices
+        self._clock = clock
+        self._devices: "OrderedDict[str, OrderedDict[str, float]]" = OrderedDict()
+
+    def clear(self) -> None:
+        self._devices.clear()
+
+    def groups(self, device_id: str) -> Set[str]:
+        """Groups of the questions served to a device within the TTL."""
+        served = self._devices.get(device_id)
+        if not served:
+            return set()
+        now = self._clock()
+        while served and next(iter(served.values())) <= now:
+            served.popitem(last=False)
+        return set(served)
+
+    def remember(self, device_id: str, questions: Iterable[QuizQuestion]) -> None:
+        """Record questions served to a device."""
+        served = self._devices.setdefault(device_id, OrderedDict())
+        self._devices.move_to_end(device_id)
+        expires_at = self._clock() + self.ttl_seconds
+        for question in questions:
+            group = question_index.group_of(question)
+            served.pop(group, None)
+            served[group] = expires_at
+        while len(served) > self.per_device:
+            served.popitem(last=False)
+        while len(self._devices) > self.max_devices:
+            self._devices.popitem(last=False)
+
+
+def question_group(question: Question) -> str:
+    """The near-duplicate group of a question (its exact key with dedup off)."""
+    if not settings.question_dedup_enabled:
+        return fold_question(question).key
+    return question_index.group_of(question)
+
+
+def distinct_questions(questions: List[QuizQuestion], source: str) -> List[QuizQuestion]:
+    """Drop near-duplicates within a quiz, counting them under `source`."""
+    if not settings.question_dedup_enabled:
+        return questions
+    kept = question_index.distinct(questions)
+    record_near_duplicates(source, len(questions) - len(kept))
+    return kept
+
+
+def recent_groups(device_id: str) -> Collection[str]:
+    """Question groups a device was served recently, to avoid in its next quiz."""
+    if not settings.question_dedup_enabled:
+        return ()
+    return recent_questions.groups(device_id)
+
+
+def remember_served(device_id: str, questions: List[QuizQuestion]) -> None:
+    """Record the questions of a quiz served to a device."""
+    if settings.question_dedup_enabled:
+        recent_questions.remember(device_id, questions)
+
+
+@dataclass
+class ReindexReport:
+    """What re-indexing the stored corpus found."""
+    bank_questions: int = 0
+    cached_questions: int = 0
+    groups: int = 0
+    bank_duplicates: int = 0  # near-duplicates of another question under the same bank key
+    pruned: int = 0
+    duplicate_ids: List[int] = field(default_factory=list)  # bank rows pruning deletes
+
+
+def reindex(db: Session, prune: bool = False) -> ReindexReport:
+    """Rebuild the index from the question bank and cached quizzes.
+
+    Bank questions are indexed most-served first, so the one kept of
+    near-duplicates under a bank key is the most-served one; with
+    `prune`, the others are deleted.
+    """
+    question_index.clear()
+    report = ReindexReport()
+    kept: Set[Tuple[str, str, str, str]] = set()
+    duplicates: List[int] = []
+
+    rows = db.query(
+        BankQuestion.id, BankQuestion.topic_slug, BankQuestion.difficulty, BankQuestion.language, BankQuestion.question
+    ).order_by(BankQuestion.served_count.desc(), BankQuestion.id).yield_per(1000)
+    for row_id, slug, difficulty, language, question in rows:
+        report.bank_questions += 1
+        key = (slug, difficulty, language, question_index.group_of(question or {}))
+        if key in kept:
+            duplicates.append(row_id)
+        else:
+            kept.add(key)
+
+    for (questions,) in db.query(CachedQuiz.questions).yield_per(200):
+        for question in questions or ():
+            report.cached_questions += 1
+            question_index.group_of(question)
+
+    report.groups = question_index.group_count
+    report.bank_duplicates = len(duplicates)
+    report.duplicate_ids = duplicates
+    if prune:
+        for start in range(0, len(duplicates), PRUNE_CHUNK):
+            chunk = duplicates[start:start + PRUNE_CHUNK]
+            report.pruned += db.query(BankQuestion).filter(
+                BankQuestion.id.in_(chunk)
+            ).delete(synchronize_session=False)
+        db.commit()
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """CLI entry point."""
+    parser = argparse.ArgumentParser(description="Re-index stored questions and report near-duplicates")
+    parser.add_argument("--prune", action="store_true", help="list near-duplicate bank questions to delete")
+    parser.add_argument("--apply", action="store_true", help="with --prune, delete them")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    Base.metadata.create_all(bind=engine)
+
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        report = reindex(db, prune=args.prune and args.apply)
+    logger.info(
+        "Indexed %d bank and %d cached questions into %d groups in %.1fs; "
+        "%d bank questions are near-duplicates, %d pruned",
+        report.bank_questions, report.cached_questions, report.groups, time.perf_counter() - started,
+        report.bank_duplicates, report.pruned
+    )
+    if args.prune and not args.apply and report.duplicate_ids:
+        logger.info(
+            "Dry run: --apply would delete bank questions %s%s",
+            report.duplicate_ids[:PRUNE_SAMPLE], " and more" if len(report.duplicate_ids) > PRUNE_SAMPLE else ""
+        )
+
+
+question_index = QuestionIndex(
+    threshold=settings.question_dedup_threshold,
+    max_entries=settings.question_index_max_entries
+)
+recent_questions = RecentQuestions(
+    ttl_seconds=settings.question_recent_ttl_seconds,
+    per_device=settings.question_recent_per_device
+)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""Batch concurrent quiz generations into shared LLM calls."""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Optional, Set, Tuple
+
+from app.metrics import record_quiz_batch, record_llm_calls_per_quiz
+from app.schemas import QuizQuestion
+from app.services.llm_limiter import PRIORITIES, LLMCaller, current_caller, llm_caller
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class QuizSpec:
+    """What to generate for one quiz."""
+    topic: str
+    num_questions: int
+    difficulty: str
+    language: str
+
+
+GenerateOne = Callable[[QuizSpec], Awaitable[List[QuizQuestion]]]
+# One LLM call for several quizzes; None marks a quiz missing from the answer
+GenerateBatch = Callable[[List[QuizSpec]], Awaitable[List[Optional[List[QuizQuestion]]]]]
+_Pending = Tuple[QuizSpec, "asyncio.Future[List[QuizQuestion]]", float, LLMCaller]
+
+
+class QuizBatcher:
+    """Pack quiz requests into one structured LLM call while the LLM is busy.
+
+    With fewer than `min_in_flight` LLM calls running, a request goes
+    straight out on its own call. Beyond that, requests are held for up to
+    `max_wait_ms` and packed, in arrival order, into calls whose expected
+    output fits `max_tokens`; the long instruction template is then paid
+    once per call instead of once per quiz. A quiz missing or malformed in
+    the batch answer (or a failed batch call) falls back to its own call.
+    Batches never mix LLM priority classes, nor `group_by` groups (the
+    routed model); each runs in its class, until the latest deadline
+    among its requests.
+    """
+
+    def __init__(
+        self,
+        generate_one: GenerateOne,
+        generate_batch: GenerateBatch,
+        max_wait_ms: int,
+        max_tokens: int,
+        tokens_per_question: int,
+        min_in_flight: int,
+        enabled: bool = True,
+        group_by: Callable[[QuizSpec], str] = lambda spec: "",
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.generate_one = generate_one
+        self.generate_batch = generate_batch
+        self.max_wait_ms = max_wait_ms
+        self.max_tokens = max_tokens
+        self.tokens_per_question = tokens_per_question
+        self.min_in_flight = min_in_flight
+        self.enabled = enabled
+        self.group_by = group_by
+        self._clock = clock
+        self._pending: List[_Pending] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._in_flight = 0
+
+    @property
+    def in_flight(self) -> int:
+        """LLM calls currently running."""
+        return self._in_flight
+
+    async def generate(self, spec: QuizSpec) -> List[QuizQuestion]:
+        """Generate one quiz, batched with concurrent requests when the LLM is busy."""
+        if not self.enabled or (not self._pending and self._in_flight < self.min_in_flight):
+            record_llm_calls_per_quiz(1)
+            return await self._call_one(spec)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((spec, future, self._clock(), current_caller()))
+        if self._pending_tokens() >= self.max_tokens:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_ms / 1000, self._dispatch)
+        return await future
+
+    def _pending_tokens(self) -> int:
+        return sum(item[0].num_questions for item in self._pending) * self.tokens_per_question
+
+    def _dispatch(self) -> None:
+        """Pack everything pending into batches and start their calls."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        group = lambda item: (PRIORITIES.index(item[3].priority), self.group_by(item[0]))  # noqa: E731
+        pending.sort(key=group)  # stable: arrival order within a group
+
+        batch: List[_Pending] = []
+        tokens = 0
+        for item in pending:
+            cost = item[0].num_questions * self.tokens_per_question
+            if batch and (tokens + cost > self.max_tokens or group(item) != group(batch[0])):
+                self._start(batch)
+                batch, tokens = [], 0
+            batch.append(item)
+            tokens += cost
+        if batch:
+            self._start(batch)
+
+    def _start(self, batch: List[_Pending]) -> None:
+        task = asyncio.ensure_future(self._run_batch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: List[_Pending]) -> None:
+        """Run one batch call and resolve its waiters, falling back per quiz."""
+        deadlines = [item[3].deadline for item in batch]
+        deadline = None if None in deadlines else max(deadlines)
+        with llm_caller(batch[0][3].priority, "", deadline):
+            await self._run_batch_calls(batch)
+
+    async def _run_batch_calls(self, batch: List[_Pending]) -> None:
+        now = self._clock()
+        record_quiz_batch(len(batch), [now - item[2] for item in batch])
+
+        if len(batch) == 1:
+            answers: List[Optional[List[QuizQuestion]]] = [None]
+        else:
+            self._in_flight += 1
+            try:
+                answers = await self.generate_batch([item[0] for item in batch])
+            except Exception as e:
+                logger.warning("Batched generation of %d quizzes failed: %s", len(batch), e)
+                answers = [None] * len(batch)
+            finally:
+                self._in_flight -= 1
+
+        shared_calls = 1 / len(batch) if len(batch) > 1 else 0
+        await asyncio.gather(*(
+            self._resolve(spec, future, questions, shared_calls)
+            for (spec, future, _, _), questions in zip(batch, answers)
+        ))
+
+    async def _resolve(
+        self,
+        spec: QuizSpec,
+        future: "asyncio.Future[List[QuizQuestion]]",
+        questions: Optional[List[QuizQuestion]],
+        shared_calls: float
+    ) -> None:
+        """Hand a quiz to its waiter, generating it on its own if the batch missed it."""
+        if questions is None:
+            record_llm_calls_per_quiz(shared_calls + 1)
+            try:
+                questions = await self._call_one(spec)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                return
+        else:
+            record_llm_calls_per_quiz(shared_calls)
+        if not future.done():
+            future.set_result(questions)
+
+    async def _call_one(self, spec: QuizSpec) -> List[QuizQuestion]:
+        self._in_flight += 1
+        try:
+            return await self.generate_one(spec)
+        finally:
+            self._in_flight -= 1
@@ -0,0 +1,236 @@
+"""Content-addressed quiz cache in front of LLM generation."""
+import hashlib
+import random
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.metrics import (
+    record_quiz_cache_hit, record_quiz_cache_miss,
+    record_quiz_cache_eviction, record_quiz_cache_size
+)
+from app.models import CachedQuiz
+from app.schemas import MAX_QUIZ_QUESTIONS, QUIZ_DIFFICULTIES, QuizQuestion
+from app.services.prompts import prompt_registry
+from app.services.topic_index import canonical_topic
+
+settings = get_settings()
+
+# Bump when the cached payload shape or the key derivation changes
+CACHE_KEY_VERSION = "v2"
+
+# Templates cached quizzes are generated from; their active versions are
+# part of the key, so a new or pinned prompt doesn't serve the old one's quizzes
+GENERATION_TEMPLATES = ("quiz", "top_up", "batch")
+
+
+def quiz_cache_key(topic: str, difficulty: str, language: str, num_questions: int) -> str:
+    """Canonical cache key for a quiz request (equivalent topics share one, see topic_index)."""
+    return _key(canonical_topic(topic), difficulty, language, num_questions)
+
+
+def topic_cache_keys(topic: str, language: str) -> List[str]:
+    """Cache keys of every quiz on a topic in a language, at any difficulty and size."""
+    canonical = canonical_topic(topic)
+    return [
+        _key(canonical, difficulty, language, num_questions)
+        for difficulty in QUIZ_DIFFICULTIES
+        for num_questions in range(1, MAX_QUIZ_QUESTIONS + 1)
+    ]
+
+
+def _key(canonical: str, difficulty: str, language: str, num_questions: int) -> str:
+    prompts = ",".join(f"{name}/{prompt_registry.versions[name]}" for name in GENERATION_TEMPLATES)
+    raw = "|".join([CACHE_KEY_VERSION, prompts, canonical, difficulty, language, str(num_questions)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+class _Entry:
+    """Cached variants for one key."""
+    __slots__ = ("variants", "expires_at")
+
+    def __init__(self, expires_at: float):
+        self.variants: List[List[dict]] = []
+        self.expires_at = expires_at
+
+
+class QuizCache:
+    """Bounded LRU with TTL and an optional database tier.
+
+    Each key holds up to `max_variants` distinct quizzes. Until a key has
+    all of its variants, lookups miss so fresh quizzes get generated; after
+    that, a random variant is served with its question order shuffled, so
+    repeat users don't see the same quiz.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: int,
+        max_variants: int,
+        persistent: bool = True,
+        enabled: bool = True,
+        clock: Callable[[], float] = time.monotonic,
+        rng: Optional[random.Random] = None
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_variants = max(1, max_variants)
+        self.persistent = persistent
+        self.enabled = enabled
+        self._clock = clock
+        self._rng = rng or random.Random()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        """Drop all in-memory entries."""
+        self._entries.clear()
+        record_quiz_cache_size(0)
+
+    def get(self, key: str, db: Optional[Session] = None) -> Optional[List[QuizQuestion]]:
+        """Return a shuffled copy of a cached variant, or None on a miss."""
+        if not self.enabled:
+            return None
+
+        entry = self._lookup_memory(key)
+        tier = "memory"
+        if (entry is None or len(entry.variants) < self.max_variants) and db is not None and self.persistent:
+            entry = self._load_from_db(key, db) or entry
+            tier = "db"
+
+        if entry is None or len(entry.variants) < self.max_variants:
+            record_quiz_cache_miss()
+            return None
+
+        record_quiz_cache_hit(tier)
+        return self._serve(entry)
+
+    def peek(self, key: str, db: Optional[Session] = None) -> Optional[List[QuizQuestion]]:
+        """Return a shuffled copy of any cached variant, even before `key` has all of them.
+
+        For reusing a quiz elsewhere (e.g. translating it); not counted as a hit or miss.
+        """
+        if not self.enabled:
+            return None
+
+        entry = self._lookup_memory(key)
+        if entry is None and db is not None and self.persistent:
+            entry = self._load_from_db(key, db, min_variants=1)
+        if entry is None or not entry.variants:
+            return None
+        return self._serve(entry)
+
+    def put(
+        self,
+        key: str,
+        questions: List[QuizQuestion],
+        db: Optional[Session] = None,
+        topic: str = "",
+        difficulty: str = "",
+        language: str = ""
+    ) -> None:
+        """Add a freshly generated quiz as a variant of `key`."""
+        if not self.enabled or not questions:
+            return
+
+        payload = [QuizQuestion.model_validate(q).model_dump() for q in questions]
+        entry = self._lookup_memory(key)
+        if entry is None:
+            entry = _Entry(self._clock() + self.ttl_seconds)
+            self._entries[key] = entry
+            self._evict_overflow()
+
+        if len(entry.variants) < self.max_variants:
+            entry.variants.append(payload)
+            if db is not None and self.persistent:
+                db.add(CachedQuiz(
+                    cache_key=key,
+                    topic=topic,
+                    difficulty=difficulty,
+                    language=language,
+                    questions=payload
+                ))
+                db.flush()
+                self._prune_db(key, db)
+                db.commit()
+
+        record_quiz_cache_size(len(self._entries))
+
+    def _lookup_memory(self, key: str) -> Optional[_Entry]:
+        """Fetch an entry, refreshing its LRU position and dropping it if expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= self._clock():
+            del self._entries[key]
+            record_quiz_cache_eviction("expired")
+            record_quiz_cache_size(len(self._entries))
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _load_from_db(self, key: str, db: Session, min_variants: Optional[int] = None) -> Optional[_Entry]:
+        """Hydrate an entry from the database tier, if it holds `min_variants` (default: all)."""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+        rows = db.query(CachedQuiz).filter(
+            CachedQuiz.cache_key == key,
+            CachedQuiz.created_at >= cutoff
+        ).order_by(CachedQuiz.created_at.desc()).limit(self.max_variants).all()
+
+        if len(rows) < (min_variants or self.max_variants):
+            return None
+
+        entry = _Entry(self._clock() + self.ttl_seconds)
+        entry.variants = [row.questions for row in rows]
+        self._entries[key] = entry
+        self._evict_overflow()
+        record_quiz_cache_size(len(self._entries))
+        return entry
+
+    def _prune_db(self, key: str, db: Session) -> None:
+        """Drop expired rows, and rows of `key` beyond its newest variants."""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+        expired = db.query(CachedQuiz).filter(
+            CachedQuiz.created_at < cutoff
+        ).delete(synchronize_session=False)
+
+        newest = db.query(CachedQuiz.id).filter(
+            CachedQuiz.cache_key == key
+        ).order_by(CachedQuiz.created_at.desc(), CachedQuiz.id.desc()).limit(self.max_variants)
+        overflow = db.query(CachedQuiz).filter(
+            CachedQuiz.cache_key == key,
+            CachedQuiz.id.not_in(newest.scalar_subquery())
+        ).delete(synchronize_session=False)
+
+        for _ in range(expired):
+            record_quiz_cache_eviction("db_expired")
+        for _ in range(overflow):
+            record_quiz_cache_eviction("db_capacity")
+
+    def _evict_overflow(self) -> None:
+        """Evict least-recently-used keys beyond capacity."""
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            record_quiz_cache_eviction("capacity")
+
+    def _serve(self, entry: _Entry) -> List[QuizQuestion]:
+        """Pick a variant and shuffle its question order."""
+        variant = list(self._rng.choice(entry.variants))
+        self._rng.shuffle(variant)
+        return [QuizQuestion.model_validate(q) for q in variant]
+
+
+quiz_cache = QuizCache(
+    max_entries=settings.quiz_cache_max_entries,
+    ttl_seconds=settings.quiz_cache_ttl_seconds,
+    max_variants=settings.quiz_cache_variants,
+    persistent=settings.quiz_cache_persistent,
+    enabled=settings.quiz_cache_enabled
+)
@@ -0,0 +1,217 @@
+"""Parse, repair and validate LLM quiz answers.
+
+Answers are decoded with `orjson` when it is installed (optional; the
+standard library `json` otherwise). Common model faults are repaired
+before giving up on an answer: code fences, prose around the JSON,
+trailing commas and a truncated final question. Questions are validated
+as a batch against the quiz schema; invalid ones are dropped, so a
+mostly good answer is kept and only the missing questions need another
+call.
+"""
+import json
+import re
+import secrets
+from dataclasses import dataclass
+from typing import Annotated, Any, List, Optional
+
+from pydantic import BeforeValidator, TypeAdapter, ValidationError
+
+from app.metrics import record_llm_answer_repair, record_llm_questions_rejected
+from app.schemas import QuizQuestion
+from app.services.json_stream import JsonArrayStreamParser
+
+try:
+    import orjson
+
+    def loads(text: str) -> Any:
+        """Decode JSON text."""
+        return orjson.loads(text)
+
+    JSONDecodeError = orjson.JSONDecodeError  # a ValueError, like json's
+except ImportError:  # pragma: no cover - depends on the environment
+    loads = json.loads
+    JSONDecodeError = json.JSONDecodeError
+
+_FENCE = re.compile(r"```[a-zA-Z]*\n?")
+# A string (kept as is) or a comma before a closing bracket (dropped)
+_STRING_OR_TRAILING_COMMA = re.compile(r'"(?:[^"\\]|\\.)*"|,(?=\s*[}\]])')
+QUESTION_TYPES = ("multiple_choice", "true_false", "fill_blank")
+OPTION_LETTERS = "ABCDEFGH"
+MAX_SALVAGE_CUTS = 8
+
+
+def question_id() -> str:
+    """A short random question id."""
+    return secrets.token_hex(4)
+
+
+def _text(value: Any) -> str:
+    if isinstance(value, (bool, int, float)):
+        value = str(value)
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError("expected non-empty text")
+    return value.strip()
+
+
+def normalize_question(data: Any) -> Any:
+    """Check one question object against the prompt's format and shape it as a QuizQuestion.
+
+    Multiple-choice answers given as the option text are mapped to the
+    option letter, and true/false answers to "True"/"False".
+    Raises: ValueError if the question is unusable.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("question is not an object")
+    qtype = data.get("type")
+    if qtype not in QUESTION_TYPES:
+        raise ValueError(f"unknown question type {qtype!r}")
+    answer = _text(data.get("correct_answer"))
+    options = data.get("options")
+    if options is not None and not isinstance(options, list):
+        raise ValueError("options is not a list")
+
+    if qtype == "multiple_choice":
+        if not options or not 2 <= len(options) <= len(OPTION_LETTERS):
+            raise ValueError("multiple choice needs 2-8 options")
+        options = [_text(option) for option in options]
+        letter = answer.upper()
+        if letter not in OPTION_LETTERS[:len(options)]:
+            # The option text instead of its letter
+            if answer not in options:
+                raise ValueError("correct answer is not an option")
+            letter = OPTION_LETTERS[options.index(answer)]
+        answer = letter
+    elif qtype == "true_false":
+        answer = answer.capitalize()
+        if answer not in ("True", "False"):
+            raise ValueError("true/false answer must be True or False")
+        options = [_text(option) for option in options[:2]] if options else ["True", "False"]
+    else:
+        options = None
+
+    return {
+        "id": question_id(),
+        "type": qtype,
+        "question": _text(data.get("question")),
+        "options": [{"id": letter, "text": text} for letter, text in zip(OPTION_LETTERS, options)] if options else None,
+        "correct_answer": answer,
+        "explanation": _text(data.get("explanation"))
+    }
+
+
+_QUESTIONS = TypeAdapter(List[Annotated[QuizQuestion, BeforeValidator(normalize_question)]])
+
+
+@dataclass
+class ParsedQuestions:
+    """Valid questions from an answer, and how many were dropped."""
+    questions: List[QuizQuestion]
+    rejected: int = 0
+
+
+def validate_questions(items: List[Any]) -> ParsedQuestions:
+    """Validate decoded questions in one pass, dropping the invalid ones."""
+    try:
+        return ParsedQuestions(_QUESTIONS.validate_python(items))
+    except ValidationError as e:
+        bad = {error["loc"][0] for error in e.errors() if error["loc"]}
+    kept = [item for i, item in enumerate(items) if i not in bad]
+    record_llm_questions_rejected(len(items) - len(kept))
+    return ParsedQuestions(_QUESTIONS.validate_python(kept), len(items) - len(kept))
+
+
+def validate_question(item: Any) -> Optional[QuizQuestion]:
+    """Validate one decoded question (e.g. from a stream), or None if it is invalid."""
+    parsed = validate_questions([item])
+    return parsed.questions[0] if parsed.questions else None
+
+
+def _strip_fences(content: str) -> str:
+    if "```" not in content:
+        return content
+    record_llm_answer_repair("code_fence")
+    return _FENCE.sub("", content)
+
+
+def _drop_trailing_commas(text: str) -> str:
+    """Remove commas before a closing bracket, outside of strings."""
+    return _STRING_OR_TRAILING_COMMA.sub(lambda m: m.group() if m.group() != "," else "", text)
+
+
+def _decode(text: str, kind: type) -> Any:
+    """Decode `text`, repairing trailing commas if needed. Raises ValueError."""
+    try:
+        value = loads(text)
+    except JSONDecodeError:
+        repaired = _drop_trailing_commas(text)
+        if repaired == text:
+            raise
+        value = loads(repaired)
+        record_llm_answer_repair("trailing_comma")
+    if not isinstance(value, kind):
+        raise ValueError(f"Expected a JSON {kind.__name__}")
+    return value
+
+
+def extract_array(content: str) -> List[Any]:
+    """The question array in an answer, repaired if needed.
+
+    A truncated array keeps its complete elements.
+    Raises: ValueError if no array can be recovered.
+    """
+    content = _strip_fences(content)
+    start = content.find("[")
+    if start == -1:
+        raise ValueError("No JSON array found in response")
+    end = content.rfind("]") + 1
+    if end > start:
+        try:
+            return _decode(content[start:end], list)
+        except ValueError:
+            pass
+
+    # Truncated or broken: close the array after its last complete element
+    text = _drop_trailing_commas(content[start:])
+    cut = len(text)
+    for _ in range(MAX_SALVAGE_CUTS):
+        cut = text.rfind("}", 0, cut)
+        if cut == -1:
+            break
+        try:
+            items = loads(text[:cut + 1] + "]")
+        except JSONDecodeError:
+            continue
+        if items and isinstance(items, list):
+            record_llm_answer_repair("truncated")
+            return items
+
+    # A brace inside strings, or a broken element mid-array: scan element by element
+    items = JsonArrayStreamParser().feed(text)
+    if not items:
+        raise ValueError("No complete question in response")
+    record_llm_answer_repair("salvaged")
+    return items
+
+
+def extract_object(content: str) -> dict:
+    """The JSON object in an answer (e.g. a batched one), repaired if needed.
+
+    Raises: ValueError if there is none.
+    """
+    content = _strip_fences(content)
+    start = content.find("{")
+    end = content.rfind("}") + 1
+    if start == -1 or end == 0:
+        raise ValueError("No JSON object found in response")
+    return _decode(content[start:end], dict)
+
+
+def parse_questions(content: str) -> ParsedQuestions:
+    """Valid questions from a single-quiz answer.
+
+    Raises: ValueError if none can be recovered.
+    """
+    parsed = validate_questions(extract_array(content))
+    if not parsed.questions:
+        raise ValueError("No valid question in response")
+    return parsed
@@ -1,23 +1,99 @@
 """Quiz generation service using LLM."""
+import asyncio
 import httpx
 import json
-import uuid
-from typing import List, Optional
+import time
+from contextlib import nullcontext
+from typing import AsyncIterator, List, Optional, Set
 from app.config import get_settings
-from app.schemas import QuizQuestion, QuizOption
+from app.metrics import record_llm_model_answer, record_llm_model_call, record_llm_prompt_call
+from app.schemas import QuizQuestion
+from app.services.circuit_breaker import CLOSED, CircuitOpenError, llm_breaker
+from app.services.http_clients import llm_client, llm_timeout
+from app.services.json_stream import JsonArrayStreamParser
+from app.services.llm_limiter import (
+    BACKGROUND, LLMDeadlineExceeded, LLMOverloadedError, llm_caller, llm_limiter
+)
+from app.services.llm_resilience import llm_calls
+from app.services.model_router import ModelRoute, ModelRouter, parse_routes
+from app.services.prompts import OutputBudget, Prompt, estimate_usage, prompt_registry
+from app.services.question_index import distinct_questions
+from app.services.quiz_batcher import QuizBatcher, QuizSpec
+from app.services.quiz_parser import (
+    extract_array, extract_object, parse_questions, validate_question, validate_questions
+)
+from app.services.quiz_translation import merge_translations, translation_items
 
 settings = get_settings()
 
-# Language names for prompts
-LANGUAGE_NAMES = {
-    "en": "English",
-    "zh": "Chinese (Simplified)",
-    "ja": "Japanese",
-    "de": "German",
-    "fr": "French",
-    "ko": "Korean",
-    "es": "Spanish"
-}
+LLM_MAX_TOKENS = 4000
+
+# LLM call modes: answers users get, and shadow-tested copies only measured
+LIVE = "live"
+SHADOW = "shadow"
+
+# Output budgets learned from LLM usage
+output_budget = OutputBudget(enabled=settings.llm_output_budget_enabled)
+
+
+def build_completion_payload(prompt: Prompt, route: ModelRoute, stream: bool = False) -> dict:
+    """Chat-completions request body for the LLM proxy."""
+    payload = {
+        "model": route.model,
+        "messages": [
+            {"role": "user", "content": prompt.text}
+        ],
+        "max_tokens": route.max_tokens,
+        "temperature": 0.7
+    }
+    if stream:
+        payload["stream"] = True
+    return payload
+
+
+def llm_headers() -> dict:
+    """Auth headers for the LLM proxy."""
+    return {
+        "Authorization": f"Bearer {settings.llm_proxy_key}",
+        "Content-Type": "application/json"
+    }
+
+
+async def post_completion(payload: dict, timeout: float, mode: str = LIVE, prompt: Optional[Prompt] = None) -> str:
+    """Make one chat-completions request within `timeout` seconds; returns the answer text.
+    
+    Records the call's latency and token usage, also by the `prompt`'s
+    template version for live calls.
+    """
+    # A shadow model's failures say nothing about whether the live path is up;
+    # the slot is taken first, so only calls that reach the upstream are judged
+    breaker = llm_breaker.call() if mode == LIVE else nullcontext()
+    async with llm_limiter.slot(payload["model"]), breaker, llm_client() as client:
+        started = time.perf_counter()
+        response = await client.post(
+            f"{settings.llm_proxy_url}/v1/chat/completions",
+            headers=llm_headers(),
+            json=payload,
+            timeout=llm_timeout(timeout)
+        )
+        response.raise_for_status()
+        body = response.json()
+    seconds = time.perf_counter() - started
+    choice = body["choices"][0]
+    content = choice["message"]["content"]
+    usage = body.get("usage")
+    record_llm_model_call(payload["model"], mode, seconds, usage)
+    if prompt is not None and mode == LIVE:
+        record_prompt_usage(prompt, payload["model"], seconds, usage or estimate_usage(prompt.text, content),
+                            truncated=choice.get("finish_reason") == "length")
+    return content
+
+
+def record_prompt_usage(prompt: Prompt, model: str, seconds: float, usage: dict, truncated: bool = False) -> None:
+    """Record a live call by template version, and learn its output length unless it was cut off."""
+    record_llm_prompt_call(prompt.template, model, seconds, usage)
+    if not truncated and usage.get("completion_tokens"):
+        output_budget.observe(prompt, usage["completion_tokens"])
 
 
 async def generate_quiz(
@@ -26,102 +102,79 @@ async def generate_quiz(
     difficulty: str = "medium",
     language: str = "en"
 ) -> List[QuizQuestion]:
-    """Generate quiz questions using LLM."""
-    
-    lang_name = LANGUAGE_NAMES.get(language, "English")
-    
-    prompt = f"""Generate exactly {num_questions} quiz questions about "{topic}" at {difficulty} difficulty level.
-    
-Output language: {lang_name}
-
-Requirements:
-- Mix question types: multiple choice (4 options), true/false, and fill-in-the-blank
-- Questions should test understanding, not just recall
-- Provide clear explanations for each answer
-- Make sure all content is in {lang_name}
-
-Return a JSON array with this exact structure:
-[
-  {{
-    "type": "multiple_choice",
-    "question": "Question text here?",
-    "options": ["Option A", "Option B", "Option C", "Option D"],
-    "correct_answer": "A",
-    "explanation": "Explanation of why this is correct"
-  }},
-  {{
-    "type": "true_false",
-    "question": "Statement to evaluate?",
-    "options": ["True", "False"],
-    "correct_answer": "True",
-    "explanation": "Explanation"
-  }},
-  {{
-    "type": "fill_blank",
-    "question": "Complete the sentence: The ___ is...",
-    "options": null,
-    "correct_answer": "answer",
-    "explanation": "Explanation"
-  }}
-]
-
-Return ONLY the JSON array, no other text."""
+    """Generate quiz questions using LLM.
+    
+    Shares an LLM call with concurrent requests when the LLM is busy
+    (see QuizBatcher).
+    """
+    return await quiz_batcher.generate(QuizSpec(topic, num_questions, difficulty, language))
+
 
+def parse_model_answer(content: str, model: str, mode: str) -> List[QuizQuestion]:
+    """Parse a single-quiz answer, recording whether the model's answer parsed.
+    
+    Repairable faults are repaired and invalid questions dropped (see
+    quiz_parser). Raises: ValueError if no valid question is left.
+    """
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(
-                f"{settings.llm_proxy_url}/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {settings.llm_proxy_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": "claude-sonnet-4-20250514",
-                    "messages": [
-                        {"role": "user", "content": prompt}
-                    ],
-                    "max_tokens": 4000,
-                    "temperature": 0.7
-                }
-            )
-            response.raise_for_status()
-            
-            data = response.json()
-            content = data["choices"][0]["message"]["content"]
-            
-            # Parse JSON from response
-            # Find JSON array in response
-            start = content.find('[')
-            end = content.rfind(']') + 1
-            if start == -1 or end == 0:
-                raise ValueError("No JSON array found in response")
-            
-            json_str = content[start:end]
-            questions_data = json.loads(json_str)
-            
-            # Convert to QuizQuestion objects
-            questions = []
-            for i, q in enumerate(questions_data):
-                question_id = str(uuid.uuid4())[:8]
-                
-                options = None
-                if q.get("options"):
-                    options = [
-                        QuizOption(id=chr(65 + j), text=opt)
-                        for j, opt in enumerate(q["options"])
-                    ]
-                
-                questions.append(QuizQuestion(
-                    id=question_id,
-                    type=q["type"],
-                    question=q["question"],
-                    options=options,
-                    correct_answer=q["correct_answer"],
-                    explanation=q["explanation"]
-                ))
-            
-            return questions
-            
+        parsed = parse_questions(content)
+    except ValueError:
+        record_llm_model_answer(model, mode, "malformed")
+        raise
+    record_llm_model_answer(model, mode, "partial" if parsed.rejected else "parsed")
+    return parsed.questions
+
+
+_shadow_tasks: Set["asyncio.Task[None]"] = set()
+
+
+def start_shadow(payload: dict) -> None:
+    """Send a copy of a quiz request to the shadow model in the background."""
+    task = asyncio.create_task(run_shadow(payload))
+    _shadow_tasks.add(task)
+    task.add_done_callback(_shadow_tasks.discard)
+
+
+async def run_shadow(payload: dict) -> None:
+    """Run a shadow call once, at background priority; its answer is only measured."""
+    model = payload["model"]
+    with llm_caller(BACKGROUND, ""):
+        try:
+            content = await post_completion(payload, settings.llm_read_timeout, mode=SHADOW)
+        except LLMOverloadedError:
+            return  # shed in favour of live traffic: not the model's fault
+        except Exception:
+            record_llm_model_answer(model, SHADOW, "error")
+            return
+    try:
+        parse_model_answer(content, model, SHADOW)
+    except ValueError:
+        pass
+
+
+async def request_quiz(spec: QuizSpec) -> List[QuizQuestion]:
+    """Generate one quiz with its own (retried, hedged) LLM call."""
+    route = model_router.route(spec.num_questions, spec.difficulty, spec.language)
+    prompt = prompt_registry.quiz(spec.topic, spec.num_questions, spec.difficulty, spec.language)
+    payload = build_completion_payload(prompt, route)
+
+    shadow_model = model_router.shadow_for(route)
+    if shadow_model and llm_breaker.state == CLOSED:
+        start_shadow({**payload, "model": shadow_model})
+
+    async def attempt(timeout: float) -> List[QuizQuestion]:
+        # An answer with no valid question fails the attempt, so it is retried
+        return parse_model_answer(await post_completion(payload, timeout, prompt=prompt), route.model, LIVE)
+
+    try:
+        questions = await llm_calls.call(f"{route.model}:quiz-{spec.num_questions}", attempt)
+        questions = distinct_questions(questions, "quiz")[:spec.num_questions]
+        missing = spec.num_questions - len(questions)
+        if missing:
+            questions += await top_up_quiz(spec, questions, missing)
+        return questions
+    except (LLMOverloadedError, LLMDeadlineExceeded, CircuitOpenError):
+        raise
     except httpx.HTTPStatusError as e:
         raise Exception(f"LLM API error: {e.response.status_code}")
     except json.JSONDecodeError as e:
@@ -130,6 +183,169 @@ Return ONLY the JSON array, no other text."""
         raise Exception(f"Quiz generation failed: {str(e)}")
 
 
+async def top_up_quiz(spec: QuizSpec, questions: List[QuizQuestion], missing: int) -> List[QuizQuestion]:
+    """Generate only the questions a partly valid answer was short of.
+    
+    Best effort, with a single call: if it fails, the quiz is served with
+    the questions it has.
+    """
+    route = model_router.route(missing, spec.difficulty, spec.language)
+    prompt = prompt_registry.top_up(
+        spec.topic, missing, spec.difficulty, spec.language, [question.question for question in questions]
+    )
+    payload = build_completion_payload(prompt, route)
+
+    async def attempt(timeout: float) -> List[QuizQuestion]:
+        return parse_model_answer(await post_completion(payload, timeout, prompt=prompt), route.model, LIVE)
+
+    try:
+        extra = await llm_calls.call(f"{route.model}:quiz-{missing}", attempt, max_attempts=1, hedge=False)
+    except Exception:
+        return []
+    return distinct_questions(questions + extra, "quiz")[len(questions):][:missing]
+
+
+def parse_batch_answer(content: str, specs: List[QuizSpec]) -> List[Optional[List[QuizQuestion]]]:
+    """Split a batched answer into one question list per quiz.
+    
+    Invalid questions are dropped; a quiz whose entry is missing or left
+    short maps to None (and falls back to its own call).
+    Raises: ValueError if the answer holds no JSON object at all.
+    """
+    answer = extract_object(content)
+    
+    quizzes: List[Optional[List[QuizQuestion]]] = []
+    for i, spec in enumerate(specs, start=1):
+        raw = answer.get(str(i))
+        questions = validate_questions(raw).questions if isinstance(raw, list) else []
+        quizzes.append(questions[:spec.num_questions] if len(questions) >= spec.num_questions else None)
+    return quizzes
+
+
+async def request_quiz_batch(specs: List[QuizSpec]) -> List[Optional[List[QuizQuestion]]]:
+    """Generate several quizzes with one LLM call.
+    
+    Not retried or hedged: a failed batch already falls back to one
+    (retried) call per quiz.
+    """
+    prompt = prompt_registry.batch(specs)
+    payload = build_completion_payload(prompt, model_router.route_batch(specs))
+
+    async def attempt(timeout: float) -> List[Optional[List[QuizQuestion]]]:
+        return parse_batch_answer(await post_completion(payload, timeout, prompt=prompt), specs)
+
+    return await llm_calls.call("batch", attempt, max_attempts=1, hedge=False)
+
+
+async def translate_questions(questions: List[QuizQuestion], language: str) -> List[QuizQuestion]:
+    """Translate quiz questions with one short LLM call, keeping their ids.
+    
+    Uses the (cheaper) translation model. Questions whose translation
+    comes back incomplete are left out.
+    Raises: ValueError if none came back translated.
+    """
+    prompt = prompt_registry.translate(translation_items(questions), language)
+    # Translated text runs about as long as its source; leave room for longer scripts
+    route = ModelRoute(settings.translation_model, min(LLM_MAX_TOKENS, 2 * prompt.estimated_tokens))
+    payload = build_completion_payload(prompt, route)
+
+    async def attempt(timeout: float) -> List[QuizQuestion]:
+        translated = merge_translations(
+            questions, extract_array(await post_completion(payload, timeout, prompt=prompt))
+        )
+        if not translated:
+            raise ValueError("No translated question in response")
+        return translated
+
+    return await llm_calls.call(f"{route.model}:translate-{len(questions)}", attempt)
+
+
+model_router = ModelRouter(
+    parse_routes(settings.llm_model_routes),
+    default_model=settings.llm_default_model,
+    tokens_per_question=settings.llm_tokens_per_question,
+    overhead_tokens=settings.llm_tokens_overhead,
+    max_tokens=LLM_MAX_TOKENS,
+    shadow_model=settings.llm_shadow_model,
+    shadow_sample_rate=settings.llm_shadow_sample_rate,
+    learned_tokens_per_question=output_budget.tokens_per_question
+)
+
+
+quiz_batcher = QuizBatcher(
+    request_quiz,
+    request_quiz_batch,
+    max_wait_ms=settings.quiz_batch_max_wait_ms,
+    max_tokens=LLM_MAX_TOKENS,
+    tokens_per_question=settings.quiz_batch_tokens_per_question,
+    min_in_flight=settings.quiz_batch_min_in_flight,
+    enabled=settings.quiz_batch_enabled,
+    group_by=lambda spec: model_router.route(spec.num_questions, spec.difficulty, spec.language).model
+)
+
+
+async def stream_quiz(
+    topic: str,
+    num_questions: int = 5,
+    difficulty: str = "medium",
+    language: str = "en"
+) -> AsyncIterator[QuizQuestion]:
+    """Stream quiz questions from the LLM, yielding each as soon as it closes.
+    
+    Uses the proxy's streaming chat-completions mode (SSE `data:` lines with
+    `choices[0].delta.content`) and feeds the text into an incremental JSON
+    array parser. Objects that fail validation are skipped.
+    """
+    prompt = prompt_registry.quiz(topic, num_questions, difficulty, language)
+    route = model_router.route(num_questions, difficulty, language)
+    parser = JsonArrayStreamParser()
+    answer: List[str] = []
+    
+    try:
+        async with llm_limiter.slot(route.model), llm_breaker.call(), llm_client() as client:
+            async with client.stream(
+                "POST",
+                f"{settings.llm_proxy_url}/v1/chat/completions",
+                headers=llm_headers(),
+                json=build_completion_payload(prompt, route, stream=True)
+            ) as response:
+                response.raise_for_status()
+                started = time.perf_counter()
+                
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    
+                    chunk = json.loads(data)
+                    choices = chunk.get("choices") or [{}]
+                    delta = choices[0].get("delta", {}).get("content")
+                    if not delta:
+                        continue
+                    answer.append(delta)
+                    
+                    for raw in parser.feed(delta):
+                        question = validate_question(raw)
+                        if question is not None:
+                            yield question
+                    
+                    if parser.finished:
+                        break
+        
+        # Streamed answers carry no usage: estimate it
+        seconds = time.perf_counter() - started
+        usage = estimate_usage(prompt.text, "".join(answer))
+        record_llm_model_call(route.model, LIVE, seconds, usage)
+        record_prompt_usage(prompt, route.model, seconds, usage)
+                        
+    except httpx.HTTPStatusError as e:
+        raise Exception(f"LLM API error: {e.response.status_code}")
+    except json.JSONDecodeError as e:
+        raise Exception(f"Failed to parse quiz stream: {str(e)}")
+
+
 def calculate_xp(correct: int, total: int, streak: int, difficulty: str) -> int:
     """Calculate XP earned from a quiz."""
     # Base XP per correct answer
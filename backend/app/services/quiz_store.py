@@ -0,0 +1,150 @@
+"""Server-side store of served quizzes, graded on submit."""
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models import QuizSession
+from app.schemas import QuizQuestion
+
+settings = get_settings()
+
+
+@dataclass(frozen=True)
+class StoredQuiz:
+    """The answer key of a quiz served to a device."""
+    quiz_id: str
+    device_id: str
+    topic: str
+    difficulty: str
+    answer_key: Tuple[Tuple[str, str, str], ...]  # (question_id, correct_answer, explanation)
+
+
+class QuizStore:
+    """Bounded LRU with TTL, backed by the `quiz_sessions` table.
+
+    Only what grading needs is kept: question ids, correct answers and
+    explanations. A quiz is taken out of the store when it is submitted, so
+    it can be graded (and earn XP) once.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: int,
+        persistent: bool = True,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persistent = persistent
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[StoredQuiz, float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        """Drop all in-memory entries."""
+        self._entries.clear()
+
+    def save(
+        self,
+        db: Optional[Session],
+        device_id: str,
+        topic: str,
+        difficulty: str,
+        questions: List[QuizQuestion]
+    ) -> str:
+        """Store a served quiz; returns its quiz id."""
+        questions = [QuizQuestion.model_validate(q) for q in questions]
+        quiz = StoredQuiz(
+            quiz_id=uuid.uuid4().hex,
+            device_id=device_id,
+            topic=topic,
+            difficulty=difficulty,
+            answer_key=tuple((q.id, q.correct_answer, q.explanation) for q in questions)
+        )
+        self._entries[quiz.quiz_id] = (quiz, self._clock() + self.ttl_seconds)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+        if db is not None and self.persistent:
+            db.add(QuizSession(
+                quiz_id=quiz.quiz_id,
+                device_id=device_id,
+                topic=topic,
+                difficulty=difficulty,
+                answer_key=[list(item) for item in quiz.answer_key]
+            ))
+            db.flush()
+            self._prune_db(db)
+            db.commit()
+        return quiz.quiz_id
+
+    def take(self, db: Optional[Session], quiz_id: str, device_id: str) -> Optional[StoredQuiz]:
+        """Remove and return a device's quiz, or None if unknown or expired."""
+        quiz = self._lookup_memory(quiz_id)
+        if quiz is None and db is not None and self.persistent:
+            quiz = self._load_from_db(quiz_id, db)
+        if quiz is None or quiz.device_id != device_id:
+            return None
+
+        self._entries.pop(quiz_id, None)
+        if db is not None and self.persistent:
+            # The row is the source of truth across workers: only the
+            # submit that deletes it gets to grade the quiz
+            deleted = db.query(QuizSession).filter(
+                QuizSession.quiz_id == quiz_id
+            ).delete(synchronize_session=False)
+            db.commit()
+            if not deleted:
+                return None
+        return quiz
+
+    def _lookup_memory(self, quiz_id: str) -> Optional[StoredQuiz]:
+        """Fetch an entry, dropping it if expired."""
+        item = self._entries.get(quiz_id)
+        if item is None:
+            return None
+        quiz, expires_at = item
+        if expires_at <= self._clock():
+            del self._entries[quiz_id]
+            return None
+        return quiz
+
+    def _load_from_db(self, quiz_id: str, db: Session) -> Optional[StoredQuiz]:
+        """Read a quiz saved by another worker, or evicted from memory."""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+        row = db.query(QuizSession).filter(
+            QuizSession.quiz_id == quiz_id,
+            QuizSession.created_at >= cutoff
+        ).first()
+        if row is None:
+            return None
+        return StoredQuiz(
+            quiz_id=row.quiz_id,
+            device_id=row.device_id,
+            topic=row.topic,
+            difficulty=row.difficulty,
+            answer_key=tuple(tuple(item) for item in row.answer_key)
+        )
+
+    def _prune_db(self, db: Session) -> None:
+        """Drop quizzes that were never submitted within the TTL."""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+        db.query(QuizSession).filter(
+            QuizSession.created_at < cutoff
+        ).delete(synchronize_session=False)
+
+
+quiz_store = QuizStore(
+    max_entries=settings.quiz_store_max_entries,
+    ttl_seconds=settings.quiz_store_ttl_seconds,
+    persistent=settings.quiz_store_persistent
+)
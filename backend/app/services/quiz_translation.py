@@ -0,0 +1,244 @@
+"""Serve quizzes in other languages by translating a cached source-language quiz.
+
+A quiz generated in the source language (`translation_source_language`)
+is cached as usual. A request for the same topic, difficulty and size in
+another language can then reuse it: its questions are served translated,
+from stored translations of their question ids when all are on hand,
+otherwise with one short translation call for the missing ones. That is
+cheaper and faster than generating the quiz again.
+
+Translations are stored under the source quiz's cache key, with the
+same lifetime as cached quizzes.
+"""
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models import QuizTranslation
+from app.schemas import QuizOption, QuizQuestion
+from app.services.quiz_cache import quiz_cache, quiz_cache_key
+
+settings = get_settings()
+
+TranslationKey = Tuple[str, str, str]  # (source cache key, question id, language)
+
+
+def translation_source_key(topic: str, difficulty: str, language: str, num_questions: int) -> Optional[str]:
+    """Cache key of the source-language quiz a request could be translated from, or None."""
+    if not settings.translation_enabled or language == settings.translation_source_language:
+        return None
+    return quiz_cache_key(topic, difficulty, settings.translation_source_language, num_questions)
+
+
+def translation_items(questions: Sequence[QuizQuestion]) -> List[dict]:
+    """The text of each question to translate, keyed by its id.
+
+    True/false options and multiple-choice answer letters are not text
+    and are kept from the source.
+    """
+    items = []
+    for question in questions:
+        item: Dict[str, Any] = {"id": question.id, "question": question.question}
+        if question.type == "multiple_choice":
+            item["options"] = [option.text for option in question.options or []]
+        if question.type == "fill_blank":
+            item["answer"] = question.correct_answer
+        item["explanation"] = question.explanation
+        items.append(item)
+    return items
+
+
+def _text(value: Any) -> str:
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError("expected translated text")
+    return value.strip()
+
+
+def translated_question(source: QuizQuestion, item: Any) -> QuizQuestion:
+    """Apply one translated item to its source question.
+
+    Raises: ValueError if the item is not a complete translation.
+    """
+    if not isinstance(item, dict):
+        raise ValueError("translation is not an object")
+    options = source.options
+    if source.type == "multiple_choice":
+        texts = item.get("options")
+        if not isinstance(texts, list) or len(texts) != len(source.options or []):
+            raise ValueError("translated options do not match")
+        options = [QuizOption(id=option.id, text=_text(text)) for option, text in zip(source.options, texts)]
+    return QuizQuestion(
+        id=source.id,
+        type=source.type,
+        question=_text(item.get("question")),
+        options=options,
+        correct_answer=_text(item.get("answer")) if source.type == "fill_blank" else source.correct_answer,
+        explanation=_text(item.get("explanation"))
+    )
+
+
+def merge_translations(questions: Sequence[QuizQuestion], items: List[Any]) -> List[QuizQuestion]:
+    """The questions that came back completely translated, matched by id."""
+    by_id = {item.get("id"): item for item in items if isinstance(item, dict)}
+    translated = []
+    for question in questions:
+        try:
+            translated.append(translated_question(question, by_id.get(question.id)))
+        except ValueError:
+            continue
+    return translated
+
+
+@dataclass
+class TranslationLookup:
+    """A source quiz for a request, and the translations already stored for it."""
+    source_key: str
+    source: List[QuizQuestion]
+    translated: Dict[str, QuizQuestion]
+
+    @property
+    def missing(self) -> List[QuizQuestion]:
+        return [question for question in self.source if question.id not in self.translated]
+
+    def quiz(self) -> List[QuizQuestion]:
+        """The translated quiz, in the source quiz's order (once nothing is missing)."""
+        return [self.translated[question.id] for question in self.source]
+
+
+def _dialect_insert(db: Session, model):
+    """Dialect-specific INSERT supporting ON CONFLICT."""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+
+class TranslationStore:
+    """Bounded LRU of translated questions with TTL and an optional database tier."""
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: int,
+        persistent: bool = True,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persistent = persistent
+        self._clock = clock
+        self._entries: "OrderedDict[TranslationKey, Tuple[dict, float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        """Drop all in-memory entries."""
+        self._entries.clear()
+
+    def lookup(
+        self,
+        source_key: str,
+        question_ids: Sequence[str],
+        language: str,
+        db: Optional[Session] = None
+    ) -> Dict[str, QuizQuestion]:
+        """Stored translations of the given questions, by question id."""
+        found: Dict[str, dict] = {}
+        for question_id in question_ids:
+            payload = self._lookup_memory((source_key, question_id, language))
+            if payload is not None:
+                found[question_id] = payload
+
+        missing = [question_id for question_id in question_ids if question_id not in found]
+        if missing and db is not None and self.persistent:
+            cutoff = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+            rows = db.query(QuizTranslation).filter(
+                QuizTranslation.source_key == source_key,
+                QuizTranslation.language == language,
+                QuizTranslation.question_id.in_(missing),
+                QuizTranslation.created_at >= cutoff
+            ).all()
+            for row in rows:
+                found[row.question_id] = row.question
+                self._remember((source_key, row.question_id, language), row.question)
+
+        return {question_id: QuizQuestion.model_validate(payload) for question_id, payload in found.items()}
+
+    def store(
+        self,
+        source_key: str,
+        questions: Sequence[QuizQuestion],
+        language: str,
+        db: Optional[Session] = None
+    ) -> None:
+        """Store translated questions of the source quiz `source_key`."""
+        if not questions:
+            return
+        payloads = [question.model_dump() for question in questions]
+        for payload in payloads:
+            self._remember((source_key, payload["id"], language), payload)
+
+        if db is not None and self.persistent:
+            # Concurrent translations of one quiz store the same questions: the last one wins
+            insert = _dialect_insert(db, QuizTranslation).values([
+                {"source_key": source_key, "question_id": payload["id"], "language": language, "question": payload}
+                for payload in payloads
+            ])
+            db.execute(insert.on_conflict_do_update(
+                index_elements=["source_key", "language", "question_id"],
+                set_={"question": insert.excluded.question, "created_at": func.now()}
+            ))
+            cutoff = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+            db.query(QuizTranslation).filter(
+                QuizTranslation.created_at < cutoff
+            ).delete(synchronize_session=False)
+            db.commit()
+
+    def _lookup_memory(self, key: TranslationKey) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        payload, expires_at = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return payload
+
+    def _remember(self, key: TranslationKey, payload: dict) -> None:
+        self._entries[key] = (payload, self._clock() + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+def look_up_translation(
+    db: Session,
+    topic: str,
+    difficulty: str,
+    language: str,
+    num_questions: int
+) -> Optional[TranslationLookup]:
+    """The cached source quiz for a request and its stored translations, or None without one."""
+    source_key = translation_source_key(topic, difficulty, language, num_questions)
+    if source_key is None:
+        return None
+    source = quiz_cache.peek(source_key, db)
+    if source is None:
+        return None
+    translated = quiz_translations.lookup(source_key, [question.id for question in source], language, db)
+    return TranslationLookup(source_key, source, translated)
+
+
+quiz_translations = TranslationStore(
+    max_entries=settings.translation_cache_max_entries,
+    ttl_seconds=settings.quiz_cache_ttl_seconds,
+    persistent=settings.quiz_cache_persistent
+)
@@ -0,0 +1,51 @@
+"""Request coalescing (single-flight) for identical concurrent work."""
+import asyncio
+from typing import Awaitable, Callable, Dict, Generic, Tuple, TypeVar
+
+from app.metrics import record_llm_call_coalesced
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+    """Run at most one in-flight call per key; concurrent callers share it.
+
+    The shared call runs in its own task and every caller awaits it through
+    `asyncio.shield`, so a caller that is cancelled (e.g. client disconnect)
+    stops waiting without cancelling the call for everyone else.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, "asyncio.Task[T]"] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """Await the call for `key`, starting it if none is in flight.
+
+        Returns: (result, shared) where shared is False for the caller that
+        started the call and True for callers that joined it.
+        """
+        task = self._calls.get(key)
+        shared = task is not None
+
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            record_llm_call_coalesced()
+
+        return await asyncio.shield(task), shared
+
+    def _forget(self, key: str, task: "asyncio.Task[T]") -> None:
+        """Drop a finished call so the next request starts a fresh one."""
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception retrieved if every waiter went away
+        if not task.cancelled():
+            task.exception()
+
+
+quiz_flights: SingleFlight = SingleFlight()
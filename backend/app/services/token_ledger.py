@@ -0,0 +1,112 @@
+"""Token ledger: atomic reservation and refund of quiz generations."""
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import delete, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.metrics import record_token_consumption, record_free_trial, record_token_refund
+from app.models import GenerationToken, FreeTrialUsage
+
+
+class NoTokensError(Exception):
+    """The device has no paid tokens and has already used its free trial."""
+
+
+@dataclass(frozen=True)
+class Reservation:
+    """A generation reserved for a device."""
+    device_id: str
+    is_free_trial: bool
+    tokens_remaining: int  # paid balance after this reservation
+
+
+def _insert_ignore(db: Session, model):
+    """Dialect-specific INSERT ... ON CONFLICT DO NOTHING."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+
+def reserve_generation(db: Session, device_id: str) -> Reservation:
+    """Reserve one generation, spending a paid token or the free trial.
+
+    Paid tokens are taken with a single conditional
+    `UPDATE ... WHERE tokens_remaining > 0 RETURNING`, and the free trial
+    with `INSERT ... ON CONFLICT DO NOTHING`, so concurrent requests can
+    never spend the same token twice.
+
+    Raises: NoTokensError if nothing is left to spend.
+    """
+    result = db.execute(
+        update(GenerationToken)
+        .where(
+            GenerationToken.device_id == device_id,
+            GenerationToken.tokens_remaining > 0
+        )
+        .values(
+            tokens_remaining=GenerationToken.tokens_remaining - 1,
+            updated_at=datetime.utcnow()
+        )
+        .returning(GenerationToken.tokens_remaining)
+    )
+    remaining = result.scalar_one_or_none()
+    if remaining is not None:
+        db.commit()
+        record_token_consumption()
+        return Reservation(device_id=device_id, is_free_trial=False, tokens_remaining=remaining)
+
+    result = db.execute(
+        _insert_ignore(db, FreeTrialUsage)
+        .values(device_id=device_id, used_at=datetime.utcnow())
+        .on_conflict_do_nothing(index_elements=["device_id"])
+    )
+    db.commit()
+    if result.rowcount == 1:
+        record_free_trial()
+        return Reservation(device_id=device_id, is_free_trial=True, tokens_remaining=0)
+
+    raise NoTokensError(device_id)
+
+
+def grant_tokens(db: Session, device_id: str, tokens: int) -> None:
+    """Add purchased tokens to a device's balance (committed by the caller).
+
+    An atomic increment, so a grant never overwrites a reservation made
+    concurrently.
+    """
+    db.execute(
+        _insert_ignore(db, GenerationToken)
+        .values(device_id=device_id, tokens_remaining=0, tokens_total=0)
+        .on_conflict_do_nothing(index_elements=["device_id"])
+    )
+    db.execute(
+        update(GenerationToken)
+        .where(GenerationToken.device_id == device_id)
+        .values(
+            tokens_remaining=GenerationToken.tokens_remaining + tokens,
+            tokens_total=GenerationToken.tokens_total + tokens,
+            updated_at=datetime.utcnow()
+        )
+    )
+
+
+def refund_generation(db: Session, reservation: Reservation) -> None:
+    """Give back a reservation whose generation failed."""
+    if reservation.is_free_trial:
+        db.execute(
+            delete(FreeTrialUsage).where(FreeTrialUsage.device_id == reservation.device_id)
+        )
+    else:
+        db.execute(
+            update(GenerationToken)
+            .where(GenerationToken.device_id == reservation.device_id)
+            .values(
+                tokens_remaining=GenerationToken.tokens_remaining + 1,
+                updated_at=datetime.utcnow()
+            )
+        )
+    db.commit()
+    record_token_refund()
@@ -0,0 +1,90 @@
+"""SEO topic catalog shared with scripts/generate-seo-pages.js."""
+import re
+import unicodedata
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List
+
+from app.config import get_settings
+
+settings = get_settings()
+
+DEFAULT_CATALOG_PATH = Path(__file__).resolve().parents[3] / "scripts" / "generate-seo-pages.js"
+
+# SEO page levels -> quiz difficulty
+LEVEL_DIFFICULTY = {
+    "beginner": "easy",
+    "intermediate": "medium",
+    "advanced": "hard",
+}
+
+_CATEGORY_LINE = re.compile(r"^\s*([a-z_]+)\s*:\s*\[([^\]]*)\]", re.MULTILINE)
+_QUOTED = re.compile(r"'([^']*)'|\"([^\"]*)\"")
+_LIST_CONST = r"const\s+{name}\s*=\s*\[([^\]]*)\]"
+_NON_SLUG = re.compile(r"[^a-z0-9]+")
+
+
+@dataclass(frozen=True)
+class SeoCatalog:
+    """Topics, levels and languages the SEO landing pages are built from."""
+    categories: Dict[str, List[str]]
+    levels: List[str]
+    languages: List[str]
+
+    @property
+    def slugs(self) -> List[str]:
+        """All topic slugs across categories."""
+        return [slug for topics in self.categories.values() for slug in topics]
+
+    @property
+    def difficulties(self) -> List[str]:
+        """Quiz difficulties covered by the catalog levels."""
+        return [LEVEL_DIFFICULTY[level] for level in self.levels if level in LEVEL_DIFFICULTY]
+
+    def category_of(self, slug: str) -> str:
+        """Catalog category of a slug, or an empty string."""
+        for category, topics in self.categories.items():
+            if slug in topics:
+                return category
+        return ""
+
+
+def topic_slug(topic: str) -> str:
+    """Slugify a topic the way the SEO pages do ("Rest API" -> "rest-api")."""
+    ascii_text = unicodedata.normalize("NFKD", topic).encode("ascii", "ignore").decode()
+    return _NON_SLUG.sub("-", ascii_text.lower()).strip("-")
+
+
+def slug_to_topic(slug: str) -> str:
+    """Human-readable topic for a slug ("rest-api" -> "rest api")."""
+    return slug.replace("-", " ")
+
+
+def _quoted_items(text: str) -> List[str]:
+    return [a or b for a, b in _QUOTED.findall(text)]
+
+
+def parse_seo_catalog(source: str) -> SeoCatalog:
+    """Parse the catalog constants out of generate-seo-pages.js."""
+    categories_block = source[source.index("const categories"):]
+    categories_block = categories_block[:categories_block.index("};")]
+    categories = {
+        name: _quoted_items(items)
+        for name, items in _CATEGORY_LINE.findall(categories_block)
+    }
+
+    def list_const(name: str) -> List[str]:
+        match = re.search(_LIST_CONST.format(name=name), source)
+        return _quoted_items(match.group(1)) if match else []
+
+    return SeoCatalog(categories=categories, levels=list_const("levels"), languages=list_const("languages"))
+
+
+@lru_cache
+def load_seo_catalog(path: str = "") -> SeoCatalog:
+    """Load the SEO catalog; empty if the script is not shipped (e.g. in Docker)."""
+    catalog_path = Path(path or settings.seo_catalog_path or DEFAULT_CATALOG_PATH)
+    if not catalog_path.exists():
+        return SeoCatalog(categories={}, levels=[], languages=[])
+    return parse_seo_catalog(catalog_path.read_text(encoding="utf-8"))
@@ -0,0 +1,200 @@
+"""Canonical topics: fold free-text quiz topics onto topics already known.
+
+"Python", "python basics" and "Learn python!" should share one cached
+quiz. A topic is folded (Unicode, case, punctuation) and stripped of
+filler words at its ends ("learn", "basics", "intro to"...), then
+matched to an SEO catalog topic by slug, or else to a topic seen before
+whose character trigrams are similar enough (MinHash LSH, in process)
+and whose words line up one to one, none negated by a prefix ("organic"
+and "inorganic chemistry" stay apart). A topic matching nothing becomes
+canonical itself.
+
+Topics learned at runtime are per process, so two workers may still
+key a near-miss topic apart until both have seen it.
+"""
+import re
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from app.config import get_settings
+from app.metrics import record_topic_canonicalization
+from app.services.minhash import MinHashIndex, char_shingles
+from app.services.topic_catalog import SeoCatalog, load_seo_catalog, slug_to_topic, topic_slug
+
+settings = get_settings()
+
+# Words that say how, not what, to study, dropped from the start or the end of a topic
+# ("learn python", "python basics"); the rest would change what a topic means
+LEADING_FILLERS = frozenset({
+    "learn", "learning", "study", "studying", "intro", "introduction", "basics", "fundamentals",
+    "essentials", "quiz", "quizzes", "questions", "about", "to", "of", "on", "in", "the", "a", "an",
+})
+TRAILING_FILLERS = frozenset({
+    "basics", "fundamentals", "essentials", "101", "quiz", "quizzes", "questions", "for", "beginners",
+})
+
+# Names whose symbols carry their meaning, spelled out before punctuation is dropped
+# ("C++", "C#" and "C" would all fold to "c")
+SYMBOL_NAMES = {"c++": "cpp", "c#": "csharp", "f#": "fsharp", ".net": "dotnet"}
+
+_SYMBOL_NAME = re.compile(r"(?<!\w)(?:c\+\+|c#|f#)(?![\w+#])|\.net(?!\w)")
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+_WHITESPACE = re.compile(r"\s+")
+_NUMBER = re.compile(r"\d+")
+
+# Prefixes that make a word its opposite, or another subject
+NEGATING_PREFIXES = ("in", "im", "il", "ir", "un", "non", "dis", "anti", "a")
+
+
+def normalize_topic(topic: str) -> str:
+    """Fold a free-text topic into its canonical form for keying."""
+    folded = unicodedata.normalize("NFKC", topic).casefold()
+    folded = _SYMBOL_NAME.sub(lambda match: f" {SYMBOL_NAMES[match.group()]} ", folded)
+    folded = _PUNCTUATION.sub(" ", folded)
+    return _WHITESPACE.sub(" ", folded).strip()
+
+
+def strip_fillers(folded: str) -> str:
+    """Drop filler words from both ends of a folded topic, unless nothing would be left."""
+    words = folded.split(" ")
+    start, end = 0, len(words)
+    while start < end and words[start] in LEADING_FILLERS:
+        start += 1
+    while end > start and words[end - 1] in TRAILING_FILLERS:
+        end -= 1
+    return " ".join(words[start:end]) if start < end else folded
+
+
+def _slug_key(text: str) -> str:
+    """Catalog lookup key: the slug without separators or a final plural "s"."""
+    key = topic_slug(text).replace("-", "")
+    if len(key) > 3 and key.endswith("s") and not key.endswith("ss"):
+        key = key[:-1]
+    return key
+
+
+def same_subject(text: str, known: str) -> bool:
+    """Whether two similar topics can name one subject.
+
+    Numbers must agree ("world war 1" and "world war 2"), both must have
+    as many words (a spelling or plural difference, not an added word),
+    and no word may be another with a negating prefix.
+    """
+    if _NUMBER.findall(text) != _NUMBER.findall(known):
+        return False
+    words, known_words = text.split(" "), known.split(" ")
+    if len(words) != len(known_words):
+        return False
+    return not any(
+        longer == prefix + shorter
+        for a, b in zip(words, known_words)
+        for longer, shorter in ((a, b), (b, a))
+        for prefix in NEGATING_PREFIXES
+    )
+
+
+@dataclass(frozen=True)
+class CanonicalTopic:
+    """A topic's canonical form, its catalog category and how it was found."""
+    topic: str
+    category: str  # SEO catalog category, or ""
+    match: str  # catalog, known, similar or new
+
+
+class TopicIndex:
+    """Map free-text topics to canonical ones (catalog topics first, then topics seen before).
+
+    New topics are learned until `max_topics` are known; resolved topics
+    are remembered, up to `max_resolved`, so a repeat costs one lookup.
+    """
+
+    def __init__(
+        self,
+        catalog: SeoCatalog,
+        threshold: float = 0.7,
+        max_topics: int = 50000,
+        max_resolved: int = 10000
+    ):
+        self.catalog = catalog
+        self.threshold = threshold
+        self.max_topics = max_topics
+        self.max_resolved = max_resolved
+        self._slugs = {_slug_key(slug): slug for slug in catalog.slugs}
+        self._catalog_topics: Dict[str, str] = {}  # topic -> category
+        self._catalog_index: MinHashIndex[str] = MinHashIndex()
+        for category, slugs in catalog.categories.items():
+            for slug in slugs:
+                self._catalog_topics[slug_to_topic(slug)] = category
+                self._catalog_index.add(slug_to_topic(slug), char_shingles(slug_to_topic(slug)))
+        self._learned: MinHashIndex[str] = MinHashIndex()
+        self._resolved: "OrderedDict[str, CanonicalTopic]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._catalog_index) + len(self._learned)
+
+    def reset(self) -> None:
+        """Forget topics learned at runtime, keeping the catalog."""
+        self._learned.clear()
+        self._resolved.clear()
+
+    def canonicalize(self, topic: str) -> CanonicalTopic:
+        """The canonical topic for a free-text topic, learning it if it is new."""
+        found = self._resolved.get(topic)
+        if found is not None:
+            self._resolved.move_to_end(topic)
+            return found
+
+        found = self._resolve(normalize_topic(topic))
+        record_topic_canonicalization(found.match)
+        self._resolved[topic] = found
+        if len(self._resolved) > self.max_resolved:
+            self._resolved.popitem(last=False)
+        return found
+
+    def _resolve(self, folded: str) -> CanonicalTopic:
+        text = strip_fillers(folded)
+        slug = self._slugs.get(_slug_key(folded)) or self._slugs.get(_slug_key(text))
+        if slug is not None:
+            return CanonicalTopic(slug_to_topic(slug), self.catalog.category_of(slug), "catalog")
+        if text in self._learned:
+            return CanonicalTopic(text, "", "known")
+
+        # The most similar known topic on the same subject, catalog topics winning ties
+        features = char_shingles(text)
+        best: Optional[CanonicalTopic] = None
+        best_score = 0.0
+        for index in (self._catalog_index, self._learned):
+            for known, score in index.query(features, self.threshold):
+                if score > best_score and same_subject(text, known):
+                    best = CanonicalTopic(known, self._catalog_topics.get(known, ""), "similar")
+                    best_score = score
+                    break
+        if best is not None:
+            return best
+
+        if text and len(self) < self.max_topics:
+            self._learned.add(text, features)
+        return CanonicalTopic(text, "", "new")
+
+
+def canonical_topic(topic: str) -> str:
+    """The canonical form of a topic, for keying cached quizzes and banked questions."""
+    if not settings.topic_canonicalization_enabled:
+        return normalize_topic(topic)
+    return topic_index.canonicalize(topic).topic
+
+
+def topic_category(topic: str) -> Optional[str]:
+    """The SEO catalog category of a topic, or None if it has none."""
+    if not settings.topic_canonicalization_enabled:
+        return None
+    return topic_index.canonicalize(topic).category or None
+
+
+topic_index = TopicIndex(
+    load_seo_catalog(),
+    threshold=settings.topic_similarity_threshold,
+    max_topics=settings.topic_index_max_topics
+)
@@ -0,0 +1,213 @@
+"""Warm pool of ready-to-serve quizzes for the hottest request keys."""
+import asyncio
+import heapq
+import logging
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from app.config import get_settings
+from app.metrics import record_warm_pool_take, record_warm_pool_state
+from app.schemas import QuizQuestion
+from app.services.quiz_cache import quiz_cache_key
+from app.services.quiz_service import generate_quiz
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class _PoolEntry:
+    """Ready quizzes and outstanding refills for one hot key."""
+    __slots__ = ("topic", "difficulty", "language", "num_questions", "ready", "refills")
+
+    def __init__(self, topic: str, difficulty: str, language: str, num_questions: int):
+        self.topic = topic
+        self.difficulty = difficulty
+        self.language = language
+        self.num_questions = num_questions
+        self.ready: Deque[Tuple[float, List[QuizQuestion]]] = deque()
+        self.refills: Deque[float] = deque()  # enqueue time of each outstanding refill
+
+
+class WarmPool:
+    """Keep `depth` unused quizzes ready for each of the hottest keys.
+
+    Request traffic is counted with exponential decay; the `hot_keys`
+    highest-scoring keys (decayed count of at least `min_hits`) get a pool.
+    Serving a quiz schedules a refill, and a fixed number of background
+    workers perform refills, which caps concurrent LLM calls.
+    """
+
+    def __init__(
+        self,
+        depth: int,
+        hot_keys: int,
+        workers: int,
+        max_age_seconds: float,
+        half_life_seconds: float = 600.0,
+        min_hits: float = 1.5,  # decayed request count; two quick requests qualify
+        enabled: bool = True,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.depth = depth
+        self.hot_keys = hot_keys
+        self.workers = workers
+        self.max_age_seconds = max_age_seconds
+        self.half_life_seconds = half_life_seconds
+        self.min_hits = min_hits
+        self.enabled = enabled
+        self._clock = clock
+        self._scores: Dict[str, Tuple[float, float]] = {}  # key -> (score, updated_at)
+        self._hot: Set[str] = set()
+        self._entries: Dict[str, _PoolEntry] = {}
+        self._queue: Optional["asyncio.Queue[str]"] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self) -> None:
+        """Start the background refill workers."""
+        if not self.enabled or self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(max(1, self.workers))]
+        # Keys that became hot before the workers existed
+        for key in self._entries:
+            self._schedule(key)
+
+    async def stop(self) -> None:
+        """Cancel the refill workers."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    def clear(self) -> None:
+        """Forget all traffic and pooled quizzes."""
+        self._scores.clear()
+        self._hot.clear()
+        self._entries.clear()
+        self._update_gauges()
+
+    def observe(self, topic: str, difficulty: str, language: str, num_questions: int) -> None:
+        """Count one request for a key and refresh the hot set."""
+        if not self.enabled:
+            return
+
+        key = quiz_cache_key(topic, difficulty, language, num_questions)
+        now = self._clock()
+        score, updated_at = self._scores.get(key, (0.0, now))
+        self._scores[key] = (self._decay(score, now - updated_at) + 1.0, now)
+
+        # Bound tracking memory to a multiple of the hot set
+        if len(self._scores) > self.hot_keys * 10:
+            coldest = min(self._scores, key=lambda k: self._current_score(k, now))
+            del self._scores[coldest]
+
+        self._refresh_hot(now)
+        if key in self._hot and key not in self._entries:
+            self._entries[key] = _PoolEntry(topic, difficulty, language, num_questions)
+            self._schedule(key)
+
+    def take(self, topic: str, difficulty: str, language: str, num_questions: int) -> Optional[List[QuizQuestion]]:
+        """Pop a ready quiz for the key, scheduling a refill; None if empty."""
+        if not self.enabled:
+            return None
+
+        key = quiz_cache_key(topic, difficulty, language, num_questions)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        self._drop_stale(entry)
+        quiz = entry.ready.popleft()[1] if entry.ready else None
+        record_warm_pool_take(hit=quiz is not None)
+        self._schedule(key)
+        return quiz
+
+    def depth_of(self, topic: str, difficulty: str, language: str, num_questions: int) -> int:
+        """Ready quizzes for a key."""
+        entry = self._entries.get(quiz_cache_key(topic, difficulty, language, num_questions))
+        return len(entry.ready) if entry else 0
+
+    def _decay(self, score: float, elapsed: float) -> float:
+        return score * 0.5 ** (elapsed / self.half_life_seconds)
+
+    def _current_score(self, key: str, now: float) -> float:
+        score, updated_at = self._scores[key]
+        return self._decay(score, now - updated_at)
+
+    def _refresh_hot(self, now: float) -> None:
+        """Recompute the hot set and release pools of keys that cooled down."""
+        candidates = [k for k in self._scores if self._current_score(k, now) >= self.min_hits]
+        self._hot = set(heapq.nlargest(self.hot_keys, candidates, key=lambda k: self._current_score(k, now)))
+        for key in [k for k in self._entries if k not in self._hot]:
+            del self._entries[key]
+        self._update_gauges()
+
+    def _drop_stale(self, entry: _PoolEntry) -> None:
+        cutoff = self._clock() - self.max_age_seconds
+        while entry.ready and entry.ready[0][0] < cutoff:
+            entry.ready.popleft()
+
+    def _schedule(self, key: str) -> None:
+        """Queue refills so ready + outstanding reaches the target depth."""
+        entry = self._entries.get(key)
+        if entry is None or self._queue is None:
+            return
+        now = self._clock()
+        while len(entry.ready) + len(entry.refills) < self.depth:
+            entry.refills.append(now)
+            self._queue.put_nowait(key)
+        self._update_gauges()
+
+    async def _worker(self) -> None:
+        """Perform queued refills one at a time."""
+        while True:
+            key = await self._queue.get()
+            entry = self._entries.get(key)
+            if entry is None:
+                continue
+            try:
+                questions = await generate_quiz(
+                    topic=entry.topic,
+                    num_questions=entry.num_questions,
+                    difficulty=entry.difficulty,
+                    language=entry.language
+                )
+                if entry.refills:
+                    entry.refills.popleft()
+                # The key may have cooled down while generating
+                if self._entries.get(key) is entry:
+                    entry.ready.append((self._clock(), questions))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if entry.refills:
+                    entry.refills.popleft()
+                logger.warning("Warm pool refill failed: %s", e)
+            finally:
+                self._update_gauges()
+
+    def _update_gauges(self) -> None:
+        now = self._clock()
+        ready = [ts for entry in self._entries.values() for ts, _ in entry.ready]
+        refills = [ts for entry in self._entries.values() for ts in entry.refills]
+        record_warm_pool_state(
+            keys=len(self._entries),
+            depth=len(ready),
+            refill_lag=now - min(refills) if refills else 0.0,
+            staleness=now - min(ready) if ready else 0.0
+        )
+
+
+warm_pool = WarmPool(
+    depth=settings.warm_pool_depth,
+    hot_keys=settings.warm_pool_hot_keys,
+    workers=settings.warm_pool_llm_concurrency,
+    max_age_seconds=settings.warm_pool_max_age_seconds,
+    enabled=settings.warm_pool_enabled
+)
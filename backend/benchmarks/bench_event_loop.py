@@ -0,0 +1,216 @@
+"""Benchmark event-loop lag and throughput of /progress under LLM and write load.
+
+Serves the app with uvicorn in a background thread and fires concurrent
+`/progress` calls at it while generate requests are blocked on (stubbed)
+LLM calls and a background writer keeps taking the SQLite write lock, as
+concurrent quiz submissions do. Runs once through a replica of the old
+synchronous-Session handler and once through the async handler, and
+reports /progress throughput and the server's event-loop lag (how late a
+5 ms timer fires on the server loop) for each.
+
+Usage (from backend/):
+    python -m benchmarks.bench_event_loop --progress-calls 200 --llm-calls 50
+    python -m benchmarks.bench_event_loop --lock-ms 0   # no write contention
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+
+import httpx
+import uvicorn
+from fastapi import Depends
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.database import Base, get_db, get_async_db, async_database_url, async_engine_options
+from app.main import app
+from app.models import UserProgress
+from app.schemas import QuizQuestion
+
+DEVICES = 1000
+
+
+def setup_database() -> str:
+    """Point the app at a seeded temp database; returns its path."""
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    url = f"sqlite:///{path}"
+    engine = create_engine(url, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    SyncSession = sessionmaker(bind=engine)
+    with SyncSession() as db:
+        db.add_all(
+            UserProgress(device_id=f"device-{i}", xp=i, level=1, total_questions=10,
+                         correct_answers=5, current_streak=0, best_streak=0, achievements=[])
+            for i in range(DEVICES)
+        )
+        db.commit()
+
+    async_engine = create_async_engine(async_database_url(url), **async_engine_options(url))
+    AsyncSession = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    def sync_db():
+        db = SyncSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def async_db():
+        async with AsyncSession() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = sync_db
+    app.dependency_overrides[get_async_db] = async_db
+    return path
+
+
+@app.get("/bench/progress-sync")
+async def progress_sync(device_id: str, db: Session = Depends(get_db)):
+    """The pre-async handler: blocking query inside an async route."""
+    progress = db.query(UserProgress).filter(UserProgress.device_id == device_id).first()
+    # Release the connection here: a blocked loop never reaches the dependency
+    # teardown, and pool checkouts would otherwise deadlock past pool_size
+    db.close()
+    return {"xp": progress.xp if progress else 0}
+
+
+def hold_write_lock(path: str, lock_ms: float, stop: threading.Event) -> None:
+    """Repeatedly hold the exclusive lock for `lock_ms`, like a slow write commit."""
+    conn = sqlite3.connect(path, isolation_level=None, timeout=30)
+    while not stop.is_set():
+        conn.execute("BEGIN EXCLUSIVE")
+        conn.execute("UPDATE user_progress SET xp = xp + 1 WHERE device_id = 'device-0'")
+        time.sleep(lock_ms / 1000)
+        conn.execute("COMMIT")
+        time.sleep(lock_ms / 1000)
+    conn.close()
+
+
+async def measure_lag(stop: asyncio.Event, samples: list, interval: float = 0.005):
+    """Record how late a periodic timer fires."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append((time.perf_counter() - start - interval) * 1000)
+
+
+def start_server():
+    """Serve the app from a background thread; returns (base URL, server loop)."""
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+
+    config = uvicorn.Config(
+        app, host="127.0.0.1", port=port, log_level="warning", lifespan="off", timeout_keep_alive=120
+    )
+    server = uvicorn.Server(config)
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_until_complete, args=(server.serve(),), daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}", loop
+
+
+class LLMStub:
+    """Stand-in for generate_quiz that counts calls in flight."""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.started = 0
+
+    async def __call__(self, **kwargs):
+        self.started += 1
+        await asyncio.sleep(self.seconds)
+        return [QuizQuestion(id="q1", type="fill_blank", question="Q?", correct_answer="a", explanation="e")]
+
+
+async def run_mode(client: httpx.AsyncClient, server_loop, mode: str, args, llm: LLMStub) -> dict:
+    """Run one scenario and collect metrics."""
+    llm.started = 0
+    generates = [
+        asyncio.create_task(client.post(
+            "/api/v1/quiz/generate",
+            json={"topic": f"{mode} topic {i}", "num_questions": 1},
+            headers={"X-Device-Id": f"{mode}-llm-{i}"}
+        ))
+        for i in range(args.llm_calls)
+    ]
+    while llm.started < args.llm_calls:  # token reservations are done; only LLM waits remain
+        if any(task.done() for task in generates):
+            raise RuntimeError(f"generate failed: {next(t for t in generates if t.done()).result().text}")
+        await asyncio.sleep(0.01)
+
+    stop_writer = threading.Event()
+    writer = threading.Thread(target=hold_write_lock, args=(args.db_path, args.lock_ms, stop_writer))
+    if args.lock_ms > 0:
+        writer.start()
+
+    def progress(i):
+        device = f"device-{i % DEVICES}"
+        if mode == "sync":
+            return client.get("/bench/progress-sync", params={"device_id": device})
+        return client.get("/api/v1/progress", headers={"X-Device-Id": device})
+
+    # Warm-up burst: open the client's keep-alive connections and the DB pool
+    await asyncio.gather(*(progress(i) for i in range(args.progress_calls)))
+
+    stop = asyncio.Event()
+    lag = []
+    sampler = asyncio.run_coroutine_threadsafe(measure_lag(stop, lag), server_loop)
+
+    start = time.perf_counter()
+    responses = await asyncio.gather(*(progress(i) for i in range(args.progress_calls)))
+    elapsed = time.perf_counter() - start
+
+    server_loop.call_soon_threadsafe(stop.set)
+    await asyncio.wrap_future(sampler)
+    stop_writer.set()
+    if writer.is_alive():
+        writer.join()
+    await asyncio.gather(*generates)
+
+    assert all(r.status_code == 200 for r in responses)
+    lag.sort()
+    return {
+        "rps": args.progress_calls / elapsed,
+        "lag_p50": statistics.median(lag),
+        "lag_p99": lag[int(len(lag) * 0.99)],
+        "lag_max": lag[-1],
+    }
+
+
+async def main(args):
+    args.db_path = setup_database()
+    base_url, server_loop = start_server()
+    llm = LLMStub(args.llm_seconds)
+
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    with patch("app.api.quiz.generate_quiz", llm):
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+            results = {
+                mode: await run_mode(client, server_loop, mode, args, llm)
+                for mode in ("sync", "async")
+            }
+
+    print(f"write lock held {args.lock_ms:g} ms of every {2 * args.lock_ms:g} ms")
+    print(f"{'handler':<8} {'progress rps':>13} {'lag p50 ms':>11} {'lag p99 ms':>11} {'lag max ms':>11}")
+    for mode, r in results.items():
+        print(f"{mode:<8} {r['rps']:>13.1f} {r['lag_p50']:>11.2f} {r['lag_p99']:>11.2f} {r['lag_max']:>11.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--progress-calls", type=int, default=200)
+    parser.add_argument("--llm-calls", type=int, default=50)
+    parser.add_argument("--llm-seconds", type=float, default=10.0)
+    parser.add_argument("--lock-ms", type=float, default=5.0, help="write-lock hold time (0 disables)")
+    asyncio.run(main(parser.parse_args()))
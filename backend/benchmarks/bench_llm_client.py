@@ -0,0 +1,73 @@
+"""Benchmark generate_quiz latency with per-call vs pooled LLM clients.
+
+Starts the local LLM stand-in and measures p50/p99 latency of
+`generate_quiz` when every call opens its own `httpx.AsyncClient` versus
+reusing the app-lifetime pooled client.
+
+Usage (from backend/):
+    python -m benchmarks.bench_llm_client --requests 500 --concurrency 20
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from app.services import http_clients, quiz_service
+from benchmarks.llm_standin import StandInConfig, StandInServer
+
+
+def percentile(samples: list, pct: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run(requests: int, concurrency: int) -> list:
+    """Fire `requests` generate_quiz calls with bounded concurrency."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await quiz_service.generate_quiz("Math", 1, "easy", "en")
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return latencies
+
+
+async def main(args):
+    standin = None
+    if not args.url:
+        standin = StandInServer(StandInConfig(latency=f"fixed:{args.latency_ms}")).start()
+    quiz_service.settings.llm_proxy_url = args.url or standin.url
+    quiz_service.settings.llm_proxy_key = quiz_service.settings.llm_proxy_key or "bench"
+
+    # Per-call client: no shared pool is open, so each call opens its own
+    per_call = await run(args.requests, args.concurrency)
+
+    await http_clients.start_http_clients()
+    try:
+        pooled = await run(args.requests, args.concurrency)
+    finally:
+        await http_clients.close_http_clients()
+        if standin is not None:
+            standin.stop()
+
+    print(f"{'mode':<10} {'p50 ms':>8} {'p99 ms':>8} {'mean ms':>8}")
+    for name, samples in (("per-call", per_call), ("pooled", pooled)):
+        print(
+            f"{name:<10} {percentile(samples, 50):>8.2f} {percentile(samples, 99):>8.2f} "
+            f"{statistics.mean(samples):>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="stand-in response delay")
+    parser.add_argument("--url", help="benchmark against this LLM proxy instead of the stand-in")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,123 @@
+"""Benchmark the per-request overhead of the metrics middleware.
+
+Drives a minimal FastAPI app directly through ASGI (no server, no sockets)
+with no middleware, with a replica of the old `@app.middleware("http")`
+metrics function, and with the pure ASGI MetricsMiddleware, and reports
+the mean time per request and the overhead over the bare app.
+
+Usage (from backend/):
+    python -m benchmarks.bench_metrics_middleware --requests 20000
+"""
+import argparse
+import asyncio
+import time
+
+from fastapi import FastAPI, Request
+
+from app.metrics import http_requests_total, http_request_duration_seconds, crawler_visits_total
+from app.middleware import BOT_PATTERNS, MetricsMiddleware
+
+USER_AGENT = b"Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/120.0 Safari/537.36"
+
+
+def make_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    return app
+
+
+def with_old_middleware() -> FastAPI:
+    """The pre-ASGI metrics middleware, as it was in app/main.py."""
+    app = make_app()
+
+    @app.middleware("http")
+    async def metrics_middleware(request: Request, call_next):
+        start_time = time.time()
+        user_agent = request.headers.get("user-agent", "")
+        for bot in BOT_PATTERNS:
+            if bot.lower() in user_agent.lower():
+                crawler_visits_total.labels(tool="bench", bot=bot).inc()
+                break
+        response = await call_next(request)
+        duration = time.time() - start_time
+        http_requests_total.labels(
+            tool="bench", endpoint=request.url.path, method=request.method, status=response.status_code
+        ).inc()
+        http_request_duration_seconds.labels(
+            tool="bench", endpoint=request.url.path, method=request.method
+        ).observe(duration)
+        return response
+
+    return app
+
+
+def with_asgi_middleware():
+    return MetricsMiddleware(make_app())
+
+
+async def drive(app, n: int) -> float:
+    """Send n GET /health requests through the ASGI app; returns µs per request."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/health", "raw_path": b"/health", "root_path": "",
+        "query_string": b"", "headers": [(b"host", b"bench"), (b"user-agent", USER_AGENT)],
+        "client": ("127.0.0.1", 1234), "server": ("bench", 80),
+    }
+
+    never = asyncio.Event()
+
+    def receiver():
+        sent = False
+
+        async def receive():
+            nonlocal sent
+            if sent:  # like a server: block until the client disconnects
+                await never.wait()
+            sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        return receive
+
+    async def send(message):
+        pass
+
+    for _ in range(min(n, 500)):  # warm-up
+        await app(dict(scope), receiver(), send)
+    start = time.perf_counter()
+    for _ in range(n):
+        await app(dict(scope), receiver(), send)
+    return (time.perf_counter() - start) / n * 1e6
+
+
+async def measure(requests: int, rounds: int) -> dict:
+    """µs per request for each variant, best of `rounds` interleaved rounds."""
+    variants = {
+        "none": make_app(),
+        "old": with_old_middleware(),
+        "asgi": with_asgi_middleware(),
+    }
+    results = {}
+    for _ in range(rounds):
+        for name, app in variants.items():
+            us = await drive(app, requests)
+            results[name] = min(results.get(name, us), us)
+    return results
+
+
+async def main(args):
+    results = await measure(args.requests, args.rounds)
+
+    print(f"{'middleware':<11} {'µs/request':>11} {'overhead µs':>12}")
+    for name, us in results.items():
+        print(f"{name:<11} {us:>11.1f} {us - results['none']:>12.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=3)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,109 @@
+"""Benchmark parsing LLM quiz answers: the old slice-and-load parser vs quiz_parser.
+
+Runs both over a corpus of LLM answers (benchmarks/data/llm_outputs.jsonl:
+clean answers plus the faults models produce - code fences, prose,
+trailing commas, truncation, missing fields, bad answers). Reports how
+many questions each recovers and µs per answer.
+
+Usage (from backend/):
+    python -m benchmarks.bench_quiz_parser --number 2000
+"""
+import argparse
+import json
+import timeit
+import uuid
+from pathlib import Path
+from typing import List
+
+from app.schemas import QuizOption, QuizQuestion
+from app.services.quiz_batcher import QuizSpec
+from app.services.quiz_parser import parse_questions
+from app.services.quiz_service import parse_batch_answer
+
+CORPUS = Path(__file__).parent / "data" / "llm_outputs.jsonl"
+
+
+def load_corpus(path: Path = CORPUS) -> List[dict]:
+    with path.open(encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def old_parse(content: str) -> List[QuizQuestion]:
+    """The parser quiz_parser replaced: all or nothing."""
+    start = content.find('[')
+    end = content.rfind(']') + 1
+    if start == -1 or end == 0:
+        raise ValueError("No JSON array found in response")
+    questions = []
+    for q in json.loads(content[start:end]):
+        options = None
+        if q.get("options"):
+            options = [QuizOption(id=chr(65 + j), text=opt) for j, opt in enumerate(q["options"])]
+        questions.append(QuizQuestion(
+            id=str(uuid.uuid4())[:8], type=q["type"], question=q["question"], options=options,
+            correct_answer=q["correct_answer"], explanation=q["explanation"]
+        ))
+    return questions
+
+
+def old_parse_batch(content: str, specs: List[QuizSpec]) -> list:
+    start = content.find('{')
+    end = content.rfind('}') + 1
+    if start == -1 or end == 0:
+        raise ValueError("No JSON object found in response")
+    answer = json.loads(content[start:end])
+    quizzes = []
+    for i, spec in enumerate(specs, start=1):
+        try:
+            quizzes.append(old_parse(json.dumps(answer[str(i)][:spec.num_questions])))
+        except (KeyError, TypeError, ValueError):
+            quizzes.append(None)
+    return quizzes
+
+
+def recovered(record: dict, single, batch) -> int:
+    """Questions a parser recovers from one answer (0 if it fails)."""
+    try:
+        if record["kind"] == "batch":
+            specs = [QuizSpec("t", n, "medium", "en") for n in record["quizzes"]]
+            return sum(len(quiz) for quiz in batch(record["content"], specs) if quiz)
+        return min(len(single(record["content"])), record["num_questions"])
+    except (ValueError, KeyError, TypeError):
+        return 0
+
+
+def asked(record: dict) -> int:
+    return sum(record["quizzes"]) if record["kind"] == "batch" else record["num_questions"]
+
+
+def main(args):
+    corpus = load_corpus()
+    parsers = {
+        "old": (old_parse, old_parse_batch),
+        "quiz_parser": (lambda content: parse_questions(content).questions, parse_batch_answer),
+    }
+
+    print(f"{'answer':<24} {'asked':>5} {'old':>5} {'new':>5}")
+    for record in corpus:
+        counts = [recovered(record, *parsers[name]) for name in parsers]
+        print(f"{record['name']:<24} {asked(record):>5} {counts[0]:>5} {counts[1]:>5}")
+
+    total = sum(asked(record) for record in corpus)
+    print(f"\n{'parser':<12} {'questions':>10} {'answers used':>13} {'µs/answer':>10}")
+    for name, (single, batch) in parsers.items():
+        counts = [recovered(record, single, batch) for record in corpus]
+
+        def run():
+            for record in corpus:
+                recovered(record, single, batch)
+
+        best = min(timeit.repeat(run, number=args.number // len(corpus), repeat=5))
+        us = best / (args.number // len(corpus) * len(corpus)) * 1e6
+        used = sum(count > 0 for count in counts)
+        print(f"{name:<12} {sum(counts):>4}/{total:<5} {used:>6}/{len(corpus):<6} {us:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=2000, help="answers parsed per run")
+    main(parser.parse_args())
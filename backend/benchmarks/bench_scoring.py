@@ -0,0 +1,51 @@
+"""Microbenchmark the scoring helpers run on every quiz submission.
+
+Times `calculate_xp`, `calculate_level` and `check_achievements` over a
+fixed set of inputs covering their branches, and reports ns per call.
+
+Usage (from backend/):
+    python -m benchmarks.bench_scoring --number 200000
+"""
+import argparse
+import timeit
+
+from app.services.quiz_service import calculate_xp, calculate_level, check_achievements
+
+XP_CASES = [(5, 5, 0, "easy"), (3, 5, 4, "medium"), (10, 10, 12, "hard"), (0, 5, 0, "unknown")]
+LEVEL_CASES = [0, 99, 250, 1999, 31999, 50000]
+ACHIEVEMENT_CASES = [
+    (5, 40, 1, 2, False, []),
+    (120, 1500, 5, 11, True, ["first_quiz"]),
+    (500, 40000, 11, 30, True, ["first_quiz", "perfect_score", "streak_5", "streak_10",
+                                "level_5", "level_10", "hundred_questions", "thousand_xp"]),
+]
+
+
+def measure(number: int, repeat: int = 5) -> dict:
+    """ns per call for each helper, best of `repeat` runs."""
+    benchmarks = {
+        "calculate_xp": (calculate_xp, XP_CASES),
+        "calculate_level": (calculate_level, [(xp,) for xp in LEVEL_CASES]),
+        "check_achievements": (check_achievements, ACHIEVEMENT_CASES),
+    }
+    results = {}
+    for name, (fn, cases) in benchmarks.items():
+        def run():
+            for case in cases:
+                fn(*case)
+
+        best = min(timeit.repeat(run, number=number // len(cases), repeat=repeat))
+        results[name] = best / (number // len(cases) * len(cases)) * 1e9
+    return results
+
+
+def main(args):
+    print(f"{'function':<20} {'ns/call':>9}")
+    for name, ns in measure(args.number).items():
+        print(f"{name:<20} {ns:>9.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=200000, help="calls per function and run")
+    main(parser.parse_args())
@@ -0,0 +1,370 @@
+"""Local OpenAI-compatible stand-in for the LLM proxy.
+
+Answers `/v1/chat/completions` with quiz JSON in the shape the quiz
+prompts ask for (a question array for single prompts, an object keyed by
+quiz number for batched ones), streamed as SSE chunks when the request
+sets `stream`. Latency, server errors, rate-limit 429s and malformed
+answers can be injected, so the backend can be load-tested offline.
+
+Latency specs (milliseconds): `fixed:800`, `uniform:300:1500`,
+`lognormal:800:0.5` (median, sigma) or `exponential:800` (mean).
+`--model-latency` overrides it per requested model, e.g.
+`claude-3-5-haiku-20241022=lognormal:300:0.4`.
+
+Usage (from backend/):
+    python -m benchmarks.llm_standin --port 8001 --latency lognormal:800:0.5 \\
+        --error-rate 0.01 --rate-limit-rate 0.02 --malformed-rate 0.01
+    LLM_PROXY_URL=http://127.0.0.1:8001 uvicorn app.main:app
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import socket
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+SINGLE_PROMPT = re.compile(r'Generate exactly (\d+) quiz questions about "(.*)" at (\w+) difficulty')
+EXISTING_QUESTIONS = re.compile(r"existing questions:\n((?:- .*\n?)*)")  # listed in top-up prompts
+BATCH_ITEM = re.compile(r'^(\d+)\. "(.*)": exactly (\d+) questions', re.MULTILINE)
+TRANSLATE_PROMPT = re.compile(r"^Translate these quiz questions into (.+)\.$", re.MULTILINE)
+MALFORMED_MODES = ("truncated", "prose", "missing_field", "short")
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """Build a sampler (seconds) from a latency spec like `lognormal:800:0.5`."""
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(":") if v]
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0] / 1000
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == "lognormal" and len(values) == 2:
+        median, sigma = values
+        return lambda rng: median * rng.lognormvariate(0, sigma) / 1000
+    if kind == "exponential" and len(values) == 1:
+        return lambda rng: rng.expovariate(1 / values[0]) / 1000
+    raise ValueError(f"Unknown latency spec: {spec!r}")
+
+
+@dataclass
+class StandInConfig:
+    """Behaviour of the stand-in."""
+    latency: str = "fixed:0"  # time to the full answer (or to the first streamed chunk)
+    model_latency: str = ""  # per-model overrides: "model=spec,model=spec"
+    chunk_chars: int = 40  # streamed content per SSE chunk
+    chunk_delay_ms: float = 0.0  # delay between streamed chunks
+    error_rate: float = 0.0  # share of requests answered with a 500
+    rate_limit_rate: float = 0.0  # share of requests answered with a 429
+    max_concurrency: int = 0  # 429 beyond this many requests in flight (0: unlimited)
+    retry_after_seconds: int = 1
+    malformed_rate: float = 0.0  # share of answers with broken quiz JSON
+    malformed_mode: str = ""  # one of MALFORMED_MODES (default: a random one each time)
+    seed: Optional[int] = None
+
+
+@dataclass
+class StandInStats:
+    """Counters exposed at `/stats`."""
+    requests: int = 0
+    ok: int = 0
+    streamed: int = 0
+    errors: int = 0
+    rate_limited: int = 0
+    malformed: int = 0
+    batched: int = 0
+    in_flight: int = 0
+    models: Dict[str, int] = field(default_factory=dict)  # requests per model
+    latencies_ms: List[float] = field(default_factory=list)
+
+    def summary(self) -> Dict:
+        return {key: value for key, value in self.__dict__.items() if key != "latencies_ms"}
+
+
+def make_question(topic: str, index: int) -> Dict:
+    """One question in the prompt's format, cycling through the three types."""
+    kind = index % 3
+    if kind == 0:
+        return {
+            "type": "multiple_choice",
+            "question": f"Which statement about {topic} is correct? ({index + 1})",
+            "options": [f"{topic} option {letter}" for letter in "ABCD"],
+            "correct_answer": "B",
+            "explanation": f"Option B is the accurate statement about {topic}."
+        }
+    if kind == 1:
+        return {
+            "type": "true_false",
+            "question": f"{topic} statement {index + 1} is true?",
+            "options": ["True", "False"],
+            "correct_answer": "True",
+            "explanation": f"The statement about {topic} holds."
+        }
+    return {
+        "type": "fill_blank",
+        "question": f"Complete the sentence about {topic}: ___ ({index + 1})",
+        "options": None,
+        "correct_answer": "answer",
+        "explanation": "The missing word is 'answer'."
+    }
+
+
+def translate_items(prompt: str, language: str) -> str:
+    """Answer a translation prompt: its items with each text tagged by the language."""
+    items = json.loads(prompt[prompt.index("\n[") + 1:prompt.rindex("]") + 1])
+    for item in items:
+        for field in ("question", "answer", "explanation"):
+            if field in item:
+                item[field] = f"[{language}] {item[field]}"
+        if "options" in item:
+            item["options"] = [f"[{language}] {option}" for option in item["options"]]
+    return json.dumps(items, ensure_ascii=False, indent=2)
+
+
+def answer_prompt(prompt: str) -> tuple:
+    """Quiz JSON for a prompt; returns (content, batched)."""
+    translation = TRANSLATE_PROMPT.search(prompt)
+    if translation:
+        return translate_items(prompt, translation.group(1)), False
+    items = BATCH_ITEM.findall(prompt)
+    if items:
+        answer = {
+            number: [make_question(topic, i) for i in range(int(count))]
+            for number, topic, count in items
+        }
+        return json.dumps(answer, indent=2), True
+
+    match = SINGLE_PROMPT.search(prompt)
+    count, topic = (int(match.group(1)), match.group(2)) if match else (5, "general knowledge")
+    # A top-up prompt lists the questions already asked: continue after them
+    existing = EXISTING_QUESTIONS.search(prompt)
+    first = len(existing.group(1).splitlines()) if existing else 0
+    return json.dumps([make_question(topic, i) for i in range(first, first + count)], indent=2), False
+
+
+def break_answer(content: str, rng: random.Random, mode: str = "") -> str:
+    """Corrupt an answer the way real models occasionally do."""
+    mode = mode or rng.choice(MALFORMED_MODES)
+    if mode == "truncated":
+        return content[:len(content) * 3 // 5]
+    if mode == "prose":
+        return "I'm sorry, I can't produce a quiz on that topic right now."
+    answer = json.loads(content)
+    arrays = list(answer.values()) if isinstance(answer, dict) else [answer]
+    for questions in arrays:
+        if mode == "missing_field":
+            questions[0].pop("correct_answer", None)
+        elif len(questions) > 1:
+            del questions[len(questions) // 2:]
+    return json.dumps(answer, indent=2)
+
+
+def completion_body(model: str, content: str, prompt: str) -> Dict:
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop"
+        }],
+        "usage": {
+            "prompt_tokens": len(prompt) // 4,
+            "completion_tokens": len(content) // 4,
+            "total_tokens": (len(prompt) + len(content)) // 4
+        }
+    }
+
+
+def build_app(config: StandInConfig) -> FastAPI:
+    """The stand-in ASGI app; `configure` swaps its behaviour between runs."""
+    app = FastAPI(title="LLM proxy stand-in")
+
+    def configure(new_config: StandInConfig) -> None:
+        app.state.config = new_config
+        app.state.rng = random.Random(new_config.seed)
+        app.state.sample_latency = parse_latency(new_config.latency)
+        app.state.model_latency = {
+            model: parse_latency(spec)
+            for model, _, spec in (item.partition("=") for item in new_config.model_latency.split(",") if item)
+        }
+        app.state.stats = StandInStats()
+
+    app.state.configure = configure
+    configure(config)
+
+    def rejection(config: StandInConfig, stats: StandInStats, rng: random.Random) -> Optional[JSONResponse]:
+        """A 429 or 500 for this request, if one is due."""
+        if config.max_concurrency and stats.in_flight > config.max_concurrency:
+            stats.rate_limited += 1
+        elif rng.random() < config.rate_limit_rate:
+            stats.rate_limited += 1
+        elif rng.random() < config.error_rate:
+            stats.errors += 1
+            return JSONResponse({"error": {"message": "injected server error", "type": "server_error"}},
+                                status_code=500)
+        else:
+            return None
+        return JSONResponse(
+            {"error": {"message": "rate limit exceeded", "type": "rate_limit_error"}},
+            status_code=429,
+            headers={"Retry-After": str(config.retry_after_seconds)}
+        )
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        config, stats, rng = app.state.config, app.state.stats, app.state.rng
+        payload = await request.json()
+        prompt = payload["messages"][-1]["content"]
+        model = payload.get("model", "stand-in")
+        stats.requests += 1
+        stats.models[model] = stats.models.get(model, 0) + 1
+        stats.in_flight += 1
+        started = time.perf_counter()
+
+        def done():
+            stats.in_flight -= 1
+            stats.latencies_ms.append((time.perf_counter() - started) * 1000)
+
+        rejected = rejection(config, stats, rng)
+        if rejected is not None:
+            done()
+            return rejected
+
+        content, batched = answer_prompt(prompt)
+        stats.batched += batched
+        if rng.random() < config.malformed_rate:
+            stats.malformed += 1
+            content = break_answer(content, rng, config.malformed_mode)
+        delay = app.state.model_latency.get(model, app.state.sample_latency)(rng)
+
+        if not payload.get("stream"):
+            await asyncio.sleep(delay)
+            stats.ok += 1
+            done()
+            return completion_body(model, content, prompt)
+
+        async def events():
+            try:
+                await asyncio.sleep(delay)
+                chunk_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+                for start in range(0, len(content), config.chunk_chars):
+                    chunk = {
+                        "id": chunk_id,
+                        "object": "chat.completion.chunk",
+                        "model": model,
+                        "choices": [{"index": 0, "delta": {"content": content[start:start + config.chunk_chars]},
+                                     "finish_reason": None}]
+                    }
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                    if config.chunk_delay_ms:
+                        await asyncio.sleep(config.chunk_delay_ms / 1000)
+                final = {"id": chunk_id, "object": "chat.completion.chunk", "model": model,
+                         "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+                yield f"data: {json.dumps(final)}\n\n"
+                yield "data: [DONE]\n\n"
+                stats.ok += 1
+                stats.streamed += 1
+            finally:
+                done()
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    async def get_stats():
+        return app.state.stats.summary()
+
+    return app
+
+
+class StandInServer:
+    """Run the stand-in on a free local port in a background thread."""
+
+    def __init__(self, config: Optional[StandInConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or StandInConfig()
+        self.host = host
+        self.port = port
+        self.app = build_app(self.config)
+        self._server: Optional[uvicorn.Server] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def stats(self) -> StandInStats:
+        return self.app.state.stats
+
+    def configure(self, **changes) -> None:
+        """Change behaviour (fields of StandInConfig) and reset the stats."""
+        self.config = StandInConfig(**{**self.config.__dict__, **changes})
+        self.app.state.configure(self.config)
+
+    def reset(self, **changes) -> None:
+        """Back to a well-behaved stand-in, with optional changes."""
+        self.config = StandInConfig(**changes)
+        self.app.state.configure(self.config)
+
+    def start(self) -> "StandInServer":
+        if not self.port:
+            sock = socket.socket()
+            sock.bind((self.host, 0))
+            self.port = sock.getsockname()[1]
+            sock.close()
+        config = uvicorn.Config(
+            self.app, host=self.host, port=self.port, log_level="warning",
+            lifespan="off", timeout_keep_alive=120
+        )
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.should_exit = True
+            self._thread.join()
+            self._server = None
+
+    def __enter__(self) -> "StandInServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", default="lognormal:800:0.5", help="see module docstring")
+    parser.add_argument("--model-latency", default="", help="per-model latency: model=spec,...")
+    parser.add_argument("--chunk-chars", type=int, default=40)
+    parser.add_argument("--chunk-delay-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--max-concurrency", type=int, default=0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-mode", default="", choices=("",) + MALFORMED_MODES)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    standin_config = StandInConfig(
+        latency=args.latency, model_latency=args.model_latency, chunk_chars=args.chunk_chars, chunk_delay_ms=args.chunk_delay_ms,
+        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+        max_concurrency=args.max_concurrency, malformed_rate=args.malformed_rate,
+        malformed_mode=args.malformed_mode, seed=args.seed
+    )
+    uvicorn.run(build_app(standin_config), host=args.host, port=args.port, log_level="info")
@@ -0,0 +1,317 @@
+"""Load-test the whole backend offline against the local LLM stand-in.
+
+Serves the app (lifespan on) with uvicorn in a background thread on a
+fresh temp SQLite database, points it at the LLM stand-in, seeds
+generation tokens for a set of devices and drives concurrent
+generate -> submit -> progress -> tokens flows through HTTP (optionally
+mixed with first flows of new free-trial devices). Reports
+throughput and p50/p95/p99 latency per endpoint, DB statements executed,
+the server's event-loop lag and what the stand-in saw, then runs the
+scoring and metrics-middleware microbenchmarks.
+
+Everything, with the commit and arguments, is written to a JSON file;
+pass an earlier file as `--baseline` to print the change against it.
+
+Usage (from backend/):
+    python -m benchmarks.load_test --flows 500 --concurrency 50
+    python -m benchmarks.load_test --latency lognormal:800:0.5 --rate-limit-rate 0.05 --error-rate 0.02
+    python -m benchmarks.load_test --output after.json --baseline before.json
+"""
+import os
+import tempfile
+
+# The app reads its configuration at import time
+_workdir = tempfile.mkdtemp(prefix="load-test-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_workdir, 'load.db')}")
+os.environ.setdefault("PROGRESS_JOURNAL_DIR", os.path.join(_workdir, "progress-journal"))
+
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+import json  # noqa: E402
+import random  # noqa: E402
+import socket  # noqa: E402
+import subprocess  # noqa: E402
+import threading  # noqa: E402
+import time  # noqa: E402
+from collections import defaultdict  # noqa: E402
+from typing import Dict, List, Optional  # noqa: E402
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app.config import get_settings  # noqa: E402
+from app.database import Base, SessionLocal, engine, async_engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import GenerationToken  # noqa: E402
+from benchmarks import bench_metrics_middleware, bench_scoring  # noqa: E402
+from benchmarks.bench_llm_client import percentile  # noqa: E402
+from benchmarks.llm_standin import StandInConfig, StandInServer  # noqa: E402
+
+
+class Recorder:
+    """Latency samples and status codes per endpoint."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    async def call(self, endpoint: str, request) -> Optional[httpx.Response]:
+        """Time a request; a transport error counts as status 0 and returns None."""
+        start = time.perf_counter()
+        try:
+            response = await request
+        except httpx.HTTPError:
+            response = None
+        self.latencies[endpoint].append((time.perf_counter() - start) * 1000)
+        self.statuses[endpoint][response.status_code if response is not None else 0] += 1
+        return response
+
+    def summary(self, elapsed: float) -> Dict[str, Dict]:
+        return {
+            endpoint: {
+                "count": len(samples),
+                "rps": len(samples) / elapsed,
+                "p50_ms": percentile(samples, 50),
+                "p95_ms": percentile(samples, 95),
+                "p99_ms": percentile(samples, 99),
+                "statuses": {str(status): n for status, n in sorted(self.statuses[endpoint].items())},
+            }
+            for endpoint, samples in self.latencies.items()
+        }
+
+
+class QueryCounter:
+    """Count SQL statements executed by the app's sync and async engines, by kind."""
+
+    def __init__(self):
+        self.counts: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        for target in (engine, async_engine.sync_engine):
+            event.listen(target, "before_cursor_execute", self._count)
+
+    def _count(self, conn, cursor, statement, parameters, context, executemany):
+        kind = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        with self._lock:
+            self.counts[kind] += 1
+
+    def summary(self, flows: int) -> Dict:
+        total = sum(self.counts.values())
+        return {"total": total, "per_flow": total / flows, "by_kind": dict(sorted(self.counts.items()))}
+
+
+async def measure_lag(stop: asyncio.Event, samples: list, interval: float = 0.005):
+    """Record how late a periodic timer fires."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append((time.perf_counter() - start - interval) * 1000)
+
+
+def seed_devices(devices: int, tokens: int) -> List[str]:
+    """Give every load-test device enough tokens for its flows."""
+    Base.metadata.create_all(bind=engine)
+    device_ids = [f"load-device-{i}" for i in range(devices)]
+    with SessionLocal() as db:
+        db.add_all(
+            GenerationToken(device_id=device_id, tokens_remaining=tokens, tokens_total=tokens)
+            for device_id in device_ids
+        )
+        db.commit()
+    return device_ids
+
+
+def start_server():
+    """Serve the app, lifespan included, from a background thread."""
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+
+    config = uvicorn.Config(
+        app, host="127.0.0.1", port=port, log_level="warning", lifespan="on", timeout_keep_alive=120
+    )
+    server = uvicorn.Server(config)
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_until_complete, args=(server.serve(),), daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}", server, thread, loop
+
+
+async def flow(
+    client: httpx.AsyncClient, recorder: Recorder, device_id: str, args, rng: random.Random, free_trial: bool = False
+):
+    """One user: generate a quiz, submit answers (some of them right), check progress and tokens."""
+    headers = {"X-Device-Id": device_id}
+    endpoint = "POST /quiz/generate" + (" [free]" if free_trial else "")
+    generated = await recorder.call(endpoint, client.post(
+        "/api/v1/quiz/generate",
+        json={
+            "topic": f"Load topic {rng.randrange(args.topics)}",
+            "num_questions": args.questions,
+            "difficulty": rng.choice(("easy", "medium", "hard"))
+        },
+        headers=headers
+    ))
+    if generated is None or generated.status_code != 200:
+        return
+
+    quiz = generated.json()
+    answers = [
+        {"question_id": q["id"], "answer": q["correct_answer"] if rng.random() < 0.7 else "?"}
+        for q in quiz["questions"]
+    ]
+    await recorder.call("POST /quiz/submit", client.post(
+        "/api/v1/quiz/submit",
+        json={"quiz_id": quiz["quiz_id"], "answers": answers, "duration_seconds": 60},
+        headers=headers
+    ))
+    await recorder.call("GET /progress", client.get("/api/v1/progress", headers=headers))
+    await recorder.call("GET /tokens", client.get("/api/v1/tokens", headers=headers))
+
+
+async def run(base_url: str, server_loop, device_ids: List[str], args) -> Dict:
+    """Drive the flows; returns the load part of the results."""
+    recorder = Recorder()
+    queries = QueryCounter()
+    rng = random.Random(args.seed)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    # A user runs one flow at a time
+    device_locks = {device_id: asyncio.Lock() for device_id in device_ids}
+
+    async def one(i: int):
+        if rng.random() < args.free_trial_share:
+            # A new device on its free trial
+            async with semaphore:
+                await flow(client, recorder, f"load-free-{i}", args, rng, free_trial=True)
+            return
+        device_id = device_ids[i % len(device_ids)]
+        async with semaphore, device_locks[device_id]:
+            await flow(client, recorder, device_id, args, rng)
+
+    stop = asyncio.Event()
+    lag: List[float] = []
+    sampler = asyncio.run_coroutine_threadsafe(measure_lag(stop, lag), server_loop)
+
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(args.flows)))
+        elapsed = time.perf_counter() - start
+
+    server_loop.call_soon_threadsafe(stop.set)
+    await asyncio.wrap_future(sampler)
+    return {
+        "elapsed_s": elapsed,
+        "flows_per_s": args.flows / elapsed,
+        "endpoints": recorder.summary(elapsed),
+        "db_queries": queries.summary(args.flows),
+        "event_loop_lag_ms": {
+            "p50": percentile(lag, 50), "p99": percentile(lag, 99), "max": max(lag)
+        },
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: Dict, baseline: Optional[Dict]) -> None:
+    """Print the results, with the change against a baseline run if given."""
+    def delta(new: float, old: Optional[float]) -> str:
+        return f"{(new - old) / old * 100:+7.1f}%" if old else ""
+
+    base_endpoints = (baseline or {}).get("endpoints", {})
+    print(f"{results['flows_per_s']:.1f} flows/s over {results['elapsed_s']:.1f} s")
+    print(f"{'endpoint':<29} {'count':>6} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  statuses")
+    for endpoint, r in results["endpoints"].items():
+        base = base_endpoints.get(endpoint, {})
+        print(
+            f"{endpoint:<29} {r['count']:>6} {r['rps']:>8.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} "
+            f"{r['p99_ms']:>8.1f}  {r['statuses']}  {delta(r['p99_ms'], base.get('p99_ms'))}"
+        )
+
+    queries = results["db_queries"]
+    base_queries = (baseline or {}).get("db_queries", {})
+    print(
+        f"DB statements: {queries['total']} ({queries['per_flow']:.1f}/flow) {queries['by_kind']}  "
+        f"{delta(queries['per_flow'], base_queries.get('per_flow'))}"
+    )
+    lag = results["event_loop_lag_ms"]
+    print(f"event-loop lag ms: p50 {lag['p50']:.2f}  p99 {lag['p99']:.2f}  max {lag['max']:.2f}")
+    print(f"LLM stand-in: {results['llm_standin']}")
+
+    base_micro = (baseline or {}).get("microbenchmarks", {})
+    for group, timings in results.get("microbenchmarks", {}).items():
+        for name, value in timings.items():
+            print(f"{group + '.' + name:<42} {value:>9.1f}  {delta(value, base_micro.get(group, {}).get(name))}")
+
+
+def main(args):
+    standin = StandInServer(StandInConfig(
+        latency=args.latency, model_latency=args.model_latency, chunk_chars=args.chunk_chars, chunk_delay_ms=args.chunk_delay_ms,
+        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+        max_concurrency=args.llm_max_concurrency, malformed_rate=args.malformed_rate, seed=args.seed
+    )).start()
+    settings = get_settings()
+    settings.llm_proxy_url = standin.url
+    settings.llm_proxy_key = settings.llm_proxy_key or "load-test"
+
+    device_ids = seed_devices(args.devices, args.flows // args.devices + 1)
+    base_url, server, thread, server_loop = start_server()
+    try:
+        results = asyncio.run(run(base_url, server_loop, device_ids, args))
+    finally:
+        server.should_exit = True
+        thread.join()
+        standin.stop()
+
+    results = {"commit": git_commit(), "args": vars(args), **results, "llm_standin": standin.stats.summary()}
+    if args.micro:
+        results["microbenchmarks"] = {
+            "scoring_ns_per_call": bench_scoring.measure(args.micro_number),
+            "middleware_us_per_request": asyncio.run(
+                bench_metrics_middleware.measure(args.micro_number // 10, rounds=3)
+            ),
+        }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--flows", type=int, default=500, help="generate -> submit flows to run")
+    parser.add_argument("--concurrency", type=int, default=50, help="flows in flight")
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--topics", type=int, default=1000, help="distinct topics (fewer: more cache hits)")
+    parser.add_argument("--questions", type=int, default=5)
+    parser.add_argument("--free-trial-share", type=float, default=0.0, help="flows by new free-trial devices")
+    parser.add_argument("--latency", default="lognormal:300:0.4", help="stand-in latency spec (ms)")
+    parser.add_argument("--model-latency", default="", help="stand-in per-model latency: model=spec,...")
+    parser.add_argument("--chunk-chars", type=int, default=40)
+    parser.add_argument("--chunk-delay-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--llm-max-concurrency", type=int, default=0, help="stand-in 429s beyond this")
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="load-test-results.json", help="JSON results file")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--no-micro", dest="micro", action="store_false", help="skip the microbenchmarks")
+    parser.add_argument("--micro-number", type=int, default=100000, help="calls per scoring microbenchmark")
+    main(parser.parse_args())
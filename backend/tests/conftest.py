@@ -1,23 +1,71 @@
 """Test configuration and fixtures."""
+import os
+import tempfile
+import httpx
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool
 
 from app.main import app
-from app.database import Base, get_db
+from app.config import get_settings
+from app.database import Base, get_db, get_async_db, async_database_url, configure_sqlite
+from app.services.quiz_cache import quiz_cache
+from app.services.quiz_store import quiz_store
+from app.services.db_writer import db_writer
+from app.services.progress_engine import progress_engine
+from app.services.circuit_breaker import llm_breaker
+from app.services.quiz_service import output_budget
+from app.services.quiz_translation import quiz_translations
+from app.services.topic_index import topic_index
+from app.services.question_index import question_index, recent_questions
+from benchmarks.llm_standin import StandInServer
 
 
-# Test database
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+# Test database: a temp file, so the sync fixtures and the async request
+# handlers see the same data
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    poolclass=StaticPool
+    connect_args={"check_same_thread": False}
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# NullPool: TestClient and pytest-asyncio run separate event loops, and
+# aiosqlite connections must not be shared between loops
+async_engine = create_async_engine(async_database_url(SQLALCHEMY_DATABASE_URL), poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Run the suite under the SQLite performance profile (WAL, pragmas) and single writer
+configure_sqlite(engine)
+configure_sqlite(async_engine)
+db_writer.engine = async_engine
+db_writer.enabled = True
+
+# Write progress behind, journaling to a temp dir
+progress_engine.engine = async_engine
+progress_engine.journal_dir = tempfile.mkdtemp()
+progress_engine.enabled = True
+
+
+class FakeClock:
+    """Manually advanced clock."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def status_error(status, headers=None):
+    """The error `raise_for_status` raises for an LLM proxy response with `status`."""
+    request = httpx.Request("POST", "http://llm/v1/chat/completions")
+    response = httpx.Response(status, request=request, headers=headers)
+    return httpx.HTTPStatusError("error", request=request, response=response)
+
 
 def override_get_db():
     """Override database dependency."""
@@ -28,6 +76,70 @@ def override_get_db():
         db.close()
 
 
+async def override_get_async_db():
+    """Override async database dependency."""
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+
+@pytest.fixture(autouse=True)
+def reset_quiz_cache():
+    """Start every test with an empty in-memory quiz cache."""
+    quiz_cache.clear()
+    yield
+    quiz_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_quiz_store():
+    """Start every test with an empty in-memory quiz store."""
+    quiz_store.clear()
+    yield
+    quiz_store.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_llm_breaker():
+    """Start every test with the LLM circuit closed."""
+    llm_breaker.reset()
+    yield
+    llm_breaker.reset()
+
+
+@pytest.fixture(autouse=True)
+def reset_output_budget():
+    """Start every test without learned LLM output budgets."""
+    output_budget.reset()
+    yield
+    output_budget.reset()
+
+
+@pytest.fixture(autouse=True)
+def reset_quiz_translations():
+    """Start every test with no stored translations in memory."""
+    quiz_translations.clear()
+    yield
+    quiz_translations.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_topic_index():
+    """Start every test knowing only the catalog topics."""
+    topic_index.reset()
+    yield
+    topic_index.reset()
+
+
+@pytest.fixture(autouse=True)
+def reset_question_index():
+    """Start every test with no indexed questions or recently served ones."""
+    question_index.clear()
+    recent_questions.clear()
+    yield
+    question_index.clear()
+    recent_questions.clear()
+
+
 @pytest.fixture(scope="function")
 def db():
     """Create test database."""
@@ -42,6 +154,7 @@ def db():
 def client(db):
     """Create test client."""
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
     Base.metadata.create_all(bind=engine)
     
     with TestClient(app) as c:
@@ -49,3 +162,20 @@ def client(db):
     
     app.dependency_overrides.clear()
     Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture(scope="session")
+def llm_standin_server():
+    """Local stand-in for the LLM proxy, shared by the session."""
+    server = StandInServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def llm_standin(llm_standin_server, monkeypatch):
+    """Point LLM calls at the stand-in, reset to well-behaved answers."""
+    llm_standin_server.reset(seed=0)
+    monkeypatch.setattr(get_settings(), "llm_proxy_url", llm_standin_server.url)
+    monkeypatch.setattr(get_settings(), "llm_proxy_key", "standin")
+    return llm_standin_server
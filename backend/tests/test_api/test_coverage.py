@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app.models import GenerationToken, FreeTrialUsage
+from app.services.quiz_store import quiz_store
 
 
 class TestDatabaseCoverage:
@@ -136,14 +137,14 @@ class TestQuizEdgeCases:
             "correct_answer": "A",
             "explanation": "Test"
         }]
+        quiz_id = quiz_store.save(db, "streak-test-device", "Test", "medium", questions)
         
         # Submit wrong answer
         response = client.post(
             "/api/v1/quiz/submit",
             json={
-                "topic": "Test",
+                "quiz_id": quiz_id,
                 "answers": [{"question_id": "q1", "answer": "B"}],
-                "questions": questions,
                 "duration_seconds": 30
             },
             headers={"X-Device-Id": "streak-test-device"}
@@ -9,6 +9,7 @@ def test_health_check(client):
     data = response.json()
     assert data["status"] == "healthy"
     assert "version" in data
+    assert data["llm_circuit"] == "closed"
 
 
 def test_root_endpoint(client):
@@ -0,0 +1,55 @@
+"""Test the request metrics middleware."""
+from prometheus_client import REGISTRY
+
+from app.middleware import detect_bot
+
+
+def requests_total(endpoint, method="GET", status="200"):
+    return REGISTRY.get_sample_value("http_requests_total", {
+        "tool": "gamified-study", "endpoint": endpoint, "method": method, "status": status
+    }) or 0
+
+
+def crawler_visits(bot):
+    return REGISTRY.get_sample_value(
+        "crawler_visits_total", {"tool": "gamified-study", "bot": bot}
+    ) or 0
+
+
+class TestMetricsMiddleware:
+    """Tests for MetricsMiddleware."""
+
+    def test_labels_use_route_template(self, client):
+        """Test the endpoint label is the route path, without the query string."""
+        before = requests_total("/health")
+        client.get("/health?utm_source=x")
+        client.get("/health?utm_source=y")
+        assert requests_total("/health") == before + 2
+        assert requests_total("/health?utm_source=x") == 0
+
+    def test_unmatched_paths_share_one_label(self, client):
+        """Test unknown paths don't create a series each."""
+        before = requests_total("unmatched", status="404")
+        client.get("/wp-admin/setup.php")
+        client.get("/.env")
+        assert requests_total("unmatched", status="404") == before + 2
+        assert requests_total("/.env", status="404") == 0
+
+    def test_status_label(self, client):
+        """Test the recorded status is the response status."""
+        before = requests_total("/api/v1/progress", status="400")
+        response = client.get("/api/v1/progress")
+        assert response.status_code == 400
+        assert requests_total("/api/v1/progress", status="400") == before + 1
+
+    def test_crawler_counted_once(self, client):
+        """Test a crawler visit is counted under its canonical bot name."""
+        before = crawler_visits("bingbot")
+        client.get("/health", headers={"User-Agent": "Mozilla/5.0 (compatible; BingBot/2.0)"})
+        assert crawler_visits("bingbot") == before + 1
+
+    def test_detect_bot(self):
+        """Test bot matching is case-insensitive and ignores browsers."""
+        assert detect_bot("Googlebot/2.1 (+http://www.google.com/bot.html)") == "Googlebot"
+        assert detect_bot("facebookexternalhit/1.1") == "facebookexternalhit"
+        assert detect_bot("Mozilla/5.0 (X11; Linux x86_64) Firefox/120.0") is None
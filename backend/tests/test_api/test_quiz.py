@@ -1,8 +1,16 @@
 """Test quiz API endpoints."""
+import asyncio
+
 import pytest
 from unittest.mock import patch, AsyncMock
 
+from app.models import BankQuestion, GenerationToken
 from app.schemas import QuizQuestion, QuizOption
+from app.api import quiz as quiz_api
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.db_writer import WriteTimeoutError
+from app.services.llm_limiter import LLMDeadlineExceeded, LLMOverloadedError
+from app.services.quiz_store import quiz_store
 
 
 # Mock quiz questions
@@ -34,6 +42,11 @@ MOCK_QUESTIONS = [
 ]
 
 
+def store_quiz(db, device_id, difficulty="medium", questions=MOCK_QUESTIONS):
+    """Store a served quiz for a device; returns its quiz id."""
+    return quiz_store.save(db, device_id, "Math", difficulty, questions)
+
+
 class TestQuizGenerate:
     """Tests for quiz generation endpoint."""
     
@@ -62,6 +75,7 @@ class TestQuizGenerate:
         assert data["topic"] == "Math"
         assert len(data["questions"]) == 2
         assert data["is_free_trial"] is True
+        assert data["quiz_id"]
     
     @patch("app.api.quiz.generate_quiz", new_callable=AsyncMock)
     def test_generate_second_attempt_fails(self, mock_generate, client):
@@ -92,6 +106,205 @@ class TestQuizGenerate:
         else:
             assert "token" in detail.lower() or "payment" in detail.lower()
     
+    @patch("app.api.quiz.generate_quiz", new_callable=AsyncMock)
+    def test_generate_overloaded_returns_503(self, mock_generate, client):
+        """A generation shed by the LLM limiter is a 503 with Retry-After, and refunded."""
+        mock_generate.side_effect = LLMOverloadedError("queue_full", retry_after=7)
+        
+        response = client.post(
+            "/api/v1/quiz/generate",
+            json={"topic": "Math", "num_questions": 2},
+            headers={"X-Device-Id": "overloaded-device"}
+        )
+        
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "7"
+        assert response.json()["detail"]["code"] == "llm_overloaded"
+        
+        # The free trial is still available
+        tokens = client.get("/api/v1/tokens", headers={"X-Device-Id": "overloaded-device"}).json()
+        assert tokens["has_free_trial"] is True
+    
+    @patch("app.api.quiz.generate_quiz", new_callable=AsyncMock)
+    def test_generate_past_deadline_returns_504(self, mock_generate, client):
+        """A generation out of time after retries is a 504, and refunded."""
+        mock_generate.side_effect = LLMDeadlineExceeded()
+        
+        response = client.post(
+            "/api/v1/quiz/generate",
+            json={"topic": "Math", "num_questions": 2},
+            headers={"X-Device-Id": "deadline-device"}
+        )
+        
+        assert response.status_code == 504
+        tokens = client.get("/api/v1/tokens", headers={"X-Device-Id": "deadline-device"}).json()
+        assert tokens["has_free_trial"] is True
+    
+    @patch("app.api.quiz.generate_quiz", new_callable=AsyncMock)
+    def test_generate_serves_degraded_quiz_while_llm_down(self, mock_generate, client, db):
+        """With the LLM circuit open, earlier questions are served free of charge."""
+        mock_generate.side_effect = CircuitOpenError(retry_after=30)
+        for i in range(3):
+            db.add(BankQuestion(topic_slug="python", difficulty="hard", language="en", question={
+                "type": "fill_blank", "question": f"Banked {i}?", "options": None,
+                "correct_answer": "a", "explanation": "e"
+            }))
+        db.commit()
+        
+        response = client.post(
+            "/api/v1/quiz/generate",
+            json={"topic": "Python", "num_questions": 2, "difficulty": "easy"},
+            headers={"X-Device-Id": "degraded-device"}
+        )
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["degraded"] is True
+        assert data["is_free_trial"] is False
+        assert len(data["questions"]) == 2
+        
+        tokens = client.get("/api/v1/tokens", headers={"X-Device-Id": "degraded-device"}).json()
+        assert tokens["has_free_trial"] is True
+    
+    @patch("app.api.quiz.generate_quiz", new_callable=AsyncMock)
+    def test_generate_refunds_at_most_once(self, mock_generate, client, db):
+        """A degraded quiz whose refund fails isn't refunded again on the error path."""
+        mock_generate.side_effect = CircuitOpenError(retry_after=30)
+        for i in range(2):
+            db.add(BankQuestion(topic_slug="python", difficulty="easy", language="en", question={
+                "type": "fill_blank", "question": f"Banked {i}?", "options": None,
+                "correct_answer": "a", "explanation": "e"
+            }))
+        db.commit()
+        refunds = []
+        
+        def failing_refund(session, reservation):
+            refunds.append(reservation)
+            raise RuntimeError("refund failed")
+        
+        with patch("app.api.quiz.refund_generation", failing_refund):
+            response = client.post(
+                "/api/v1/quiz/generate",
+                json={"topic": "Python", "num_questions": 2},
+                headers={"X-Device-Id": "refund-once-device"}
+            )
+        
+        assert response.status_code == 500
+        assert len(refunds) == 1
+    
+    def test_generate_reservation_timeout_is_retryable(self, client):
+        """A reservation the database writer didn't get to in time is a 503 with Retry-After."""
+        async def timed_out(db, fn, *args):
+            raise WriteTimeoutError(asyncio.get_running_loop().create_future())
+        
+        with patch("app.api.quiz.db_writer.run", side_effect=timed_out):
+            response = client.post(
+                "/api/v1/quiz/generate",
+                json={"topic": "Math", "num_questions": 2},
+                headers={"X-Device-Id": "busy-device"}
+            )
+        
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == str(quiz_api.WRITE_RETRY_AFTER_SECONDS)
+        assert response.json()["detail"]["code"] == "db_busy"
+    
+    def test_late_reservation_is_refunded(self):
+        """A reservation applied after its request answered 503 is queued for a refund."""
+        loop = asyncio.new_event_loop()
+        pending = loop.create_future()
+        pending.set_result("reservation")
+        
+        with patch.object(quiz_api.db_writer, "_task", object()), \
+                patch.object(quiz_api.db_writer, "enqueue") as enqueue:
+            quiz_api.refund_late_reservation(pending)
+        loop.close()
+        
+        enqueue.assert_called_once_with(quiz_api.refund_generation, "reservation")
+    
+    @patch("app.api.quiz.generate_quiz", new_callable=AsyncMock)
+    def test_generate_unavailable_without_earlier_questions(self, mock_generate, client):
+        """With the LLM circuit open and nothing to fall back on, generation is a 503."""
+        mock_generate.side_effect = CircuitOpenError(retry_after=30)
+        
+        response = client.post(
+            "/api/v1/quiz/generate",
+            json={"topic": "Underwater basket weaving", "num_questions": 2},
+            headers={"X-Device-Id": "unavailable-device"}
+        )
+        
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "30"
+        assert response.json()["detail"]["code"] == "llm_unavailable"
+    
+    @patch("app.api.quiz.translate_questions", new_callable=AsyncMock)
+    @patch("app.api.quiz.generate_quiz", new_callable=AsyncMock)
+    def test_generate_translates_cached_quiz(self, mock_generate, mock_translate, client):
+        """A quiz cached in English is served translated to other languages, and the translation stored."""
+        mock_generate.return_value = MOCK_QUESTIONS
+        mock_translate.side_effect = lambda questions, language: [
+            q.model_copy(update={"question": f"[{language}] {q.question}"}) for q in questions
+        ]
+        
+        def generate(device_id, language):
+            return client.post(
+                "/api/v1/quiz/generate",
+                json={"topic": "Translated math", "num_questions": 2, "language": language},
+                headers={"X-Device-Id": device_id}
+            )
+        
+        assert generate("translate-en", "en").status_code == 200
+        response = generate("translate-fr-1", "fr")
+        
+        assert response.status_code == 200
+        assert {q["question"] for q in response.json()["questions"]} == {"[fr] What is 2+2?", "[fr] The sky is blue?"}
+        assert mock_generate.await_count == 1
+        
+        # Stored translations need no further call
+        response = generate("translate-fr-2", "fr")
+        assert all(q["question"].startswith("[fr] ") for q in response.json()["questions"])
+        assert mock_translate.await_count == 1
+    
+    @patch("app.api.quiz.translate_questions", new_callable=AsyncMock)
+    @patch("app.api.quiz.generate_quiz", new_callable=AsyncMock)
+    def test_generate_falls_back_when_translation_fails(self, mock_generate, mock_translate, client):
+        """A failed translation falls back to generating the quiz in its language."""
+        mock_generate.return_value = MOCK_QUESTIONS
+        mock_translate.side_effect = ValueError("No question translated")
+        
+        for device_id, language in (("fallback-en", "en"), ("fallback-de", "de")):
+            response = client.post(
+                "/api/v1/quiz/generate",
+                json={"topic": "Fallback math", "num_questions": 2, "language": language},
+                headers={"X-Device-Id": device_id}
+            )
+            assert response.status_code == 200
+        
+        assert mock_translate.await_count == 1
+        assert mock_generate.await_count == 2
+    
+    def test_generate_avoids_questions_the_device_saw(self, client, db):
+        """A device's next bank quiz leaves out the questions it was just served."""
+        db.add(GenerationToken(device_id="bank-device", tokens_remaining=2, tokens_total=2))
+        # Rotating by served count alone would serve the first two questions again
+        for text, served_count in (("Which gas do plants absorb?", 0), ("What do roots take up?", 0),
+                                   ("Where does photosynthesis happen?", 5), ("What colour is chlorophyll?", 5)):
+            db.add(BankQuestion(topic_slug="botany", difficulty="easy", language="en", served_count=served_count, question={
+                "type": "fill_blank", "question": text, "options": None, "correct_answer": "a", "explanation": "e"
+            }))
+        db.commit()
+        
+        served = []
+        for _ in range(2):
+            response = client.post(
+                "/api/v1/quiz/generate",
+                json={"topic": "Botany", "num_questions": 2, "difficulty": "easy"},
+                headers={"X-Device-Id": "bank-device"}
+            )
+            assert response.status_code == 200
+            served += [q["question"] for q in response.json()["questions"]]
+        
+        assert len(set(served)) == 4
+    
     def test_generate_invalid_difficulty(self, client):
         """Test invalid difficulty validation."""
         response = client.post(
@@ -119,26 +332,24 @@ class TestQuizSubmit:
         response = client.post(
             "/api/v1/quiz/submit",
             json={
-                "topic": "Math",
-                "answers": [],
-                "questions": []
+                "quiz_id": "abc",
+                "answers": []
             }
         )
         assert response.status_code == 400
     
-    def test_submit_updates_progress(self, client):
+    def test_submit_updates_progress(self, client, db):
         """Test that submit updates user progress."""
-        questions = [q.model_dump() for q in MOCK_QUESTIONS]
+        quiz_id = store_quiz(db, "test-device-5")
         
         response = client.post(
             "/api/v1/quiz/submit",
             json={
-                "topic": "Math",
+                "quiz_id": quiz_id,
                 "answers": [
                     {"question_id": "q1", "answer": "B"},
                     {"question_id": "q2", "answer": "A"}
-                ],
-                "questions": questions
+                ]
             },
             headers={"X-Device-Id": "test-device-5"}
         )
@@ -151,19 +362,18 @@ class TestQuizSubmit:
         assert "first_quiz" in data["new_achievements"]
         assert "perfect_score" in data["new_achievements"]
     
-    def test_submit_partial_correct(self, client):
+    def test_submit_partial_correct(self, client, db):
         """Test partial correct answers."""
-        questions = [q.model_dump() for q in MOCK_QUESTIONS]
+        quiz_id = store_quiz(db, "test-device-6")
         
         response = client.post(
             "/api/v1/quiz/submit",
             json={
-                "topic": "Math",
+                "quiz_id": quiz_id,
                 "answers": [
                     {"question_id": "q1", "answer": "A"},  # Wrong
                     {"question_id": "q2", "answer": "A"}   # Correct
-                ],
-                "questions": questions
+                ]
             },
             headers={"X-Device-Id": "test-device-6"}
         )
@@ -172,6 +382,77 @@ class TestQuizSubmit:
         data = response.json()
         assert data["correct_count"] == 1
         assert data["total_count"] == 2
+    
+    def test_submit_uses_quiz_difficulty(self, client, db):
+        """Test XP is calculated at the difficulty the quiz was generated with."""
+        answers = [{"question_id": "q1", "answer": "B"}, {"question_id": "q2", "answer": "A"}]
+        xp = {}
+        for difficulty in ("easy", "hard"):
+            device = f"difficulty-{difficulty}"
+            quiz_id = store_quiz(db, device, difficulty=difficulty)
+            response = client.post(
+                "/api/v1/quiz/submit",
+                json={"quiz_id": quiz_id, "answers": answers},
+                headers={"X-Device-Id": device}
+            )
+            xp[difficulty] = response.json()["xp_earned"]
+        
+        assert xp["easy"] == 2 * 5 + 20
+        assert xp["hard"] == 2 * 15 + 20
+    
+    def test_submit_unknown_quiz(self, client):
+        """Test an unknown quiz id is rejected."""
+        response = client.post(
+            "/api/v1/quiz/submit",
+            json={"quiz_id": "missing", "answers": []},
+            headers={"X-Device-Id": "test-device-7"}
+        )
+        assert response.status_code == 404
+    
+    def test_submit_only_once(self, client, db):
+        """Test a quiz can't be graded twice."""
+        quiz_id = store_quiz(db, "test-device-8")
+        body = {"quiz_id": quiz_id, "answers": [{"question_id": "q1", "answer": "B"}]}
+        
+        first = client.post("/api/v1/quiz/submit", json=body, headers={"X-Device-Id": "test-device-8"})
+        second = client.post("/api/v1/quiz/submit", json=body, headers={"X-Device-Id": "test-device-8"})
+        
+        assert first.status_code == 200
+        assert second.status_code == 404
+    
+    def test_submit_other_device_quiz(self, client, db):
+        """Test a device can't submit a quiz served to another device."""
+        quiz_id = store_quiz(db, "owner-device")
+        response = client.post(
+            "/api/v1/quiz/submit",
+            json={"quiz_id": quiz_id, "answers": []},
+            headers={"X-Device-Id": "other-device"}
+        )
+        assert response.status_code == 404
+    
+    @patch("app.api.quiz.generate_quiz", new_callable=AsyncMock)
+    def test_generate_then_submit(self, mock_generate, client):
+        """Test the quiz id from generate grades the served questions."""
+        mock_generate.return_value = MOCK_QUESTIONS
+        headers = {"X-Device-Id": "round-trip-device"}
+        quiz = client.post(
+            "/api/v1/quiz/generate",
+            json={"topic": "Math", "num_questions": 2, "difficulty": "hard"},
+            headers=headers
+        ).json()
+        
+        response = client.post(
+            "/api/v1/quiz/submit",
+            json={
+                "quiz_id": quiz["quiz_id"],
+                "answers": [{"question_id": q["id"], "answer": q["correct_answer"]} for q in quiz["questions"]]
+            },
+            headers=headers
+        )
+        
+        assert response.status_code == 200
+        assert response.json()["correct_count"] == 2
+        assert response.json()["xp_earned"] == 2 * 15 + 20
 
 
 class TestProgress:
@@ -190,20 +471,19 @@ class TestProgress:
         assert data["level"] == 1
         assert data["total_questions"] == 0
     
-    def test_get_progress_after_quiz(self, client):
+    def test_get_progress_after_quiz(self, client, db):
         """Test progress after completing a quiz."""
-        questions = [q.model_dump() for q in MOCK_QUESTIONS]
+        quiz_id = store_quiz(db, "progress-device")
         
         # Submit a quiz first
         client.post(
             "/api/v1/quiz/submit",
             json={
-                "topic": "Math",
+                "quiz_id": quiz_id,
                 "answers": [
                     {"question_id": "q1", "answer": "B"},
                     {"question_id": "q2", "answer": "A"}
-                ],
-                "questions": questions
+                ]
             },
             headers={"X-Device-Id": "progress-device"}
         )
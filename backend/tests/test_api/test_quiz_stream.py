@@ -0,0 +1,192 @@
+"""Test the streaming quiz generation endpoint."""
+import json
+import pytest
+from unittest.mock import patch
+
+from app.models import BankQuestion, GenerationToken
+from app.schemas import QuizQuestion
+from app.services.circuit_breaker import llm_breaker
+from app.services.quiz_cache import quiz_cache, quiz_cache_key
+from app.services.quiz_translation import quiz_translations
+
+
+def make_questions(n):
+    return [
+        QuizQuestion(id=f"q{i}", type="fill_blank", question=f"Q{i}?", correct_answer="a", explanation="e")
+        for i in range(n)
+    ]
+
+
+def fake_stream(questions, fail_after=None):
+    """Build a stream_quiz replacement yielding `questions`."""
+    async def stream(**kwargs):
+        for i, question in enumerate(questions):
+            if fail_after is not None and i == fail_after:
+                raise Exception("LLM API error: 502")
+            yield question
+        if fail_after is not None and fail_after >= len(questions):
+            raise Exception("LLM API error: 502")
+    return stream
+
+
+def read_events(response):
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+
+class TestGenerateStream:
+    """Tests for /quiz/generate/stream."""
+
+    def test_streams_ndjson_and_consumes_once(self, client, db):
+        """Test questions stream as NDJSON and one token is consumed."""
+        db.add(GenerationToken(device_id="stream-device", tokens_remaining=3, tokens_total=3))
+        db.commit()
+
+        with patch("app.api.quiz.stream_quiz", fake_stream(make_questions(3))):
+            response = client.post(
+                "/api/v1/quiz/generate/stream",
+                json={"topic": "Streams", "num_questions": 3},
+                headers={"X-Device-Id": "stream-device"}
+            )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        events = read_events(response)
+        assert [e["event"] for e in events] == ["question"] * 3 + ["done"]
+        assert events[-1]["tokens_remaining"] == 2
+        assert events[-1]["quiz_id"]
+
+    def test_sse_framing(self, client):
+        """Test SSE framing when requested via Accept."""
+        with patch("app.api.quiz.stream_quiz", fake_stream(make_questions(1))):
+            response = client.post(
+                "/api/v1/quiz/generate/stream",
+                json={"topic": "Streams", "num_questions": 1},
+                headers={"X-Device-Id": "sse-device", "Accept": "text/event-stream"}
+            )
+
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert response.text.startswith("event: question\ndata: ")
+        assert "event: done" in response.text
+
+    def test_streams_degraded_quiz_while_llm_down(self, client, db, monkeypatch):
+        """Test earlier questions are streamed, free of charge, while the circuit is open."""
+        db.add(GenerationToken(device_id="degraded-stream", tokens_remaining=3, tokens_total=3))
+        db.add(BankQuestion(topic_slug="streams", difficulty="medium", language="en", question={
+            "type": "fill_blank", "question": "Banked?", "options": None,
+            "correct_answer": "a", "explanation": "e"
+        }))
+        db.commit()
+        monkeypatch.setattr(type(llm_breaker), "is_open", property(lambda self: True))
+
+        with patch("app.api.quiz.stream_quiz", fake_stream([], fail_after=0)):
+            response = client.post(
+                "/api/v1/quiz/generate/stream",
+                json={"topic": "Streams", "num_questions": 2},
+                headers={"X-Device-Id": "degraded-stream"}
+            )
+
+        events = read_events(response)
+        assert [e["event"] for e in events] == ["question", "done"]
+        assert events[-1]["degraded"] is True
+        assert events[-1]["tokens_remaining"] == 3
+        tokens = client.get("/api/v1/tokens", headers={"X-Device-Id": "degraded-stream"}).json()
+        assert tokens["tokens_remaining"] == 3
+
+    def test_streams_stored_translation(self, client, db):
+        """Test a quiz is streamed from stored translations of a cached source quiz."""
+        source = make_questions(2)
+        quiz_cache.put(quiz_cache_key("Streams", "medium", "en", 2), source, db)
+        quiz_translations.store(
+            quiz_cache_key("Streams", "medium", "en", 2),
+            [q.model_copy(update={"question": f"[ja] {q.question}"}) for q in source], "ja", db
+        )
+
+        with patch("app.api.quiz.stream_quiz", fake_stream([], fail_after=0)):
+            response = client.post(
+                "/api/v1/quiz/generate/stream",
+                json={"topic": "Streams", "num_questions": 2, "language": "ja"},
+                headers={"X-Device-Id": "translated-stream"}
+            )
+
+        events = read_events(response)
+        assert [e["event"] for e in events] == ["question"] * 2 + ["done"]
+        assert {e["question"]["question"] for e in events[:2]} == {"[ja] Q0?", "[ja] Q1?"}
+
+    def test_failure_before_first_question_is_free(self, client):
+        """Test a stream that fails before any question does not use the trial."""
+        with patch("app.api.quiz.stream_quiz", fake_stream([], fail_after=0)):
+            response = client.post(
+                "/api/v1/quiz/generate/stream",
+                json={"topic": "Streams", "num_questions": 2},
+                headers={"X-Device-Id": "fail-device"}
+            )
+
+        events = read_events(response)
+        assert events[-1]["event"] == "error"
+        tokens = client.get("/api/v1/tokens", headers={"X-Device-Id": "fail-device"}).json()
+        assert tokens["has_free_trial"] is True
+
+    def test_failure_after_first_question_is_charged_once(self, client):
+        """Test a mid-stream failure still consumes exactly one trial."""
+        with patch("app.api.quiz.stream_quiz", fake_stream(make_questions(2), fail_after=1)):
+            response = client.post(
+                "/api/v1/quiz/generate/stream",
+                json={"topic": "Streams", "num_questions": 2},
+                headers={"X-Device-Id": "partial-device"}
+            )
+
+        events = read_events(response)
+        assert [e["event"] for e in events] == ["question", "error"]
+        tokens = client.get("/api/v1/tokens", headers={"X-Device-Id": "partial-device"}).json()
+        assert tokens["free_trial_used"] is True
+
+    def test_short_stream_not_cached(self, client):
+        """Test a stream with fewer questions than requested is not cached."""
+        with patch("app.api.quiz.stream_quiz", fake_stream(make_questions(2))), \
+                patch.object(quiz_cache, "max_variants", 1):
+            response = client.post(
+                "/api/v1/quiz/generate/stream",
+                json={"topic": "Short", "num_questions": 3},
+                headers={"X-Device-Id": "short-device"}
+            )
+
+            assert [e["event"] for e in read_events(response)] == ["question"] * 2 + ["done"]
+            assert quiz_cache.get(quiz_cache_key("Short", "medium", "en", 3)) is None
+
+    def test_upstream_closed_after_enough_questions(self, client):
+        """Test the LLM stream is closed as soon as the requested questions are sent."""
+        order = []
+
+        async def endless(**kwargs):
+            try:
+                for question in make_questions(10):
+                    yield question
+            finally:
+                order.append("closed")
+
+        with patch("app.api.quiz.stream_quiz", endless), \
+                patch("app.api.quiz.record_quiz_generation", side_effect=lambda *a: order.append("done")):
+            response = client.post(
+                "/api/v1/quiz/generate/stream",
+                json={"topic": "Endless", "num_questions": 2},
+                headers={"X-Device-Id": "endless-device"}
+            )
+
+        assert [e["event"] for e in read_events(response)] == ["question"] * 2 + ["done"]
+        assert order == ["closed", "done"]
+
+    def test_no_tokens_returns_402_before_streaming(self, client):
+        """Test an exhausted device gets a plain 402."""
+        with patch("app.api.quiz.stream_quiz", fake_stream(make_questions(1))):
+            client.post(
+                "/api/v1/quiz/generate/stream",
+                json={"topic": "Streams", "num_questions": 1},
+                headers={"X-Device-Id": "broke-device"}
+            )
+            response = client.post(
+                "/api/v1/quiz/generate/stream",
+                json={"topic": "Streams", "num_questions": 1},
+                headers={"X-Device-Id": "broke-device"}
+            )
+
+        assert response.status_code == 402
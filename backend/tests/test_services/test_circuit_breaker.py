@@ -0,0 +1,181 @@
+"""Test the LLM circuit breaker and degraded-mode quizzes."""
+import asyncio
+
+import httpx
+import pytest
+
+from app.models import BankQuestion, CachedQuiz
+from app.services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from app.services.degraded_quiz import assemble_degraded_quiz
+from app.services.llm_limiter import LLMDeadlineExceeded, LLMOverloadedError
+from app.services.quiz_cache import quiz_cache_key
+from tests.conftest import FakeClock, status_error
+
+
+async def fail(breaker, error):
+    with pytest.raises(type(error)):
+        async with breaker.call():
+            raise error
+
+
+async def succeed(breaker):
+    async with breaker.call():
+        pass
+
+
+def banked(slug, text, difficulty="medium", language="en"):
+    return BankQuestion(
+        topic_slug=slug, difficulty=difficulty, language=language,
+        question={"type": "fill_blank", "question": text, "options": None,
+                  "correct_answer": "a", "explanation": "e"}
+    )
+
+
+class TestCircuitBreaker:
+    """Tests for breaker state transitions."""
+
+    @pytest.mark.asyncio
+    async def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=3, open_seconds=10, clock=FakeClock())
+
+        await fail(breaker, status_error(500))
+        await fail(breaker, httpx.ConnectError("refused"))
+        await succeed(breaker)  # resets the count
+        for _ in range(2):
+            await fail(breaker, httpx.ReadTimeout("slow"))
+        assert breaker.state == CLOSED
+
+        await fail(breaker, status_error(503))
+        assert breaker.state == OPEN
+        with pytest.raises(CircuitOpenError) as exc:
+            await succeed(breaker)
+        assert exc.value.retry_after == 10
+
+    @pytest.mark.asyncio
+    async def test_rate_limits_and_client_errors_do_not_count(self):
+        breaker = CircuitBreaker(failure_threshold=2, open_seconds=10, clock=FakeClock())
+
+        for error in (status_error(429), status_error(400), ValueError("malformed")):
+            await fail(breaker, error)
+            await fail(breaker, error)
+        assert breaker.state == CLOSED
+
+    @pytest.mark.asyncio
+    async def test_half_open_probe_closes_or_reopens(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, open_seconds=10, clock=clock)
+        await fail(breaker, status_error(502))
+
+        clock.now += 10
+        assert breaker.state == HALF_OPEN
+        await fail(breaker, status_error(502))
+        assert breaker.state == OPEN
+        assert breaker.retry_after() == 10
+
+        clock.now += 10
+        await succeed(breaker)
+        assert breaker.state == CLOSED
+
+    @pytest.mark.asyncio
+    async def test_half_open_lets_one_probe_through(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, open_seconds=1, clock=clock)
+        await fail(breaker, status_error(500))
+        clock.now += 1
+
+        release = asyncio.Event()
+
+        async def probe():
+            async with breaker.call():
+                await release.wait()
+
+        task = asyncio.create_task(probe())
+        await asyncio.sleep(0)
+        with pytest.raises(CircuitOpenError):
+            await succeed(breaker)
+
+        release.set()
+        await task
+        assert breaker.state == CLOSED
+
+    @pytest.mark.asyncio
+    async def test_cancelled_call_gives_no_verdict(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, open_seconds=1, clock=clock)
+        await fail(breaker, status_error(500))
+        clock.now += 1
+
+        await fail(breaker, asyncio.CancelledError())
+        assert breaker.state == HALF_OPEN
+        await succeed(breaker)  # the probe slot was given back
+        assert breaker.state == CLOSED
+
+    @pytest.mark.asyncio
+    async def test_shed_probe_gives_no_verdict(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, open_seconds=1, clock=clock)
+        await fail(breaker, status_error(500))
+        clock.now += 1
+
+        await fail(breaker, LLMOverloadedError("queue_full", retry_after=1))
+        await fail(breaker, LLMDeadlineExceeded())
+        assert breaker.state == HALF_OPEN
+        await fail(breaker, status_error(503))  # the probe slot was given back
+        assert breaker.state == OPEN
+
+    @pytest.mark.asyncio
+    async def test_local_errors_keep_the_failure_count(self):
+        breaker = CircuitBreaker(failure_threshold=2, open_seconds=10, clock=FakeClock())
+
+        await fail(breaker, httpx.ConnectError("refused"))
+        await fail(breaker, LLMOverloadedError("queue_full", retry_after=1))
+        await fail(breaker, LLMDeadlineExceeded())
+        await fail(breaker, httpx.ConnectError("refused"))
+        assert breaker.state == OPEN
+
+    @pytest.mark.asyncio
+    async def test_standin_outage_fails_fast(self, llm_standin, monkeypatch):
+        from app.services import quiz_service
+        from app.services.quiz_batcher import QuizSpec
+
+        breaker = CircuitBreaker(failure_threshold=2, open_seconds=30)
+        monkeypatch.setattr(quiz_service, "llm_breaker", breaker)
+        llm_standin.configure(error_rate=1.0, retry_after_seconds=0)
+
+        with pytest.raises(CircuitOpenError):
+            await quiz_service.request_quiz(QuizSpec("Python", 2, "easy", "en"))
+        assert llm_standin.stats.requests == 2
+
+        with pytest.raises(CircuitOpenError):
+            await quiz_service.request_quiz(QuizSpec("Python", 2, "easy", "en"))
+        assert llm_standin.stats.requests == 2
+
+
+class TestDegradedQuiz:
+    """Tests for assembling degraded-mode quizzes from earlier questions."""
+
+    def test_prefers_cached_quizzes_on_the_topic(self, db):
+        key = quiz_cache_key("Learn Python!", "hard", "en", 1)
+        db.add(CachedQuiz(cache_key=key, topic="Learn Python!", difficulty="hard", language="en", questions=[
+            {"id": "x", "type": "fill_blank", "question": "Cached?", "options": None,
+             "correct_answer": "a", "explanation": "e"}
+        ]))
+        db.add(banked("python", "Banked?"))
+        db.commit()
+
+        questions = assemble_degraded_quiz(db, "python", "medium", "en", 2)
+
+        assert [q.question for q in questions] == ["Cached?", "Banked?"]
+        assert assemble_degraded_quiz(db, "python basics", "easy", "fr", 1) is None
+
+    def test_falls_back_to_the_topic_category(self, db):
+        db.add(banked("javascript", "Sibling?"))
+        db.add(banked("python", "Other language?", language="fr"))
+        db.commit()
+
+        questions = assemble_degraded_quiz(db, "Python", "easy", "en", 5)
+
+        assert [q.question for q in questions] == ["Sibling?"]
+
+    def test_none_without_earlier_questions(self, db):
+        assert assemble_degraded_quiz(db, "Underwater basket weaving", "easy", "en", 5) is None
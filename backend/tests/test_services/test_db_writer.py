@@ -0,0 +1,122 @@
+"""Test the single-writer queue and SQLite profile."""
+import asyncio
+
+import pytest
+from sqlalchemy import text
+
+from app.models import UserProgress
+from app.services.db_writer import DatabaseWriter, WriteTimeoutError
+from tests.conftest import TestingSessionLocal, TestingAsyncSessionLocal, async_engine
+
+
+def add_progress(db, device_id):
+    db.add(UserProgress(device_id=device_id, xp=0, level=1, total_questions=0,
+                        correct_answers=0, current_streak=0, best_streak=0, achievements=[]))
+    db.commit()
+    return device_id
+
+
+def fail(db):
+    db.add(UserProgress(device_id="never", xp=0))
+    db.flush()
+    raise ValueError("boom")
+
+
+def device_ids():
+    with TestingSessionLocal() as session:
+        return {p.device_id for p in session.query(UserProgress)}
+
+
+class TestDatabaseWriter:
+    """Tests for batched writes."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_writes_are_batched(self, db):
+        """Test queued writes are committed together and all applied."""
+        writer = DatabaseWriter(async_engine, batch_size=64)
+        batches = []
+        commit_batch = writer._commit_batch
+
+        async def counting(batch):
+            batches.append(len(batch))
+            await commit_batch(batch)
+
+        writer._commit_batch = counting
+        await writer.start()
+        async with TestingAsyncSessionLocal() as session:
+            results = await asyncio.gather(
+                *(writer.run(session, add_progress, f"d{i}") for i in range(20))
+            )
+        await writer.stop()
+
+        assert results == [f"d{i}" for i in range(20)]
+        assert sum(batches) == 20 and len(batches) < 20
+        assert device_ids() == {f"d{i}" for i in range(20)}
+
+    @pytest.mark.asyncio
+    async def test_failing_write_is_isolated(self, db):
+        """Test a failing write rolls back alone and raises to its caller."""
+        writer = DatabaseWriter(async_engine, batch_size=64)
+        await writer.start()
+        async with TestingAsyncSessionLocal() as session:
+            results = await asyncio.gather(
+                writer.run(session, add_progress, "ok-1"),
+                writer.run(session, fail),
+                writer.run(session, add_progress, "ok-2"),
+                return_exceptions=True
+            )
+        await writer.stop()
+
+        assert results[0] == "ok-1" and results[2] == "ok-2"
+        assert isinstance(results[1], ValueError)
+        assert device_ids() == {"ok-1", "ok-2"}
+
+    @pytest.mark.asyncio
+    async def test_timed_out_write_is_still_reported(self, db):
+        """Test a write the writer gets to late raises WriteTimeoutError whose `pending` resolves."""
+        writer = DatabaseWriter(async_engine, batch_size=64, timeout_seconds=0.01)
+        release = asyncio.Event()
+        commit_batch = writer._commit_batch
+
+        async def slow(batch):
+            await release.wait()
+            await commit_batch(batch)
+
+        writer._commit_batch = slow
+        await writer.start()
+        async with TestingAsyncSessionLocal() as session:
+            with pytest.raises(WriteTimeoutError) as raised:
+                await writer.run(session, add_progress, "late")
+        release.set()
+
+        assert await raised.value.pending == "late"
+        await writer.stop()
+        assert device_ids() == {"late"}
+
+    @pytest.mark.asyncio
+    async def test_runs_on_session_when_not_started(self, db):
+        """Test writes run directly on the caller's session without a writer task."""
+        writer = DatabaseWriter(async_engine, batch_size=64)
+        async with TestingAsyncSessionLocal() as session:
+            assert await writer.run(session, add_progress, "direct") == "direct"
+        assert device_ids() == {"direct"}
+
+    def test_runs_on_session_from_another_loop(self, db):
+        """Test a writer started on one event loop doesn't capture writes from another."""
+        writer = DatabaseWriter(async_engine, batch_size=64)
+        other = asyncio.new_event_loop()
+        other.run_until_complete(writer.start())
+
+        async def write():
+            async with TestingAsyncSessionLocal() as session:
+                return await writer.run(session, add_progress, "other-loop")
+
+        assert asyncio.run(write()) == "other-loop"
+        other.run_until_complete(writer.stop())
+        other.close()
+
+    def test_sqlite_profile_applied(self, db):
+        """Test connections come up with the WAL profile."""
+        assert db.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert db.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert db.execute(text("PRAGMA temp_store")).scalar() == 2  # MEMORY
@@ -0,0 +1,60 @@
+"""Test shared HTTP clients."""
+import pytest
+from unittest.mock import patch
+
+from app.services import http_clients
+
+
+class TestLLMClient:
+    """Tests for the pooled LLM client."""
+
+    @pytest.mark.asyncio
+    async def test_short_lived_client_outside_lifespan(self):
+        """Test a throwaway client is used when no shared client is open."""
+        async with http_clients.llm_client() as client:
+            assert client is not http_clients._llm_client
+        assert client.is_closed
+
+    @pytest.mark.asyncio
+    async def test_shared_client_is_reused(self):
+        """Test the lifespan-owned client is reused across calls."""
+        await http_clients.start_http_clients()
+        try:
+            async with http_clients.llm_client() as first:
+                pass
+            async with http_clients.llm_client() as second:
+                pass
+            assert first is second
+            assert not first.is_closed
+
+            async with http_clients.creem_client() as creem:
+                assert creem is not first
+        finally:
+            await http_clients.close_http_clients()
+
+        assert first.is_closed
+        assert http_clients._llm_client is None
+        assert http_clients._creem_client is None
+
+    @pytest.mark.asyncio
+    async def test_separate_connect_and_read_timeouts(self):
+        """Test connect and read timeouts come from settings."""
+        client = http_clients.build_llm_client()
+        try:
+            assert client.timeout.connect == http_clients.settings.llm_connect_timeout
+            assert client.timeout.read == http_clients.settings.llm_read_timeout
+        finally:
+            await client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_http2_falls_back_without_h2(self):
+        """Test HTTP/2 is silently downgraded when h2 is missing."""
+        with patch.object(http_clients.settings, "llm_http2", True), \
+                patch("app.services.http_clients._http2_supported", return_value=False):
+            client = http_clients.build_llm_client()
+        await client.aclose()
+
+    def test_lifespan_opens_and_closes_clients(self, client):
+        """Test the app lifespan owns the shared clients."""
+        assert http_clients._llm_client is not None
+        assert http_clients._creem_client is not None
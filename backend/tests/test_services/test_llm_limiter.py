@@ -0,0 +1,259 @@
+"""Test the adaptive LLM concurrency limiter."""
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.llm_limiter import (
+    AdaptiveLimiter, LLMOverloadedError, BACKGROUND, FREE_TRIAL, PAID, llm_caller
+)
+from tests.conftest import FakeClock, status_error
+
+
+def make_limiter(**kwargs):
+    options = dict(initial_limit=2, min_limit=1, max_limit=10, max_queue=2, queue_timeout=1.0)
+    options.update(kwargs)
+    return AdaptiveLimiter(**options)
+
+
+async def hold(limiter, release: asyncio.Event, started: list, name, priority=BACKGROUND, device_id=""):
+    with llm_caller(priority, device_id):
+        async with limiter.slot():
+            started.append(name)
+            await release.wait()
+
+
+async def run_one_at_a_time(limiter, callers):
+    """Queue `callers` (name, priority, device) behind a held slot; return their start order."""
+    started = []
+    gate = asyncio.Event()
+    blocker = asyncio.create_task(hold(limiter, gate, [], "blocker"))
+    await asyncio.sleep(0)
+
+    released = asyncio.Event()
+    released.set()
+    tasks = []
+    for name, priority, device_id in callers:
+        tasks.append(asyncio.create_task(hold(limiter, released, started, name, priority, device_id)))
+        await asyncio.sleep(0)
+
+    gate.set()
+    await asyncio.gather(blocker, *tasks)
+    return started
+
+
+class TestAdaptiveLimiter:
+    """Tests for admission, shedding and limit adaptation."""
+
+    @pytest.mark.asyncio
+    async def test_queues_over_the_limit_in_order(self):
+        limiter = make_limiter()
+        release = asyncio.Event()
+        started = []
+        tasks = [asyncio.create_task(hold(limiter, release, started, i)) for i in range(4)]
+        await asyncio.sleep(0.01)
+
+        assert started == [0, 1]
+        assert limiter.in_flight == 2
+        assert limiter.queue_depth == 2
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert started == [0, 1, 2, 3]
+        assert limiter.in_flight == 0
+        assert limiter.queue_depth == 0
+
+    @pytest.mark.asyncio
+    async def test_full_queue_rejects_at_once(self):
+        limiter = make_limiter(max_queue=1)
+        release = asyncio.Event()
+        tasks = [asyncio.create_task(hold(limiter, release, [], i)) for i in range(3)]
+        await asyncio.sleep(0.01)
+
+        with pytest.raises(LLMOverloadedError) as exc:
+            async with limiter.slot():
+                pass
+        assert exc.value.reason == "queue_full"
+        assert exc.value.retry_after >= 1
+
+        release.set()
+        await asyncio.gather(*tasks)
+
+    @pytest.mark.asyncio
+    async def test_queue_timeout(self):
+        limiter = make_limiter(initial_limit=1, queue_timeout=0.02)
+        release = asyncio.Event()
+        task = asyncio.create_task(hold(limiter, release, [], 0))
+        await asyncio.sleep(0.01)
+
+        with pytest.raises(LLMOverloadedError) as exc:
+            async with limiter.slot():
+                pass
+        assert exc.value.reason == "queue_timeout"
+        assert limiter.queue_depth == 0
+
+        release.set()
+        await task
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_leaves_queue(self):
+        limiter = make_limiter(initial_limit=1)
+        release = asyncio.Event()
+        started = []
+        first = asyncio.create_task(hold(limiter, release, started, "first"))
+        waiting = asyncio.create_task(hold(limiter, release, started, "cancelled"))
+        await asyncio.sleep(0.01)
+
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        assert limiter.queue_depth == 0
+
+        release.set()
+        await first
+        assert started == ["first"]
+        assert limiter.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_overload_signal_shrinks_limit_once_per_window(self):
+        clock = FakeClock()
+        limiter = make_limiter(initial_limit=10, backoff=0.5, clock=clock)
+
+        for _ in range(2):
+            with pytest.raises(httpx.HTTPStatusError):
+                async with limiter.slot():
+                    raise status_error(429)
+        assert limiter.limit == 5
+
+        clock.now += 1.0
+        with pytest.raises(httpx.HTTPStatusError):
+            async with limiter.slot():
+                raise status_error(503)
+        assert limiter.limit == 2
+
+        # A client error says nothing about load
+        with pytest.raises(httpx.HTTPStatusError):
+            async with limiter.slot():
+                raise status_error(400)
+        assert limiter.limit == 2
+
+    @pytest.mark.asyncio
+    async def test_slow_call_shrinks_limit(self):
+        clock = FakeClock()
+        limiter = make_limiter(initial_limit=4, backoff=0.5, clock=clock)
+
+        async with limiter.slot():
+            clock.now += 1.0
+        async with limiter.slot():
+            clock.now += 5.0
+
+        assert limiter.limit == 2
+
+    @pytest.mark.asyncio
+    async def test_one_outlier_or_a_slower_model_does_not_shrink_limit(self):
+        clock = FakeClock()
+        limiter = make_limiter(initial_limit=4, backoff=0.5, clock=clock)
+
+        for latency in (1.0, 1.0, 2.5, 1.0):
+            async with limiter.slot("fast"):
+                clock.now += latency
+        for _ in range(3):
+            async with limiter.slot("slow"):
+                clock.now += 4.0
+
+        assert limiter.limit == 4
+
+    @pytest.mark.asyncio
+    async def test_grows_only_while_in_use(self):
+        clock = FakeClock()
+        limiter = make_limiter(initial_limit=2, clock=clock)
+
+        # One call at a time never uses half of a larger limit
+        for _ in range(20):
+            async with limiter.slot():
+                clock.now += 1.0
+        assert limiter.limit == 2
+
+        release = asyncio.Event()
+        for _ in range(10):
+            tasks = [asyncio.create_task(hold(limiter, release, [], i)) for i in range(limiter.limit)]
+            await asyncio.sleep(0)
+            clock.now += 1.0
+            release.set()
+            await asyncio.gather(*tasks)
+            release.clear()
+        assert limiter.limit >= 4
+
+    @pytest.mark.asyncio
+    async def test_disabled_admits_everything(self):
+        limiter = make_limiter(initial_limit=1, max_queue=0, enabled=False)
+        release = asyncio.Event()
+        started = []
+        tasks = [asyncio.create_task(hold(limiter, release, started, i)) for i in range(5)]
+        await asyncio.sleep(0.01)
+
+        assert len(started) == 5
+        release.set()
+        await asyncio.gather(*tasks)
+
+
+class TestPriorityScheduling:
+    """Tests for class priority, device fairness and the free-trial share."""
+
+    @pytest.mark.asyncio
+    async def test_paid_first_then_free_trial_then_background(self):
+        limiter = make_limiter(initial_limit=1, max_queue=10, free_trial_min_share=0)
+
+        started = await run_one_at_a_time(limiter, [
+            ("background", BACKGROUND, ""),
+            ("free", FREE_TRIAL, "a"),
+            ("paid", PAID, "b"),
+        ])
+
+        assert started == ["paid", "free", "background"]
+
+    @pytest.mark.asyncio
+    async def test_devices_take_turns(self):
+        limiter = make_limiter(initial_limit=1, max_queue=10)
+
+        started = await run_one_at_a_time(limiter, [
+            ("a1", PAID, "a"), ("a2", PAID, "a"), ("a3", PAID, "a"),
+            ("b1", PAID, "b"), ("c1", PAID, "c"),
+        ])
+
+        assert started == ["a1", "b1", "c1", "a2", "a3"]
+
+    @pytest.mark.asyncio
+    async def test_free_trials_get_their_share(self):
+        limiter = make_limiter(initial_limit=1, max_queue=20, free_trial_min_share=0.25)
+
+        started = await run_one_at_a_time(
+            limiter,
+            [(f"paid{i}", PAID, f"p{i}") for i in range(6)] + [(f"free{i}", FREE_TRIAL, f"f{i}") for i in range(2)]
+        )
+
+        assert started == ["paid0", "paid1", "paid2", "free0", "paid3", "paid4", "paid5", "free1"]
+
+    @pytest.mark.asyncio
+    async def test_full_queue_preempts_lower_class(self):
+        limiter = make_limiter(initial_limit=1, max_queue=1)
+        gate = asyncio.Event()
+        started = []
+        blocker = asyncio.create_task(hold(limiter, gate, started, "blocker"))
+        background = asyncio.create_task(hold(limiter, gate, started, "background", BACKGROUND))
+        await asyncio.sleep(0.01)
+
+        paid = asyncio.create_task(hold(limiter, gate, started, "paid", PAID, "a"))
+        await asyncio.sleep(0.01)
+
+        with pytest.raises(LLMOverloadedError) as exc:
+            await background
+        assert exc.value.reason == "preempted"
+
+        # Nothing below free trial is left to push out
+        with pytest.raises(LLMOverloadedError):
+            await hold(limiter, gate, started, "free", FREE_TRIAL, "b")
+
+        gate.set()
+        await asyncio.gather(blocker, paid)
+        assert started == ["blocker", "paid"]
+        assert limiter.queue_depth == 0
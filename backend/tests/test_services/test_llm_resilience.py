@@ -0,0 +1,145 @@
+"""Test retries, hedging and deadlines for LLM calls."""
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.services.llm_limiter import LLMDeadlineExceeded, LLMOverloadedError, llm_caller, PAID
+from app.services.llm_resilience import ResilientCaller, retry_reason
+from tests.conftest import status_error
+
+
+def make_caller(**kwargs):
+    options = dict(
+        max_attempts=3, backoff_base=0.001, backoff_max=0.01, deadline=5.0, attempt_timeout=5.0,
+        hedge_min_samples=3, hedge_min_delay=0.01
+    )
+    options.update(kwargs)
+    return ResilientCaller(**options)
+
+
+def scripted(*outcomes):
+    """An attempt that fails or answers with each outcome in turn."""
+    calls = []
+
+    async def attempt(timeout):
+        outcome = outcomes[len(calls)]
+        calls.append(timeout)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    return attempt, calls
+
+
+class TestRetryReason:
+    """Tests for which failures are worth another attempt."""
+
+    def test_classifies_failures(self):
+        assert retry_reason(httpx.ReadTimeout("slow")) == "timeout"
+        assert retry_reason(status_error(429)) == "rate_limited"
+        assert retry_reason(status_error(502)) == "server_error"
+        assert retry_reason(httpx.ConnectError("refused")) == "transport"
+        assert retry_reason(ValueError("No JSON array found")) == "malformed"
+
+    def test_does_not_retry_client_errors_or_local_shedding(self):
+        assert retry_reason(status_error(400)) is None
+        assert retry_reason(LLMOverloadedError("queue_full", 1)) is None
+        assert retry_reason(LLMDeadlineExceeded()) is None
+
+
+class TestResilientCaller:
+    """Tests for retries, hedges and the deadline."""
+
+    @pytest.mark.asyncio
+    async def test_retries_until_success(self):
+        attempt, calls = scripted(status_error(503), ValueError("bad json"), "quiz")
+
+        assert await make_caller().call("quiz", attempt) == "quiz"
+        assert len(calls) == 3
+
+    @pytest.mark.asyncio
+    async def test_gives_up_after_max_attempts(self):
+        attempt, calls = scripted(*[status_error(500)] * 5)
+
+        with pytest.raises(httpx.HTTPStatusError):
+            await make_caller().call("quiz", attempt)
+        assert len(calls) == 3
+
+        attempt, calls = scripted(*[status_error(500)] * 5)
+        with pytest.raises(httpx.HTTPStatusError):
+            await make_caller().call("batch", attempt, max_attempts=1)
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_does_not_retry_client_errors(self):
+        attempt, calls = scripted(status_error(401), "quiz")
+
+        with pytest.raises(httpx.HTTPStatusError):
+            await make_caller().call("quiz", attempt)
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_waits_for_retry_after(self):
+        attempt, calls = scripted(status_error(429, {"retry-after": "0.05"}), "quiz")
+
+        started = time.monotonic()
+        assert await make_caller().call("quiz", attempt) == "quiz"
+        assert time.monotonic() - started >= 0.05
+
+    @pytest.mark.asyncio
+    async def test_no_retry_past_the_deadline(self):
+        attempt, calls = scripted(status_error(429, {"retry-after": "10"}), "quiz")
+
+        with pytest.raises(httpx.HTTPStatusError):
+            await make_caller(deadline=1.0).call("quiz", attempt)
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_caller_deadline_bounds_attempts(self):
+        async def hangs(timeout):
+            await asyncio.sleep(10)
+
+        with llm_caller(PAID, "a", deadline=time.monotonic() + 0.05):
+            with pytest.raises(LLMDeadlineExceeded):
+                await make_caller().call("quiz", hangs)
+
+    @pytest.mark.asyncio
+    async def test_hedges_slow_attempt(self):
+        caller = make_caller()
+        for _ in range(3):
+            assert await caller.call("quiz", scripted("warm")[0]) == "warm"
+
+        started = []
+        cancelled = []
+
+        async def first_slow(timeout):
+            started.append(timeout)
+            if len(started) == 1:
+                try:
+                    await asyncio.sleep(10)
+                except asyncio.CancelledError:
+                    cancelled.append(True)
+                    raise
+            return "hedge"
+
+        assert await caller.call("quiz", first_slow) == "hedge"
+        await asyncio.sleep(0.01)  # let the cancelled primary unwind
+        assert len(started) == 2
+        assert cancelled == [True]
+
+    @pytest.mark.asyncio
+    async def test_no_hedge_without_capacity(self):
+        caller = make_caller(can_hedge=lambda: False)
+        for _ in range(3):
+            await caller.call("quiz", scripted("warm")[0])
+        started = []
+
+        async def slow(timeout):
+            started.append(timeout)
+            await asyncio.sleep(0.05)
+            return "quiz"
+
+        assert await caller.call("quiz", slow) == "quiz"
+        assert len(started) == 1
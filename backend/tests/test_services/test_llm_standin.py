@@ -0,0 +1,122 @@
+"""Test the LLM client path end to end against the local LLM stand-in."""
+import random
+import pytest
+
+from app.models import GenerationToken
+from app.services.quiz_batcher import QuizSpec
+from app.services.quiz_service import generate_quiz, request_quiz_batch, stream_quiz
+from benchmarks.llm_standin import break_answer, parse_latency
+
+
+class TestStandIn:
+    """Tests for the stand-in itself."""
+
+    def test_parse_latency(self):
+        rng = random.Random(0)
+        assert parse_latency("fixed:250")(rng) == 0.25
+        assert 0.1 <= parse_latency("uniform:100:200")(rng) <= 0.2
+        assert parse_latency("lognormal:800:0.5")(rng) > 0
+        with pytest.raises(ValueError):
+            parse_latency("gamma:1")
+
+    def test_break_answer_truncates(self):
+        assert break_answer('[{"a": 1}]', random.Random(0), "truncated") != '[{"a": 1}]'
+
+
+class TestAgainstStandIn:
+    """The real quiz service talking HTTP to the stand-in."""
+
+    @pytest.mark.asyncio
+    async def test_generate_quiz(self, llm_standin):
+        questions = await generate_quiz("Photosynthesis", 4, "easy", "en")
+
+        assert len(questions) == 4
+        assert [q.type for q in questions[:3]] == ["multiple_choice", "true_false", "fill_blank"]
+        assert "Photosynthesis" in questions[0].question
+        assert llm_standin.stats.ok == 1
+
+    @pytest.mark.asyncio
+    async def test_stream_quiz(self, llm_standin):
+        llm_standin.configure(chunk_chars=7)
+
+        questions = [q async for q in stream_quiz("Rivers", 3, "medium", "en")]
+
+        assert len(questions) == 3
+        assert llm_standin.stats.streamed == 1
+
+    @pytest.mark.asyncio
+    async def test_batch_demux(self, llm_standin):
+        specs = [QuizSpec("Algebra", 2, "easy", "en"), QuizSpec("Poetry", 3, "hard", "en")]
+
+        answers = await request_quiz_batch(specs)
+
+        assert [len(a) for a in answers] == [2, 3]
+        assert "Poetry" in answers[1][0].question
+        assert llm_standin.stats.batched == 1
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("change,status", [
+        ({"rate_limit_rate": 1.0}, 429),
+        ({"error_rate": 1.0}, 500),
+    ])
+    async def test_upstream_errors(self, llm_standin, change, status):
+        llm_standin.configure(**change, retry_after_seconds=0)
+
+        with pytest.raises(Exception, match=f"LLM API error: {status}"):
+            await generate_quiz("Chemistry", 3, "easy", "en")
+        assert llm_standin.stats.requests == 3  # retried up to llm_max_attempts
+
+    @pytest.mark.asyncio
+    async def test_malformed_answer(self, llm_standin):
+        llm_standin.configure(malformed_rate=1.0, malformed_mode="prose")
+
+        with pytest.raises(Exception, match="No JSON array found"):
+            await generate_quiz("Chemistry", 3, "easy", "en")
+        assert llm_standin.stats.malformed == 3  # every attempt
+
+    @pytest.mark.asyncio
+    async def test_truncated_answer_is_repaired_and_topped_up(self, llm_standin):
+        llm_standin.configure(malformed_rate=1.0, malformed_mode="truncated")
+
+        questions = await generate_quiz("Chemistry", 5, "easy", "en")
+
+        # 3 complete questions survive the cut; the top-up is cut before
+        # its first one closes, so the partial quiz is served
+        assert len(questions) == 3
+        assert llm_standin.stats.requests == 2
+
+    @pytest.mark.asyncio
+    async def test_batch_missing_field(self, llm_standin):
+        llm_standin.configure(malformed_rate=1.0, malformed_mode="missing_field")
+        specs = [QuizSpec("Algebra", 2, "easy", "en"), QuizSpec("Poetry", 2, "easy", "en")]
+
+        answers = await request_quiz_batch(specs)
+
+        assert answers == [None, None]
+
+
+def test_generate_and_submit(client, db, llm_standin):
+    """A quiz generated through the real LLM path can be submitted and graded."""
+    device_id = "standin-device"
+    db.add(GenerationToken(device_id=device_id, tokens_remaining=3, tokens_total=3))
+    db.commit()
+    headers = {"X-Device-Id": device_id}
+
+    generated = client.post(
+        "/api/v1/quiz/generate",
+        json={"topic": "Volcanoes", "num_questions": 3, "difficulty": "easy"},
+        headers=headers
+    )
+    assert generated.status_code == 200
+    quiz = generated.json()
+
+    submitted = client.post("/api/v1/quiz/submit", json={
+        "quiz_id": quiz["quiz_id"],
+        "answers": [
+            {"question_id": q["id"], "answer": q["correct_answer"]} for q in quiz["questions"]
+        ]
+    }, headers=headers)
+
+    assert submitted.status_code == 200
+    assert submitted.json()["correct_count"] == 3
+    assert llm_standin.stats.ok == 1
@@ -0,0 +1,78 @@
+"""Test model routing and shadow calls."""
+import asyncio
+import random
+
+import pytest
+
+from app.services.model_router import ModelRoute, ModelRouter, parse_routes
+from app.services.quiz_batcher import QuizSpec
+
+ROUTES = """[
+    {"model": "small", "max_questions": 3, "difficulties": ["easy"]},
+    {"model": "local", "languages": ["zh"], "tokens_per_question": 400}
+]"""
+
+
+def make_router(**kwargs):
+    options = dict(
+        rules=parse_routes(ROUTES), default_model="large",
+        tokens_per_question=300, overhead_tokens=200, max_tokens=4000
+    )
+    options.update(kwargs)
+    return ModelRouter(**options)
+
+
+class TestModelRouter:
+    """Tests for picking a model and output budget."""
+
+    def test_first_matching_rule_wins(self):
+        router = make_router()
+
+        assert router.route(1, "easy", "en") == ModelRoute("small", 500)
+        assert router.route(3, "easy", "zh") == ModelRoute("small", 1100)
+        assert router.route(3, "hard", "zh") == ModelRoute("local", 1400)
+        assert router.route(4, "easy", "en") == ModelRoute("large", 1400)
+
+    def test_budget_is_capped(self):
+        assert make_router().route(20, "hard", "en") == ModelRoute("large", 4000)
+
+    def test_batch_routes_by_largest_quiz_at_hardest_difficulty(self):
+        router = make_router()
+
+        small = [QuizSpec("a", 3, "easy", "en"), QuizSpec("b", 2, "easy", "en"), QuizSpec("c", 3, "easy", "en")]
+        assert router.route_batch(small) == ModelRoute("small", 2600)
+
+        mixed = [QuizSpec("a", 1, "easy", "en"), QuizSpec("b", 1, "medium", "en")]
+        assert router.route_batch(mixed).model == "large"
+
+        languages = [QuizSpec("a", 5, "hard", "zh"), QuizSpec("b", 5, "hard", "en")]
+        assert router.route_batch(languages) == ModelRoute("large", 3200)
+
+    def test_empty_table_uses_default_model(self):
+        assert make_router(rules=parse_routes("")).route(1, "easy", "en").model == "large"
+
+    def test_shadow_sampling(self):
+        router = make_router(shadow_model="small", shadow_sample_rate=0.25, rng=random.Random(0))
+        route = ModelRoute("large", 1000)
+
+        sampled = sum(router.shadow_for(route) == "small" for _ in range(1000))
+        assert 200 < sampled < 300
+        # Never shadow a call onto its own model
+        assert router.shadow_for(ModelRoute("small", 500)) is None
+        assert make_router().shadow_for(route) is None
+
+
+class TestAgainstStandIn:
+    """Routed and shadowed calls against the LLM stand-in."""
+
+    @pytest.mark.asyncio
+    async def test_routes_and_shadows(self, llm_standin, monkeypatch):
+        from app.services import quiz_service
+
+        monkeypatch.setattr(quiz_service, "model_router", make_router(shadow_model="cheap", shadow_sample_rate=1.0))
+
+        questions = await quiz_service.request_quiz(QuizSpec("Python", 2, "easy", "en"))
+        assert len(questions) == 2
+        await asyncio.gather(*quiz_service._shadow_tasks)
+
+        assert llm_standin.stats.models == {"small": 1, "cheap": 1}
@@ -0,0 +1,145 @@
+"""Test the write-behind progress engine."""
+import asyncio
+import shutil
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from app.models import StudySession, UserProgress
+from app.services.progress_engine import ProgressEngine
+from app.services.quiz_store import StoredQuiz
+from tests.conftest import TestingSessionLocal, TestingAsyncSessionLocal, async_engine
+
+QUIZ = StoredQuiz(
+    quiz_id="quiz", device_id="device", topic="Math", difficulty="easy",
+    answer_key=(("q1", "A", "e"), ("q2", "B", "e"))
+)
+
+
+def make_engine(journal_dir, **kwargs):
+    options = dict(flush_interval_ms=60000, flush_max_items=1000, max_rows=100)
+    options.update(kwargs)
+    return ProgressEngine(async_engine, journal_dir=str(journal_dir), **options)
+
+
+async def submit(engine, device_id, correct=2):
+    async with TestingAsyncSessionLocal() as session:
+        return await engine.submit(session, device_id, QUIZ, correct, 30)
+
+
+def crash(engine):
+    """Stop an engine without its shutdown flush."""
+    engine._task.cancel()
+    engine._journal.close()
+
+
+def stored():
+    with TestingSessionLocal() as session:
+        progress = {p.device_id: p.xp for p in session.query(UserProgress)}
+        return progress, session.query(StudySession).count()
+
+
+class TestProgressEngine:
+    """Tests for buffering, flushing and journal replay."""
+
+    @pytest.mark.asyncio
+    async def test_submits_applied_in_memory_then_flushed(self, db, tmp_path):
+        """Test submits are visible at once and committed by one flush."""
+        engine = make_engine(tmp_path)
+        await engine.start()
+
+        progress, xp_earned, achievements = await submit(engine, "d1")
+        await submit(engine, "d1", correct=1)
+        await submit(engine, "d2")
+
+        assert xp_earned == 2 * 5 + 20 and "first_quiz" in achievements
+        assert engine.get("d1").total_questions == 4
+        assert stored() == ({}, 0)
+
+        await engine.flush()
+        assert stored() == ({"d1": engine.get("d1").xp, "d2": xp_earned}, 3)
+        assert list(tmp_path.iterdir()) == []
+        await engine.stop()
+
+    @pytest.mark.asyncio
+    async def test_early_flush_at_max_items(self, db, tmp_path):
+        """Test enough pending submits trigger a flush before the interval."""
+        engine = make_engine(tmp_path, flush_max_items=2)
+        await engine.start()
+
+        await submit(engine, "d1")
+        await submit(engine, "d2")
+        for _ in range(100):
+            if stored()[1] == 2:
+                break
+            await asyncio.sleep(0.01)
+        assert stored()[1] == 2 and engine.pending == 0
+        await engine.stop()
+
+    @pytest.mark.asyncio
+    async def test_concurrent_submits_share_an_fsync_off_the_loop(self, db, tmp_path):
+        """Test the journal fsync runs on a worker thread and is shared by waiting submits."""
+        engine = make_engine(tmp_path)
+        await engine.start()
+        threads = []
+
+        def slow_fsync(fd):
+            threads.append(threading.get_ident())
+            time.sleep(0.05)
+
+        with patch("app.services.progress_engine.os.fsync", slow_fsync):
+            await asyncio.gather(*(submit(engine, f"d{i}") for i in range(10)))
+
+        assert 1 <= len(threads) < 10
+        assert threading.get_ident() not in threads
+        await engine.stop()
+
+    @pytest.mark.asyncio
+    async def test_stop_flushes(self, db, tmp_path):
+        """Test a clean shutdown commits everything pending."""
+        engine = make_engine(tmp_path)
+        await engine.start()
+        _, xp_earned, _ = await submit(engine, "d1")
+        await engine.stop()
+
+        assert stored() == ({"d1": xp_earned}, 1)
+        assert engine.get("d1") is None
+
+    @pytest.mark.asyncio
+    async def test_crash_replays_journal(self, db, tmp_path):
+        """Test submits acknowledged before a crash are applied on restart."""
+        engine = make_engine(tmp_path)
+        await engine.start()
+        await submit(engine, "d1")
+        progress, _, _ = await submit(engine, "d1", correct=1)
+        crash(engine)
+        assert stored() == ({}, 0)
+
+        restarted = make_engine(tmp_path)
+        await restarted.start()
+        assert stored() == ({"d1": progress.xp}, 2)
+
+        # Later submits continue from the replayed row
+        again, _, _ = await submit(restarted, "d1")
+        assert again.total_questions == 6
+        await restarted.stop()
+
+    @pytest.mark.asyncio
+    async def test_replay_skips_committed_entries(self, db, tmp_path):
+        """Test a crash between commit and journal cleanup doesn't apply submits twice."""
+        engine = make_engine(tmp_path)
+        await engine.start()
+        progress, _, _ = await submit(engine, "d1")
+        backup = tmp_path.parent / "backup"
+        shutil.copytree(tmp_path, backup)
+        await engine.flush()
+        crash_dir = tmp_path.parent / "crashed"
+        shutil.copytree(backup, crash_dir)
+
+        restarted = make_engine(crash_dir)
+        await restarted.start()
+        assert stored() == ({"d1": progress.xp}, 1)
+        await restarted.stop()
+        await engine.stop()
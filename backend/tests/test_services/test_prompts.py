@@ -0,0 +1,125 @@
+"""Test the prompt registry, token estimates and learned output budgets."""
+import pytest
+
+from app.services import quiz_service
+from app.services.model_router import ModelRoute, ModelRouter, RouteRule
+from app.services.prompts import OutputBudget, PromptRegistry, estimate_tokens
+from app.services.quiz_batcher import QuizSpec
+
+
+class TestPromptRegistry:
+    """Tests for compiled, versioned templates."""
+
+    def test_quiz_prompt(self):
+        prompt = PromptRegistry().quiz("Rivers", 4, "hard", "fr")
+
+        assert prompt.template == "quiz/v2"
+        assert prompt.text.startswith('Generate exactly 4 quiz questions about "Rivers" at hard difficulty level.')
+        assert "Write all content in French" in prompt.text
+        assert (prompt.num_questions, prompt.language) == (4, "fr")
+
+    def test_examples_are_sized_to_the_quiz(self):
+        registry = PromptRegistry()
+
+        one = registry.quiz("Rivers", 1, "easy", "en").text
+        five = registry.quiz("Rivers", 5, "easy", "en").text
+
+        assert "multiple_choice" in one and "true_false" not in one
+        assert all(kind in five for kind in ("multiple_choice", "true_false", "fill_blank"))
+        # English needs no language instructions
+        assert "English" not in five
+
+    def test_latest_version_is_smaller_than_v1(self):
+        v1 = PromptRegistry(versions={"quiz": "v1"}).quiz("Rivers", 3, "easy", "en")
+
+        assert v1.template == "quiz/v1"
+        assert PromptRegistry().quiz("Rivers", 3, "easy", "en").estimated_tokens < v1.estimated_tokens * 0.8
+
+    def test_templates_are_compiled_once(self):
+        registry = PromptRegistry()
+        assert registry.compiled("quiz", "en", "easy", 3) is registry.compiled("quiz", "en", "easy", 3)
+
+    def test_topic_is_not_a_template(self):
+        prompt = PromptRegistry().quiz("{examples} in {count}", 2, "easy", "en")
+        assert 'about "{examples} in {count}"' in prompt.text
+
+    def test_top_up_lists_asked_questions(self):
+        prompt = PromptRegistry().top_up("Rivers", 2, "easy", "en", ["Longest river?", "Deepest river?"])
+
+        assert prompt.template == "top_up/v2"
+        assert "Generate exactly 2 quiz questions" in prompt.text
+        assert prompt.text.endswith("- Longest river?\n- Deepest river?")
+
+    def test_batch_prompt(self):
+        prompt = PromptRegistry().batch([QuizSpec("A", 3, "easy", "en"), QuizSpec("B", 2, "hard", "fr")])
+
+        assert prompt.template == "batch/v2"
+        assert (prompt.num_questions, prompt.language) == (5, None)
+
+    def test_unknown_version_raises(self):
+        with pytest.raises(ValueError):
+            PromptRegistry(versions={"quiz": "v9"})
+
+
+class TestTokenEstimate:
+    def test_estimate_tokens(self):
+        assert estimate_tokens("abcd" * 10) == 10
+        assert estimate_tokens("光合作用") == 4
+        assert estimate_tokens("") == 0
+
+
+class TestOutputBudget:
+    """Tests for learning completion tokens per question."""
+
+    def test_learns_after_min_samples(self):
+        budget = OutputBudget(headroom=1.5, min_samples=3)
+        prompt = PromptRegistry().quiz("Rivers", 4, "easy", "en")
+
+        for _ in range(2):
+            budget.observe(prompt, 400)
+        assert budget.tokens_per_question("en") is None
+
+        budget.observe(prompt, 400)
+        assert budget.tokens_per_question("en") == 150
+        assert budget.tokens_per_question("zh") is None
+
+    def test_ignores_mixed_language_batches(self):
+        budget = OutputBudget(min_samples=1)
+        budget.observe(PromptRegistry().batch([QuizSpec("A", 3, "easy", "en"), QuizSpec("B", 2, "easy", "fr")]), 900)
+        assert budget._per_question == {}
+
+    def test_router_prefers_rule_then_learned_budget(self):
+        learned = {"zh": 500}
+        router = ModelRouter(
+            [RouteRule("small", max_questions=2, tokens_per_question=100)], "large",
+            tokens_per_question=300, overhead_tokens=0, max_tokens=4000,
+            learned_tokens_per_question=learned.get
+        )
+
+        assert router.route(2, "easy", "zh") == ModelRoute("small", 200)
+        assert router.route(4, "easy", "zh") == ModelRoute("large", 2000)
+        assert router.route(4, "easy", "en") == ModelRoute("large", 1200)
+
+
+class TestAgainstStandIn:
+    """Usage flows into the output budget from the LLM stand-in."""
+
+    @pytest.mark.asyncio
+    async def test_usage_sizes_later_calls(self, llm_standin, monkeypatch):
+        budget = OutputBudget(min_samples=1)
+        monkeypatch.setattr(quiz_service, "output_budget", budget)
+
+        await quiz_service.request_quiz(QuizSpec("Rivers", 3, "medium", "en"))
+
+        learned = budget.tokens_per_question("en")
+        assert learned and learned < 300
+
+    @pytest.mark.asyncio
+    async def test_stream_usage_is_estimated(self, llm_standin, monkeypatch):
+        budget = OutputBudget(min_samples=1)
+        monkeypatch.setattr(quiz_service, "output_budget", budget)
+
+        questions = [q async for q in quiz_service.stream_quiz("Rivers", 3, "medium", "en")]
+
+        assert len(questions) == 3
+        assert budget.tokens_per_question("en")
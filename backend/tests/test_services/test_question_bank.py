@@ -0,0 +1,164 @@
+"""Test the question bank and SEO catalog."""
+import asyncio
+import pytest
+from unittest.mock import patch, AsyncMock
+
+from app.models import BankQuestion
+from app.schemas import QuizQuestion
+from app.services.question_bank import (
+    add_to_bank, assemble_quiz_from_bank, bank_count, warm_question_bank, warm_from_cli
+)
+from app.services import http_clients
+from app.services.topic_catalog import parse_seo_catalog, load_seo_catalog, topic_slug
+from tests.conftest import TestingSessionLocal, TestingAsyncSessionLocal
+
+CATALOG_SOURCE = """
+const categories = {
+  programming: ['python', 'rest-api'],
+  math: ["algebra"]
+};
+
+const levels = ['beginner', 'advanced'];
+const languages = ['en', 'fr'];
+"""
+
+
+def make_questions(prefix, n):
+    return [
+        QuizQuestion(id=f"{prefix}{i}", type="fill_blank", question=f"{prefix} question {i}?",
+                     correct_answer="a", explanation="e")
+        for i in range(n)
+    ]
+
+
+class TestTopicCatalog:
+    """Tests for SEO catalog parsing."""
+
+    def test_parse_catalog(self):
+        """Test categories, levels and languages are extracted."""
+        catalog = parse_seo_catalog(CATALOG_SOURCE)
+        assert catalog.categories == {"programming": ["python", "rest-api"], "math": ["algebra"]}
+        assert catalog.difficulties == ["easy", "hard"]
+        assert catalog.languages == ["en", "fr"]
+        assert catalog.category_of("algebra") == "math"
+
+    def test_repo_catalog_loads(self):
+        """Test the real SEO script parses into a full catalog."""
+        catalog = load_seo_catalog()
+        assert len(catalog.slugs) > 200
+        assert len(catalog.languages) == 7
+
+    def test_topic_slug(self):
+        """Test topics slugify like the SEO page paths."""
+        assert topic_slug("REST API") == "rest-api"
+        assert topic_slug("  Machine Learning! ") == "machine-learning"
+
+
+class TestQuestionBank:
+    """Tests for storing and assembling banked questions."""
+
+    def test_add_skips_duplicates(self, db):
+        """Test exact duplicate questions are not stored twice."""
+        key = ("python", "easy", "en")
+        assert add_to_bank(db, key, make_questions("p", 3)) == 3
+        assert add_to_bank(db, key, make_questions("p", 4)) == 1
+        assert bank_count(db, key) == 4
+
+    def test_assemble_short_bank_returns_none(self, db):
+        """Test a bank with too few questions falls back."""
+        add_to_bank(db, ("python", "easy", "en"), make_questions("p", 2))
+        assert assemble_quiz_from_bank(db, "Python", "easy", "en", 3) is None
+
+    def test_assemble_rotates_least_served(self, db):
+        """Test quizzes are assembled with fresh ids, least-served first."""
+        add_to_bank(db, ("rest-api", "medium", "fr"), make_questions("r", 4))
+
+        first = assemble_quiz_from_bank(db, "REST API", "medium", "fr", 2)
+        second = assemble_quiz_from_bank(db, "rest api", "medium", "fr", 2)
+
+        assert len(first) == len(second) == 2
+        assert not {q.question for q in first} & {q.question for q in second}
+        assert all(len(q.id) == 8 for q in first)
+
+
+class TestWarmer:
+    """Tests for the bank warmer."""
+
+    @pytest.mark.asyncio
+    async def test_warm_fills_keys_with_bounded_concurrency(self, db):
+        """Test each key is filled to target with at most N LLM calls at once."""
+        in_flight = 0
+        peak = 0
+        calls = 0
+
+        async def fake_generate(topic, num_questions, difficulty, language):
+            nonlocal in_flight, peak, calls
+            calls += 1
+            call = calls
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return make_questions(f"{topic}-{call}-", num_questions)
+
+        keys = [(slug, "easy", "en") for slug in ("python", "algebra", "rest-api", "sql")]
+        with patch("app.services.question_bank.generate_quiz", side_effect=fake_generate), \
+                patch("app.services.question_bank.AsyncSessionLocal", TestingAsyncSessionLocal):
+            added = await warm_question_bank(keys, target=15, concurrency=2)
+
+        assert added == 60
+        assert peak <= 2
+        for key in keys:
+            assert bank_count(db, key) == 15
+
+    @pytest.mark.asyncio
+    async def test_warm_survives_failures(self, db):
+        """Test a failing key does not stop the others."""
+        async def flaky(topic, num_questions, difficulty, language):
+            if topic == "python":
+                raise Exception("LLM API error: 500")
+            return make_questions(topic, num_questions)
+
+        with patch("app.services.question_bank.generate_quiz", side_effect=flaky), \
+                patch("app.services.question_bank.AsyncSessionLocal", TestingAsyncSessionLocal):
+            added = await warm_question_bank(
+                [("python", "easy", "en"), ("algebra", "easy", "en")], target=5, concurrency=1
+            )
+
+        assert added == 5
+
+    @pytest.mark.asyncio
+    async def test_cli_warms_with_shared_llm_client(self, db):
+        """Test the CLI run opens the pooled LLM client and closes it afterwards."""
+        clients = []
+
+        async def fake_generate(topic, num_questions, difficulty, language):
+            clients.append(http_clients._llm_client)
+            return make_questions(topic, num_questions)
+
+        with patch("app.services.question_bank.generate_quiz", side_effect=fake_generate), \
+                patch("app.services.question_bank.AsyncSessionLocal", TestingAsyncSessionLocal):
+            added = await warm_from_cli([("python", "easy", "en")], target=5, concurrency=1)
+
+        assert added == 5
+        assert clients and clients[0] is not None
+        assert http_clients._llm_client is None
+
+
+class TestGenerateFromBank:
+    """Tests for the /quiz/generate bank fast path."""
+
+    def test_banked_topic_skips_llm(self, client, db):
+        """Test a banked topic is served without a live generation."""
+        add_to_bank(db, ("python", "medium", "en"), make_questions("p", 5))
+
+        with patch("app.api.quiz.generate_quiz", new_callable=AsyncMock) as mock:
+            response = client.post(
+                "/api/v1/quiz/generate",
+                json={"topic": "Python", "num_questions": 5},
+                headers={"X-Device-Id": "bank-device"}
+            )
+
+        assert response.status_code == 200
+        assert len(response.json()["questions"]) == 5
+        mock.assert_not_awaited()
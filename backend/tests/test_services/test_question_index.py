@@ -0,0 +1,181 @@
+"""Test near-duplicate question detection."""
+import json
+
+import pytest
+
+from unittest.mock import patch
+
+from app.models import BankQuestion, CachedQuiz
+from app.schemas import QuizOption, QuizQuestion
+from app.services import quiz_service
+from app.services.question_bank import add_to_bank, assemble_quiz_from_bank
+from app.services.question_index import QuestionIndex, RecentQuestions, main, question_index, reindex
+from app.services.quiz_batcher import QuizSpec
+from tests.conftest import TestingSessionLocal, engine
+
+NEAR_DUPLICATES = [
+    ("What is the capital of France?", "What is the capital city of France?"),
+    ("Which of the following is a mammal?", "Which of the following animals is a mammal?"),
+    ("光合作用发生在植物细胞的哪个部位？", "光合作用发生在植物细胞的什么部位？"),
+]
+
+
+def question(text, id="q", answer="a"):
+    return QuizQuestion(id=id, type="fill_blank", question=text, correct_answer=answer, explanation="e")
+
+
+def multiple_choice(text, options, answer):
+    return QuizQuestion(
+        id="q", type="multiple_choice", question=text, correct_answer=answer, explanation="e",
+        options=[QuizOption(id=option_id, text=option) for option_id, option in zip("ABCD", options)]
+    )
+
+
+def bank_row(text, served=0):
+    return BankQuestion(topic_slug="python", difficulty="easy", language="en", served_count=served, question={
+        "type": "fill_blank", "question": text, "options": None, "correct_answer": "a", "explanation": "e"
+    })
+
+
+class TestQuestionIndex:
+    """Tests for grouping question texts."""
+
+    @pytest.mark.parametrize("first,second", NEAR_DUPLICATES)
+    def test_near_duplicates_share_a_group(self, first, second):
+        index = QuestionIndex()
+        assert index.group_of(question(first)) == index.group_of(question(second)) == \
+            index.group_of(question(first.upper()))
+
+    def test_different_questions_stay_apart(self):
+        index = QuestionIndex()
+        texts = [("What is the capital of France?", "Paris"), ("What is the capital of Spain?", "Madrid"),
+                 ("Is 7 a prime number?", "True"), ("Is 9 a prime number?", "False"),
+                 ("Which gas do plants absorb?", "CO2"), ("Which of the following is a prime number?", "7"),
+                 ("Which of the following is NOT a prime number?", "7")]
+        assert len({index.group_of(question(text, answer=answer)) for text, answer in texts}) == len(texts)
+
+    def test_negations_match_their_contractions(self):
+        index = QuestionIndex()
+        assert index.group_of(question("Which of the following is NOT a prime number?")) == \
+            index.group_of(question("Which of the following isn't a prime number?"))
+
+    def test_options_and_answers_count(self):
+        index = QuestionIndex()
+        stem = "Which of the following is a prime number?"
+        first = index.group_of(multiple_choice(stem, ["4", "6", "7", "9"], "C"))
+
+        # Same options in another order, same answer
+        assert index.group_of(multiple_choice(stem, ["7", "9", "4", "6"], "A")) == first
+        assert index.group_of(multiple_choice(stem, ["4", "6", "7", "9"], "D")) != first
+        assert index.group_of(multiple_choice(stem, ["8", "10", "11", "12"], "C")) != first
+
+    def test_stored_payloads_match_models(self):
+        index = QuestionIndex()
+        model = multiple_choice("Which planet is largest?", ["Mars", "Jupiter"], "B")
+        assert index.group_of(model.model_dump(exclude={"id"})) == index.group_of(model)
+
+    def test_distinct_keeps_the_first(self):
+        quiz = [question(NEAR_DUPLICATES[0][0], "a"), question("Which gas do plants absorb?", "b"),
+                question(NEAR_DUPLICATES[0][1], "c")]
+        assert [q.id for q in QuestionIndex().distinct(quiz)] == ["a", "b"]
+
+    def test_full_index_matches_exact_repeats_only(self):
+        index = QuestionIndex(max_entries=1)
+        index.group_of(question(NEAR_DUPLICATES[0][0]))
+
+        assert index.group_of(question(NEAR_DUPLICATES[0][0] + "!")) == index.group_of(question(NEAR_DUPLICATES[0][0]))
+        assert len(index) == 1
+
+
+class TestRecentQuestions:
+    def test_groups_expire_and_are_bounded(self):
+        now = [0.0]
+        recent = RecentQuestions(ttl_seconds=60, per_device=2, clock=lambda: now[0])
+
+        recent.remember("device", [question("Question one?"), question("Question two?")])
+        now[0] = 30
+        recent.remember("device", [question("Question three?")])
+
+        assert recent.groups("device") == {"question two = a", "question three = a"}
+        now[0] = 61
+        assert recent.groups("device") == {"question three = a"}
+        assert recent.groups("other") == set()
+
+
+class TestBank:
+    """Tests for keeping near-duplicates out of the bank and bank quizzes."""
+
+    def test_add_skips_near_duplicates(self, db):
+        add_to_bank(db, ("python", "easy", "en"), [question(NEAR_DUPLICATES[0][0])])
+
+        added = add_to_bank(db, ("python", "easy", "en"), [question(NEAR_DUPLICATES[0][1]), question("Why?")])
+
+        assert added == 1
+
+    def test_quiz_has_no_near_duplicates(self, db):
+        db.add_all([bank_row(NEAR_DUPLICATES[0][0]), bank_row(NEAR_DUPLICATES[0][1]), bank_row("Why?", served=1)])
+        db.commit()
+
+        quiz = assemble_quiz_from_bank(db, "python", "easy", "en", 2)
+
+        assert len(quiz) == 2 and quiz[1].question == "Why?"
+        assert assemble_quiz_from_bank(db, "python", "easy", "en", 3) is None
+
+    def test_recent_questions_only_when_short(self, db):
+        db.add_all([bank_row("Old question?"), bank_row("New question?", served=5)])
+        db.commit()
+        avoid = {question_index.group_of(bank_row("Old question?").question)}
+
+        assert [q.question for q in assemble_quiz_from_bank(db, "python", "easy", "en", 1, avoid)] == ["New question?"]
+        assert len(assemble_quiz_from_bank(db, "python", "easy", "en", 2, avoid)) == 2
+
+    def test_reindex_reports_and_prunes(self, db):
+        db.add_all([
+            bank_row(NEAR_DUPLICATES[0][0]), bank_row(NEAR_DUPLICATES[0][1], served=3), bank_row("Why?"),
+            CachedQuiz(cache_key="k", topic="python", difficulty="easy", language="en",
+                       questions=[{"question": NEAR_DUPLICATES[1][0]}, {"question": NEAR_DUPLICATES[1][1]}]),
+        ])
+        db.commit()
+
+        report = reindex(db, prune=True)
+
+        assert (report.bank_questions, report.cached_questions, report.groups) == (3, 2, 3)
+        assert (report.bank_duplicates, report.pruned) == (1, 1)
+        # The most-served of the near-duplicates is kept
+        assert [row.question["question"] for row in db.query(BankQuestion).order_by(BankQuestion.id)] == \
+            [NEAR_DUPLICATES[0][1], "Why?"]
+
+    def test_cli_prune_is_a_dry_run_without_apply(self, db):
+        db.add_all([bank_row(NEAR_DUPLICATES[0][0]), bank_row(NEAR_DUPLICATES[0][1])])
+        db.commit()
+
+        with patch("app.services.question_index.SessionLocal", TestingSessionLocal), \
+                patch("app.services.question_index.engine", engine):
+            main(["--prune"])
+            assert db.query(BankQuestion).count() == 2
+
+            main(["--prune", "--apply"])
+            assert db.query(BankQuestion).count() == 1
+
+
+class TestGeneration:
+    @pytest.mark.asyncio
+    async def test_near_duplicates_are_topped_up(self, monkeypatch):
+        answers = [
+            [NEAR_DUPLICATES[0][0], NEAR_DUPLICATES[0][1], "Which gas do plants absorb?"],
+            ["What is the capital of France, the country?", "Which river flows through Paris?"],
+        ]
+
+        async def post_completion(payload, timeout, mode=quiz_service.LIVE, prompt=None):
+            return json.dumps([
+                {"type": "fill_blank", "question": text, "correct_answer": "a", "explanation": "e"}
+                for text in answers.pop(0)
+            ])
+
+        monkeypatch.setattr(quiz_service, "post_completion", post_completion)
+
+        questions = await quiz_service.request_quiz(QuizSpec("France", 3, "easy", "en"))
+
+        assert [q.question for q in questions] == [
+            NEAR_DUPLICATES[0][0], "Which gas do plants absorb?", "Which river flows through Paris?"
+        ]
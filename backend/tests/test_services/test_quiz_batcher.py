@@ -0,0 +1,181 @@
+"""Test batched quiz generation."""
+import asyncio
+import json
+
+import pytest
+
+from app.schemas import QuizQuestion
+from app.services.llm_limiter import FREE_TRIAL, PAID, current_caller, llm_caller
+from app.services.quiz_batcher import QuizBatcher, QuizSpec
+from app.services.quiz_service import parse_batch_answer, prompt_registry
+
+
+def make_quiz(spec: QuizSpec, source: str):
+    return [
+        QuizQuestion(id=f"{source}{i}", type="fill_blank", question=f"{spec.topic} {i}?",
+                     correct_answer="a", explanation="e")
+        for i in range(spec.num_questions)
+    ]
+
+
+def raw_question(topic, i):
+    return {"type": "fill_blank", "question": f"{topic} {i}?", "options": None,
+            "correct_answer": "a", "explanation": "e"}
+
+
+class FakeLLM:
+    """Records single and batched calls."""
+
+    def __init__(self, missing=(), fail_batch=False):
+        self.single = []
+        self.batches = []
+        self.missing = set(missing)
+        self.fail_batch = fail_batch
+
+    async def one(self, spec):
+        self.single.append(spec.topic)
+        await asyncio.sleep(0.01)
+        return make_quiz(spec, "single")
+
+    async def batch(self, specs):
+        self.batches.append([spec.topic for spec in specs])
+        await asyncio.sleep(0.01)
+        if self.fail_batch:
+            raise Exception("LLM API error: 500")
+        return [None if spec.topic in self.missing else make_quiz(spec, "batch") for spec in specs]
+
+
+def make_batcher(llm, **kwargs):
+    options = dict(max_wait_ms=20, max_tokens=4000, tokens_per_question=100, min_in_flight=0)
+    options.update(kwargs)
+    return QuizBatcher(llm.one, llm.batch, **options)
+
+
+def spec(topic, n=5):
+    return QuizSpec(topic, n, "medium", "en")
+
+
+class TestQuizBatcher:
+    """Tests for scheduling, packing and fallback."""
+
+    @pytest.mark.asyncio
+    async def test_idle_llm_is_not_batched(self):
+        """Test a request goes straight out while few LLM calls are running."""
+        llm = FakeLLM()
+        batcher = make_batcher(llm, min_in_flight=2)
+
+        questions = await batcher.generate(spec("python"))
+
+        assert llm.single == ["python"] and llm.batches == []
+        assert len(questions) == 5
+
+    @pytest.mark.asyncio
+    async def test_busy_llm_batches_and_demultiplexes(self):
+        """Test concurrent requests share one call and each gets its own quiz."""
+        llm = FakeLLM()
+        batcher = make_batcher(llm)
+
+        results = await asyncio.gather(*(batcher.generate(spec(t)) for t in ("a", "b", "c")))
+
+        assert llm.batches == [["a", "b", "c"]] and llm.single == []
+        assert [r[0].question for r in results] == ["a 0?", "b 0?", "c 0?"]
+
+    @pytest.mark.asyncio
+    async def test_batches_fit_token_budget(self):
+        """Test requests are split into calls whose output fits max_tokens."""
+        llm = FakeLLM()
+        batcher = make_batcher(llm, max_tokens=1000)
+
+        await asyncio.gather(*(batcher.generate(spec(t)) for t in ("a", "b", "c", "d", "e")))
+
+        assert llm.batches == [["a", "b"], ["c", "d"]]
+        assert llm.single == ["e"]  # a batch of one is a plain call
+
+    @pytest.mark.asyncio
+    async def test_batches_keep_priority_classes_apart(self):
+        """Test paid and free-trial requests go out in separate batches, paid first."""
+        llm = FakeLLM()
+        batcher = make_batcher(llm)
+        priorities = {}
+
+        async def batch(specs):
+            priorities[specs[0].topic] = current_caller().priority
+            return await llm.batch(specs)
+
+        batcher.generate_batch = batch
+
+        async def generate(topic, priority):
+            with llm_caller(priority, topic):
+                return await batcher.generate(spec(topic))
+
+        await asyncio.gather(
+            generate("free1", FREE_TRIAL), generate("paid1", PAID),
+            generate("free2", FREE_TRIAL), generate("paid2", PAID)
+        )
+
+        assert llm.batches == [["paid1", "paid2"], ["free1", "free2"]]
+        assert priorities == {"paid1": PAID, "free1": FREE_TRIAL}
+
+    @pytest.mark.asyncio
+    async def test_batches_keep_groups_apart(self):
+        """Test quizzes routed to different models go out in separate batches."""
+        llm = FakeLLM()
+        batcher = make_batcher(llm, group_by=lambda s: "small" if s.num_questions <= 3 else "large")
+
+        await asyncio.gather(
+            batcher.generate(spec("a", 5)), batcher.generate(spec("b", 2)),
+            batcher.generate(spec("c", 5)), batcher.generate(spec("d", 3))
+        )
+
+        assert sorted(llm.batches) == [["a", "c"], ["b", "d"]]
+
+    @pytest.mark.asyncio
+    async def test_malformed_quiz_falls_back_alone(self):
+        """Test a quiz missing from the batch answer gets its own call."""
+        llm = FakeLLM(missing={"b"})
+        batcher = make_batcher(llm)
+
+        results = await asyncio.gather(*(batcher.generate(spec(t)) for t in ("a", "b", "c")))
+
+        assert llm.single == ["b"]
+        assert [r[0].id for r in results] == ["batch0", "single0", "batch0"]
+
+    @pytest.mark.asyncio
+    async def test_failed_batch_falls_back_per_request(self):
+        """Test a failed batch call retries each quiz on its own."""
+        llm = FakeLLM(fail_batch=True)
+        batcher = make_batcher(llm)
+
+        results = await asyncio.gather(*(batcher.generate(spec(t)) for t in ("a", "b")))
+
+        assert sorted(llm.single) == ["a", "b"]
+        assert all(r[0].id == "single0" for r in results)
+
+
+class TestBatchAnswer:
+    """Tests for the batched prompt and answer parsing."""
+
+    def test_prompt_lists_each_quiz(self):
+        """Test every quiz is numbered with its own size, difficulty and language."""
+        prompt = prompt_registry.batch([QuizSpec("Python", 3, "easy", "en"), QuizSpec("Algebra", 5, "hard", "fr")]).text
+        assert '1. "Python": exactly 3 questions at easy difficulty level, written in English' in prompt
+        assert '2. "Algebra": exactly 5 questions at hard difficulty level, written in French' in prompt
+
+    def test_parse_demultiplexes_by_number(self):
+        """Test each quiz gets its own array, and bad entries map to None."""
+        specs = [spec("a", 2), spec("b", 2), spec("c", 2), spec("d", 2)]
+        content = "Here you go:\n" + json.dumps({
+            "1": [raw_question("a", i) for i in range(3)],
+            "2": [raw_question("b", 0)],
+            "3": [{"question": "no type"}, raw_question("c", 1)],
+        })
+
+        quizzes = parse_batch_answer(content, specs)
+
+        assert [q.question for q in quizzes[0]] == ["a 0?", "a 1?"]
+        assert quizzes[1:] == [None, None, None]
+
+    def test_parse_without_object_raises(self):
+        """Test an answer with no JSON object fails the whole batch."""
+        with pytest.raises(ValueError):
+            parse_batch_answer("[]", [spec("a")])
@@ -0,0 +1,182 @@
+"""Test the quiz cache."""
+import random
+from datetime import datetime, timedelta
+import pytest
+from unittest.mock import patch
+
+from app.models import CachedQuiz
+from app.schemas import QuizQuestion
+from app.services.quiz_cache import QuizCache, quiz_cache_key
+from app.services.topic_index import normalize_topic
+from tests.conftest import FakeClock
+
+
+def make_quiz(tag: str, n: int = 3):
+    """Build a quiz whose question ids carry a variant tag."""
+    return [
+        QuizQuestion(
+            id=f"{tag}-{i}",
+            type="fill_blank",
+            question=f"Question {i}?",
+            correct_answer="answer",
+            explanation="Because"
+        )
+        for i in range(n)
+    ]
+
+
+class TestCacheKey:
+    """Tests for request canonicalization."""
+
+    def test_topic_folding(self):
+        """Test case, punctuation and whitespace are folded."""
+        assert normalize_topic("  Python   Basics!! ") == "python basics"
+        assert normalize_topic("ＰＹＴＨＯＮ") == "python"
+
+    def test_symbol_names_keep_their_meaning(self):
+        """Test languages named by their symbols don't fold onto each other."""
+        assert normalize_topic("C++ Templates") == "cpp templates"
+        assert normalize_topic("C#") == normalize_topic("Ｃ＃") == "csharp"
+        assert normalize_topic("F#") == "fsharp"
+        assert normalize_topic("ASP.NET Core") == "asp dotnet core"
+        assert normalize_topic("Node.js") == "node js"
+
+    def test_symbol_names_get_their_own_keys(self):
+        """Test C, C++ and C# are cached apart."""
+        keys = {quiz_cache_key(topic, "medium", "en", 5) for topic in ("C", "C++", "C#", "F#", ".NET")}
+        assert len(keys) == 5
+
+    def test_equivalent_requests_share_key(self):
+        """Test equivalent topics map to the same key."""
+        assert quiz_cache_key("Python Basics", "medium", "en", 5) == \
+            quiz_cache_key("python  basics?", "medium", "en", 5)
+
+    def test_key_includes_all_fields(self):
+        """Test difficulty, language and size are part of the key."""
+        base = quiz_cache_key("python", "medium", "en", 5)
+        assert base != quiz_cache_key("python", "hard", "en", 5)
+        assert base != quiz_cache_key("python", "medium", "fr", 5)
+        assert base != quiz_cache_key("python", "medium", "en", 4)
+
+    def test_key_includes_prompt_versions(self):
+        """Test quizzes from another generation prompt version aren't served as current ones."""
+        from app.services.prompts import PromptRegistry
+
+        base = quiz_cache_key("python", "medium", "en", 5)
+        with patch("app.services.quiz_cache.prompt_registry", PromptRegistry(versions={"quiz": "v1"})):
+            assert quiz_cache_key("python", "medium", "en", 5) != base
+
+
+class TestQuizCache:
+    """Tests for the in-memory tier and variety policy."""
+
+    def test_misses_until_all_variants_generated(self):
+        """Test a key only hits once it holds every variant."""
+        cache = QuizCache(max_entries=10, ttl_seconds=60, max_variants=2, persistent=False)
+        cache.put("k", make_quiz("a"))
+        assert cache.get("k") is None
+
+        cache.put("k", make_quiz("b"))
+        served = cache.get("k")
+        assert served is not None
+        assert {q.id.split("-")[0] for q in served} in ({"a"}, {"b"})
+
+    def test_shuffles_question_order(self):
+        """Test served variants have their question order shuffled."""
+        cache = QuizCache(
+            max_entries=10, ttl_seconds=60, max_variants=1,
+            persistent=False, rng=random.Random(1)
+        )
+        cache.put("k", make_quiz("a", n=8))
+        orders = {tuple(q.id for q in cache.get("k")) for _ in range(10)}
+        assert len(orders) > 1
+
+    def test_ttl_expiry(self):
+        """Test entries expire after the TTL."""
+        clock = FakeClock()
+        cache = QuizCache(max_entries=10, ttl_seconds=60, max_variants=1, persistent=False, clock=clock)
+        cache.put("k", make_quiz("a"))
+        assert cache.get("k") is not None
+
+        clock.now = 61
+        assert cache.get("k") is None
+        assert len(cache) == 0
+
+    def test_lru_eviction(self):
+        """Test the least recently used key is evicted at capacity."""
+        cache = QuizCache(max_entries=2, ttl_seconds=60, max_variants=1, persistent=False)
+        cache.put("a", make_quiz("a"))
+        cache.put("b", make_quiz("b"))
+        cache.get("a")
+        cache.put("c", make_quiz("c"))
+
+        assert cache.get("a") is not None
+        assert cache.get("b") is None
+        assert cache.get("c") is not None
+
+    def test_disabled_cache(self):
+        """Test a disabled cache never stores or serves."""
+        cache = QuizCache(max_entries=10, ttl_seconds=60, max_variants=1, enabled=False)
+        cache.put("k", make_quiz("a"))
+        assert cache.get("k") is None
+
+
+class TestPersistentTier:
+    """Tests for the database tier."""
+
+    def test_survives_memory_clear(self, db):
+        """Test variants are reloaded from the database."""
+        cache = QuizCache(max_entries=10, ttl_seconds=60, max_variants=2)
+        cache.put("k", make_quiz("a"), db, topic="Python")
+        cache.put("k", make_quiz("b"), db, topic="Python")
+        assert db.query(CachedQuiz).count() == 2
+
+        cache.clear()
+        served = cache.get("k", db)
+        assert served is not None
+        assert len(served) == 3
+
+    def test_rows_capped_per_key(self, db):
+        """Test a key keeps only its newest variants in the database."""
+        cache = QuizCache(max_entries=10, ttl_seconds=60, max_variants=2)
+        for tag in "abcd":
+            cache.put("k", make_quiz(tag), db)
+            cache.clear()  # a restarted process adds variants again
+
+        rows = db.query(CachedQuiz).filter(CachedQuiz.cache_key == "k").all()
+        assert sorted(row.questions[0]["id"] for row in rows) == ["c-0", "d-0"]
+
+    def test_expired_rows_deleted_on_write(self, db):
+        """Test writing a variant sweeps expired rows of every key."""
+        db.add(CachedQuiz(cache_key="old", questions=[], created_at=datetime.utcnow() - timedelta(hours=2)))
+        db.commit()
+
+        cache = QuizCache(max_entries=10, ttl_seconds=60, max_variants=2)
+        cache.put("new", make_quiz("a"), db)
+
+        assert [row.cache_key for row in db.query(CachedQuiz)] == ["new"]
+
+
+class TestGenerateEndpointCache:
+    """Tests for the cache in front of /quiz/generate."""
+
+    def test_repeat_requests_served_from_cache(self, client, db):
+        """Test identical requests stop reaching the LLM once cached."""
+        from unittest.mock import patch, AsyncMock
+        from app.models import GenerationToken
+        from app.services.quiz_cache import quiz_cache
+
+        db.add(GenerationToken(device_id="cache-device", tokens_remaining=10, tokens_total=10))
+        db.commit()
+
+        with patch("app.api.quiz.generate_quiz", new_callable=AsyncMock) as mock:
+            mock.return_value = make_quiz("a")
+            for _ in range(quiz_cache.max_variants + 2):
+                response = client.post(
+                    "/api/v1/quiz/generate",
+                    json={"topic": "Python basics", "num_questions": 3},
+                    headers={"X-Device-Id": "cache-device"}
+                )
+                assert response.status_code == 200
+
+        assert mock.await_count == quiz_cache.max_variants
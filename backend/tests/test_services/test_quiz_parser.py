@@ -0,0 +1,157 @@
+"""Test parsing, repairing and validating LLM quiz answers."""
+import json
+
+import pytest
+
+from app.services import quiz_service
+from app.services.quiz_batcher import QuizSpec
+from app.services.quiz_parser import extract_array, extract_object, parse_questions, validate_questions
+
+
+def raw_question(i, **changes):
+    question = {"type": "multiple_choice", "question": f"Question {i}?", "options": ["w", "x", "y", "z"],
+                "correct_answer": "B", "explanation": "Because."}
+    question.update(changes)
+    return question
+
+
+def answer(count, start=0):
+    return json.dumps([raw_question(i) for i in range(start, start + count)], indent=2)
+
+
+class TestRepair:
+    """Tests for recovering the JSON from faulty answers."""
+
+    def test_clean_answer(self):
+        assert len(extract_array(answer(3))) == 3
+
+    def test_code_fence_and_prose(self):
+        content = "Here is your quiz:\n```json\n" + answer(2) + "\n```\nEnjoy!"
+        assert len(extract_array(content)) == 2
+
+    def test_trailing_commas(self):
+        content = answer(2).replace('"Because."', '"Because.",')[:-2] + ",\n]"
+        assert len(extract_array(content)) == 2
+
+    def test_comma_inside_string_is_kept(self):
+        content = answer(1).replace("Because.", "Because, ]")[:-2] + ",\n]"
+        assert extract_array(content)[0]["explanation"] == "Because, ]"
+
+    def test_truncated_answer_keeps_complete_questions(self):
+        content = answer(3)
+        content = content[:content.index("Question 2")]
+        assert [q["question"] for q in extract_array(content)] == ["Question 0?", "Question 1?"]
+
+    def test_truncated_inside_braces_in_strings(self):
+        content = answer(2).replace("Because.", "Use {} here.")
+        content = content[:content.rindex("{}") + 2]
+        assert [q["question"] for q in extract_array(content)] == ["Question 0?"]
+
+    @pytest.mark.parametrize("content", ["I'm sorry, I can't do that.", "[", '[{"type": "multi'])
+    def test_unrecoverable_answer_raises(self, content):
+        with pytest.raises(ValueError):
+            extract_array(content)
+
+    def test_extract_object(self):
+        assert extract_object('```json\n{"1": [],}\n```') == {"1": []}
+        with pytest.raises(ValueError):
+            extract_object("[]")
+
+
+class TestValidation:
+    """Tests for checking questions against the quiz schema."""
+
+    def test_valid_questions_become_quiz_questions(self):
+        parsed = validate_questions([raw_question(0), raw_question(1, type="fill_blank", options=None)])
+
+        assert parsed.rejected == 0
+        first = parsed.questions[0]
+        assert [o.id for o in first.options] == ["A", "B", "C", "D"] and first.correct_answer == "B"
+        assert len(first.id) == 8 and first.id != parsed.questions[1].id
+        assert parsed.questions[1].options is None
+
+    def test_invalid_questions_are_dropped(self):
+        items = [
+            raw_question(0),
+            raw_question(1, correct_answer="E"),  # not an option
+            raw_question(2, type="essay"),
+            {k: v for k, v in raw_question(3).items() if k != "explanation"},
+            "not a question",
+            raw_question(5),
+        ]
+
+        parsed = validate_questions(items)
+
+        assert [q.question for q in parsed.questions] == ["Question 0?", "Question 5?"]
+        assert parsed.rejected == 4
+
+    def test_answers_are_normalized(self):
+        parsed = validate_questions([
+            raw_question(0, correct_answer="y"),  # the option text
+            raw_question(1, correct_answer="c"),
+            raw_question(2, type="true_false", options=None, correct_answer="false"),
+            raw_question(3, type="fill_blank", correct_answer=1789),
+        ])
+
+        assert [q.correct_answer for q in parsed.questions] == ["C", "C", "False", "1789"]
+        assert [o.text for o in parsed.questions[2].options] == ["True", "False"]
+        assert parsed.questions[3].options is None
+
+    def test_answer_with_no_valid_question_raises(self):
+        with pytest.raises(ValueError, match="No valid question"):
+            parse_questions(json.dumps([raw_question(0, type="essay")]))
+
+
+class FakeCompletions:
+    """Answers post_completion calls in order, recording their prompts."""
+
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.prompts = []
+
+    async def __call__(self, payload, timeout, mode=quiz_service.LIVE, prompt=None):
+        self.prompts.append(payload["messages"][0]["content"])
+        content = self.answers.pop(0)
+        if isinstance(content, Exception):
+            raise content
+        return content
+
+
+class TestTopUp:
+    """Tests for topping up a partly valid answer."""
+
+    @pytest.fixture
+    def completions(self, monkeypatch):
+        def install(*answers):
+            fake = FakeCompletions(*answers)
+            monkeypatch.setattr(quiz_service, "post_completion", fake)
+            return fake
+        return install
+
+    @pytest.mark.asyncio
+    async def test_missing_questions_are_topped_up(self, completions):
+        first = json.loads(answer(4))
+        first[1]["type"] = "essay"
+        fake = completions(json.dumps(first), answer(2, start=3))
+
+        questions = await quiz_service.request_quiz(QuizSpec("Rivers", 4, "easy", "en"))
+
+        # The repeated question is dropped from the top-up
+        assert [q.question for q in questions] == ["Question 0?", "Question 2?", "Question 3?", "Question 4?"]
+        assert 'Generate exactly 1 quiz questions about "Rivers"' in fake.prompts[1]
+        assert "- Question 2?" in fake.prompts[1] and "- Question 1?" not in fake.prompts[1]
+
+    @pytest.mark.asyncio
+    async def test_failed_top_up_serves_partial_quiz(self, completions):
+        completions(answer(2), "I'm sorry, I can't do that.")
+
+        questions = await quiz_service.request_quiz(QuizSpec("Rivers", 3, "easy", "en"))
+
+        assert len(questions) == 2
+
+    @pytest.mark.asyncio
+    async def test_long_answer_is_trimmed(self, completions):
+        fake = completions(answer(5))
+
+        assert len(await quiz_service.request_quiz(QuizSpec("Rivers", 3, "easy", "en"))) == 3
+        assert len(fake.prompts) == 1
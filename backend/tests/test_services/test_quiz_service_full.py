@@ -6,8 +6,9 @@ import httpx
 
 from app.services.quiz_service import (
     generate_quiz, calculate_xp, calculate_level, xp_to_next_level,
-    check_achievements, LANGUAGE_NAMES
+    check_achievements
 )
+from app.services.prompts import LANGUAGE_NAMES
 
 
 class TestGenerateQuiz:
@@ -0,0 +1,92 @@
+"""Test the server-side quiz store."""
+from datetime import datetime, timedelta
+
+from app.models import QuizSession
+from app.schemas import QuizQuestion
+from app.services.quiz_store import QuizStore
+from tests.conftest import FakeClock
+
+
+def make_quiz(n: int = 2):
+    return [
+        QuizQuestion(id=f"q{i}", type="fill_blank", question=f"Question {i}?",
+                     correct_answer=f"answer {i}", explanation="Because")
+        for i in range(n)
+    ]
+
+
+class TestQuizStore:
+    """Tests for the in-memory tier."""
+
+    def test_take_returns_answer_key_once(self):
+        """Test a quiz is returned with its answer key, then removed."""
+        store = QuizStore(max_entries=10, ttl_seconds=60, persistent=False)
+        quiz_id = store.save(None, "device", "Math", "hard", make_quiz())
+
+        quiz = store.take(None, quiz_id, "device")
+        assert quiz.difficulty == "hard" and quiz.topic == "Math"
+        assert quiz.answer_key == (("q0", "answer 0", "Because"), ("q1", "answer 1", "Because"))
+        assert store.take(None, quiz_id, "device") is None
+
+    def test_other_device_cannot_take(self):
+        """Test a quiz is only returned to the device it was served to."""
+        store = QuizStore(max_entries=10, ttl_seconds=60, persistent=False)
+        quiz_id = store.save(None, "device", "Math", "easy", make_quiz())
+
+        assert store.take(None, quiz_id, "other") is None
+        assert store.take(None, quiz_id, "device") is not None
+
+    def test_ttl_expiry(self):
+        """Test quizzes expire after the TTL."""
+        clock = FakeClock()
+        store = QuizStore(max_entries=10, ttl_seconds=60, persistent=False, clock=clock)
+        quiz_id = store.save(None, "device", "Math", "easy", make_quiz())
+
+        clock.now = 61
+        assert store.take(None, quiz_id, "device") is None
+        assert len(store) == 0
+
+    def test_lru_capacity(self):
+        """Test the oldest quizzes are evicted beyond capacity."""
+        store = QuizStore(max_entries=2, ttl_seconds=60, persistent=False)
+        ids = [store.save(None, "device", "Math", "easy", make_quiz()) for _ in range(3)]
+
+        assert len(store) == 2
+        assert store.take(None, ids[0], "device") is None
+        assert store.take(None, ids[2], "device") is not None
+
+
+class TestQuizStoreDatabase:
+    """Tests for the database tier."""
+
+    def test_taken_from_db_after_restart(self, db):
+        """Test a quiz outlives the in-memory tier."""
+        quiz_id = QuizStore(max_entries=10, ttl_seconds=60).save(db, "device", "Math", "hard", make_quiz())
+
+        restarted = QuizStore(max_entries=10, ttl_seconds=60)
+        quiz = restarted.take(db, quiz_id, "device")
+        assert quiz.difficulty == "hard"
+        assert quiz.answer_key[0] == ("q0", "answer 0", "Because")
+        assert db.query(QuizSession).count() == 0
+
+    def test_taken_once_across_workers(self, db):
+        """Test two stores sharing a table can't both grade one quiz."""
+        first = QuizStore(max_entries=10, ttl_seconds=60)
+        quiz_id = first.save(db, "device", "Math", "easy", make_quiz())
+        other_worker = QuizStore(max_entries=10, ttl_seconds=60)
+
+        assert other_worker.take(db, quiz_id, "device") is not None
+        assert first.take(db, quiz_id, "device") is None
+
+    def test_expired_rows_deleted_on_write(self, db):
+        """Test unsubmitted quizzes past the TTL are pruned."""
+        store = QuizStore(max_entries=10, ttl_seconds=60)
+        stale_id = store.save(db, "device", "Math", "easy", make_quiz())
+        db.query(QuizSession).filter(QuizSession.quiz_id == stale_id).update(
+            {"created_at": datetime.utcnow() - timedelta(seconds=120)}
+        )
+        db.commit()
+        store.clear()
+
+        fresh_id = store.save(db, "device", "Math", "easy", make_quiz())
+        assert {row.quiz_id for row in db.query(QuizSession)} == {fresh_id}
@@ -0,0 +1,117 @@
+"""Test incremental parsing and streaming generation."""
+import json
+import pytest
+import httpx
+from contextlib import asynccontextmanager
+from unittest.mock import patch
+
+from app.services.json_stream import JsonArrayStreamParser
+from app.services.quiz_service import stream_quiz
+
+QUESTIONS = [
+    {
+        "type": "multiple_choice",
+        "question": "Which brace is {this}?",
+        "options": ["[", "]", "{", "}"],
+        "correct_answer": "C",
+        "explanation": 'Strings may contain "quoted" brackets ]'
+    },
+    {
+        "type": "fill_blank",
+        "question": "The capital of France is ___",
+        "options": None,
+        "correct_answer": "Paris",
+        "explanation": "Paris is the capital"
+    }
+]
+
+
+def feed_in_chunks(parser, text, size):
+    """Feed text in fixed-size chunks, collecting completed objects."""
+    objects = []
+    for i in range(0, len(text), size):
+        objects.extend(parser.feed(text[i:i + size]))
+    return objects
+
+
+class TestJsonArrayStreamParser:
+    """Tests for the incremental JSON array parser."""
+
+    @pytest.mark.parametrize("size", [1, 3, 17, 10000])
+    def test_any_chunking_yields_same_objects(self, size):
+        """Test objects are recovered regardless of chunk boundaries."""
+        text = "Here you go:\n```json\n" + json.dumps(QUESTIONS, indent=2) + "\n```"
+        parser = JsonArrayStreamParser()
+        assert feed_in_chunks(parser, text, size) == QUESTIONS
+        assert parser.finished
+
+    def test_object_emitted_as_soon_as_it_closes(self):
+        """Test an element is returned before the array is complete."""
+        parser = JsonArrayStreamParser()
+        first = json.dumps(QUESTIONS[0])
+        assert parser.feed("[" + first[:-1]) == []
+        assert parser.feed(first[-1] + ", {") == [QUESTIONS[0]]
+        assert not parser.finished
+
+    def test_malformed_element_is_skipped(self):
+        """Test a broken element is dropped and parsing continues."""
+        parser = JsonArrayStreamParser()
+        objects = parser.feed('[{"type": oops}, {"type": "true_false"}]')
+        assert objects == [{"type": "true_false"}]
+        assert parser.malformed == 1
+
+
+def sse_body(content: str, size: int = 20) -> bytes:
+    """Build an OpenAI-style SSE body streaming `content` in deltas."""
+    lines = []
+    for i in range(0, len(content), size):
+        chunk = {"choices": [{"delta": {"content": content[i:i + size]}}]}
+        lines.append(f"data: {json.dumps(chunk)}\n\n")
+    lines.append("data: [DONE]\n\n")
+    return "".join(lines).encode()
+
+
+def mock_llm(handler):
+    """Patch the LLM client with one backed by a mock transport."""
+    @asynccontextmanager
+    async def fake_client():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            yield client
+    return patch("app.services.quiz_service.llm_client", fake_client)
+
+
+class TestStreamQuiz:
+    """Tests for stream_quiz."""
+
+    @pytest.mark.asyncio
+    async def test_streams_questions(self):
+        """Test questions are yielded from streamed deltas."""
+        requests = []
+
+        def handler(request):
+            requests.append(json.loads(request.content))
+            return httpx.Response(200, content=sse_body(json.dumps(QUESTIONS)))
+
+        with mock_llm(handler):
+            questions = [q async for q in stream_quiz("Geography", 2, "easy", "en")]
+
+        assert requests[0]["stream"] is True
+        assert [q.type for q in questions] == ["multiple_choice", "fill_blank"]
+        assert questions[0].options[2].text == "{"
+
+    @pytest.mark.asyncio
+    async def test_skips_invalid_questions(self):
+        """Test objects missing required fields are skipped."""
+        content = json.dumps([{"type": "true_false"}, QUESTIONS[1]])
+
+        with mock_llm(lambda request: httpx.Response(200, content=sse_body(content))):
+            questions = [q async for q in stream_quiz("Geography", 2, "easy", "en")]
+
+        assert len(questions) == 1
+
+    @pytest.mark.asyncio
+    async def test_http_error(self):
+        """Test upstream errors are reported."""
+        with mock_llm(lambda request: httpx.Response(502)):
+            with pytest.raises(Exception, match="LLM API error: 502"):
+                [q async for q in stream_quiz("Geography", 2, "easy", "en")]
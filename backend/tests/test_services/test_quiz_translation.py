@@ -0,0 +1,126 @@
+"""Test serving quizzes translated from a source-language quiz."""
+import pytest
+
+from app.models import QuizTranslation
+from app.schemas import QuizOption, QuizQuestion
+from app.services.quiz_cache import QuizCache
+from app.services.quiz_service import translate_questions
+from app.services.quiz_translation import (
+    TranslationStore, merge_translations, translation_items, translation_source_key
+)
+
+SOURCE = [
+    QuizQuestion(id="q1", type="multiple_choice", question="Largest planet?",
+                 options=[QuizOption(id="A", text="Mars"), QuizOption(id="B", text="Jupiter")],
+                 correct_answer="B", explanation="Jupiter is largest."),
+    QuizQuestion(id="q2", type="true_false", question="The Sun is a star?",
+                 options=[QuizOption(id="A", text="True"), QuizOption(id="B", text="False")],
+                 correct_answer="True", explanation="It is."),
+    QuizQuestion(id="q3", type="fill_blank", question="The red planet is ___.",
+                 correct_answer="Mars", explanation="Iron oxide."),
+]
+
+TRANSLATED_ITEMS = [
+    {"id": "q1", "question": "Plus grande planète ?", "options": ["Mars", "Jupiter"], "explanation": "Jupiter."},
+    {"id": "q2", "question": "Le Soleil est une étoile ?", "explanation": "Oui."},
+    {"id": "q3", "question": "La planète rouge est ___.", "answer": "Mars", "explanation": "Oxyde de fer."},
+]
+
+
+class TestTranslationItems:
+    """Tests for what is sent for translation and how it comes back."""
+
+    def test_items_hold_only_text(self):
+        items = translation_items(SOURCE)
+
+        assert items[0] == {"id": "q1", "question": "Largest planet?", "options": ["Mars", "Jupiter"],
+                            "explanation": "Jupiter is largest."}
+        assert "options" not in items[1] and "answer" not in items[1]
+        assert items[2]["answer"] == "Mars"
+
+    def test_merge_keeps_ids_answers_and_structure(self):
+        translated = merge_translations(SOURCE, TRANSLATED_ITEMS)
+
+        assert [q.id for q in translated] == ["q1", "q2", "q3"]
+        assert translated[0].question == "Plus grande planète ?"
+        assert translated[0].correct_answer == "B" and [o.id for o in translated[0].options] == ["A", "B"]
+        assert translated[1].options == SOURCE[1].options and translated[1].correct_answer == "True"
+
+    def test_incomplete_translations_are_left_out(self):
+        items = [
+            {**TRANSLATED_ITEMS[0], "options": ["Mars"]},  # an option lost
+            {"id": "q2", "question": "", "explanation": "Oui."},
+            TRANSLATED_ITEMS[2],
+            {"id": "q9", "question": "?", "explanation": "?"},
+        ]
+
+        assert [q.id for q in merge_translations(SOURCE, items)] == ["q3"]
+
+    def test_source_language_is_not_translated(self):
+        assert translation_source_key("Space", "easy", "en", 3) is None
+        assert translation_source_key("Space", "easy", "fr", 3) == translation_source_key("space", "easy", "de", 3)
+
+
+class TestTranslationStore:
+    """Tests for the translated-question store."""
+
+    def test_memory_round_trip_and_expiry(self):
+        now = [0.0]
+        store = TranslationStore(max_entries=10, ttl_seconds=60, persistent=False, clock=lambda: now[0])
+        translated = merge_translations(SOURCE, TRANSLATED_ITEMS)
+
+        store.store("key", translated, "fr")
+
+        assert set(store.lookup("key", ["q1", "q2", "q3", "q4"], "fr")) == {"q1", "q2", "q3"}
+        assert store.lookup("key", ["q1"], "de") == {}
+        now[0] = 61
+        assert store.lookup("key", ["q1"], "fr") == {}
+
+    def test_capacity(self):
+        store = TranslationStore(max_entries=2, ttl_seconds=60, persistent=False)
+        store.store("key", merge_translations(SOURCE, TRANSLATED_ITEMS), "fr")
+        assert len(store) == 2
+
+    def test_database_tier(self, db):
+        store = TranslationStore(max_entries=10, ttl_seconds=60)
+        store.store("key", merge_translations(SOURCE, TRANSLATED_ITEMS), "fr", db)
+        store.clear()
+
+        found = store.lookup("key", ["q1", "q3"], "fr", db)
+
+        assert found["q3"].question == "La planète rouge est ___."
+        assert len(store) == 2  # hydrated into memory
+
+    def test_storing_again_replaces_rows(self, db):
+        store = TranslationStore(max_entries=10, ttl_seconds=60)
+        translated = merge_translations(SOURCE, TRANSLATED_ITEMS)
+        store.store("key", translated, "fr", db)
+        store.store("key", [translated[0].model_copy(update={"question": "Planète géante ?"})], "fr", db)
+
+        assert db.query(QuizTranslation).count() == 3
+        store.clear()
+        assert store.lookup("key", ["q1"], "fr", db)["q1"].question == "Planète géante ?"
+
+
+class TestCachePeek:
+    def test_peek_serves_before_all_variants(self, db):
+        cache = QuizCache(max_entries=10, ttl_seconds=60, max_variants=3)
+        cache.put("key", SOURCE, db, topic="Space", difficulty="easy", language="en")
+
+        assert cache.get("key", db) is None
+        assert {q.id for q in cache.peek("key", db)} == {"q1", "q2", "q3"}
+
+        cache.clear()
+        assert {q.id for q in cache.peek("key", db)} == {"q1", "q2", "q3"}
+        assert cache.peek("other", db) is None
+
+
+class TestAgainstStandIn:
+    @pytest.mark.asyncio
+    async def test_translate_questions(self, llm_standin):
+        translated = await translate_questions(SOURCE, "fr")
+
+        assert [q.id for q in translated] == ["q1", "q2", "q3"]
+        assert translated[0].question == "[French] Largest planet?"
+        assert translated[2].correct_answer == "[French] Mars"
+        assert llm_standin.stats.models == {"claude-3-5-haiku-20241022": 1}
@@ -0,0 +1,165 @@
+"""Test request coalescing."""
+import asyncio
+import pytest
+import httpx
+from unittest.mock import patch
+
+from app.services.single_flight import SingleFlight
+
+
+class TestSingleFlight:
+    """Tests for the single-flight primitive."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_callers_share_one_call(self):
+        """Test identical concurrent calls run the function once."""
+        flights = SingleFlight()
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "quiz"
+
+        results = await asyncio.gather(*(flights.do("k", work) for _ in range(5)))
+
+        assert calls == 1
+        assert [value for value, _ in results] == ["quiz"] * 5
+        assert [shared for _, shared in results].count(False) == 1
+        assert len(flights) == 0
+
+    @pytest.mark.asyncio
+    async def test_different_keys_run_separately(self):
+        """Test different keys are not coalesced."""
+        flights = SingleFlight()
+        calls = []
+
+        async def work(key):
+            calls.append(key)
+            await asyncio.sleep(0)
+            return key
+
+        await asyncio.gather(flights.do("a", lambda: work("a")), flights.do("b", lambda: work("b")))
+        assert sorted(calls) == ["a", "b"]
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_does_not_cancel_call(self):
+        """Test cancelling one waiter leaves the shared call running."""
+        flights = SingleFlight()
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            return "done"
+
+        first = asyncio.create_task(flights.do("k", work))
+        second = asyncio.create_task(flights.do("k", work))
+        await asyncio.sleep(0)
+
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await second == ("done", True)
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    @pytest.mark.asyncio
+    async def test_errors_propagate_and_reset(self):
+        """Test failures reach every waiter and the next call starts fresh."""
+        flights = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(
+            flights.do("k", fail), flights.do("k", fail), return_exceptions=True
+        )
+        assert all(isinstance(r, ValueError) for r in results)
+
+        async def ok():
+            return "fresh"
+
+        assert await flights.do("k", ok) == ("fresh", False)
+
+
+class TestGenerateCoalescing:
+    """Tests for coalescing in /quiz/generate."""
+
+    @pytest.mark.asyncio
+    async def test_identical_requests_share_generation_but_charge_each(self, client):
+        """Test concurrent identical requests make one LLM call and each use a trial."""
+        from app.main import app
+        from app.schemas import QuizQuestion
+
+        calls = 0
+
+        async def slow_generate(**kwargs):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return [QuizQuestion(
+                id="q1", type="fill_blank", question="Q?",
+                correct_answer="a", explanation="e"
+            )]
+
+        transport = httpx.ASGITransport(app=app)
+        with patch("app.api.quiz.generate_quiz", side_effect=slow_generate):
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+                responses = await asyncio.gather(*(
+                    ac.post(
+                        "/api/v1/quiz/generate",
+                        json={"topic": "Viral topic", "num_questions": 1},
+                        headers={"X-Device-Id": f"viral-{i}"}
+                    )
+                    for i in range(4)
+                ))
+
+            assert [r.status_code for r in responses] == [200] * 4
+            assert all(r.json()["is_free_trial"] for r in responses)
+            assert calls == 1
+
+            # Every device spent its own free trial
+            for i in range(4):
+                assert client.get("/api/v1/tokens", headers={"X-Device-Id": f"viral-{i}"}).json()["free_trial_used"]
+
+    @pytest.mark.asyncio
+    async def test_quiz_cached_when_initiator_disconnects(self, client):
+        """Test the shared result is cached even if the starting request is cancelled."""
+        from app.main import app
+        from app.schemas import QuizQuestion
+        from app.services.quiz_cache import quiz_cache, quiz_cache_key
+
+        started = asyncio.Event()
+
+        async def slow_generate(**kwargs):
+            started.set()
+            await asyncio.sleep(0.05)
+            return [QuizQuestion(
+                id="q1", type="fill_blank", question="Q?",
+                correct_answer="a", explanation="e"
+            )]
+
+        def generate(ac, device_id):
+            return ac.post(
+                "/api/v1/quiz/generate",
+                json={"topic": "Abandoned topic", "num_questions": 1},
+                headers={"X-Device-Id": device_id}
+            )
+
+        transport = httpx.ASGITransport(app=app)
+        with patch("app.api.quiz.generate_quiz", side_effect=slow_generate), \
+                patch.object(quiz_cache, "max_variants", 1):
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+                initiator = asyncio.create_task(generate(ac, "leaver"))
+                await started.wait()
+                joiner = asyncio.create_task(generate(ac, "stayer"))
+                await asyncio.sleep(0.01)
+                initiator.cancel()
+                response = await joiner
+
+            assert response.status_code == 200
+            key = quiz_cache_key("Abandoned topic", "medium", "en", 1)
+            assert quiz_cache.get(key) is not None
@@ -0,0 +1,133 @@
+"""Test the token ledger."""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from unittest.mock import patch
+
+from app.database import Base
+from app.models import GenerationToken, FreeTrialUsage
+from app.schemas import QuizQuestion
+from app.services.token_ledger import (
+    NoTokensError, reserve_generation, refund_generation
+)
+
+
+class TestReserveGeneration:
+    """Tests for reservations and refunds."""
+
+    def test_paid_token_reserved_first(self, db):
+        """Test paid tokens are spent before the free trial."""
+        db.add(GenerationToken(device_id="paid", tokens_remaining=2, tokens_total=2))
+        db.commit()
+
+        reservation = reserve_generation(db, "paid")
+        assert not reservation.is_free_trial
+        assert reservation.tokens_remaining == 1
+        assert db.query(FreeTrialUsage).count() == 0
+
+    def test_free_trial_once(self, db):
+        """Test the free trial can be reserved exactly once."""
+        assert reserve_generation(db, "new").is_free_trial
+        with pytest.raises(NoTokensError):
+            reserve_generation(db, "new")
+
+    def test_refund_paid_token(self, db):
+        """Test a refund returns the paid token."""
+        token = GenerationToken(device_id="refund", tokens_remaining=1, tokens_total=1)
+        db.add(token)
+        db.commit()
+
+        refund_generation(db, reserve_generation(db, "refund"))
+        db.refresh(token)
+        assert token.tokens_remaining == 1
+
+    def test_refund_free_trial(self, db):
+        """Test a refunded free trial can be used again."""
+        refund_generation(db, reserve_generation(db, "trial-refund"))
+        assert reserve_generation(db, "trial-refund").is_free_trial
+
+    def test_parallel_reservations_never_overspend(self, tmp_path):
+        """Test 100 threads racing for 10 tokens get exactly 10 reservations."""
+        engine = create_engine(
+            f"sqlite:///{tmp_path / 'ledger.db'}",
+            connect_args={"check_same_thread": False, "timeout": 30}
+        )
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+
+        with Session() as session:
+            session.add(GenerationToken(device_id="racer", tokens_remaining=10, tokens_total=10))
+            session.add(FreeTrialUsage(device_id="racer"))
+            session.commit()
+
+        def attempt(_):
+            with Session() as session:
+                try:
+                    return reserve_generation(session, "racer")
+                except NoTokensError:
+                    return None
+
+        with ThreadPoolExecutor(max_workers=20) as pool:
+            results = list(pool.map(attempt, range(100)))
+
+        assert sum(r is not None for r in results) == 10
+        with Session() as session:
+            assert session.query(GenerationToken).one().tokens_remaining == 0
+        engine.dispose()
+
+
+class TestConcurrentGenerates:
+    """Tests for /quiz/generate under concurrency."""
+
+    @pytest.mark.asyncio
+    async def test_100_parallel_generates_against_10_tokens(self, client, db):
+        """Test exactly 10 of 100 concurrent generates succeed."""
+        from app.main import app
+
+        db.add(GenerationToken(device_id="burst", tokens_remaining=10, tokens_total=10))
+        db.add(FreeTrialUsage(device_id="burst"))
+        db.commit()
+
+        async def slow_generate(**kwargs):
+            await asyncio.sleep(0.01)
+            return [QuizQuestion(id="q1", type="fill_blank", question="Q?",
+                                 correct_answer="a", explanation="e")]
+
+        transport = httpx.ASGITransport(app=app)
+        with patch("app.api.quiz.generate_quiz", side_effect=slow_generate):
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+                responses = await asyncio.gather(*(
+                    ac.post(
+                        "/api/v1/quiz/generate",
+                        json={"topic": f"Topic {i}", "num_questions": 1},
+                        headers={"X-Device-Id": "burst"}
+                    )
+                    for i in range(100)
+                ))
+
+        statuses = [r.status_code for r in responses]
+        assert statuses.count(200) == 10
+        assert statuses.count(402) == 90
+        remaining = sorted(r.json()["tokens_remaining"] for r in responses if r.status_code == 200)
+        assert remaining == list(range(10))
+
+    def test_failed_generation_is_refunded(self, client, db):
+        """Test an LLM failure gives the token back."""
+        token = GenerationToken(device_id="unlucky", tokens_remaining=1, tokens_total=1)
+        db.add(token)
+        db.commit()
+
+        with patch("app.api.quiz.generate_quiz", side_effect=Exception("LLM API error: 503")):
+            response = client.post(
+                "/api/v1/quiz/generate",
+                json={"topic": "Math", "num_questions": 1},
+                headers={"X-Device-Id": "unlucky"}
+            )
+
+        assert response.status_code == 500
+        db.refresh(token)
+        assert token.tokens_remaining == 1
@@ -0,0 +1,140 @@
+"""Test topic canonicalization and the MinHash similarity index."""
+from unittest.mock import patch
+
+import pytest
+
+from app.models import BankQuestion
+from app.services.minhash import MinHashIndex, char_shingles, jaccard
+from app.services.question_bank import assemble_quiz_from_bank
+from app.services.quiz_cache import quiz_cache_key
+from app.services.topic_catalog import SeoCatalog
+from app.services.topic_index import TopicIndex, strip_fillers
+
+CATALOG = SeoCatalog(
+    categories={
+        "programming": ["python", "data-structures", "nodejs"],
+        "history": ["world-war-1", "world-war-2", "cold-war"],
+        "science": ["quantum-mechanics", "organic-chemistry"],
+        "programming_languages": ["csharp"],
+    },
+    levels=[], languages=[]
+)
+
+
+class TestMinHashIndex:
+    """Tests for the LSH index."""
+
+    def test_finds_similar_texts_only(self):
+        index = MinHashIndex()
+        for text in ("photosynthesis in plants", "plate tectonics", "the french revolution"):
+            index.add(text, char_shingles(text))
+
+        found = index.query(char_shingles("photosynthesis in plant"), 0.7)
+
+        assert [key for key, _ in found] == ["photosynthesis in plants"]
+        assert found[0][1] == jaccard(char_shingles("photosynthesis in plant"), char_shingles("photosynthesis in plants"))
+        assert index.query(char_shingles("cell biology"), 0.7) == []
+
+    def test_signatures_are_deterministic(self):
+        features = char_shingles("volcanoes")
+        assert MinHashIndex().signature(features) == MinHashIndex().signature(features)
+
+    def test_bands_must_divide_signature(self):
+        with pytest.raises(ValueError):
+            MinHashIndex(num_perm=64, bands=10)
+
+
+class TestTopicIndex:
+    """Tests for mapping free-text topics onto canonical ones."""
+
+    @pytest.fixture
+    def index(self):
+        return TopicIndex(CATALOG)
+
+    @pytest.mark.parametrize("topic", ["Python", "python basics", "Learn python!", "Python for beginners", "ＰＹＴＨＯＮ 101"])
+    def test_catalog_topics(self, index, topic):
+        found = index.canonicalize(topic)
+        assert (found.topic, found.category, found.match) == ("python", "programming", "catalog")
+
+    def test_catalog_slug_variants(self, index):
+        assert index.canonicalize("Intro to the Data Structure").topic == "data structures"
+        assert index.canonicalize("Node.js").topic == "nodejs"
+        assert index.canonicalize("The Cold War").topic == "cold war"
+
+    def test_fillers_only_at_the_ends(self):
+        assert strip_fillers("history of rome") == "history of rome"
+        assert strip_fillers("machine learning basics") == "machine learning"
+        assert strip_fillers("the basics") == "the basics"
+
+    def test_similar_topics_share_the_first_seen(self, index):
+        assert index.canonicalize("Photosynthesis in plants").match == "new"
+
+        found = index.canonicalize("photosynthesis in plant")
+
+        assert (found.topic, found.match) == ("photosynthesis in plants", "similar")
+        assert index.canonicalize("quantum mechanicss").topic == "quantum mechanics"
+
+    def test_numbers_keep_topics_apart(self, index):
+        assert index.canonicalize("world war 3").topic == "world war 3"
+        assert index.canonicalize("world war 3 timeline").topic != index.canonicalize("world war 2 timeline").topic
+
+    def test_negating_prefixes_keep_topics_apart(self, index):
+        assert index.canonicalize("Inorganic chemistry").topic == "inorganic chemistry"
+        assert index.canonicalize("organic chemistr").topic == "organic chemistry"
+        index.canonicalize("unsupervised learning")
+        assert index.canonicalize("supervised learning").match == "new"
+
+    def test_added_words_keep_topics_apart(self, index):
+        assert index.canonicalize("non-linear quantum mechanics").topic == "non linear quantum mechanics"
+
+    def test_symbol_names_reach_the_catalog(self, index):
+        found = index.canonicalize("C#")
+        assert (found.topic, found.match) == ("csharp", "catalog")
+        assert index.canonicalize("C++").topic == "cpp"
+
+    def test_unrelated_topics_stay_apart(self, index):
+        assert index.canonicalize("java").topic == "java"
+        assert index.canonicalize("javascript").topic == "javascript"
+        assert index.canonicalize("光合作用").topic == "光合作用"
+
+    def test_learned_topics_are_bounded_and_reset(self):
+        index = TopicIndex(CATALOG, max_topics=len(CATALOG.slugs) + 1)
+        index.canonicalize("plate tectonics")
+        index.canonicalize("cell biology")
+        assert len(index) == len(CATALOG.slugs) + 1
+
+        index.reset()
+
+        assert index.canonicalize("plate tectonic").match == "new"
+
+
+class TestUsers:
+    """Canonical topics in cache keys, the question bank and metrics."""
+
+    def test_equivalent_topics_share_a_cache_key(self):
+        assert quiz_cache_key("Learn Python!", "easy", "en", 5) == quiz_cache_key("python", "easy", "en", 5)
+        assert quiz_cache_key("java", "easy", "en", 5) != quiz_cache_key("python", "easy", "en", 5)
+
+    def test_bank_serves_equivalent_topics(self, db):
+        for i in range(2):
+            db.add(BankQuestion(topic_slug="python", difficulty="easy", language="en", question={
+                "type": "fill_blank", "question": f"Banked {i}?", "options": None,
+                "correct_answer": "a", "explanation": "e"
+            }))
+        db.commit()
+
+        assert len(assemble_quiz_from_bank(db, "Python basics", "easy", "en", 2)) == 2
+
+    def test_generation_metric_labels_catalog_categories(self):
+        from app.metrics import quiz_generations_total, record_quiz_generation
+
+        with patch.object(quiz_generations_total, "labels", wraps=quiz_generations_total.labels) as labels:
+            record_quiz_generation("Learn Rust", "easy", "programming")
+            record_quiz_generation("Spanish", "easy", "languages")
+            record_quiz_generation("The Cold War", "easy", "history")
+            record_quiz_generation("Jazz", "easy", "arts")
+            record_quiz_generation("Random topic", "easy")
+
+        # One vocabulary, whether the label comes from the catalog or from keywords
+        assert [call.kwargs["topic_category"] for call in labels.call_args_list] == \
+            ["programming", "language", "academic", "general", "general"]
@@ -0,0 +1,128 @@
+"""Test the warm pool."""
+import asyncio
+import pytest
+from unittest.mock import patch
+
+from app.schemas import QuizQuestion
+from app.services.warm_pool import WarmPool
+from tests.conftest import FakeClock
+
+KEY = ("Python", "medium", "en", 1)
+
+
+def fake_generate(delay=0.0):
+    """generate_quiz replacement that counts calls."""
+    state = {"calls": 0, "in_flight": 0, "peak": 0}
+
+    async def generate(topic, num_questions, difficulty, language):
+        state["calls"] += 1
+        state["in_flight"] += 1
+        state["peak"] = max(state["peak"], state["in_flight"])
+        await asyncio.sleep(delay)
+        state["in_flight"] -= 1
+        return [QuizQuestion(id=str(state["calls"]), type="fill_blank", question=f"{topic}?",
+                             correct_answer="a", explanation="e")]
+
+    return generate, state
+
+
+async def settle():
+    """Let background refill workers run."""
+    for _ in range(20):
+        await asyncio.sleep(0)
+
+
+class TestWarmPool:
+    """Tests for hot-key tracking and refills."""
+
+    @pytest.mark.asyncio
+    async def test_key_becomes_hot_and_is_filled(self):
+        """Test a repeatedly requested key gets `depth` ready quizzes."""
+        pool = WarmPool(depth=3, hot_keys=5, workers=2, max_age_seconds=60)
+        generate, state = fake_generate()
+
+        with patch("app.services.warm_pool.generate_quiz", side_effect=generate):
+            await pool.start()
+            try:
+                pool.observe(*KEY)
+                await settle()
+                assert pool.depth_of(*KEY) == 0  # one request is not hot yet
+
+                pool.observe(*KEY)
+                await settle()
+                assert pool.depth_of(*KEY) == 3
+            finally:
+                await pool.stop()
+
+        assert state["calls"] == 3
+
+    @pytest.mark.asyncio
+    async def test_take_triggers_refill(self):
+        """Test serving a quiz schedules a replacement."""
+        pool = WarmPool(depth=2, hot_keys=5, workers=1, max_age_seconds=60, min_hits=0.5)
+        generate, state = fake_generate()
+
+        with patch("app.services.warm_pool.generate_quiz", side_effect=generate):
+            await pool.start()
+            try:
+                pool.observe(*KEY)
+                await settle()
+                quiz = pool.take(*KEY)
+                assert quiz is not None
+                await settle()
+                assert pool.depth_of(*KEY) == 2
+            finally:
+                await pool.stop()
+
+        assert state["calls"] == 3
+
+    @pytest.mark.asyncio
+    async def test_refills_respect_concurrency_cap(self):
+        """Test no more than `workers` refills run at once."""
+        pool = WarmPool(depth=4, hot_keys=5, workers=2, max_age_seconds=60, min_hits=0.5)
+        generate, state = fake_generate(delay=0.01)
+
+        with patch("app.services.warm_pool.generate_quiz", side_effect=generate):
+            await pool.start()
+            try:
+                pool.observe("Python", "easy", "en", 1)
+                pool.observe("Rust", "easy", "en", 1)
+                await asyncio.sleep(0.1)
+            finally:
+                await pool.stop()
+
+        assert state["calls"] == 8
+        assert state["peak"] <= 2
+
+    def test_only_hottest_keys_are_pooled(self):
+        """Test the pool tracks at most `hot_keys` keys."""
+        pool = WarmPool(depth=1, hot_keys=1, workers=1, max_age_seconds=60, min_hits=0.5)
+        pool.observe("Python", "easy", "en", 1)
+        pool.observe("Rust", "easy", "en", 1)
+        pool.observe("Rust", "easy", "en", 1)
+
+        assert pool.take("Python", "easy", "en", 1) is None
+        assert len(pool._entries) == 1
+
+    @pytest.mark.asyncio
+    async def test_stale_quizzes_are_dropped(self):
+        """Test quizzes older than max age are not served."""
+        clock = FakeClock()
+        pool = WarmPool(depth=1, hot_keys=5, workers=1, max_age_seconds=60, min_hits=0.5, clock=clock)
+        generate, _ = fake_generate()
+
+        with patch("app.services.warm_pool.generate_quiz", side_effect=generate):
+            await pool.start()
+            try:
+                pool.observe(*KEY)
+                await settle()
+                clock.now = 61
+                assert pool.take(*KEY) is None
+            finally:
+                await pool.stop()
+
+    def test_disabled_pool_is_inert(self):
+        """Test a disabled pool never tracks or serves."""
+        pool = WarmPool(depth=1, hot_keys=5, workers=1, max_age_seconds=60, min_hits=0.5, enabled=False)
+        pool.observe(*KEY)
+        assert pool.take(*KEY) is None
@@ -17,6 +17,7 @@ export interface QuizQuestion {
 }
 
 export interface QuizResponse {
+  quiz_id: string
   topic: string
   questions: QuizQuestion[]
   is_free_trial: boolean
@@ -105,9 +106,8 @@ export async function generateQuiz(
 }
 
 export async function submitQuiz(
-  topic: string,
+  quizId: string,
   answers: { question_id: string; answer: string }[],
-  questions: QuizQuestion[],
   durationSeconds?: number
 ): Promise<QuizSubmitResponse> {
   const response = await fetch(`${API_BASE}/quiz/submit`, {
@@ -117,9 +117,8 @@ export async function submitQuiz(
       'X-Device-Id': getDeviceId()
     },
     body: JSON.stringify({
-      topic,
+      quiz_id: quizId,
       answers,
-      questions,
       duration_seconds: durationSeconds
     })
   })
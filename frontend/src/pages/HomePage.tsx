@@ -15,7 +15,7 @@ export default function HomePage() {
   const [loading, setLoading] = useState(false)
   const [error, setError] = useState('')
   
-  const { setQuestions, setTopic: saveQuizTopic } = useQuizStore()
+  const { setQuestions, setQuizId, setTopic: saveQuizTopic } = useQuizStore()
   const { tokensRemaining, hasFreeTrial, setTokenStatus, isLoading } = useTokenStore()
   
   useEffect(() => {
@@ -42,6 +42,7 @@ export default function HomePage() {
     
     try {
       const result = await generateQuiz(topic, numQuestions, difficulty, i18n.language)
+      setQuizId(result.quiz_id)
       saveQuizTopic(topic)
       setQuestions(result.questions, result.is_free_trial, result.tokens_remaining)
       navigate('/quiz')
@@ -9,6 +9,7 @@ export default function QuizPage() {
   const navigate = useNavigate()
   
   const {
+    quizId,
     topic,
     questions,
     currentIndex,
@@ -41,9 +42,8 @@ export default function QuizPage() {
     try {
       const durationSeconds = Math.floor((Date.now() - startTime) / 1000)
       const result = await submitQuiz(
-        topic,
+        quizId,
         Object.entries(answers).map(([question_id, answer]) => ({ question_id, answer })),
-        questions,
         durationSeconds
       )
       setResults(result)
@@ -2,6 +2,7 @@ import { create } from 'zustand'
 import { QuizQuestion, QuizSubmitResponse } from '../lib/api'
 
 interface QuizState {
+  quizId: string
   topic: string
   questions: QuizQuestion[]
   currentIndex: number
@@ -10,6 +11,7 @@ interface QuizState {
   isFreeTrial: boolean
   tokensRemaining: number | null
   
+  setQuizId: (quizId: string) => void
   setTopic: (topic: string) => void
   setQuestions: (questions: QuizQuestion[], isFreeTrial: boolean, tokens: number | null) => void
   setAnswer: (questionId: string, answer: string) => void
@@ -20,6 +22,7 @@ interface QuizState {
 }
 
 export const useQuizStore = create<QuizState>((set) => ({
+  quizId: '',
   topic: '',
   questions: [],
   currentIndex: 0,
@@ -28,6 +31,8 @@ export const useQuizStore = create<QuizState>((set) => ({
   isFreeTrial: false,
   tokensRemaining: null,
   
+  setQuizId: (quizId) => set({ quizId }),
+  
   setTopic: (topic) => set({ topic }),
   
   setQuestions: (questions, isFreeTrial, tokens) => set({
@@ -54,6 +59,7 @@ export const useQuizStore = create<QuizState>((set) => ({
   setResults: (results) => set({ results }),
   
   reset: () => set({
+    quizId: '',
     topic: '',
     questions: [],
     currentIndex: 0,
@@ -94,6 +94,7 @@ describe('API error handling', () => {
 describe('API success cases', () => {
   it('generates quiz successfully', async () => {
     const mockResponse = {
+      quiz_id: 'quiz-1',
       topic: 'Math',
       questions: [
         {
@@ -118,6 +119,7 @@ describe('API success cases', () => {
     const { generateQuiz } = await import('../lib/api')
     const result = await generateQuiz('Math', 5, 'medium', 'en')
     
+    expect(result.quiz_id).toBe('quiz-1')
     expect(result.topic).toBe('Math')
     expect(result.questions).toHaveLength(1)
     expect(result.is_free_trial).toBe(true)
@@ -142,10 +144,16 @@ describe('API success cases', () => {
     global.fetch = mockFetch
     
     const { submitQuiz } = await import('../lib/api')
-    const result = await submitQuiz('Math', [], [], 60)
+    const result = await submitQuiz('quiz-1', [{ question_id: 'q1', answer: 'A' }], 60)
     
     expect(result.correct_count).toBe(3)
     expect(result.xp_earned).toBe(40)
+    const body = JSON.parse(mockFetch.mock.calls[0][1].body)
+    expect(body).toEqual({
+      quiz_id: 'quiz-1',
+      answers: [{ question_id: 'q1', answer: 'A' }],
+      duration_seconds: 60
+    })
   })
 
   it('gets progress successfully', async () => {